@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+#
+#   diff_benchmark.py
+#
+#   Time wb_diff_difflib.Difference on a corpus of large diffs
+#   that are slow with the quadratic intraline search:
+#
+#       lockfile    - package lock with most versions and hashes changed
+#       generated   - generated source where every line is renumbered
+#       reformat    - source where every line has its indentation changed
+#       scattered   - small edits spread through a large file
+#       unrelated   - two files with no lines in common
+#
+#   With --legacy the original engine, difflib line matching and the
+#   quadratic fancy_replace, is also timed. It can take many minutes.
+#
+#   usage: diff_benchmark.py [<scale>] [--legacy]
+#
+import sys
+import time
+import random
+import difflib
+
+sys.path.insert( 0, '..' )
+
+# the legacy fancy_replace recurses once per similar line
+sys.setrecursionlimit( 20000 )
+
+import wb_diff_difflib
+
+class CountingBody:
+    def __init__( self ):
+        self.normal = 0
+        self.inserted = 0
+        self.deleted = 0
+        self.changed = 0
+
+    def addNormalLine( self, line ):
+        self.normal += 1
+
+    def addInsertedLine( self, line ):
+        self.inserted += 1
+
+    def addDeletedLine( self, line ):
+        self.deleted += 1
+
+    def addChangedLineBegin( self ):
+        self.changed += 1
+
+    def addChangedLineReplace( self, old, new ):
+        pass
+
+    def addChangedLineDelete( self, old ):
+        pass
+
+    def addChangedLineInsert( self, new ):
+        pass
+
+    def addChangedLineEqual( self, text ):
+        pass
+
+    def addChangedLineEnd( self ):
+        pass
+
+    def addEnd( self ):
+        pass
+
+    def __str__( self ):
+        return 'normal %d inserted %d deleted %d changed %d' % (self.normal, self.inserted, self.deleted, self.changed)
+
+class LegacyDifference(wb_diff_difflib.Difference):
+    # the original difflib line matching and quadratic fancy_replace
+    def fancy_replace( self, a, alo, ahi, b, blo, bhi ):
+        best_ratio, cutoff = 0.51, 0.52
+        cruncher = difflib.SequenceMatcher( wb_diff_difflib.isCharacterJunk )
+        eqi, eqj = None, None
+
+        for j in range( blo, bhi ):
+            bj = b[j]
+            cruncher.set_seq2( bj )
+            for i in range( alo, ahi ):
+                ai = a[i]
+                if ai == bj:
+                    if eqi is None:
+                        eqi, eqj = i, j
+                    continue
+                cruncher.set_seq1( ai )
+                if( cruncher.real_quick_ratio() > best_ratio
+                and cruncher.quick_ratio() > best_ratio
+                and cruncher.ratio() > best_ratio ):
+                    best_ratio, best_i, best_j = cruncher.ratio(), i, j
+
+        if best_ratio < cutoff:
+            if eqi is None:
+                self.plain_replace( a, alo, ahi, b, blo, bhi )
+                return
+            best_i, best_j = eqi, eqj
+
+        self.fancy_helper( a, alo, best_i, b, blo, best_j )
+        self.synch_pair( cruncher, a[ best_i ], b[ best_j ] )
+        self.fancy_helper( a, best_i+1, ahi, b, best_j+1, bhi )
+
+    def fancy_helper( self, a, alo, ahi, b, blo, bhi ):
+        if alo < ahi:
+            if blo < bhi:
+                self.fancy_replace( a, alo, ahi, b, blo, bhi )
+            else:
+                self.dump( self.text_body.addDeletedLine, a, alo, ahi )
+        elif blo < bhi:
+            self.dump( self.text_body.addInsertedLine, b, blo, bhi )
+
+    def filecompare( self, lines_left, lines_right ):
+        matcher = difflib.SequenceMatcher( wb_diff_difflib.isLineJunk, lines_left, lines_right )
+        for tag, left_lo, left_hi, right_lo, right_hi in matcher.get_opcodes():
+            if tag == 'replace':
+                self.fancy_replace( lines_left, left_lo, left_hi, lines_right, right_lo, right_hi )
+            elif tag == 'delete':
+                self.dump( self.text_body.addDeletedLine, lines_left, left_lo, left_hi )
+            elif tag == 'insert':
+                self.dump( self.text_body.addInsertedLine, lines_right, right_lo, right_hi )
+            elif tag == 'equal':
+                self.dump( self.text_body.addNormalLine, lines_left, left_lo, left_hi )
+
+        self.text_body.addEnd()
+        return 1
+
+def randomHash( rnd ):
+    return '%040x' % (rnd.getrandbits( 160 ),)
+
+def corpusLockfile( rnd, scale ):
+    left = []
+    right = []
+    for index in range( 200 * scale ):
+        name = 'package-%05d' % (index,)
+        old_version = '%d.%d.%d' % (rnd.randint( 0, 9 ), rnd.randint( 0, 20 ), rnd.randint( 0, 50 ))
+        old_hash = randomHash( rnd )
+        if rnd.random() < 0.2:
+            new_version, new_hash = old_version, old_hash
+
+        else:
+            new_version, new_hash = '%s.1' % (old_version,), randomHash( rnd )
+
+        for lines, version, hash_ in ((left, old_version, old_hash), (right, new_version, new_hash)):
+            lines.append( '    "%s": {' % (name,) )
+            lines.append( '      "version": "%s",' % (version,) )
+            lines.append( '      "resolved": "https://registry.example.com/%s/-/%s-%s.tgz",' % (name, name, version) )
+            lines.append( '      "integrity": "sha1-%s"' % (hash_,) )
+            lines.append( '    },' )
+
+    return left, right
+
+def corpusGenerated( rnd, scale ):
+    left = ['static const int table_%d[] = { %d, %d, %d };' % (index, index, index*2, index*3) for index in range( 1000 * scale )]
+    right = ['static const int table_%d[] = { %d, %d, %d };' % (index+1, index, index*2, index*3) for index in range( 1000 * scale )]
+    return left, right
+
+def corpusReformat( rnd, scale ):
+    left = []
+    for index in range( 1000 * scale ):
+        left.append( '%sresult_%d = compute( value_%d, option_%d )' % (' ' * (4 * rnd.randint( 0, 3 )), index, index % 17, index % 5) )
+
+    right = ['\t' + line.lstrip() for line in left]
+    return left, right
+
+def corpusScattered( rnd, scale ):
+    left = ['line %d of a large file with some words in it' % (index,) for index in range( 5000 * scale )]
+    right = list( left )
+    for index in range( 0, len(right), 7 ):
+        right[ index ] = right[ index ].replace( 'some', 'different' )
+
+    return left, right
+
+def corpusUnrelated( rnd, scale ):
+    left = [randomHash( rnd ) for index in range( 1000 * scale )]
+    right = [randomHash( rnd ) for index in range( 1000 * scale )]
+    return left, right
+
+all_corpus = (
+    ('lockfile', corpusLockfile),
+    ('generated', corpusGenerated),
+    ('reformat', corpusReformat),
+    ('scattered', corpusScattered),
+    ('unrelated', corpusUnrelated),
+    )
+
+def timeIt( label, difference_class, left, right ):
+    body = CountingBody()
+    start = time.time()
+    difference_class( body ).filecompare( left, right )
+    print( '    %-10s %8.3fs  %s' % (label, time.time() - start, body) )
+
+def main( argv ):
+    scale = 1
+    legacy = False
+    for arg in argv[1:]:
+        if arg == '--legacy':
+            legacy = True
+
+        else:
+            scale = int( arg )
+
+    for name, corpus in all_corpus:
+        left, right = corpus( random.Random( 1 ), scale )
+        print( '%s: %d vs. %d lines' % (name, len(left), len(right)) )
+
+        timeIt( 'current', wb_diff_difflib.Difference, left, right )
+        if legacy:
+            timeIt( 'legacy', LegacyDifference, left, right )
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit( main( sys.argv ) )
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+#
+#   file_state_memory.py
+#
+#   The measuring shared by the <scm>_file_state_memory.py benchmarks.
+#   Each benchmark provides a legacy file state class, the current
+#   file state class and a function that makes the file states of
+#   all the paths, then calls main() here.
+#
+#   The paths are made before measuring as they are the keys of
+#   all_file_state and are shared with the file states.
+#
+import gc
+import time
+import pathlib
+import tracemalloc
+import builtins
+
+# the SCM modules translate their messages at import time
+builtins.T_ = lambda s: s
+
+def measure( label, make_file_states, file_state_class, project, all_paths ):
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    all_file_state = make_file_states( file_state_class, project, all_paths )
+    build_time = time.time() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.time()
+    gc.collect()
+    gc_time = time.time() - start
+
+    print( '    %-8s %8.1f MB %6.1f bytes/file  build %6.3fs  gc.collect %6.3fs' %
+            (label, size / 1e6, size / len(all_paths), build_time, gc_time) )
+
+    del all_file_state
+
+def main( argv, scm_name, make_file_states, project, legacy_class, current_class ):
+    num_files = int( argv[1] ) if len(argv) > 1 else 300000
+
+    all_paths = [pathlib.Path( 'folder-%03d/file-%06d.txt' % (index // 1000, index) ) for index in range( num_files )]
+
+    print( '%s: %d file states' % (scm_name, num_files) )
+    measure( 'legacy', make_file_states, legacy_class, project, all_paths )
+    measure( 'current', make_file_states, current_class, project, all_paths )
+
+    return 0
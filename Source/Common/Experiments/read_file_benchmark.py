@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+#
+#   read_file_benchmark.py
+#
+#   Compare the time taken and the peak memory used to read the lines
+#   of a large generated text file:
+#
+#       legacy  - open in text mode, read() then split( '\n' )
+#       current - wb_read_file.readFileTextLines that decodes blocks
+#                 of a memory map of the file
+#
+#   Both keep the same list of lines, the difference in the peak is
+#   the copies of the whole file the legacy read makes.
+#
+#   usage: read_file_benchmark.py [<num-lines>]
+#
+import sys
+import os
+import time
+import tempfile
+import tracemalloc
+
+sys.path.insert( 0, '..' )
+
+import wb_read_file
+
+def readLegacy( filename ):
+    with open( filename, encoding='utf-8' ) as f:
+        return f.read().split( '\n' )
+
+def readCurrent( filename ):
+    return wb_read_file.readFileTextLines( filename, universal_newlines=True )
+
+def measure( label, read_fn, filename ):
+    tracemalloc.start()
+    start = time.time()
+    all_lines = read_fn( filename )
+    duration = time.time() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print( '    %-8s %7.3fs  lines %8.1f MB  peak %8.1f MB' % (label, duration, size / 1e6, peak / 1e6) )
+    return all_lines
+
+def main( argv ):
+    num_lines = int( argv[1] ) if len(argv) > 1 else 2000000
+
+    fd, filename = tempfile.mkstemp( suffix='.txt' )
+    try:
+        with os.fdopen( fd, 'w', encoding='utf-8' ) as f:
+            for index in range( num_lines ):
+                f.write( 'line %d of a generated log file with some non-ascii text éè\n' % (index,) )
+
+        print( 'read file: %d lines %.1f MB' % (num_lines, os.path.getsize( filename ) / 1e6) )
+        legacy_lines = measure( 'legacy', readLegacy, filename )
+        current_lines = measure( 'current', readCurrent, filename )
+        assert legacy_lines == current_lines
+
+    finally:
+        os.remove( filename )
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit( main( sys.argv ) )
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+#
+#   unified_diff_view_benchmark.py
+#
+#   Time showing a large generated unified diff:
+#
+#       legacy  - each line written as styled text into a QTextEdit
+#       current - WbDiffViewText that keeps the bytes of the diff with
+#                 an index of the line ends and styles only the lines
+#                 that are drawn
+#
+#   The legacy time is tens of seconds for the default size.
+#
+#   usage: unified_diff_view_benchmark.py [<num-files>] [<lines-per-file>]
+#
+import sys
+import time
+import builtins
+
+sys.path.insert( 0, '..' )
+
+builtins.T_ = lambda s: s
+
+from PyQt5 import QtWidgets
+from PyQt5 import QtGui
+
+import wb_diff_unified_view
+
+class FakePrefs:
+    diff_window = None
+
+class FakeApp:
+    def __init__( self, qt_app ):
+        self.qt_app = qt_app
+        self.prefs = FakePrefs()
+
+    def isDarkMode( self ):
+        return False
+
+    def codeFont( self ):
+        return QtGui.QFont( 'monospace' )
+
+    def makeFgBrush( self, colour ):
+        return QtGui.QBrush( QtGui.QColor( colour ) ) if colour != '' else QtGui.QBrush()
+
+    def makeBgBrush( self, colour ):
+        return QtGui.QBrush( QtGui.QColor( colour ) ) if colour != '' else QtGui.QBrush()
+
+    def fontMetrics( self ):
+        return self.qt_app.fontMetrics()
+
+    def getAppQIcon( self ):
+        return QtGui.QIcon()
+
+def makeDiffLines( num_files, lines_per_file ):
+    all_lines = []
+    for file_index in range( num_files ):
+        name = 'folder/file-%05d.py' % (file_index,)
+        all_lines.append( 'diff --git a/%s b/%s' % (name, name) )
+        all_lines.append( '--- a/%s' % (name,) )
+        all_lines.append( '+++ b/%s' % (name,) )
+        for line_index in range( 0, lines_per_file, 10 ):
+            all_lines.append( '@@ -%d,10 +%d,10 @@' % (line_index+1, line_index+1) )
+            for offset in range( 4 ):
+                all_lines.append( '     value_%d = compute( %d )' % (line_index+offset, offset) )
+
+            all_lines.append( '-    value_%d = old_compute( %d )' % (line_index+4, file_index) )
+            all_lines.append( '+    value_%d = new_compute( %d )' % (line_index+4, file_index) )
+            for offset in range( 5, 10 ):
+                all_lines.append( '     value_%d = compute( %d )' % (line_index+offset, offset) )
+
+    return all_lines
+
+class LegacyDiffViewText(wb_diff_unified_view.WbDiffViewBase):
+    def __init__( self, app, title ):
+        super().__init__( app, title )
+
+        self.text_edit = QtWidgets.QTextEdit()
+        self.text_edit.setReadOnly( True )
+
+        self.all_text_formats = {}
+        for style, fg_colour, bg_colour in self.all_style_colours:
+            char_format = QtGui.QTextCharFormat()
+            char_format.setFont( app.codeFont() )
+            char_format.setForeground( app.makeFgBrush( fg_colour ) )
+            char_format.setBackground( app.makeBgBrush( bg_colour ) )
+            self.all_text_formats[ style ] = char_format
+
+    def setUnifiedDiffText( self, all_lines ):
+        for line in all_lines:
+            if line.startswith('-'):
+                self.writeStyledText( line + '\n', self.style_delete )
+
+            elif line.startswith('+'):
+                self.writeStyledText( line + '\n', self.style_add )
+
+            elif line.startswith(' '):
+                self.writeStyledText( line + '\n', self.style_normal )
+
+            else:
+                self.writeStyledText( line + '\n', self.style_header )
+
+    def writeStyledText( self, text, style ):
+        self.text_edit.moveCursor( QtGui.QTextCursor.End )
+
+        cursor = self.text_edit.textCursor()
+        cursor.beginEditBlock()
+        cursor.setCharFormat( self.all_text_formats[ style ] )
+        cursor.insertText( text )
+        cursor.endEditBlock()
+
+def measure( label, view_class, app, diff_text ):
+    start = time.time()
+
+    # the diff arrives as text like the output of git diff
+    view = view_class( app, label )
+    view.setUnifiedDiffText( diff_text.split( '\n' ) )
+
+    print( '    %-8s %8.3fs' % (label, time.time() - start) )
+    return view
+
+def main( argv ):
+    num_files = int( argv[1] ) if len(argv) > 1 else 1000
+    lines_per_file = int( argv[2] ) if len(argv) > 2 else 500
+
+    qt_app = QtWidgets.QApplication( argv )
+    app = FakeApp( qt_app )
+
+    diff_text = '\n'.join( makeDiffLines( num_files, lines_per_file ) )
+
+    print( 'unified diff: %d files %d lines %.1f MB' % (num_files, diff_text.count( '\n' ) + 1, len(diff_text) / 1e6) )
+    view = measure( 'current', wb_diff_unified_view.WbDiffViewText, app, diff_text )
+    model = view.diff_model
+    print( '             kept %.1f MB of diff bytes and %.1f MB of line ends' %
+            (len(model.data_buffer) / 1e6, model.all_line_ends.itemsize * len(model.all_line_ends) / 1e6) )
+
+    measure( 'legacy', LegacyDiffViewText, app, diff_text )
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit( main( sys.argv ) )
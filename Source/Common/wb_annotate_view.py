@@ -13,6 +13,7 @@
 from PyQt5 import QtWidgets
 from PyQt5 import QtCore
 
+import wb_profile
 import wb_tracked_qwidget
 import wb_main_window
 import wb_table_view
@@ -132,6 +133,16 @@ class WbAnnotateView(wb_main_window.WbMainWindow, wb_tracked_qwidget.WbTrackedMo
 
         self.updateEnableStates()
 
+    # for annotations that arrive a part at a time after showAnnotationForFile
+    def updateAnnotationForFile( self, all_row_ranges, all_commit_log_nodes ):
+        self.annotate_model.updateAnnotationLogIds( all_row_ranges, all_commit_log_nodes )
+
+    def completeAnnotationForFile( self ):
+        self.annotate_table.resizeColumnToContents( self.annotate_model.col_date )
+
+        # show the full commit message if it has been updated
+        self.selectionChangedAnnotation()
+
     def selectionChangedAnnotation( self ):
         self.current_annotations = [index.row() for index in self.annotate_table.selectedIndexes() if index.column() == 0]
 
@@ -170,6 +181,7 @@ class WbAnnotateTableView(wb_table_view.WbTableView):
 
         self.main_window.selectionChangedAnnotation()
 
+@wb_profile.profileModelResets
 class WbAnnotateModel(QtCore.QAbstractTableModel):
     col_revision = 0
     col_author = 1
@@ -197,6 +209,27 @@ class WbAnnotateModel(QtCore.QAbstractTableModel):
         self.all_commit_log_nodes = all_commit_log_nodes
         self.endResetModel()
 
+    def updateAnnotationLogIds( self, all_row_ranges, all_commit_log_nodes ):
+        # all_row_ranges is a list of (first_row, num_rows, log_id)
+        self.all_commit_log_nodes.update( all_commit_log_nodes )
+
+        all_changed_ranges = []
+        for first_row, num_rows, log_id in sorted( all_row_ranges ):
+            for node in self.all_annotation_nodes[ first_row:first_row+num_rows ]:
+                node.log_id = log_id
+
+            # merge adjacent ranges to emit fewer dataChanged signals
+            if len(all_changed_ranges) > 0 and all_changed_ranges[-1][1] == first_row:
+                all_changed_ranges[-1][1] = first_row + num_rows
+
+            else:
+                all_changed_ranges.append( [first_row, first_row + num_rows] )
+
+        for first_row, end_row in all_changed_ranges:
+            self.dataChanged.emit(
+                self.createIndex( first_row, self.col_revision ),
+                self.createIndex( end_row-1, self.col_date ) )
+
     def rowCount( self, parent ):
         return len( self.all_annotation_nodes )
 
@@ -228,10 +261,14 @@ class WbAnnotateModel(QtCore.QAbstractTableModel):
 
         if role == QtCore.Qt.DisplayRole:
             node = self.all_annotation_nodes[ index.row() ]
-            log_node = self.all_commit_log_nodes[ node.log_id ]
+            log_node = self.all_commit_log_nodes.get( node.log_id )
 
             col = index.column()
 
+            if log_node is None and col in (self.col_revision, self.col_author, self.col_date):
+                # not annotated yet
+                return ''
+
             if col == self.col_revision:
                 return log_node.commitIdString()
 
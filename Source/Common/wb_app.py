@@ -26,6 +26,7 @@ import wb_platform_specific
 import wb_logging
 import wb_background_thread
 import wb_config
+import wb_profile
 
 qt_event_type_names = {}
 for name in dir(QtCore.QEvent):
@@ -159,6 +160,11 @@ class WbApp(wb_logging.AppLoggingMixin,
 
         self.debugLogApp = self.debug_options.debugLogApp
 
+        if wb_profile.profiler.isEnabled():
+            profile_dir = wb_platform_specific.getProfileDir()
+            profile_dir.mkdir( parents=True, exist_ok=True )
+            wb_profile.profiler.setOutputFolder( profile_dir )
+
         self.setupAppDebug()
 
         # these messages just go into the log file not the log widget
@@ -210,6 +216,7 @@ class WbApp(wb_logging.AppLoggingMixin,
         self.main_window = self.createMainWindow()
 
         self.applicationStateChanged.connect( self.applicationStateChangedHandler )
+        self.aboutToQuit.connect( self.saveProfile )
 
     def isDarkMode( self ):
         if hasattr( self.prefs, 'projects_defaults' ):
@@ -297,6 +304,17 @@ class WbApp(wb_logging.AppLoggingMixin,
         self.log.info( 'Writing preferences' )
         self.prefs_manager.writePreferences()
 
+    def saveProfile( self ):
+        if not wb_profile.profiler.isEnabled():
+            return
+
+        try:
+            filename = wb_profile.profiler.saveTrace()
+            self.log.info( 'Saved %d profile events in %s' % (wb_profile.profiler.numEvents(), filename) )
+
+        except OSError as e:
+            self.log.error( 'Cannot save profile - %s' % (e,) )
+
     def debugShowCallers( self, depth ):
         if not self.__debug:
             return
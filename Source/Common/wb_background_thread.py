@@ -11,11 +11,13 @@
 
 '''
 import threading
-import queue
+import bisect
 import types
 
 from PyQt5 import QtCore
 
+import wb_profile
+
 #
 #   Decorator used to set the requires_thread_switcher property on a function
 #
@@ -41,38 +43,152 @@ class MarshalledCall:
     def __repr__( self ):
         return '<MarshalledCall: fn=%s nargs=%d>' % (self.function.__name__, len(self.args))
 
-class BackgroundThread(threading.Thread):
-    def __init__( self, app ):
-        super().__init__()
+#
+#   priority of background work, lower numbers run first
+#
+PRIORITY_INTERACTIVE = 0    # the user is waiting for the result
+PRIORITY_NORMAL = 1
+PRIORITY_REFRESH = 2        # updates that can wait for interactive work
+
+class BackgroundWork:
+    def __init__( self, function, args, priority, serial_key, owner, on_cancel, sequence ):
+        self.call = MarshalledCall( function, args )
+        self.priority = priority
+        self.serial_key = serial_key
+        self.owner = owner
+        self.on_cancel = on_cancel
+        self.sequence = sequence
+
+    def __lt__( self, other ):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
 
+    def __repr__( self ):
+        return '<BackgroundWork: %r pri=%d key=%r>' % (self.call, self.priority, self.serial_key)
+
+#
+#   BackgroundExecutor
+#
+#   Runs work on a small pool of background threads
+#
+#   - work with a lower priority number runs first
+#   - work with the same serial_key never runs at the same time,
+#     use the project name to serialise all the work on a project
+#   - work with a serial_key of None runs on its own as if
+#     there was only one background thread
+#   - queued work can be cancelled by its owner
+#
+class BackgroundExecutor:
+    def __init__( self, app, num_workers ):
         self.app = app
 
-        self.setDaemon( 1 )
-        self.running = 1
+        self.running = True
+
+        self.cv = threading.Condition()
+        # sorted by priority then order of arrival
+        self.all_queued_work = []
+        self.all_running_serial_keys = set()
+        self.num_running = 0
+        self.next_sequence = 0
+
+        self.all_workers = [BackgroundWorker( self, index ) for index in range( num_workers )]
+
+    def start( self ):
+        for worker in self.all_workers:
+            worker.start()
 
-        self.work_queue = queue.Queue( maxsize=0 )
+    def addWork( self, function, args, priority=PRIORITY_NORMAL, serial_key=None, owner=None, on_cancel=None ):
+        self.app.debug_options.debugLogThreading( 'BackgroundExecutor.addWork( %r, %r, %r, %r )' % (function, args, priority, serial_key) )
+        assert self.running
+
+        with self.cv:
+            self.next_sequence += 1
+            work = BackgroundWork( function, args, priority, serial_key, owner, on_cancel, self.next_sequence )
+            bisect.insort( self.all_queued_work, work )
+            self.cv.notify_all()
+
+    def cancelWork( self, owner ):
+        # remove all the queued work of owner
+        with self.cv:
+            all_cancelled = [work for work in self.all_queued_work if work.owner is owner]
+            self.all_queued_work = [work for work in self.all_queued_work if work.owner is not owner]
+
+        for work in all_cancelled:
+            self.app.debug_options.debugLogThreading( 'BackgroundExecutor.cancelWork %r' % (work,) )
+            if work.on_cancel is not None:
+                work.on_cancel()
+
+    def shutdown( self ):
+        with self.cv:
+            self.running = False
+            self.cv.notify_all()
+
+    def _nextWork( self ):
+        # called by the workers
+        with self.cv:
+            while True:
+                if not self.running:
+                    return None
+
+                work = self.__takeRunnableWork()
+                if work is not None:
+                    self.num_running += 1
+                    # None is added to stop other work starting
+                    self.all_running_serial_keys.add( work.serial_key )
+                    return work
+
+                self.cv.wait()
+
+    def _workDone( self, work ):
+        with self.cv:
+            self.num_running -= 1
+            self.all_running_serial_keys.discard( work.serial_key )
+            self.cv.notify_all()
+
+    def __takeRunnableWork( self ):
+        if None in self.all_running_serial_keys:
+            # work that must run on its own is running
+            return None
+
+        for index, work in enumerate( self.all_queued_work ):
+            if work.serial_key is None:
+                if self.num_running == 0:
+                    del self.all_queued_work[ index ]
+                    return work
+
+                # do not let later work start before this work
+                return None
+
+            if work.serial_key not in self.all_running_serial_keys:
+                del self.all_queued_work[ index ]
+                return work
+
+        return None
+
+class BackgroundWorker(threading.Thread):
+    def __init__( self, executor, index ):
+        super().__init__( name='BackgroundWorker-%d' % (index,) )
+
+        self.executor = executor
+        self.app = executor.app
+
+        self.setDaemon( 1 )
 
     def run( self ):
-        while self.running:
-            function = self.work_queue.get( block=True, timeout=None )
-            self.app.debug_options.debugLogThreading( 'BackgroundThread.run dispatching %r' % (function,) )
+        while True:
+            work = self.executor._nextWork()
+            if work is None:
+                break
+
+            self.app.debug_options.debugLogThreading( 'BackgroundWorker.run dispatching %r' % (work,) )
 
             try:
-                function()
+                work.call()
 
             except:
                 self.app.log.exception( 'function failed on background thread' )
 
-    def addWork( self, function, args ):
-        self.app.debug_options.debugLogThreading( 'BackgroundThread.addWork( %r, %r )' % (function, args) )
-        assert self.running
-        self.work_queue.put( MarshalledCall( function, args ), block=False, timeout=None )
-
-    def shutdown( self ):
-        self.addWork( self.__shutdown )
-
-    def __shutdown( self ):
-        self.running = 0
+            finally:
+                self.executor._workDone( work )
 
 #
 #   BackgroundWorkMixin
@@ -80,7 +196,7 @@ class BackgroundThread(threading.Thread):
 #   Add features that allow processing to switch
 #   easily from foreground to background threads
 #
-#   runInBackground - call function on the background thread
+#   runInBackground - call function on a background thread
 #   runInForeground - call function on the foreground thread
 #
 #   deferRunInForeground
@@ -92,19 +208,24 @@ class BackgroundThread(threading.Thread):
 #       - function starts in the foreground
 #       - switch to the background by yield switchToBackground
 #       - switch to the foreground by yield switchToForeground
+#       - the priority, serial_key and cancel_key given to
+#         wrapWithThreadSwitcher control how the background
+#         parts are run by the BackgroundExecutor
 #
 
 # assumes that self is app
 class BackgroundWorkMixin:
     foregroundProcessSignal = QtCore.pyqtSignal( [MarshalledCall] )
 
+    num_background_workers = 3
+
     def __init__( self ):
         self.foreground_thread = threading.currentThread()
-        self.background_thread = BackgroundThread( self )
+        self.background_executor = BackgroundExecutor( self, self.num_background_workers )
 
     def startBackgroundThread( self ):
         self.foregroundProcessSignal.connect( self.__runInForeground, type=QtCore.Qt.QueuedConnection )
-        self.background_thread.start()
+        self.background_executor.start()
 
     def isForegroundThread( self ):
         # return true if the caller is running on the main thread
@@ -113,17 +234,17 @@ class BackgroundWorkMixin:
     def deferRunInForeground( self, function ):
         return DeferRunInForeground( self, function )
 
-    def runInBackground( self, function, args ):
+    def runInBackground( self, function, args, priority=PRIORITY_NORMAL, serial_key=None, owner=None, on_cancel=None ):
         self.debug_options.debugLogThreading( 'runInBackground( %r, %r )' % (function, args) )
-        self.background_thread.addWork( function, args )
+        self.background_executor.addWork( function, args, priority, serial_key, owner, on_cancel )
 
     def runInForeground( self, function, args ):
         # cannot call logging from here as this will cause the log call to be marshelled
         self.foregroundProcessSignal.emit( MarshalledCall( function, args ) )
 
-    def wrapWithThreadSwitcher( self, function, reason='' ):
+    def wrapWithThreadSwitcher( self, function, reason='', priority=PRIORITY_NORMAL, serial_key=None, cancel_key=None ):
         if requiresThreadSwitcher( function ):
-            return ThreadSwitchScheduler( self, function, reason )
+            return ThreadSwitchScheduler( self, function, reason, priority, serial_key, cancel_key )
 
         else:
             return function
@@ -149,28 +270,66 @@ class DeferRunInForeground:
     def __call__( self, *args ):
         self.app.runInForeground( self.function, args )
 
+#
+#   ThreadSwitchScheduler
+#
+#   priority - one of the PRIORITY_xxx values
+#   serial_key - background parts with the same key never run at the same time
+#       can be a function that returns the key when the scheduler is called
+#   cancel_key - calling a scheduler cancels the earlier scheduler with the same key
+#       its queued background part is dropped and it stops at its next yield
+#
 class ThreadSwitchScheduler:
     next_instance_id = 0
-    def __init__( self, app, function, reason ):
+
+    all_active_by_cancel_key = {}
+    cancel_lock = threading.Lock()
+
+    def __init__( self, app, function, reason, priority=PRIORITY_NORMAL, serial_key=None, cancel_key=None ):
         self.app = app
         self.function = function
         self.reason = reason
+        self.priority = priority
+        self.serial_key = serial_key
+        self.cancel_key = cancel_key
         self.debugLogThreading = self.app.debug_options.debugLogThreading
         ThreadSwitchScheduler.next_instance_id += 1
         self.instance_id = self.next_instance_id
 
+        self.run_serial_key = None
+        self.cancelled = False
+
+        # cProfile stats of all the steps when enabled
+        self.action_profile = wb_profile.profiler.actionProfile()
+        self.step_number = 0
+
     def __call__( self, *args, **kwds ):
         self.debugLogThreading( 'ThreadSwitchScheduler(%d:%s): start %r( %r, %r )' % (self.instance_id, self.reason, self.function, args, kwds) )
 
+        if callable( self.serial_key ):
+            self.run_serial_key = self.serial_key()
+
+        else:
+            self.run_serial_key = self.serial_key
+
+        if self.cancel_key is not None:
+            with self.cancel_lock:
+                superseded = self.all_active_by_cancel_key.get( self.cancel_key )
+                self.all_active_by_cancel_key[ self.cancel_key ] = self
+
+            if superseded is not None:
+                superseded.cancel()
+
         #pylint disable=bare-except
         try:
             # call the function
-            result = self.function( *args, **kwds )
+            result = self.__step( self.function, *args, **kwds )
 
             # did the function run or make a generator?
             if type(result) != types.GeneratorType:
                 self.debugLogThreading( 'ThreadSwitchScheduler(%d:%s): done (not GeneratorType)' % (self.instance_id, self.reason) )
                 # it ran - we are all done
+                self.__done()
                 return
 
             # step the generator
@@ -178,21 +337,71 @@ class ThreadSwitchScheduler:
 
         except:
             self.app.log.exception( 'ThreadSwitchScheduler(%d:%s)' % (self.instance_id, self.reason) )
+            self.__done()
+
+    def cancel( self ):
+        self.debugLogThreading( 'ThreadSwitchScheduler(%d:%s): cancel' % (self.instance_id, self.reason) )
+        self.cancelled = True
+        self.app.background_executor.cancelWork( self )
+
+    def isCancelled( self ):
+        return self.cancelled
+
+    def __done( self ):
+        if self.cancel_key is not None:
+            with self.cancel_lock:
+                if self.all_active_by_cancel_key.get( self.cancel_key ) is self:
+                    del self.all_active_by_cancel_key[ self.cancel_key ]
+
+        if self.action_profile is not None:
+            self.action_profile.save( self.instance_id, self.reason )
+            self.action_profile = None
+
+    def __step( self, function, *args, **kwds ):
+        if not wb_profile.profiler.enabled:
+            return function( *args, **kwds )
+
+        self.step_number += 1
+        profiling = self.action_profile is not None and self.action_profile.enable()
+        try:
+            with wb_profile.span( str(self.reason), 'thread-switch', {'instance_id': self.instance_id, 'step': self.step_number} ):
+                return function( *args, **kwds )
+
+        finally:
+            if profiling:
+                self.action_profile.disable()
 
     def queueNextSwitch( self, generator ):
         self.debugLogThreading( 'ThreadSwitchScheduler(%d:%s): generator %r' % (self.instance_id, self.reason, generator) )
+        if self.cancelled:
+            self.debugLogThreading( 'ThreadSwitchScheduler(%d:%s): done (cancelled)' % (self.instance_id, self.reason) )
+            generator.close()
+            self.__done()
+            return
+
         # result tells where to schedule the generator to next
         try:
-            where_to_go_next = next( generator )
+            where_to_go_next = self.__step( next, generator )
 
         except StopIteration:
             # no problem all done
             self.debugLogThreading( 'ThreadSwitchScheduler(%d:%s): done (StopIteration)' % (self.instance_id, self.reason) )
+            self.__done()
             return
 
-        # will be one of app.runInForeground or app.runInForeground
+        except:
+            self.__done()
+            raise
+
+        # will be one of app.runInForeground or app.runInBackground
         self.debugLogThreading( 'ThreadSwitchScheduler(%d:%s): next %r' % (self.instance_id, self.reason, where_to_go_next) )
-        where_to_go_next( self.queueNextSwitch, (generator,) )
+        if where_to_go_next == self.app.runInBackground:
+            where_to_go_next( self.queueNextSwitch, (generator,),
+                    priority=self.priority, serial_key=self.run_serial_key,
+                    owner=self, on_cancel=generator.close )
+
+        else:
+            where_to_go_next( self.queueNextSwitch, (generator,) )
 
 #------------------------------------------------------------
 #
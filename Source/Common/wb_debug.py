@@ -11,6 +11,9 @@
 
 '''
 import time
+
+import wb_profile
+
 class WbDebugOption:
     __slots__ = ('__enabled', '_log', '__name', '__fmt')
 
@@ -58,6 +61,17 @@ class WbDebugSpeedOption(WbDebugOption):
 
             self._log.debug( 'SPEED %.6f %.6f %s' % (start_delta, last_delta, msg,) )
 
+class WbDebugProfileOption(WbDebugOption):
+    __slots__ = ('__enable_profiler',)
+
+    def __init__( self, log, name, enable_profiler ):
+        super().__init__( log, name )
+        self.__enable_profiler = enable_profiler
+
+    def enable( self, state=True ):
+        super().enable( state )
+        self.__enable_profiler( state )
+
 class WbDebug:
     def __init__( self, log ):
         self._log = log
@@ -69,6 +83,9 @@ class WbDebug:
         self.debugLogTreeModelNode = self.addDebugOption( 'TREE MODEL NODE' )
         self.debugLogTableModel = self.addDebugOption( 'TABLE MODEL' )
         self.debugLogDiff = self.addDebugOption( 'DIFF' )
+        self.debugLogFsWatcher = self.addDebugOption( 'FS WATCHER' )
+        self.debugLogProfile = WbDebugProfileOption( self._log, 'PROFILE', wb_profile.profiler.enable )
+        self.debugLogProfileCprofile = WbDebugProfileOption( self._log, 'PROFILE CPROFILE', wb_profile.profiler.enableCProfile )
 
     def setDebug( self, str_options ):
         for option in [s.strip().lower() for s in str_options.split(',')]:
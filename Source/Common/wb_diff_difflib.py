@@ -9,11 +9,37 @@
 
     wb_diff_difflib.py
 
+    The lines of the files are matched using patience diff,
+    which anchors on lines that are unique in both files,
+    falling back to difflib for regions without unique lines.
+
+    Replaced blocks are searched for similar lines to show
+    intraline differences. The search only looks at lines near
+    the expected position and large blocks are shown as a
+    plain replace to keep the time taken reasonable.
+
 '''
 import sys
 import unicodedata
 import difflib
+import bisect
 import wb_read_file
+import wb_profile
+
+# replaced blocks with more lines than this on either side
+# are shown without looking for similar lines
+default_max_fancy_replace_lines = 1000
+
+# how many lines either side of the expected position
+# are searched for a similar line
+default_similar_line_window = 10
+
+# the most similarity scores to calculate for one replaced block
+# as each one can take hundreds of micro seconds
+default_max_similar_line_compares = 5000
+
+# lines longer than this are only paired if identical
+default_max_similar_line_length = 2000
 
 # define what "junk" means
 
@@ -25,9 +51,22 @@ def isCharacterJunk(ch, ws=" \t"):
 
 class Difference:
     'Difference'
-    def __init__( self, text_body ):
+    def __init__( self, text_body,
+                max_fancy_replace_lines=default_max_fancy_replace_lines,
+                similar_line_window=default_similar_line_window,
+                max_similar_line_length=default_max_similar_line_length,
+                max_similar_line_compares=default_max_similar_line_compares ):
         self.text_body = text_body
 
+        # None for no limit
+        self.max_fancy_replace_lines = max_fancy_replace_lines
+        self.similar_line_window = similar_line_window
+        self.max_similar_line_length = max_similar_line_length
+        self.max_similar_line_compares = max_similar_line_compares
+
+        # set by filecompare when both sides have the same contents
+        self.identical = False
+
     # meant for dumping lines
     def dump( self, fn, x, lo, hi ):
         for i in range(lo, hi):
@@ -45,90 +84,138 @@ class Difference:
             self.dump(self.text_body.addInsertedLine, b, blo, bhi)
 
     # When replacing one block of lines with another, this guy searches
-    # the blocks for *similar* lines; the best-matching pair (if any) is
-    # used as a synch point, and intraline difference marking is done on
-    # the similar pair.  Lots of work, but often worth it.
-
-    def fancy_replace( self, a, alo, ahi, b, blo, bhi):
+    # the blocks for *similar* lines; the pairs of similar lines are
+    # used as synch points, and intraline difference marking is done on
+    # the similar pairs.  Lots of work, but often worth it.
+
+    def fancy_replace( self, a, alo, ahi, b, blo, bhi ):
+        if( self.max_fancy_replace_lines is not None
+        and max( ahi - alo, bhi - blo ) > self.max_fancy_replace_lines ):
+            self.plain_replace( a, alo, ahi, b, blo, bhi )
+            return
+
+        cruncher = difflib.SequenceMatcher( isCharacterJunk )
+
+        all_pairs = self.find_similar_pairs( cruncher, a, alo, ahi, b, blo, bhi )
+
+        # use the most pairs that keep the lines in order as synch points
+        last_i, last_j = alo, blo
+        for i, j in longestIncreasingPairs( all_pairs ):
+            # pump out diffs from before the synch point
+            self.unpaired_replace( a, last_i, i, b, last_j, j )
+            self.synch_pair( cruncher, a[i], b[j] )
+            last_i, last_j = i+1, j+1
+
+        self.unpaired_replace( a, last_i, ahi, b, last_j, bhi )
+
+    def find_similar_pairs( self, cruncher, a, alo, ahi, b, blo, bhi ):
+        '''
+        return a list of (i, j) in order of j pairing each b[j]
+        with the most similar a[i] near the expected position
+        '''
         # don't synch up unless the lines have a similarity score of at
-        # least cutoff; best_ratio tracks the best score seen so far
-        best_ratio, cutoff = 0.51, 0.52
-        cruncher = difflib.SequenceMatcher(isCharacterJunk)
-        eqi, eqj = None, None   # 1st indices of equal lines (if any)
-
-        # search for the pair that matches best without being identical
-        # (identical lines must be junk lines, & we don't want to synch up
-        # on junk -- unless we have to)
+        # least cutoff and stop looking when a line is good enough
+        cutoff, good_enough = 0.52, 0.75
+
+        window = self.similar_line_window
+        if window is None:
+            window = max( ahi - alo, bhi - blo )
+
+        # look at the nearest lines first
+        all_offsets = [0]
+        for offset in range( 1, window+1 ):
+            all_offsets.append( offset )
+            all_offsets.append( -offset )
+
+        max_length = self.max_similar_line_length
+        compares_left = self.max_similar_line_compares
+        a_len = ahi - alo
+        b_len = bhi - blo
+
+        all_pairs = []
         for j in range( blo, bhi ):
             bj = b[j]
-            cruncher.set_seq2(bj)
-            for i in range( alo, ahi ):
+            long_line = max_length is not None and len(bj) > max_length
+            # where b[j] would be if the blocks lined up
+            expected_i = alo + (j - blo) * a_len // b_len
+            best_ratio, best_i = cutoff, None
+
+            cruncher.set_seq2( bj )
+            for offset in all_offsets:
+                i = expected_i + offset
+                if i < alo or i >= ahi:
+                    continue
+
                 ai = a[i]
                 if ai == bj:
-                    if eqi is None:
-                        eqi, eqj = i, j
+                    best_i = i
+                    break
+
+                if( long_line
+                or (max_length is not None and len(ai) > max_length)
+                or compares_left == 0 ):
                     continue
-                cruncher.set_seq1(ai)
+
+                cruncher.set_seq1( ai )
                 # computing similarity is expensive, so use the quick
                 # upper bounds first -- have seen this speed up messy
                 # compares by a factor of 3.
-                # note that ratio() is only expensive to compute the first
-                # time it's called on a sequence pair; the expensive part
-                # of the computation is cached by cruncher
-                if( cruncher.real_quick_ratio() > best_ratio
-                and cruncher.quick_ratio() > best_ratio
-                and cruncher.ratio() > best_ratio ):
-                    best_ratio, best_i, best_j = cruncher.ratio(), i, j
-
-        if best_ratio < cutoff:
-            # no non-identical "pretty close" pair
-            if eqi is None:
-                # no identical pair either -- treat it as a straight replace
-                self.plain_replace( a, alo, ahi, b, blo, bhi )
-                return
-            # no close pair, but an identical pair -- synch up on that
-            best_i, best_j, best_ratio = eqi, eqj, 1.0
-        else:
-            # there's a close pair, so forget the identical pair (if any)
-            eqi = None
+                if( cruncher.real_quick_ratio() < best_ratio
+                or cruncher.quick_ratio() < best_ratio ):
+                    continue
+
+                if compares_left is not None:
+                    compares_left -= 1
 
-        # a[best_i] very similar to b[best_j]; eqi is None iff they're not
-        # identical
+                ratio = cruncher.ratio()
+                if ratio >= best_ratio:
+                    best_ratio, best_i = ratio, i
+                    if ratio >= good_enough:
+                        break
 
-        # pump out diffs from before the synch point
-        self.fancy_helper( a, alo, best_i, b, blo, best_j )
+            if best_i is not None:
+                all_pairs.append( (best_i, j) )
+
+        return all_pairs
+
+    def unpaired_replace( self, a, alo, ahi, b, blo, bhi ):
+        if alo < ahi:
+            if blo < bhi:
+                self.plain_replace( a, alo, ahi, b, blo, bhi )
+            else:
+                self.dump( self.text_body.addDeletedLine, a, alo, ahi )
+        elif blo < bhi:
+            self.dump( self.text_body.addInsertedLine, b, blo, bhi )
 
+    def synch_pair( self, cruncher, aelt, belt ):
         # do intraline marking on the synch pair
-        aelt, belt = a[ best_i ], b[ best_j ]
-        if eqi is None:
-            self.text_body.addChangedLineBegin()
+        if aelt == belt:
+            self.text_body.addNormalLine( aelt )
+            return
 
-            # diff usually makes more sense as a diff of the words in a line
-            awords = self.splitIntoWords( aelt )
-            bwords = self.splitIntoWords( belt )
-            cruncher.set_seqs( awords, bwords )
-            for tag, ai1, ai2, bj1, bj2 in cruncher.get_opcodes():
-                if tag == 'replace':
-                    self.text_body.addChangedLineReplace( ''.join( awords[ai1:ai2] ), ''.join( bwords[bj1:bj2] ) )
+        self.text_body.addChangedLineBegin()
 
-                elif tag == 'delete':
-                    self.text_body.addChangedLineDelete( ''.join( awords[ai1:ai2] ) )
+        # diff usually makes more sense as a diff of the words in a line
+        awords = self.splitIntoWords( aelt )
+        bwords = self.splitIntoWords( belt )
+        cruncher.set_seqs( awords, bwords )
+        for tag, ai1, ai2, bj1, bj2 in cruncher.get_opcodes():
+            if tag == 'replace':
+                self.text_body.addChangedLineReplace( ''.join( awords[ai1:ai2] ), ''.join( bwords[bj1:bj2] ) )
 
-                elif tag == 'insert':
-                    self.text_body.addChangedLineInsert( ''.join( bwords[bj1:bj2] ) )
+            elif tag == 'delete':
+                self.text_body.addChangedLineDelete( ''.join( awords[ai1:ai2] ) )
 
-                elif tag == 'equal':
-                    self.text_body.addChangedLineEqual( ''.join( bwords[bj1:bj2] ) )
+            elif tag == 'insert':
+                self.text_body.addChangedLineInsert( ''.join( bwords[bj1:bj2] ) )
 
-                else:
-                    raise ValueError( 'unknown tag ' + str(tag) )
+            elif tag == 'equal':
+                self.text_body.addChangedLineEqual( ''.join( bwords[bj1:bj2] ) )
 
-            self.text_body.addChangedLineEnd()
-        else:
-            self.text_body.addNormalLine( aelt )
+            else:
+                raise ValueError( 'unknown tag ' + str(tag) )
 
-        # pump out diffs from after the synch point
-        self.fancy_helper(a, best_i+1, ahi, b, best_j+1, bhi)
+        self.text_body.addChangedLineEnd()
 
     def splitIntoWords( self, line ):
         all_words = []
@@ -158,47 +245,47 @@ class Difference:
 
         return all_words
 
-    def fancy_helper( self, a, alo, ahi, b, blo, bhi):
-        if alo < ahi:
-            if blo < bhi:
-                self.fancy_replace( a, alo, ahi, b, blo, bhi)
-            else:
-                self.dump(self.text_body.addDeletedLine, a, alo, ahi)
-        elif blo < bhi:
-            self.dump(self.text_body.addInsertedLine, b, blo, bhi)
-
     def fail(self, msg):
         out = sys.stderr.write
         out(msg + "\n\n")
         return 0
 
     # filename can be a list of lines of the name of a file to open
-    def filecompare( self, filename_left, filename_right ):
+    @wb_profile.profileFunction( 'diff' )
+    def filecompare( self, filename_left, filename_right, all_opcodes=None ):
+        # all_opcodes are from compareLines when the lines
+        # have been compared on a background thread
+        if (type(filename_left) != type([]) and type(filename_right) != type([])
+        and wb_read_file.filesAreIdentical( filename_left, filename_right )):
+            # compare the hashes of the files and read only one of them
+            lines_left = self.readFileLines( filename_left )
+            if lines_left is None:
+                return 0
+
+            self.identical = True
+            lines_left = [eolRemoval( line ) for line in lines_left]
+            self.dump( self.text_body.addNormalLine, lines_left, 0, len(lines_left) )
+            self.text_body.addEnd()
+            return 1
+
         if type(filename_left) == type([]):
             lines_left = filename_left
         else:
-            try:
-                lines_left = wb_read_file.readFileContentsAsUnicode( filename_left ).split('\n')
-
-            except IOError as e:
-                print( 'Error opening %s\n%s' % (filename_left, e) )
+            lines_left = self.readFileLines( filename_left )
+            if lines_left is None:
                 return 0
 
         if type(filename_right) == type([]):
             lines_right = filename_right
         else:
-            try:
-                lines_right = wb_read_file.readFileContentsAsUnicode( filename_right ).split('\n')
-
-            except IOError as e:
-                print( 'Error opening %s\n%s' % (filename_right, e) )
+            lines_right = self.readFileLines( filename_right )
+            if lines_right is None:
                 return 0
 
-        lines_left = [eolRemoval( line ) for line in lines_left]
-        lines_right = [eolRemoval( line ) for line in lines_right]
+        if all_opcodes is None:
+            lines_left, lines_right, all_opcodes = compareLines( lines_left, lines_right )
 
-        matcher = difflib.SequenceMatcher( isLineJunk, lines_left, lines_right )
-        for tag, left_lo, left_hi, right_lo, right_hi in matcher.get_opcodes():
+        for tag, left_lo, left_hi, right_lo, right_hi in all_opcodes:
             if tag == 'replace':
                 self.fancy_replace( lines_left, left_lo, left_hi, lines_right, right_lo, right_hi )
             elif tag == 'delete':
@@ -210,11 +297,185 @@ class Difference:
             else:
                 raise ValueError( 'unknown tag ' + str( tag ) )
 
+        # lines compared on a background thread can be the same
+        self.identical = all( opcode[0] == 'equal' for opcode in all_opcodes )
+
         self.text_body.addEnd()
         return 1
 
+    def readFileLines( self, filename ):
+        try:
+            with wb_read_file.WbMappedFile( filename ) as mapped_file:
+                if mapped_file.isBinary():
+                    print( 'Cannot compare binary file %s' % (filename,) )
+                    return None
+
+                return mapped_file.textLines()
+
+        except IOError as e:
+            print( 'Error opening %s\n%s' % (filename, e) )
+            return None
+
+def compareLines( lines_left, lines_right ):
+    '''
+    return the lines without their line ends and the opcodes
+    that Difference.filecompare shows
+    '''
+    lines_left = [eolRemoval( line ) for line in lines_left]
+    lines_right = [eolRemoval( line ) for line in lines_right]
+
+    return lines_left, lines_right, patienceOpcodes( lines_left, lines_right )
+
 # need to strip any \n or \r thats on the end of the line
 def eolRemoval( line ):
     while line and line[-1] in ['\n','\r']:
         line = line[:-1]
     return line
+
+def patienceOpcodes( a, b ):
+    '''
+    return the opcodes to turn a into b in the same form
+    as difflib.SequenceMatcher.get_opcodes()
+    '''
+    all_opcodes = []
+    i = 0
+    j = 0
+    for block_i, block_j, size in patienceMatchingBlocks( a, b ):
+        if i < block_i and j < block_j:
+            all_opcodes.append( ('replace', i, block_i, j, block_j) )
+
+        elif i < block_i:
+            all_opcodes.append( ('delete', i, block_i, j, block_j) )
+
+        elif j < block_j:
+            all_opcodes.append( ('insert', i, block_i, j, block_j) )
+
+        i = block_i + size
+        j = block_j + size
+        if size > 0:
+            all_opcodes.append( ('equal', block_i, i, block_j, j) )
+
+    return all_opcodes
+
+def patienceMatchingBlocks( a, b ):
+    '''
+    return the matching blocks of a and b in the same form
+    as difflib.SequenceMatcher.get_matching_blocks()
+    '''
+    all_matches = []
+
+    # use a stack of work to do as recursion fails on large files
+    all_work = [(0, len(a), 0, len(b))]
+    while len(all_work) > 0:
+        alo, ahi, blo, bhi = all_work.pop()
+
+        # match the common lines at the start and end
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            all_matches.append( (alo, blo, 1) )
+            alo += 1
+            blo += 1
+
+        while alo < ahi and blo < bhi and a[ahi-1] == b[bhi-1]:
+            ahi -= 1
+            bhi -= 1
+            all_matches.append( (ahi, bhi, 1) )
+
+        if alo == ahi or blo == bhi:
+            continue
+
+        all_anchors = uniqueLineAnchors( a, alo, ahi, b, blo, bhi )
+        if len(all_anchors) == 0:
+            # no unique lines to anchor on - let difflib find what it can
+            matcher = difflib.SequenceMatcher( isLineJunk, a[alo:ahi], b[blo:bhi] )
+            for i, j, size in matcher.get_matching_blocks():
+                if size > 0:
+                    all_matches.append( (alo + i, blo + j, size) )
+            continue
+
+        # work on the regions between the anchors
+        last_i, last_j = alo, blo
+        for i, j in all_anchors:
+            all_matches.append( (i, j, 1) )
+            all_work.append( (last_i, i, last_j, j) )
+            last_i, last_j = i+1, j+1
+
+        all_work.append( (last_i, ahi, last_j, bhi) )
+
+    # join up adjacent matches into blocks
+    all_matches.sort()
+    all_blocks = []
+    for i, j, size in all_matches:
+        if len(all_blocks) > 0:
+            last_i, last_j, last_size = all_blocks[-1]
+            if last_i + last_size == i and last_j + last_size == j:
+                all_blocks[-1] = (last_i, last_j, last_size + size)
+                continue
+
+        all_blocks.append( (i, j, size) )
+
+    all_blocks.append( (len(a), len(b), 0) )
+    return all_blocks
+
+def uniqueLineAnchors( a, alo, ahi, b, blo, bhi ):
+    '''
+    return the longest increasing sequence of (i, j) pairs
+    where a[i] == b[j] and the line is unique in both ranges
+    '''
+    all_a_counts = {}
+    for i in range( alo, ahi ):
+        line = a[i]
+        if line in all_a_counts:
+            all_a_counts[ line ] = None
+
+        else:
+            all_a_counts[ line ] = i
+
+    all_b_counts = {}
+    for j in range( blo, bhi ):
+        line = b[j]
+        if all_a_counts.get( line ) is None:
+            continue
+
+        if line in all_b_counts:
+            all_b_counts[ line ] = None
+
+        else:
+            all_b_counts[ line ] = j
+
+    # unique pairs in order of b
+    all_pairs = [(all_a_counts[ line ], j) for line, j in all_b_counts.items() if j is not None]
+    all_pairs.sort( key=lambda pair: pair[1] )
+
+    return longestIncreasingPairs( all_pairs )
+
+def longestIncreasingPairs( all_pairs ):
+    '''
+    all_pairs is a list of (i, j) in order of j
+    return the longest sub-list where i is also increasing
+    '''
+    # patience sort
+    all_pile_tops = []
+    all_pile_pairs = []
+    all_back_links = []
+    for index, (i, j) in enumerate( all_pairs ):
+        pile = bisect.bisect_left( all_pile_tops, i )
+        if pile == len(all_pile_tops):
+            all_pile_tops.append( i )
+            all_pile_pairs.append( index )
+
+        else:
+            all_pile_tops[ pile ] = i
+            all_pile_pairs[ pile ] = index
+
+        all_back_links.append( all_pile_pairs[ pile-1 ] if pile > 0 else None )
+
+    all_longest = []
+    if len(all_pile_pairs) > 0:
+        index = all_pile_pairs[-1]
+        while index is not None:
+            all_longest.append( all_pairs[ index ] )
+            index = all_back_links[ index ]
+
+        all_longest.reverse()
+
+    return all_longest
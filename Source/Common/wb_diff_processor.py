@@ -12,12 +12,64 @@
 '''
 from PyQt5 import QtCore
 
+# number of lines to collect before adding them to the editors
+flush_lines = 20000
+
+class StyledTextBuffer:
+    '''
+    collect styled text and add it to the scintilla control
+    in large chunks instead of one call per piece of text
+    '''
+    def __init__( self, scintilla ):
+        self.scintilla = scintilla
+
+        # totals for the text in the control and the buffer
+        self.length = 0
+        self.line_count = 0
+        # lines waiting to be flushed
+        self.pending_lines = 0
+
+        self.all_text = []
+        self.all_styles = []
+        self.all_indicators = []
+
+    def append( self, text, style_number, indic_number=None ):
+        data = text.encode( 'utf-8' )
+        self.all_text.append( data )
+        self.all_styles.append( bytes( (style_number,) ) * len(data) )
+
+        if indic_number is not None:
+            self.all_indicators.append( (indic_number, self.length, len(data)) )
+
+        self.length += len(data)
+        num_lines = text.count( '\n' )
+        self.line_count += num_lines
+        self.pending_lines += num_lines
+
+    def flush( self ):
+        if len(self.all_text) == 0:
+            return
+
+        self.scintilla.appendStyledBytes( b''.join( self.all_text ), b''.join( self.all_styles ) )
+
+        for indic_number, pos, length in self.all_indicators:
+            self.scintilla.setIndicatorCurrent( indic_number )
+            self.scintilla.indicatorFillRange( pos, length )
+
+        self.all_text = []
+        self.all_styles = []
+        self.all_indicators = []
+        self.pending_lines = 0
+
 class DiffOneSideProcessor:
     def __init__( self, name, text_body ):
         self.name = name
         self.text_body = text_body
         self.diff_line_numbers = text_body.diff_line_numbers
 
+        self.body_buffer = StyledTextBuffer( self.text_body )
+        self.line_numbers_buffer = StyledTextBuffer( self.diff_line_numbers )
+
         self.line_number = 0
         self.last_line_number = -1
         self.changed_lines = []
@@ -25,7 +77,7 @@ class DiffOneSideProcessor:
         self.current_change_marker = -1
 
     def _markChangeCurrentLine( self ):
-        line_number = self.text_body.getLineCount() - 1
+        line_number = self.body_buffer.line_count
 
         if( self.last_line_number != line_number
         and self.last_line_number != (line_number - 1) ):
@@ -33,6 +85,15 @@ class DiffOneSideProcessor:
 
         self.last_line_number = line_number
 
+    def _flush( self ):
+        self.body_buffer.flush()
+        self.line_numbers_buffer.flush()
+        self.text_body.flushFoldLevels()
+
+    def _flushIfFull( self ):
+        if self.body_buffer.pending_lines >= flush_lines:
+            self._flush()
+
     def moveNextChange( self ):
         self.current_changed_block += 1
         self.showCurrentChange()
@@ -75,65 +136,66 @@ class DiffOneSideProcessor:
     def _addLineNumber( self ):
         self.line_number = self.line_number + 1
 
-        self.diff_line_numbers.insertStyledText( '%5d\n' % (self.line_number,),
+        self.line_numbers_buffer.append( '%5d\n' % (self.line_number,),
                         self.diff_line_numbers.style_line_numbers )
 
     def _addBlankLineNumber( self ):
-        self.diff_line_numbers.insertStyledText( '%5s\n' % '',
+        self.line_numbers_buffer.append( '%5s\n' % '',
                         self.diff_line_numbers.style_line_numbers )
 
     def addNormalLine( self, line ):
-        line_number = self.text_body.lineFromPosition( self.text_body.getLength() )
-        self.text_body.setFoldLine( line_number, True )
+        self.text_body.setFoldLine( self.body_buffer.line_count, True )
         self._addLineNumber()
-        self.text_body.insertStyledText( line+'\n', self.text_body.style_line_normal )
+        self.body_buffer.append( line+'\n', self.text_body.style_line_normal )
+        self._flushIfFull()
 
     def addGapLine( self ):
         self._markChangeCurrentLine()
         self._markChangeCurrentLine()
         self._addBlankLineNumber()
 
-        line_number = self.text_body.lineFromPosition( self.text_body.getLength() )
-        self.text_body.setFoldLine( line_number, False )
-        self.text_body.insertStyledText( '\n', self.text_body.style_line_normal )
+        self.text_body.setFoldLine( self.body_buffer.line_count, False )
+        self.body_buffer.append( '\n', self.text_body.style_line_normal )
+        self._flushIfFull()
 
     def addInsertedLine( self, line ):
         self._markChangeCurrentLine()
         self._addLineNumber()
-        line_number = self.text_body.lineFromPosition( self.text_body.getLength() )
-        self.text_body.setFoldLine(line_number, False)
-        self.text_body.insertStyledText( line+'\n', self.text_body.style_line_insert )
+        self.text_body.setFoldLine( self.body_buffer.line_count, False )
+        self.body_buffer.append( line+'\n', self.text_body.style_line_insert )
+        self._flushIfFull()
 
     def addDeletedLine( self, line ):
         self._markChangeCurrentLine()
         self._addLineNumber()
-        line_number = self.text_body.lineFromPosition( self.text_body.getLength() )
-        self.text_body.setFoldLine(line_number, False)
-        self.text_body.insertStyledText( line+'\n', self.text_body.style_line_delete )
+        self.text_body.setFoldLine( self.body_buffer.line_count, False )
+        self.body_buffer.append( line+'\n', self.text_body.style_line_delete )
+        self._flushIfFull()
 
     def addChangedLineBegin( self ):
         self._markChangeCurrentLine()
         self._addLineNumber()
-        line_number = self.text_body.lineFromPosition( self.text_body.getLength() )
-        self.text_body.setFoldLine( line_number, False )
+        self.text_body.setFoldLine( self.body_buffer.line_count, False )
 
     def addChangedLineReplace( self, text ):
-        self.text_body.insertStyledText( text, self.text_body.style_line_change, self.text_body.indictor_char_changed )
+        self.body_buffer.append( text, self.text_body.style_line_change, self.text_body.indictor_char_changed )
 
     def addChangedLineDelete( self, old ):
-        self.text_body.insertStyledText( old, self.text_body.style_line_delete, self.text_body.indictor_char_delete )
+        self.body_buffer.append( old, self.text_body.style_line_delete, self.text_body.indictor_char_delete )
 
     def addChangedLineInsert( self, new ):
-        self.text_body.insertStyledText( new, self.text_body.style_line_insert, self.text_body.indictor_char_insert )
+        self.body_buffer.append( new, self.text_body.style_line_insert, self.text_body.indictor_char_insert )
 
     def addChangedLineEqual( self, text ):
-        self.text_body.insertStyledText( text, self.text_body.style_line_normal  )
+        self.body_buffer.append( text, self.text_body.style_line_normal )
 
     def addChangedLineEnd( self ):
-        self.text_body.insertStyledText( '\n', self.text_body.style_line_normal )
+        self.body_buffer.append( '\n', self.text_body.style_line_normal )
+        self._flushIfFull()
 
     #--------------------------------------------------------------------------------
     def addEnd( self ):
+        self._flush()
         self.text_body.setReadOnly( 1 )
 
 #--------------------------------------------------------------------------------
@@ -24,7 +24,7 @@ import wb_config
 import wb_tracked_qwidget
 
 class DiffSideBySideView(wb_main_window.WbMainWindow, wb_tracked_qwidget.WbTrackedModeless):
-    def __init__( self, app, parent, title, file_left, header_left, file_right, header_right, ):
+    def __init__( self, app, parent, title, file_left, header_left, file_right, header_right, all_opcodes=None ):
         super().__init__( app, app.debug_options.debugLogDiff, parent=parent )
 
         geometry = self.app.prefs.diff_window.geometry
@@ -66,11 +66,13 @@ class DiffSideBySideView(wb_main_window.WbMainWindow, wb_tracked_qwidget.WbTrack
         self.processor = wb_diff_processor.DiffProcessor( self.panel_left.ed, self.panel_right.ed )
         self.diff = wb_diff_difflib.Difference( self.processor )
 
-        self.files_ok = self.diff.filecompare( file_left, file_right )
+        self.files_ok = self.diff.filecompare( file_left, file_right, all_opcodes )
         if not self.files_ok:
             return
 
         self.setChangeCounts( 0, self.processor.getChangeCount() )
+        if self.diff.identical:
+            self.status_message.setText( T_('The files are identical') )
 
         self.setCentralWidget( self.splitter )
 
@@ -250,6 +252,9 @@ class DiffBodyText(wb_scintilla.WbScintilla):
         self.fold_start = -1
         self.fold_context_border = 1
         self.fold_minimum_length = self.fold_context_border * 2 + 1
+        # (line, level) to set by flushFoldLevels
+        self.all_pending_fold_levels = []
+        self.all_fold_header_lines = []
 
         self.style_line_normal = self.STYLE_DEFAULT
         self.style_line_insert = self.STYLE_LASTPREDEFINED + 1
@@ -261,7 +266,9 @@ class DiffBodyText(wb_scintilla.WbScintilla):
         self.indictor_char_delete =  9
         self.indictor_char_changed = 10
 
+        # the diff is read only - save the time and memory of undo
         self.emptyUndoBuffer()
+        self.setUndoCollection( False )
 
         self.setMarginWidth( 0, 0 )
         self.setMarginWidth( 1, 0 )
@@ -446,29 +453,34 @@ class DiffBodyText(wb_scintilla.WbScintilla):
             self.diff_line_numbers.hideLines( start_line, end_line )
 
     def setFoldLine( self, line_number, is_fold_line ):
+        # the fold levels are set in flushFoldLevels as calls
+        # to scintilla for each line are slow for large diffs
         if is_fold_line:
             if self.fold_start == -1:
                 self.fold_start = line_number
 
             elif line_number - self.fold_start == self.fold_minimum_length:
-                self.setFoldLevel( self.fold_start, (self.SC_FOLDLEVELBASE+1) | self.SC_FOLDLEVELHEADERFLAG )
-                self.diff_line_numbers.setFoldLevel( self.fold_start, (self.SC_FOLDLEVELBASE+1) | self.SC_FOLDLEVELHEADERFLAG )
+                self.all_pending_fold_levels.append( (self.fold_start, (self.SC_FOLDLEVELBASE+1) | self.SC_FOLDLEVELHEADERFLAG) )
+                self.all_fold_header_lines.append( self.fold_start )
 
-            self.setFoldLevel( line_number, self.SC_FOLDLEVELBASE+1 )
-            self.diff_line_numbers.setFoldLevel( line_number, self.SC_FOLDLEVELBASE+1 )
+            self.all_pending_fold_levels.append( (line_number, self.SC_FOLDLEVELBASE+1) )
 
         else:
-            self.setFoldLevel( line_number, self.SC_FOLDLEVELBASE )
-            self.diff_line_numbers.setFoldLevel( line_number, self.SC_FOLDLEVELBASE )
-
+            # new lines start at SC_FOLDLEVELBASE
             if self.fold_start != -1:
                 self.fold_start = -1
 
+    def flushFoldLevels( self ):
+        for line_number, level in self.all_pending_fold_levels:
+            self.setFoldLevel( line_number, level )
+            self.diff_line_numbers.setFoldLevel( line_number, level )
+
+        self.all_pending_fold_levels = []
+
     def showAllFolds(self, show_folds):
-        for line in range( self.getLineCount() ):
-            if( self.getFoldLevel( line ) & self.SC_FOLDLEVELHEADERFLAG
-            and ((self.getFoldExpanded( line ) and not show_folds)
-                or (not self.getFoldExpanded( line ) and show_folds)) ):
+        for line in self.all_fold_header_lines:
+            if( (self.getFoldExpanded( line ) and not show_folds)
+            or (not self.getFoldExpanded( line ) and show_folds) ):
                 self.toggleFoldAtLine( line )
 
 #------------------------------------------------------------------------------------------
@@ -482,6 +494,7 @@ class DiffLineNumbers(wb_scintilla.WbScintilla):
         self.style_line_numbers_for_diff = self.STYLE_LASTPREDEFINED
 
         self.emptyUndoBuffer()
+        self.setUndoCollection( False )
 
         self.setMarginWidth( 0, 0 )
         self.setMarginWidth( 1, 0 )
@@ -9,12 +9,138 @@
 
     wb_diff_view.py
 
+    The unified diff is kept as the bytes of the diff output with
+    the offset of the end of each line. Only the lines that are
+    scrolled into view are decoded and styled.
+
+    WbUnifiedDiffParser turns the diff output into blocks of whole
+    lines and indexes the files and hunks of each block. It can run
+    on a background thread while the view shows the earlier blocks.
+
 '''
+import re
+import array
+import bisect
+import operator
+import itertools
+
 from PyQt5 import QtWidgets
 from PyQt5 import QtGui
+from PyQt5 import QtCore
 
 import wb_tracked_qwidget
+import wb_table_view
 import wb_config
+import wb_profile
+
+# the first line of each file in git, hg, svn and p4 diff output.
+# searching for the newline before a line is a lot faster than using ^
+re_file_header = re.compile( rb'\n(diff |Index: |Diff )([^\n]*)' )
+re_hunk_header = re.compile( rb'\n@@' )
+
+class WbUnifiedDiffBlock:
+    __slots__ = ('data', 'all_line_ends', 'all_file_headers', 'all_hunk_rows', 'max_line_length')
+
+    def __init__( self, data, all_line_ends, all_file_headers, all_hunk_rows, max_line_length ):
+        # whole lines of the diff output
+        self.data = data
+        # offsets from the start of the diff output of the end of each line
+        self.all_line_ends = all_line_ends
+        # list of (row, filename) of the first line of each file
+        self.all_file_headers = all_file_headers
+        self.all_hunk_rows = all_hunk_rows
+        # in characters with tabs expanded
+        self.max_line_length = max_line_length
+
+    def numLines( self ):
+        return len(self.all_line_ends)
+
+class WbUnifiedDiffParser:
+    def __init__( self ):
+        # the start of a line that is not complete yet
+        self.partial_line = b''
+
+        self.num_bytes = 0
+        self.num_lines = 0
+        self.last_file_header = None
+        self.last_file_header_row = None
+
+    def parseLines( self, all_lines ):
+        if len(all_lines) == 0:
+            return None
+
+        return self.parseBytes( ('\n'.join( all_lines ) + '\n').encode( 'utf-8', 'surrogateescape' ) )
+
+    def parseBytes( self, data ):
+        data = self.partial_line + data
+        end = data.rfind( b'\n' ) + 1
+        self.partial_line = data[end:]
+        if end == 0:
+            return None
+
+        return self.__parseBlock( data[:end] )
+
+    def finish( self ):
+        # the diff output may not end with a newline
+        if self.partial_line == b'':
+            return None
+
+        data = self.partial_line + b'\n'
+        self.partial_line = b''
+        return self.__parseBlock( data )
+
+    def __parseBlock( self, data ):
+        all_lines = data.split( b'\n' )
+        del all_lines[-1]
+
+        # the line lengths plus one for each newline
+        all_line_ends = array.array( 'Q', map( operator.add,
+                            itertools.accumulate( map( len, all_lines ) ),
+                            itertools.count( self.num_bytes + 1 ) ) )
+
+        # with a newline before the first line of the block the start of
+        # a match is the offset in data of the line that matched
+        search_data = b'\n' + data
+
+        all_file_headers = []
+        for match in re_file_header.finditer( search_data ):
+            row = self.num_lines + bisect.bisect_right( all_line_ends, self.num_bytes + match.start() )
+            # svn puts a diff --git line just after its Index: line
+            if (match.group( 1 ) == b'diff '
+            and match.group( 2 ).startswith( b'--git ' )
+            and self.last_file_header == b'Index: '
+            and row - self.last_file_header_row <= 2):
+                continue
+
+            self.last_file_header = match.group( 1 )
+            self.last_file_header_row = row
+            all_file_headers.append( (row, fileNameFromHeader( match.group( 1 ), match.group( 2 ) )) )
+
+        all_hunk_rows = array.array( 'L',
+                            (self.num_lines + bisect.bisect_right( all_line_ends, self.num_bytes + match.start() )
+                                for match in re_hunk_header.finditer( search_data )) )
+
+        if b'\t' in data:
+            max_line_length = max( map( len, data.expandtabs().split( b'\n' ) ) )
+
+        else:
+            max_line_length = max( map( len, all_lines ) )
+
+        self.num_bytes += len(data)
+        self.num_lines += len(all_lines)
+
+        return WbUnifiedDiffBlock( data, all_line_ends, all_file_headers, all_hunk_rows, max_line_length )
+
+def fileNameFromHeader( header, rest ):
+    name = rest.decode( 'utf-8', 'replace' ).rstrip( '\r' )
+    if header == b'Index: ':
+        return name
+
+    if name.startswith( '--git ' ):
+        return name.rpartition( ' b/' )[2]
+
+    # hg: diff -r <rev> <path> p4: Diff <path>@<rev>
+    return name.split( ' ' )[-1]
 
 class WbDiffViewBase(wb_tracked_qwidget.WbTrackedModelessQWidget):
     style_header = 0
@@ -53,52 +179,216 @@ class WbDiffViewText(WbDiffViewBase):
 
         self.code_font = self.app.codeFont()
 
-        self.text_edit = QtWidgets.QTextEdit()
+        self.diff_model = WbUnifiedDiffModel( self.app, self.code_font, self.all_style_colours )
+        self.parser = WbUnifiedDiffParser()
 
-        self.layout = QtWidgets.QVBoxLayout()
-        self.layout.addWidget( self.text_edit )
+        self.file_list = QtWidgets.QComboBox()
+        self.file_list.setEnabled( False )
+        self.file_list.activated[int].connect( self.__fileListActivated )
 
-        self.setLayout( self.layout )
+        self.text_table = WbUnifiedDiffTableView( self )
+        self.text_table.setModel( self.diff_model )
+        self.text_table.setSelectionBehavior( self.text_table.SelectRows )
+        self.text_table.setAutoScroll( False )
+        self.text_table.horizontalHeader().hide()
+        self.text_table.verticalHeader().hide()
+        # there is only one column to scroll across
+        self.text_table.setHorizontalScrollMode( self.text_table.ScrollPerPixel )
 
-        self.all_text_formats = {}
-        for style, fg_colour, bg_colour in self.all_style_colours:
-            char_format = QtGui.QTextCharFormat()
-            char_format.setFont( self.code_font )
-            char_format.setForeground( app.makeFgBrush( fg_colour ) )
-            char_format.setBackground( app.makeBgBrush( bg_colour ) )
-            self.all_text_formats[ style ] = char_format
+        code_font_metrics = QtGui.QFontMetrics( self.code_font )
+        self.char_width = code_font_metrics.width( 'm' )
+        self.text_table.verticalHeader().setDefaultSectionSize( code_font_metrics.lineSpacing() + 2 )
 
-        self.text_edit.setReadOnly( True )
+        self.file_layout = QtWidgets.QHBoxLayout()
+        self.file_layout.addWidget( QtWidgets.QLabel( T_('File') ) )
+        self.file_layout.addWidget( self.file_list, 1 )
+
+        # shown by setIdentical when there are no differences
+        self.identical_label = QtWidgets.QLabel( T_('The files are identical') )
+        self.identical_label.hide()
+
+        self.layout = QtWidgets.QVBoxLayout()
+        self.layout.addLayout( self.file_layout )
+        self.layout.addWidget( self.identical_label )
+        self.layout.addWidget( self.text_table )
+
+        self.setLayout( self.layout )
 
         em = self.app.fontMetrics().width( 'm' )
         ex = self.app.fontMetrics().lineSpacing()
         self.resize( 130*em, 45*ex )
 
+    @wb_profile.profileFunction( 'diff' )
     def setUnifiedDiffText( self, all_lines ):
-        for line in all_lines:
-            if line.startswith('-'):
-                self.writeStyledText( line + '\n', self.style_delete )
+        self.appendUnifiedDiffText( all_lines )
+        self.ensureStartVisible()
 
-            elif line.startswith('+'):
-                self.writeStyledText( line + '\n', self.style_add )
+    def appendUnifiedDiffText( self, all_lines ):
+        self.appendUnifiedDiffBlock( self.parser.parseLines( all_lines ) )
 
-            elif line.startswith(' '):
-                self.writeStyledText( line + '\n', self.style_normal )
+    @wb_profile.profileFunction( 'diff' )
+    def appendUnifiedDiffBlock( self, block ):
+        # block is from a WbUnifiedDiffParser that may have run on a background thread
+        if block is None or block.numLines() == 0:
+            return
 
-            else:
-                self.writeStyledText( line + '\n', self.style_header )
+        self.diff_model.appendBlock( block )
 
-        self.ensureStartVisible()
+        self.text_table.setColumnWidth( 0, (self.diff_model.max_line_length + 2) * self.char_width )
+
+        if len(block.all_file_headers) > 0:
+            self.file_list.addItems( [name for row, name in block.all_file_headers] )
+            self.file_list.setEnabled( True )
+
+    def setIdentical( self ):
+        self.identical_label.show()
 
     def ensureStartVisible( self ):
-        self.text_edit.moveCursor( QtGui.QTextCursor.Start )
-        self.text_edit.ensureCursorVisible()
+        self.text_table.scrollToTop()
+
+    def moveToNextHunk( self ):
+        self.__moveToRow( self.diff_model.nextHunkRow( self.__topRow() ) )
+
+    def moveToPrevHunk( self ):
+        self.__moveToRow( self.diff_model.prevHunkRow( self.__topRow() ) )
+
+    def __fileListActivated( self, file_index ):
+        self.__moveToRow( self.diff_model.fileHeaderRow( file_index ) )
+
+    def __topRow( self ):
+        return max( 0, self.text_table.rowAt( 0 ) )
+
+    def __moveToRow( self, row ):
+        if row is None:
+            return
+
+        index = self.diff_model.index( row, 0 )
+        self.text_table.scrollTo( index, self.text_table.PositionAtTop )
+        self.text_table.setCurrentIndex( index )
+
+        file_index = self.diff_model.fileIndexForRow( row )
+        if file_index is not None:
+            self.file_list.setCurrentIndex( file_index )
+
+    def selectedText( self ):
+        all_rows = sorted( index.row() for index in self.text_table.selectionModel().selectedRows() )
+        return ''.join( '%s\n' % (self.diff_model.lineText( row ),) for row in all_rows )
+
+class WbUnifiedDiffTableView(wb_table_view.WbTableView):
+    def __init__( self, view ):
+        self.view = view
+        super().__init__( spacing_scale=1.0, alternate_row_shading=False )
+
+    def keyPressEvent( self, event ):
+        if event.matches( QtGui.QKeySequence.Copy ):
+            QtWidgets.QApplication.clipboard().setText( self.view.selectedText() )
+
+        elif event.text() in ('n', 'N'):
+            self.view.moveToNextHunk()
+
+        elif event.text() in ('p', 'P'):
+            self.view.moveToPrevHunk()
+
+        else:
+            super().keyPressEvent( event )
+
+class WbUnifiedDiffModel(QtCore.QAbstractTableModel):
+    def __init__( self, app, code_font, all_style_colours ):
+        self.app = app
+        super().__init__()
+
+        self.code_font = code_font
+
+        self.all_fg_brushes = {}
+        self.all_bg_brushes = {}
+        for style, fg_colour, bg_colour in all_style_colours:
+            self.all_fg_brushes[ style ] = app.makeFgBrush( fg_colour )
+            self.all_bg_brushes[ style ] = app.makeBgBrush( bg_colour )
+
+        # the first character of a line decides its style
+        self.all_line_styles = {
+            ord( '-' ): WbDiffViewBase.style_delete,
+            ord( '+' ): WbDiffViewBase.style_add,
+            ord( ' ' ): WbDiffViewBase.style_normal,
+            }
+
+        self.data_buffer = bytearray()
+        self.all_line_ends = array.array( 'Q' )
+        self.all_file_header_rows = array.array( 'L' )
+        self.all_hunk_rows = array.array( 'L' )
+        self.max_line_length = 0
+
+    def appendBlock( self, block ):
+        first_row = len(self.all_line_ends)
+
+        self.beginInsertRows( QtCore.QModelIndex(), first_row, first_row + block.numLines() - 1 )
+
+        self.data_buffer.extend( block.data )
+        self.all_line_ends.extend( block.all_line_ends )
+        self.all_file_header_rows.extend( row for row, name in block.all_file_headers )
+        self.all_hunk_rows.extend( block.all_hunk_rows )
+        self.max_line_length = max( self.max_line_length, block.max_line_length )
+
+        self.endInsertRows()
+
+    def rowCount( self, parent ):
+        return len(self.all_line_ends)
+
+    def columnCount( self, parent ):
+        return 1
+
+    def lineBytes( self, row ):
+        start = self.all_line_ends[ row-1 ] if row > 0 else 0
+        return self.data_buffer[ start:self.all_line_ends[ row ]-1 ]
+
+    def lineText( self, row ):
+        return self.lineBytes( row ).decode( 'utf-8', 'replace' )
+
+    def lineStyle( self, row ):
+        start = self.all_line_ends[ row-1 ] if row > 0 else 0
+        if start == self.all_line_ends[ row ]-1:
+            return WbDiffViewBase.style_header
+
+        return self.all_line_styles.get( self.data_buffer[ start ], WbDiffViewBase.style_header )
+
+    def fileHeaderRow( self, file_index ):
+        if file_index < 0 or file_index >= len(self.all_file_header_rows):
+            return None
+
+        return self.all_file_header_rows[ file_index ]
+
+    def fileIndexForRow( self, row ):
+        file_index = bisect.bisect_right( self.all_file_header_rows, row ) - 1
+        if file_index < 0:
+            return None
+
+        return file_index
+
+    def nextHunkRow( self, row ):
+        hunk_index = bisect.bisect_right( self.all_hunk_rows, row )
+        if hunk_index >= len(self.all_hunk_rows):
+            return None
+
+        return self.all_hunk_rows[ hunk_index ]
+
+    def prevHunkRow( self, row ):
+        hunk_index = bisect.bisect_left( self.all_hunk_rows, row ) - 1
+        if hunk_index < 0:
+            return None
+
+        return self.all_hunk_rows[ hunk_index ]
+
+    def data( self, index, role ):
+        if role == QtCore.Qt.DisplayRole:
+            return self.lineText( index.row() ).expandtabs()
+
+        elif role == QtCore.Qt.ForegroundRole:
+            return self.all_fg_brushes[ self.lineStyle( index.row() ) ]
+
+        elif role == QtCore.Qt.BackgroundRole:
+            return self.all_bg_brushes[ self.lineStyle( index.row() ) ]
 
-    def writeStyledText( self, text, style ):
-        self.text_edit.moveCursor( QtGui.QTextCursor.End )
+        elif role == QtCore.Qt.FontRole:
+            return self.code_font
 
-        cursor = self.text_edit.textCursor()
-        cursor.beginEditBlock()
-        cursor.setCharFormat( self.all_text_formats[ style ] )
-        cursor.insertText( text )
-        cursor.endEditBlock()
+        return None
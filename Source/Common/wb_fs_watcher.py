@@ -0,0 +1,530 @@
+'''
+ ====================================================================
+ Copyright (c) 2018 Barry A Scott.  All rights reserved.
+
+ This software is licensed as described in the file LICENSE.txt,
+ which you should have received as part of this distribution.
+
+ ====================================================================
+
+    wb_fs_watcher.py
+
+    Watch the working trees of projects and record which paths
+    have changed since the last time the changes were taken.
+
+    On Linux inotify is used, which knows exactly which paths changed.
+    Elsewhere, or if inotify runs out of watches, the tree is polled
+    for folder changes. A polled tree is not precise and callers must
+    check all files for changes.
+
+'''
+import sys
+import os
+import select
+import struct
+import errno
+import threading
+import time
+import pathlib
+
+# when there are more dirty paths than this its quicker to check everything
+max_dirty_paths = 10000
+
+poll_interval = 2.0
+
+class WatchedTree:
+    def __init__( self, key, root ):
+        self.key = key
+        self.root = root
+
+        # until the watches are in place changes may be missed
+        self.precise = False
+        # None means that any path may have changed
+        self.all_dirty_paths = None
+        self.dirty = True
+
+    def __repr__( self ):
+        return '<WatchedTree: %s %s precise=%r>' % (self.key, self.root, self.precise)
+
+    def addDirtyPath( self, path ):
+        self.dirty = True
+        if self.all_dirty_paths is None:
+            return
+
+        self.all_dirty_paths.add( path )
+        if len(self.all_dirty_paths) > max_dirty_paths:
+            self.all_dirty_paths = None
+
+    def setAllDirty( self ):
+        self.dirty = True
+        self.all_dirty_paths = None
+
+class WbFileSystemWatcher:
+    def __init__( self, app, changes_callback ):
+        self.app = app
+        self.log = app.log
+        self.debugLog = app.debug_options.debugLogFsWatcher
+
+        # called on the watcher thread with the key of the tree that changed
+        self.changes_callback = changes_callback
+
+        self.lock = threading.Lock()
+        self.all_trees = {}
+
+        self.inotify = None
+        if sys.platform.startswith( 'linux' ):
+            try:
+                self.inotify = InotifyWatcher( self )
+                self.inotify.start()
+
+            except OSError as e:
+                self.log.info( 'inotify not available, polling for file changes - %s' % (e,) )
+                self.inotify = None
+
+        self.poller = PollingWatcher( self )
+        self.poller.start()
+
+    def addTree( self, key, root ):
+        self.debugLog( 'addTree( %r, %s )' % (key, root) )
+        tree = WatchedTree( key, root )
+        with self.lock:
+            self.all_trees[ key ] = tree
+
+        if self.inotify is not None:
+            self.inotify.addTree( tree )
+
+        else:
+            self.poller.addTree( tree )
+
+    def removeTree( self, key ):
+        self.debugLog( 'removeTree( %r )' % (key,) )
+        with self.lock:
+            tree = self.all_trees.pop( key, None )
+
+        if tree is None:
+            return
+
+        if self.inotify is not None:
+            self.inotify.removeTree( tree )
+
+        self.poller.removeTree( tree )
+
+    def isPrecise( self, key ):
+        with self.lock:
+            tree = self.all_trees.get( key )
+            return tree is not None and tree.precise
+
+    def isDirty( self, key ):
+        with self.lock:
+            tree = self.all_trees.get( key )
+            return tree is None or tree.dirty
+
+    def takeDirtyPaths( self, key ):
+        '''
+        return the set of project relative paths changed since the last call
+        or None if the changes are not known precisely
+        '''
+        with self.lock:
+            tree = self.all_trees.get( key )
+            if tree is None:
+                return None
+
+            all_dirty_paths = tree.all_dirty_paths if tree.precise else None
+
+            tree.dirty = False
+            tree.all_dirty_paths = set()
+
+        self.debugLog( 'takeDirtyPaths( %r ) -> %s' %
+            (key, 'all' if all_dirty_paths is None else '%d paths' % (len(all_dirty_paths),)) )
+        return all_dirty_paths
+
+    def _fallBackToPolling( self, tree ):
+        with self.lock:
+            tree.precise = False
+            tree.setAllDirty()
+
+        self.poller.addTree( tree )
+
+    def _markDirty( self, tree, all_paths ):
+        with self.lock:
+            for path in all_paths:
+                tree.addDirtyPath( path )
+
+        self.changes_callback( tree.key )
+
+    def _markAllDirty( self, tree ):
+        with self.lock:
+            tree.setAllDirty()
+
+        self.changes_callback( tree.key )
+
+    def shutdown( self ):
+        if self.inotify is not None:
+            self.inotify.shutdown()
+
+        self.poller.shutdown()
+
+#------------------------------------------------------------
+#
+#   Linux inotify
+#
+#------------------------------------------------------------
+IN_MODIFY       = 0x00000002
+IN_ATTRIB       = 0x00000004
+IN_CLOSE_WRITE  = 0x00000008
+IN_MOVED_FROM   = 0x00000040
+IN_MOVED_TO     = 0x00000080
+IN_CREATE       = 0x00000100
+IN_DELETE       = 0x00000200
+IN_DELETE_SELF  = 0x00000400
+IN_MOVE_SELF    = 0x00000800
+IN_Q_OVERFLOW   = 0x00004000
+IN_IGNORED      = 0x00008000
+IN_ONLYDIR      = 0x01000000
+IN_DONT_FOLLOW  = 0x02000000
+IN_ISDIR        = 0x40000000
+
+IN_CLOEXEC      = 0o2000000
+
+watch_mask = (IN_MODIFY|IN_ATTRIB|IN_CLOSE_WRITE
+             |IN_MOVED_FROM|IN_MOVED_TO|IN_CREATE|IN_DELETE
+             |IN_DELETE_SELF|IN_MOVE_SELF
+             |IN_ONLYDIR|IN_DONT_FOLLOW)
+
+inotify_event_header = struct.Struct( 'iIII' )
+
+class InotifyWatcher(threading.Thread):
+    def __init__( self, watcher ):
+        super().__init__( name='inotify watcher' )
+        self.setDaemon( 1 )
+
+        import ctypes
+        import ctypes.util
+
+        self.watcher = watcher
+        self.debugLog = watcher.debugLog
+
+        self.libc = ctypes.CDLL( ctypes.util.find_library( 'c' ), use_errno=True )
+        self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self.fd = self.libc.inotify_init1( IN_CLOEXEC )
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError( err, os.strerror( err ) )
+
+        self.get_errno = ctypes.get_errno
+
+        # wd -> {tree: path relative to the tree root}
+        # the git folders are watched by absolute path and
+        # a worktree shares the refs folders with its main repo
+        self.all_watches = {}
+        # tree -> the refs/heads folder of its git repo
+        self.all_refs_heads = {}
+        self.all_pending_trees = []
+        self.pending_lock = threading.Lock()
+
+        self.running = True
+
+    def addTree( self, tree ):
+        # adding the watches walks the whole tree - do it on this thread
+        with self.pending_lock:
+            self.all_pending_trees.append( tree )
+
+    def removeTree( self, tree ):
+        with self.pending_lock:
+            # it may not have been watched yet
+            self.all_pending_trees = [pending_tree for pending_tree in self.all_pending_trees if pending_tree is not tree]
+            self.all_refs_heads.pop( tree, None )
+
+            for wd, all_watched_trees in list( self.all_watches.items() ):
+                if all_watched_trees.pop( tree, None ) is not None and len(all_watched_trees) == 0:
+                    if self.fd >= 0:
+                        self.libc.inotify_rm_watch( self.fd, wd )
+                    del self.all_watches[ wd ]
+
+    def shutdown( self ):
+        self.running = False
+
+    def run( self ):
+        while self.running:
+            with self.pending_lock:
+                all_trees = self.all_pending_trees
+                self.all_pending_trees = []
+
+            for tree in all_trees:
+                self.__watchTree( tree )
+
+            readable, _, _ = select.select( [self.fd], [], [], 0.5 )
+            if len(readable) == 0:
+                continue
+
+            try:
+                data = os.read( self.fd, 256*1024 )
+
+            except OSError as e:
+                self.watcher.log.error( 'inotify read failed - %s' % (e,) )
+                continue
+
+            self.__processEvents( data )
+
+        # closing the fd removes all the watches
+        with self.pending_lock:
+            os.close( self.fd )
+            self.fd = -1
+            self.all_watches = {}
+
+    def __watchTree( self, tree ):
+        start = time.time()
+        all_folders = [pathlib.Path( '.' )]
+        while len(all_folders) > 0:
+            folder = all_folders.pop()
+            if not self.__addWatch( tree, folder ):
+                self.debugLog( 'watches exhausted for %r - polling instead' % (tree,) )
+                self.removeTree( tree )
+                self.watcher._fallBackToPolling( tree )
+                return
+
+            try:
+                all_dirents = list( os.scandir( str( tree.root / folder ) ) )
+
+            except OSError:
+                continue
+
+            for dirent in all_dirents:
+                path = folder / dirent.name
+                if path == pathlib.Path( '.git' ):
+                    # .git can be a folder or a file naming the git dir
+                    continue
+
+                if dirent.is_dir( follow_symlinks=False ):
+                    all_folders.append( path )
+
+        precise = True
+        if os.path.lexists( str( tree.root / '.git' ) ):
+            git_dir, common_dir = gitAdminFolders( tree.root )
+            if git_dir is None:
+                # the changes made by git commands would be missed
+                self.debugLog( 'git dir of %r not found - not precise' % (tree,) )
+                precise = False
+
+            else:
+                # only the changes that alter the status are interesting,
+                # HEAD, the index, packed-refs and the branches
+                refs_heads = common_dir / 'refs' / 'heads'
+                with self.pending_lock:
+                    self.all_refs_heads[ tree ] = refs_heads
+
+                all_git_folders = [git_dir, common_dir, common_dir / 'refs']
+                # branch names can have / in them
+                for dirpath, all_dirnames, all_filenames in os.walk( str( refs_heads ) ):
+                    all_git_folders.append( pathlib.Path( dirpath ) )
+
+                for git_folder in all_git_folders:
+                    if not self.__addWatch( tree, git_folder ):
+                        self.debugLog( 'watches exhausted for %r - polling instead' % (tree,) )
+                        self.removeTree( tree )
+                        self.watcher._fallBackToPolling( tree )
+                        return
+
+        self.debugLog( 'watching %r in %.3fs' % (tree, time.time() - start) )
+        with self.watcher.lock:
+            tree.precise = precise
+
+    def __addWatch( self, tree, folder ):
+        wd = self.libc.inotify_add_watch( self.fd, os.fsencode( str( tree.root / folder ) ), watch_mask )
+        if wd < 0:
+            err = self.get_errno()
+            if err == errno.ENOSPC:
+                return False
+
+            # the folder may have been removed already
+            return True
+
+        with self.pending_lock:
+            self.all_watches.setdefault( wd, {} )[ tree ] = folder
+
+        return True
+
+    def __processEvents( self, data ):
+        all_changes = {}
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = inotify_event_header.unpack_from( data, offset )
+            offset += inotify_event_header.size
+            name = os.fsdecode( data[offset:offset+length].rstrip( b'\0' ) )
+            offset += length
+
+            if mask&IN_Q_OVERFLOW:
+                self.debugLog( 'inotify queue overflow' )
+                with self.pending_lock:
+                    all_trees = set( tree for all_watched_trees in self.all_watches.values() for tree in all_watched_trees )
+
+                for tree in all_trees:
+                    self.watcher._markAllDirty( tree )
+                continue
+
+            with self.pending_lock:
+                if mask&IN_IGNORED:
+                    self.all_watches.pop( wd, None )
+                    continue
+
+                if wd not in self.all_watches:
+                    continue
+
+                all_watched = list( self.all_watches[ wd ].items() )
+
+            for tree, folder in all_watched:
+                if folder.is_absolute():
+                    # a change in the git folders
+                    path = pathlib.Path( '.git' )
+
+                    refs_heads = self.all_refs_heads.get( tree )
+                    if( mask&IN_ISDIR and mask&(IN_CREATE|IN_MOVED_TO)
+                    and refs_heads is not None
+                    and (folder == refs_heads or refs_heads in folder.parents) ):
+                        # a folder for branches like feature/x
+                        self.__watchNewFolder( tree, folder / name )
+
+                else:
+                    path = folder / name if name != '' else folder
+
+                    if mask&IN_ISDIR and mask&(IN_CREATE|IN_MOVED_TO):
+                        # watch the new folder and everything that was created in it
+                        self.__watchNewFolder( tree, path )
+
+                all_changes.setdefault( tree, set() ).add( path )
+
+        for tree, all_paths in all_changes.items():
+            self.watcher._markDirty( tree, all_paths )
+
+    def __watchNewFolder( self, tree, new_folder ):
+        all_folders = [new_folder]
+        while len(all_folders) > 0:
+            folder = all_folders.pop()
+            if not self.__addWatch( tree, folder ):
+                self.removeTree( tree )
+                self.watcher._fallBackToPolling( tree )
+                return
+
+            try:
+                for dirent in os.scandir( str( tree.root / folder ) ):
+                    if dirent.is_dir( follow_symlinks=False ):
+                        all_folders.append( folder / dirent.name )
+
+            except OSError:
+                pass
+
+def gitAdminFolders( root ):
+    '''
+    return the git dir and the common git dir of the working tree at root.
+    For a worktree or a submodule .git is a file that names the git dir
+    and for a worktree the git dir names the common dir that holds the refs.
+    returns (None, None) if they cannot be found
+    '''
+    dot_git = root / '.git'
+    if dot_git.is_dir():
+        return dot_git, dot_git
+
+    try:
+        with open( str(dot_git), encoding='utf-8' ) as f:
+            line = f.readline().strip()
+
+        if not line.startswith( 'gitdir:' ):
+            return None, None
+
+        git_dir = root / line[len('gitdir:'):].strip()
+
+        common_dir = git_dir
+        commondir_file = git_dir / 'commondir'
+        if commondir_file.exists():
+            with open( str(commondir_file), encoding='utf-8' ) as f:
+                common_dir = git_dir / f.readline().strip()
+
+    except (OSError, UnicodeDecodeError):
+        return None, None
+
+    if not git_dir.is_dir() or not common_dir.is_dir():
+        return None, None
+
+    return git_dir.resolve(), common_dir.resolve()
+
+#------------------------------------------------------------
+#
+#   polling fallback
+#
+#------------------------------------------------------------
+class PollingWatcher(threading.Thread):
+    def __init__( self, watcher ):
+        super().__init__( name='polling watcher' )
+        self.setDaemon( 1 )
+
+        self.watcher = watcher
+        self.debugLog = watcher.debugLog
+
+        self.lock = threading.Lock()
+        # tree -> {folder: mtime}
+        self.all_trees = {}
+
+        self.running = True
+        self.stop_event = threading.Event()
+
+    def addTree( self, tree ):
+        with self.lock:
+            self.all_trees[ tree ] = None
+
+    def removeTree( self, tree ):
+        with self.lock:
+            self.all_trees.pop( tree, None )
+
+    def shutdown( self ):
+        self.running = False
+        self.stop_event.set()
+
+    def run( self ):
+        while self.running:
+            # wake up at once on shutdown
+            if self.stop_event.wait( poll_interval ):
+                break
+
+            with self.lock:
+                all_trees = list( self.all_trees.items() )
+
+            for tree, all_old_mtimes in all_trees:
+                all_new_mtimes = self.__folderMtimes( tree )
+
+                if all_old_mtimes is not None:
+                    all_changed = [folder for folder, mtime in all_new_mtimes.items()
+                                    if all_old_mtimes.get( folder ) != mtime]
+                    all_changed.extend( folder for folder in all_old_mtimes if folder not in all_new_mtimes )
+
+                    if len(all_changed) > 0:
+                        self.watcher._markDirty( tree, all_changed )
+
+                with self.lock:
+                    if tree in self.all_trees:
+                        self.all_trees[ tree ] = all_new_mtimes
+
+    def __folderMtimes( self, tree ):
+        all_mtimes = {}
+        for git_path in ('.git', '.git/index', '.git/HEAD'):
+            try:
+                all_mtimes[ pathlib.Path( git_path ) ] = os.stat( str( tree.root / git_path ) ).st_mtime_ns
+
+            except OSError:
+                pass
+
+        all_folders = [pathlib.Path( '.' )]
+        while len(all_folders) > 0:
+            folder = all_folders.pop()
+            try:
+                all_mtimes[ folder ] = os.stat( str( tree.root / folder ) ).st_mtime_ns
+                for dirent in os.scandir( str( tree.root / folder ) ):
+                    if dirent.is_dir( follow_symlinks=False ) and dirent.name != '.git':
+                        all_folders.append( folder / dirent.name )
+
+            except OSError:
+                pass
+
+        return all_mtimes
@@ -13,6 +13,29 @@
 from PyQt5 import QtWidgets
 from PyQt5 import QtCore
 
+import wb_background_thread
+
+#
+#   what has changed when updateEnableStates is called
+#
+ENABLER_TABLE_SELECTION = 'table-selection'
+ENABLER_PROJECT = 'project'
+
+#
+#   Decorator used to set what the state of an enabler or checker depends on.
+#   Handlers without the decorator are called on every update.
+#
+_enabler_depends_on_attr = 'enabler_depends_on'
+def enabler_depends_on( *all_depends_on ):
+    def decorator( fn ):
+        setattr( fn, _enabler_depends_on_attr, frozenset( all_depends_on ) )
+        return fn
+
+    return decorator
+
+def enablerDependsOn( fn ):
+    return getattr( fn, _enabler_depends_on_attr, None )
+
 class WbMainWindow(QtWidgets.QMainWindow):
     focus_is_in_names = ('tree', 'table')
 
@@ -45,6 +68,11 @@ class WbMainWindow(QtWidgets.QMainWindow):
     def completeInit( self ):
         pass
 
+    # override to return the key that serialises the background work
+    # of this window, such as the project name. None runs the work on its own
+    def threadSwitcherSerialKey( self ):
+        return None
+
     def close( self ):
         super().close()
 
@@ -62,8 +90,9 @@ class WbMainWindow(QtWidgets.QMainWindow):
     def appActiveHandler( self ):
         pass
 
-    def updateEnableStates( self, force_disabled=False ):
-        self.__action_state_manager.update( force_disabled )
+    # all_changed is what has changed since the last update or None if anything may have changed
+    def updateEnableStates( self, force_disabled=False, all_changed=None ):
+        self.__action_state_manager.update( force_disabled, all_changed )
 
     def setupMenuBar( self, menu_bar ):
         pass
@@ -82,7 +111,8 @@ class WbMainWindow(QtWidgets.QMainWindow):
         action = menu.addAction( icon, name )
 
         if handler is not None:
-            handler = self.app.wrapWithThreadSwitcher( handler, 'menu: %s' % (name,) )
+            handler = self.app.wrapWithThreadSwitcher( handler, 'menu: %s' % (name,),
+                                wb_background_thread.PRIORITY_INTERACTIVE, self.threadSwitcherSerialKey )
 
             if checker is not None:
                 action.toggled.connect( handler )
@@ -119,7 +149,8 @@ class WbMainWindow(QtWidgets.QMainWindow):
             action = bar.addAction( icon, name )
 
         if handler is not None:
-            handler = self.app.wrapWithThreadSwitcher( handler, 'toolbar: %s' % (name,) )
+            handler = self.app.wrapWithThreadSwitcher( handler, 'toolbar: %s' % (name,),
+                                wb_background_thread.PRIORITY_INTERACTIVE, self.threadSwitcherSerialKey )
 
             if checker is not None:
                 action.toggled.connect( handler )
@@ -142,6 +173,7 @@ class WbActionStateManager:
         self.__all_action_checkers = []
 
         self.__update_running = False
+        self.__last_force_disabled = None
 
     def addEnabler( self, action, enabler_handler ):
         self.__all_action_enablers.append( WbActionEnabledState( action, enabler_handler ) )
@@ -149,20 +181,27 @@ class WbActionStateManager:
     def addChecker( self, action, checker_handler ):
         self.__all_action_checkers.append( WbActionCheckedState( action, checker_handler ) )
 
-    def update( self, force_disabled ):
+    def update( self, force_disabled, all_changed=None ):
         if self.__update_running:
             return
 
         self.__update_running = True
-        self.debugLog( 'WbActionState.update running' )
+        self.debugLog( 'WbActionState.update running all_changed=%r' % (all_changed,) )
+
+        # every state needs setting the first time and when force_disabled changes
+        if force_disabled != self.__last_force_disabled:
+            all_changed = None
+            self.__last_force_disabled = force_disabled
 
         # use a cache to avoid calling state queries more then once on any one update
         cache = {}
         for enabler in self.__all_action_enablers:
-            enabler.setState( cache, force_disabled=force_disabled )
+            if enabler.dependsOn( all_changed ):
+                enabler.setState( cache, force_disabled=force_disabled )
 
         for checker in self.__all_action_checkers:
-            checker.setState( cache, force_disabled=False )
+            if checker.dependsOn( all_changed ):
+                checker.setState( cache, force_disabled=False )
 
         self.debugLog( 'WbActionState.update done' )
         self.__update_running = False
@@ -172,10 +211,17 @@ class WbActionSetStateBase:
         self.action = action
         self.handler = handler
         self.__key = self.handler.__name__
+        self.__all_depends_on = enablerDependsOn( self.handler )
 
     def __repr__( self ):
         return '<WbActionEnabledState: %r>' % (self.enabler_handler,)
 
+    def dependsOn( self, all_changed ):
+        if all_changed is None or self.__all_depends_on is None:
+            return True
+
+        return not self.__all_depends_on.isdisjoint( all_changed )
+
     def setState( self, cache, force_disabled ):
         state = False if force_disabled else self.__callHandler( cache )
         assert state in (True, False), 'setState "%r" return %r not bool' % (self.handler, state)
@@ -210,3 +256,28 @@ class WbActionCheckedState(WbActionSetStateBase):
 
     def setActionState( self, state ):
         self.action.setChecked( state )
+
+class WbSelectionFacts:
+    '''
+    Facts about the selected file states that are worked out once
+    for each selection and shared by all the enablers.
+    '''
+    def __init__( self, all_file_states ):
+        self.all_file_states = all_file_states
+        self.__all_counts = {}
+
+    def __len__( self ):
+        return len(self.all_file_states)
+
+    def count( self, predicate ):
+        # predicate must be the same object on each call, such as WbGitFileState.canStage
+        if predicate not in self.__all_counts:
+            self.__all_counts[ predicate ] = sum( 1 for file_state in self.all_file_states if predicate( file_state ) )
+
+        return self.__all_counts[ predicate ]
+
+    def any( self, predicate ):
+        return self.count( predicate ) > 0
+
+    def all( self, predicate ):
+        return self.count( predicate ) == len(self.all_file_states)
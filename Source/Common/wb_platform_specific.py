@@ -45,12 +45,63 @@ def getLogFilename():
     filename = '%s.log'   % (name,)
     return getPreferencesDir() / filename
 
+def getCommitChangesCacheFilename():
+    name = ''.join( __all_name_parts )
+    filename = '%s-commit-changes.db'   % (name,)
+    return getPreferencesDir() / filename
+
+def getAnnotateCacheFilename():
+    name = ''.join( __all_name_parts )
+    filename = '%s-annotate.db'   % (name,)
+    return getPreferencesDir() / filename
+
+def getProfileDir():
+    name = ''.join( __all_name_parts )
+    return getPreferencesDir() / ('%s-profile' % (name,))
+
 def getLastCheckinMessageFilename():
     return getPreferencesDir() / 'log_message.txt'
 
 def getLastLockMessageFilename():
     return getPreferencesDir() / 'lock_message.txt'
 
+# room left on the command line for the command and its options
+command_line_reserved_length = 4096
+# also limit the number of paths so that each command is reasonably quick
+command_line_max_paths = 1000
+
+def chunkCommandLinePaths( all_paths ):
+    '''
+    yield lists of paths that each fit on one command line
+    '''
+    max_length = max( getMaxCommandLineLength() - command_line_reserved_length, 1024 )
+
+    all_chunk_paths = []
+    chunk_length = 0
+    for path in all_paths:
+        if not isinstance( path, (str, bytes) ):
+            path = str( path )
+
+        # allow for quoting and the pointer or separator for each path
+        if isinstance( path, str ):
+            path_length = len( path.encode( 'utf-8' ) ) + 8
+
+        else:
+            path_length = len(path) + 8
+
+        if( len(all_chunk_paths) > 0
+        and (chunk_length + path_length > max_length
+            or len(all_chunk_paths) >= command_line_max_paths) ):
+            yield all_chunk_paths
+            all_chunk_paths = []
+            chunk_length = 0
+
+        all_chunk_paths.append( path )
+        chunk_length += path_length
+
+    if len(all_chunk_paths) > 0:
+        yield all_chunk_paths
+
 def setupPlatform( all_name_parts, argv0 ):
     setupPlatformSpecific( all_name_parts, argv0 )
 
@@ -17,7 +17,8 @@ import pathlib
 
 __all__ = ('setupPlatformSpecific', 'getAppDir', 'getPreferencesDir'
           ,'getLocalePath', 'getDocUserGuide', 'getNullDevice'
-          ,'getHomeFolder', 'getDefaultExecutableFolder', 'isInvalidFilename')
+          ,'getHomeFolder', 'getDefaultExecutableFolder', 'isInvalidFilename'
+          ,'getMaxCommandLineLength')
 
 __all_name_parts = None
 app_dir = None
@@ -69,6 +70,19 @@ def getHomeFolder():
 def getDefaultExecutableFolder():
     return pathlib.Path( '/usr/bin' )
 
+def getMaxCommandLineLength():
+    # ARG_MAX covers the arguments and the environment
+    try:
+        arg_max = os.sysconf( 'SC_ARG_MAX' )
+
+    except (ValueError, OSError):
+        arg_max = -1
+
+    if arg_max <= 0:
+        arg_max = 128*1024
+
+    return arg_max - sum( len(name) + len(value) + 2 for name, value in os.environ.items() )
+
 __filename_bad_chars_set = set( '/\000' )
 def isInvalidFilename( filename ):
     name_set = set( filename )
@@ -20,7 +20,8 @@ import ctypes.wintypes
 
 __all__ = ('setupPlatformSpecific', 'getAppDir', 'getPreferencesDir'
           ,'getLocalePath', 'getDocUserGuide', 'getNullDevice'
-          ,'getHomeFolder', 'getDefaultExecutableFolder', 'isInvalidFilename')
+          ,'getHomeFolder', 'getDefaultExecutableFolder', 'isInvalidFilename'
+          ,'getMaxCommandLineLength')
 
 CSIDL_APPDATA = 0x1a        # Application Data
 CSIDL_WINDOWS = 0x24        # windows folder
@@ -89,6 +90,10 @@ def getHomeFolder():
 def getDefaultExecutableFolder():
     return getProgramFilesDir()
 
+def getMaxCommandLineLength():
+    # limit of the command line passed to CreateProcess
+    return 32767
+
 __filename_bad_chars_set = set( '\\:/\000?<>*|"' )
 __filename_reserved_names = set( ['nul', 'con', 'aux', 'prn',
     'com1', 'com2', 'com3', 'com4', 'com5', 'com6', 'com7', 'com8', 'com9',
@@ -0,0 +1,269 @@
+'''
+ ====================================================================
+ Copyright (c) 2018 Barry A Scott.  All rights reserved.
+
+ This software is licensed as described in the file LICENSE.txt,
+ which you should have received as part of this distribution.
+
+ ====================================================================
+
+    wb_profile.py
+
+    Record timing spans of the hot paths of the app and save them
+    as a Chrome trace JSON file that chrome://tracing or
+    https://ui.perfetto.dev can show.
+
+    Enable with --debug profile and add profile-cprofile to also
+    save a cProfile stats file for each action.
+
+    Nothing is recorded and the hooks cost a single test when
+    profiling is not enabled.
+
+'''
+import os
+import re
+import json
+import time
+import functools
+import threading
+import inspect
+import cProfile
+
+class WbProfiler:
+    def __init__( self ):
+        self.enabled = False
+        self.cprofile_enabled = False
+
+        # where the trace and cProfile files are saved
+        self.output_folder = None
+
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+
+        # used from the foreground and background threads
+        self.lock = threading.Lock()
+        self.all_events = []
+        self.all_thread_names = {}
+
+    def enable( self, state=True ):
+        self.enabled = state
+
+    def enableCProfile( self, state=True ):
+        self.enabled = self.enabled or state
+        self.cprofile_enabled = state
+
+    def isEnabled( self ):
+        return self.enabled
+
+    def setOutputFolder( self, folder ):
+        self.output_folder = folder
+
+    def now( self ):
+        # trace timestamps are in micro seconds
+        return (time.perf_counter() - self.origin) * 1000000.0
+
+    def span( self, name, category, args=None ):
+        if not self.enabled:
+            return _null_span
+
+        return WbProfileSpan( self, name, category, args )
+
+    def addSpan( self, name, category, start, end, args=None ):
+        thread = threading.current_thread()
+        event = {'name': name
+                ,'cat': category
+                ,'ph': 'X'
+                ,'ts': start
+                ,'dur': end - start
+                ,'pid': self.pid
+                ,'tid': thread.ident}
+        if args:
+            event['args'] = args
+
+        with self.lock:
+            self.all_events.append( event )
+            self.all_thread_names[ thread.ident ] = thread.name
+
+    def numEvents( self ):
+        return len(self.all_events)
+
+    def saveTrace( self ):
+        if self.output_folder is None:
+            return None
+
+        filename = self.output_folder / ('trace-%s.json' % (time.strftime( '%Y%m%d-%H%M%S' ),))
+        self.saveTraceFile( filename )
+        return filename
+
+    def saveTraceFile( self, filename ):
+        with self.lock:
+            all_events = list( self.all_events )
+            all_thread_names = dict( self.all_thread_names )
+
+        # name the threads in the trace viewer
+        for tid, name in sorted( all_thread_names.items() ):
+            all_events.append( {'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}} )
+
+        with open( str(filename), 'w', encoding='utf-8' ) as f:
+            json.dump( {'traceEvents': all_events, 'displayTimeUnit': 'ms'}, f )
+
+    def actionProfile( self ):
+        if not self.cprofile_enabled:
+            return None
+
+        return WbActionProfile()
+
+class WbProfileSpan:
+    __slots__ = ('profiler', 'name', 'category', 'args', 'start')
+
+    def __init__( self, profiler, name, category, args ):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def __enter__( self ):
+        self.start = self.profiler.now()
+        return self
+
+    def __exit__( self, exc_type, exc_value, tb ):
+        self.profiler.addSpan( self.name, self.category, self.start, self.profiler.now(), self.args )
+        return False
+
+class WbNullSpan:
+    __slots__ = ()
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, exc_type, exc_value, tb ):
+        return False
+
+_null_span = WbNullSpan()
+
+#
+#   collect the cProfile stats of all the steps of one action
+#   that can run in the foreground and background threads
+#
+class WbActionProfile:
+    def __init__( self ):
+        self.profile = cProfile.Profile()
+        self.num_steps = 0
+
+    def enable( self ):
+        try:
+            self.profile.enable()
+            return True
+
+        except ValueError:
+            # another profiler is active on another thread
+            return False
+
+    def disable( self ):
+        self.profile.disable()
+        self.num_steps += 1
+
+    def save( self, instance_id, reason ):
+        if self.num_steps == 0 or profiler.output_folder is None:
+            return
+
+        name = re.sub( r'[^A-Za-z0-9_.-]+', '-', str(reason) ).strip( '-' )
+        self.profile.dump_stats( str( profiler.output_folder / ('%04d-%s.prof' % (instance_id, name)) ) )
+
+profiler = WbProfiler()
+
+def span( name, category, args=None ):
+    return profiler.span( name, category, args )
+
+#
+#   class decorators to add spans to methods
+#
+def profileMethods( *all_prefixes ):
+    '''
+    add a span around each method of the class that
+    starts with one of all_prefixes
+    '''
+    def decorator( cls ):
+        for name, fn in list( vars( cls ).items() ):
+            if name.startswith( '__' ) or not inspect.isfunction( fn ):
+                continue
+
+            if name.startswith( all_prefixes ):
+                setattr( cls, name, _profileFunction( fn, '%s.%s' % (cls.__name__, name), 'project' ) )
+
+        return cls
+
+    return decorator
+
+def profileFunction( category ):
+    '''
+    add a span around a single function or method
+    '''
+    def decorator( fn ):
+        return _profileFunction( fn, fn.__qualname__, category )
+
+    return decorator
+
+def profileModelResets( cls ):
+    '''
+    add a span from beginResetModel to the end of endResetModel
+    that includes the time the views take to update
+    '''
+    span_name = '%s.resetModel' % (cls.__name__,)
+    super_begin = cls.beginResetModel
+    super_end = cls.endResetModel
+
+    def beginResetModel( self ):
+        if profiler.enabled:
+            self._wb_profile_reset_start = profiler.now()
+
+        super_begin( self )
+
+    def endResetModel( self ):
+        super_end( self )
+
+        start = getattr( self, '_wb_profile_reset_start', None )
+        if start is not None:
+            self._wb_profile_reset_start = None
+            profiler.addSpan( span_name, 'model', start, profiler.now() )
+
+    cls.beginResetModel = beginResetModel
+    cls.endResetModel = endResetModel
+    return cls
+
+def _profileFunction( fn, span_name, category ):
+    if inspect.isgeneratorfunction( fn ):
+        @functools.wraps( fn )
+        def wrapper( *args, **kwds ):
+            if not profiler.enabled:
+                return fn( *args, **kwds )
+
+            return _profileGenerator( fn( *args, **kwds ), span_name, category )
+
+    else:
+        @functools.wraps( fn )
+        def wrapper( *args, **kwds ):
+            if not profiler.enabled:
+                return fn( *args, **kwds )
+
+            with WbProfileSpan( profiler, span_name, category, None ):
+                return fn( *args, **kwds )
+
+    return wrapper
+
+def _profileGenerator( generator, span_name, category ):
+    # only time the generator itself not the code consuming its values
+    try:
+        while True:
+            with WbProfileSpan( profiler, span_name, category, None ):
+                try:
+                    value = next( generator )
+
+                except StopIteration:
+                    return
+
+            yield value
+
+    finally:
+        generator.close()
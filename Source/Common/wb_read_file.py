@@ -9,10 +9,177 @@
 
     wb_read_file.py
 
+    WbMappedFile reads a file through a memory map. The encoding
+    and whether the file is binary are decided from the first block
+    of the file and the lines are decoded a block at a time so that
+    a large file is never held in memory as bytes and as text.
+
+    fileDigest hashes the contents of a file a block at a time so
+    that a file can be compared with the id or checksum that the
+    SCM keeps without reading the text of either side.
+    filesAreIdentical compares two files a block at a time and
+    stops at the first difference.
+
 '''
+import os
+import mmap
+import hashlib
 import locale
 import codecs
 
+# how much of the start of the file is used to find its encoding
+# and to decide that it is binary - like git a NUL means binary
+prefix_size = 8000
+
+# the size of the blocks of the file that are decoded in one go
+decode_block_size = 1024*1024
+
+# the size of the blocks of the file that are hashed in one go
+hash_block_size = 1024*1024
+
+class WbMappedFile:
+    def __init__( self, filename ):
+        self.filename = filename
+
+        with open( str(filename), 'rb' ) as f:
+            # an empty file cannot be mapped
+            if os.fstat( f.fileno() ).st_size == 0:
+                self.contents = b''
+
+            else:
+                self.contents = mmap.mmap( f.fileno(), 0, access=mmap.ACCESS_READ )
+
+        prefix = self.contents[:prefix_size]
+        self.encoding = encodingFromPrefix( prefix )
+        self.binary = self.encoding not in ('utf-16', 'utf-32') and b'\0' in prefix
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, exc_type, exc_value, tb ):
+        self.close()
+        return False
+
+    def close( self ):
+        if isinstance( self.contents, mmap.mmap ):
+            self.contents.close()
+
+        self.contents = b''
+
+    def isBinary( self ):
+        return self.binary
+
+    def getEncoding( self ):
+        return self.encoding
+
+    def textLines( self, universal_newlines=False ):
+        '''
+        return the lines of the file as str.split( '\n' ) would.
+        with universal_newlines \r\n and \r are line ends
+        like a file opened in text mode
+        '''
+        try:
+            return self.__decodeLines( self.encoding, 'strict', universal_newlines )
+
+        except UnicodeDecodeError:
+            try:
+                # use the choosen encoding and replace chars in error
+                return self.__decodeLines( self.encoding, 'replace', universal_newlines )
+
+            except UnicodeDecodeError:
+                # fall back to latin-1
+                return self.__decodeLines( 'iso8859-1', 'replace', universal_newlines )
+
+    def __decodeLines( self, encoding, errors, universal_newlines ):
+        all_lines = []
+        # the parts of a line that is split between blocks
+        all_line_parts = []
+        for text in self.__decodeBlocks( encoding, errors, universal_newlines ):
+            all_block_lines = text.split( '\n' )
+            all_line_parts.append( all_block_lines[0] )
+            if len(all_block_lines) > 1:
+                all_lines.append( ''.join( all_line_parts ) )
+                all_lines.extend( all_block_lines[1:-1] )
+                all_line_parts = [all_block_lines[-1]]
+
+        all_lines.append( ''.join( all_line_parts ) )
+        return all_lines
+
+    def __decodeBlocks( self, encoding, errors, universal_newlines ):
+        # the incremental decoder copes with characters split between blocks
+        decoder = codecs.getincrementaldecoder( encoding )( errors )
+
+        if not universal_newlines:
+            for start in range( 0, len(self.contents), decode_block_size ):
+                yield decoder.decode( self.contents[start:start+decode_block_size] )
+
+            yield decoder.decode( b'', final=True )
+            return
+
+        # hold back a \r at the end of a block in case the next block starts with \n
+        held_back = ''
+        for start in range( 0, len(self.contents), decode_block_size ):
+            text = held_back + decoder.decode( self.contents[start:start+decode_block_size] )
+            if text.endswith( '\r' ):
+                text = text[:-1]
+                held_back = '\r'
+
+            else:
+                held_back = ''
+
+            yield text.replace( '\r\n', '\n' ).replace( '\r', '\n' )
+
+        text = held_back + decoder.decode( b'', final=True )
+        yield text.replace( '\r\n', '\n' ).replace( '\r', '\n' )
+
+def readFileTextLines( filename, universal_newlines=False ):
+    with WbMappedFile( filename ) as mapped_file:
+        return mapped_file.textLines( universal_newlines )
+
+def fileDigest( filename, digest_name, header=None ):
+    '''
+    return the hex digest of the contents of filename using
+    the hashlib algorithm digest_name. header is called with the
+    size of the file and returns bytes to hash before the contents,
+    like the header of a git blob.
+    '''
+    with open( str(filename), 'rb' ) as f:
+        digest = hashlib.new( digest_name )
+        if header is not None:
+            digest.update( header( os.fstat( f.fileno() ).st_size ) )
+
+        while True:
+            block = f.read( hash_block_size )
+            if block == b'':
+                break
+
+            digest.update( block )
+
+    return digest.hexdigest()
+
+def filesAreIdentical( filename_left, filename_right ):
+    '''
+    return True if the two files have the same contents.
+    Files that cannot be read are not identical.
+    '''
+    try:
+        # files of different sizes are different without reading them
+        if os.stat( str(filename_left) ).st_size != os.stat( str(filename_right) ).st_size:
+            return False
+
+        # stop reading at the first block that is different
+        with open( str(filename_left), 'rb' ) as f_left, open( str(filename_right), 'rb' ) as f_right:
+            while True:
+                block_left = f_left.read( hash_block_size )
+                if block_left != f_right.read( hash_block_size ):
+                    return False
+
+                if block_left == b'':
+                    return True
+
+    except OSError:
+        return False
+
 def readFileContentsAsUnicode( filename ):
     f = open( filename, 'rb' )
     contents = f.read()
@@ -59,3 +226,17 @@ def encodingFromContents( contents ):
         encoding = 'iso8859-1'
 
     return encoding
+
+def encodingFromPrefix( prefix ):
+    if( prefix.startswith( codecs.BOM_UTF8 )
+    or prefix.startswith( (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE) )
+    or prefix.startswith( (codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE) ) ):
+        return encodingFromContents( prefix )
+
+    try:
+        # the prefix may end part way through a character
+        codecs.getincrementaldecoder( 'utf-8' )().decode( prefix, final=False )
+        return 'utf-8'
+
+    except UnicodeDecodeError:
+        return encodingFromContents( prefix )
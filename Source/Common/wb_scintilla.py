@@ -50,6 +50,10 @@ class WbScintilla(Qsci.QsciScintilla):
     def insertText( self, pos, text ):
         self.SendScintilla( self.SCI_INSERTTEXT, pos, text.encode( 'utf-8' ) )
 
+    def appendBytes( self, data ):
+        # data is utf-8 encoded
+        self.SendScintilla( self.SCI_APPENDTEXT, len(data), data )
+
     def replaceSel( self, text ):
         self.SendScintilla( self.SCI_REPLACESEL, text.encode( 'utf-8' ) )
 
@@ -64,6 +68,9 @@ class WbScintilla(Qsci.QsciScintilla):
     def emptyUndoBuffer( self ):
         self.SendScintilla( self.SCI_EMPTYUNDOBUFFER )
 
+    def setUndoCollection( self, collect ):
+        self.SendScintilla( self.SCI_SETUNDOCOLLECTION, collect )
+
     # --- Selection and information ---
     def getLength( self ):
         return self.SendScintilla( self.SCI_GETLENGTH )
@@ -126,6 +133,10 @@ class WbScintilla(Qsci.QsciScintilla):
     def setStyling( self, length, style_number ):
         self.SendScintilla( self.SCI_SETSTYLING, length, style_number )
 
+    def setStylingEx( self, all_style_numbers ):
+        # one style number byte for each byte of text
+        self.SendScintilla( self.SCI_SETSTYLINGEX, len(all_style_numbers), all_style_numbers )
+
     # --- Style definition ---
     def styleSetFromSpec( self, style_number, css ):
         # simple css-like style
@@ -264,6 +275,14 @@ class WbScintilla(Qsci.QsciScintilla):
             self.setIndicatorCurrent( indic_number )
             self.indicatorFillRange( pos, len(text) )
 
+    def appendStyledBytes( self, data, all_style_numbers ):
+        # append utf-8 encoded text with a style number for each byte
+        pos = self.getLength()
+        self.appendBytes( data )
+
+        self.startStyling( pos )
+        self.setStylingEx( all_style_numbers )
+
     def changeLineStyle( self, line, style ):
         pos_start = self.positionFromLine( line )
         pos_end = self.getLineEndPosition( line )
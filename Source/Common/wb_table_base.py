@@ -14,6 +14,7 @@ from PyQt5 import QtCore
 
 import types
 
+import wb_profile
 import wb_table_view
 
 _alignment_map = {
@@ -106,6 +107,7 @@ class WbTableView(wb_table_view.WbTableView):
         # allow the table to redraw the selected row highlights
         super().selectionChanged( selected, deselected )
 
+@wb_profile.profileModelResets
 class WbTableModel(QtCore.QAbstractTableModel):
     def __init__( self, view_model_map ):
         self.view_model_map = view_model_map
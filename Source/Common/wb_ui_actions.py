@@ -10,10 +10,15 @@
     wb_ui_actions.py
 
 '''
+import time
 import difflib
 
 import wb_diff_unified_view
 import wb_diff_side_by_side_view
+import wb_diff_difflib
+import wb_main_window
+
+from wb_background_thread import thread_switcher
 
 class WbMainWindowActions:
     def __init__( self, scm_type, factory ):
@@ -71,9 +76,19 @@ class WbMainWindowActions:
 
         return self.table_view.selectedAllFileStates()
 
+    # use in enablers in place of tableSelectedAllFileStates
+    def tableSelectionFacts( self ):
+        if self.table_view is None:
+            return wb_main_window.WbSelectionFacts( [] )
+
+        return self.table_view.selectionFacts()
+
     # ------------------------------------------------------------
     def diffTwoFiles( self, title, old_lines, new_lines, header_left, header_right ):
-        if self.app.prefs.view.isDiffUnified():
+        if old_lines == new_lines:
+            self.showIdenticalFiles( title, old_lines, header_left, header_right )
+
+        elif self.app.prefs.view.isDiffUnified():
             all_lines = list( difflib.unified_diff( old_lines, new_lines ) )
 
             self.showDiffText( title, all_lines )
@@ -86,9 +101,121 @@ class WbMainWindowActions:
                         new_lines, header_right )
             window.show()
 
+    def showIdenticalFiles( self, title, all_lines, header_left, header_right ):
+        # both sides are all_lines - show them without working out a diff
+        if self.app.prefs.view.isDiffUnified():
+            window = wb_diff_unified_view.WbDiffViewText( self.app, title )
+            window.setIdentical()
+            window.show()
+
+        elif self.app.prefs.view.isDiffSideBySide():
+            all_lines = [wb_diff_difflib.eolRemoval( line ) for line in all_lines]
+            if len(all_lines) > 0:
+                all_opcodes = [('equal', 0, len(all_lines), 0, len(all_lines))]
+
+            else:
+                all_opcodes = []
+
+            window = wb_diff_side_by_side_view.DiffSideBySideView(
+                        self.app, None,
+                        title,
+                        all_lines, header_left,
+                        all_lines, header_right,
+                        all_opcodes )
+            window.show()
+
     def showDiffText( self, title, all_lines ):
         assert type(all_lines) == list
 
         window = wb_diff_unified_view.WbDiffViewText( self.app, title )
         window.setUnifiedDiffText( all_lines )
         window.show()
+
+    @thread_switcher
+    def diffTwoFiles_Bg( self, title, old_lines, new_lines, header_left, header_right ):
+        # the diff is calculated on the background thread
+        if old_lines == new_lines:
+            self.showIdenticalFiles( title, old_lines, header_left, header_right )
+
+        elif self.app.prefs.view.isDiffUnified():
+            yield from self.showDiffText_Bg( title, difflib.unified_diff( old_lines, new_lines ) )
+
+        elif self.app.prefs.view.isDiffSideBySide():
+            yield self.switchToBackground
+
+            old_lines, new_lines, all_opcodes = wb_diff_difflib.compareLines( old_lines, new_lines )
+
+            yield self.switchToForeground
+
+            window = wb_diff_side_by_side_view.DiffSideBySideView(
+                        self.app, None,
+                        title,
+                        old_lines, header_left,
+                        new_lines, header_right,
+                        all_opcodes )
+            window.show()
+
+    @thread_switcher
+    def showDiffText_Bg( self, title, all_lines ):
+        # all_lines can be an iterator, like the lines from difflib,
+        # that is read on the background thread
+        parser = wb_diff_unified_view.WbUnifiedDiffParser()
+        yield from self.__showUnifiedDiff_Bg( title, all_lines, parser, parser.parseLines )
+
+    @thread_switcher
+    def showDiffOutput_Bg( self, title, all_data ):
+        # all_data is an iterator of the bytes of the diff output
+        # as the diff command produces them
+        parser = wb_diff_unified_view.WbUnifiedDiffParser()
+        yield from self.__showUnifiedDiff_Bg( title, all_data, parser,
+                                                lambda all_chunk_data: parser.parseBytes( b''.join( all_chunk_data ) ) )
+
+    @thread_switcher
+    def __showUnifiedDiff_Bg( self, title, all_parts, parser, parse ):
+        # the diff is shown a block at a time as it is read and
+        # parsed on the background thread
+        window = wb_diff_unified_view.WbDiffViewText( self.app, title )
+        window.show()
+
+        self.progress.start( T_('Diff %(count)d lines'), 0 )
+
+        part_iter = iter( all_parts )
+        diff_done = False
+        while not diff_done:
+            yield self.switchToBackground
+
+            all_chunk_parts = []
+
+            # update the view a few times a second
+            end_time = time.time() + 0.25
+            diff_done = True
+            for part in part_iter:
+                all_chunk_parts.append( part )
+
+                if time.time() > end_time:
+                    diff_done = False
+                    break
+
+            block = parse( all_chunk_parts )
+            if diff_done:
+                last_block = parser.finish()
+
+            else:
+                last_block = None
+
+            yield self.switchToForeground
+
+            if not window.isVisible():
+                # the view was closed before all the diff was shown
+                if hasattr( all_parts, 'close' ):
+                    all_parts.close()
+
+                self.progress.end()
+                return
+
+            for block in (block, last_block):
+                if block is not None:
+                    window.appendUnifiedDiffBlock( block )
+                    self.progress.incEventCount( block.numLines() )
+
+        self.progress.end()
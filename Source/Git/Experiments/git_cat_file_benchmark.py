@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+#
+#   git_cat_file_benchmark.py
+#
+#   Compare the time taken to read the old and new versions of the
+#   files changed by the last <num-commits> commits of a repo using:
+#
+#       show        - git show <commit>:<path> for each version
+#       cat-file    - GitProject.getTextLinesForCommits that reads both
+#                     versions with one request to git cat-file --batch
+#       cached      - the same reads again from the cache of recent objects
+#
+#   usage: git_cat_file_benchmark.py <repo-folder> [<num-commits>]
+#
+import sys
+import time
+import pathlib
+import builtins
+
+sys.path.insert( 0, '..' )
+sys.path.insert( 0, '../../Common' )
+
+builtins.T_ = lambda s: s
+
+import git
+import wb_git_project
+
+class FakeDebugOption:
+    def __call__( self, msg ):
+        pass
+
+    def isEnabled( self ):
+        return False
+
+class FakeDebug:
+    def __getattr__( self, name ):
+        return FakeDebugOption()
+
+class FakeGitPrefs:
+    status_porcelain = True
+
+class FakePrefs:
+    git = FakeGitPrefs()
+
+class FakeApp:
+    def __init__( self ):
+        self.debug_options = FakeDebug()
+        self.prefs = FakePrefs()
+
+class FakePrefsProject:
+    def __init__( self, path ):
+        self.name = 'Benchmark'
+        self.path = path
+        self.master_branch_name = None
+
+def textLines( text ):
+    all_lines = text.split( '\n' )
+    if all_lines[-1] == '':
+        return all_lines[:-1]
+
+    return all_lines
+
+def allChanges( repo, num_commits ):
+    # (old commit, new commit, path) of each file modified by the commits
+    all_changes = []
+    for commit in repo.iter_commits( 'HEAD', max_count=num_commits ):
+        if len(commit.parents) == 0:
+            continue
+
+        for diff in commit.parents[0].diff( commit ):
+            if diff.a_path == diff.b_path and not diff.new_file and not diff.deleted_file:
+                all_changes.append( (commit.parents[0].hexsha, commit.hexsha, diff.b_path) )
+
+    return all_changes
+
+def readWithShow( repo, all_changes ):
+    for old_commit, new_commit, path in all_changes:
+        textLines( repo.git.show( '%s:%s' % (old_commit, path) ) )
+        textLines( repo.git.show( '%s:%s' % (new_commit, path) ) )
+
+def readWithCatFile( project, all_changes ):
+    for old_commit, new_commit, path in all_changes:
+        project.getTextLinesForCommits( pathlib.Path( path ), [old_commit, new_commit] )
+
+def timeIt( label, num_reads, fn ):
+    start = time.time()
+    fn()
+    duration = time.time() - start
+    print( '    %-10s %7.3fs %8.2fms/read' % (label, duration, duration * 1000.0 / max( 1, num_reads )) )
+
+def main( argv ):
+    repo_path = pathlib.Path( argv[1] ).resolve()
+    num_commits = int( argv[2] ) if len(argv) > 2 else 50
+
+    repo = git.Repo( str(repo_path) )
+    all_changes = allChanges( repo, num_commits )
+    num_reads = len(all_changes) * 2
+
+    project = wb_git_project.GitProject( FakeApp(), FakePrefsProject( repo_path ), None )
+
+    print( 'git: %d versions of files changed by %d commits' % (num_reads, num_commits) )
+    timeIt( 'show', num_reads, lambda: readWithShow( repo, all_changes ) )
+    timeIt( 'cat-file', num_reads, lambda: readWithCatFile( project, all_changes ) )
+    timeIt( 'cached', num_reads, lambda: readWithCatFile( project, all_changes ) )
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit( main( sys.argv ) )
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+#
+#   git_file_state_memory.py
+#
+#   Compare the memory used and the time taken by a full garbage
+#   collection for the file states of a very large working copy:
+#
+#       legacy  - dict backed objects with the attributes WbGitFileState had
+#       current - WbGitFileState with __slots__ and the status in bit flags
+#
+#   usage: git_file_state_memory.py [<num-files>]
+#
+import sys
+import pathlib
+
+sys.path.insert( 0, '..' )
+sys.path.insert( 0, '../../Common' )
+sys.path.insert( 0, '../../Common/Experiments' )
+
+import file_state_memory
+
+import wb_git_project
+
+class FakeDebugOption:
+    def __call__( self, msg ):
+        pass
+
+    def isEnabled( self ):
+        return False
+
+class FakeDebug:
+    def __getattr__( self, name ):
+        return FakeDebugOption()
+
+class FakeGitPrefs:
+    status_porcelain = True
+
+class FakePrefs:
+    git = FakeGitPrefs()
+
+class FakeApp:
+    def __init__( self ):
+        self.debug_options = FakeDebug()
+        self.prefs = FakePrefs()
+
+class FakePrefsProject:
+    def __init__( self ):
+        self.name = 'Benchmark'
+        self.path = pathlib.Path( '.' )
+        self.master_branch_name = None
+
+class FakeDiff:
+    renamed = False
+    deleted_file = False
+    new_file = False
+    a_blob = None
+    b_blob = None
+
+class LegacyFileState:
+    def __init__( self, project, filepath ):
+        self.project = project
+        self.filepath = filepath
+        self.is_dir = False
+        self.index_entry = None
+        self.unstaged_diff = None
+        self.staged_diff = None
+        self.untracked = False
+        self.state_calculated = False
+        self.staged_is_modified = False
+        self.unstaged_is_modified = False
+        self.staged_abbrev = None
+        self.unstaged_abbrev = None
+        self.head_blob = None
+        self.staged_blob = None
+
+    def setIndexEntry( self, index_entry ):
+        self.index_entry = index_entry
+
+    def _addUnstaged( self, diff ):
+        self.state_calculated = False
+        self.unstaged_diff = diff
+
+    def getUnstagedAbbreviatedStatus( self ):
+        if not self.state_calculated:
+            self.staged_abbrev = ''
+            self.unstaged_abbrev = '' if self.unstaged_diff is None else 'M'
+            self.unstaged_is_modified = self.unstaged_diff is not None
+            self.state_calculated = True
+
+        return self.unstaged_abbrev
+
+def makeFileStates( file_state_class, project, all_paths ):
+    index_entry = object()
+    diff = FakeDiff()
+
+    all_file_state = {}
+    for index, path in enumerate( all_paths ):
+        file_state = file_state_class( project, path )
+        file_state.setIndexEntry( index_entry )
+        # one in ten files is modified
+        if index % 10 == 0:
+            file_state._addUnstaged( diff )
+
+        file_state.getUnstagedAbbreviatedStatus()
+        all_file_state[ path ] = file_state
+
+    return all_file_state
+
+if __name__ == '__main__':
+    sys.exit( file_state_memory.main( sys.argv, 'git', makeFileStates,
+                wb_git_project.GitProject( FakeApp(), FakePrefsProject(), None ), LegacyFileState, wb_git_project.WbGitFileState ) )
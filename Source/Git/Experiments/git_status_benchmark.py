@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+#
+#   git_status_benchmark.py
+#
+#   Compare the time taken to find the status of a large repo using:
+#
+#       gitpython   - IndexFile.diff(HEAD), IndexFile.diff(None) and untracked_files
+#       incremental - WbGitIncrementalStatus first and second update
+#       porcelain   - WbGitPorcelainStatus using git status --porcelain=v2
+#
+#   usage: git_status_benchmark.py <repo-folder> [<num-files>]
+#
+#   The repo is created if the folder does not exist.
+#
+import sys
+import time
+import pathlib
+import subprocess
+import builtins
+
+sys.path.insert( 0, '..' )
+sys.path.insert( 0, '../../Common' )
+
+builtins.T_ = lambda s: s
+
+import git
+import wb_git_project
+
+files_per_folder = 100
+
+class FakeDebugOption:
+    def __call__( self, msg ):
+        pass
+
+    def isEnabled( self ):
+        return False
+
+class FakeDebug:
+    def __getattr__( self, name ):
+        return FakeDebugOption()
+
+class FakeLog:
+    def __getattr__( self, name ):
+        return print
+
+class FakeGitPrefs:
+    def __init__( self, status_porcelain ):
+        self.status_porcelain = status_porcelain
+
+class FakePrefs:
+    def __init__( self, status_porcelain ):
+        self.git = FakeGitPrefs( status_porcelain )
+
+class FakeApp:
+    def __init__( self, status_porcelain ):
+        self.debug_options = FakeDebug()
+        self.log = FakeLog()
+        self.prefs = FakePrefs( status_porcelain )
+
+class FakePrefsProject:
+    def __init__( self, path ):
+        self.name = 'BenchmarkRepo'
+        self.path = path
+        self.master_branch_name = None
+
+def git_cmd( repo, *args ):
+    subprocess.run( ['git', '-C', str(repo)] + list(args), check=True, stdout=subprocess.DEVNULL )
+
+def makeRepo( repo, num_files ):
+    print( 'Creating %s with %d files' % (repo, num_files) )
+    repo.mkdir( parents=True )
+    git_cmd( repo, 'init', '-q' )
+    git_cmd( repo, 'config', 'user.email', 'benchmark@example.com' )
+    git_cmd( repo, 'config', 'user.name', 'Benchmark' )
+
+    with (repo / '.gitignore').open( 'w' ) as f:
+        f.write( '*.o\n' )
+
+    for index in range( num_files ):
+        folder = repo / ('folder-%04d' % (index // (files_per_folder * files_per_folder),)) / ('sub-%04d' % (index // files_per_folder,))
+        if index % files_per_folder == 0:
+            folder.mkdir( parents=True, exist_ok=True )
+
+        with (folder / ('file-%06d.txt' % (index,))).open( 'w' ) as f:
+            f.write( 'line 1 of file %d\nline 2\n' % (index,) )
+
+    git_cmd( repo, 'add', '.' )
+    git_cmd( repo, 'commit', '-q', '-m', 'initial' )
+
+    # change 1% of the files in various ways
+    all_files = sorted( repo.glob( 'folder-*/sub-*/file-*.txt' ) )
+    for index, path in enumerate( all_files[::100] ):
+        kind = index % 4
+        if kind == 0:
+            with path.open( 'a' ) as f:
+                f.write( 'modified\n' )
+
+        elif kind == 1:
+            with path.open( 'a' ) as f:
+                f.write( 'staged\n' )
+            git_cmd( repo, 'add', str(path) )
+
+        elif kind == 2:
+            path.with_suffix( '.new' ).write_text( 'untracked\n' )
+
+        else:
+            path.with_suffix( '.o' ).write_text( 'ignored\n' )
+
+def timeIt( label, fn ):
+    start = time.time()
+    result = fn()
+    print( '%-30s %8.3fs' % (label, time.time() - start) )
+    return result
+
+def gitPythonStatus( repo_path ):
+    repo = git.Repo( str(repo_path) )
+    index = git.index.IndexFile( repo )
+    staged = list( index.diff( repo.head.commit ) )
+    unstaged = list( index.diff( None ) )
+    untracked = repo.untracked_files
+    return len(staged), len(unstaged), len(untracked)
+
+def projectStatus( repo_path, status_porcelain ):
+    project = wb_git_project.GitProject( FakeApp( status_porcelain ), FakePrefsProject( repo_path ), None )
+    project.updateState( '.' )
+    return project
+
+def main( argv ):
+    repo_path = pathlib.Path( argv[1] ).resolve()
+    num_files = int( argv[2] ) if len(argv) > 2 else 100000
+
+    if not repo_path.exists():
+        makeRepo( repo_path, num_files )
+
+    # warm the OS file cache
+    gitPythonStatus( repo_path )
+
+    counts = timeIt( 'gitpython three calls', lambda: gitPythonStatus( repo_path ) )
+    print( '    staged %d unstaged %d untracked %d' % counts )
+
+    project = timeIt( 'incremental first update', lambda: projectStatus( repo_path, False ) )
+    print( '    staged %d modified %d files %d' % (project.numStagedFiles(), project.numModifiedFiles(), len(project.all_file_state)) )
+    timeIt( 'incremental second update', lambda: project.updateState( '.' ) )
+
+    project = timeIt( 'porcelain first update', lambda: projectStatus( repo_path, True ) )
+    print( '    staged %d modified %d files %d' % (project.numStagedFiles(), project.numModifiedFiles(), len(project.all_file_state)) )
+    timeIt( 'porcelain second update', lambda: project.updateState( '.' ) )
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit( main( sys.argv ) )
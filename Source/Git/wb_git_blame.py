@@ -0,0 +1,86 @@
+'''
+ ====================================================================
+ Copyright (c) 2018 Barry A Scott.  All rights reserved.
+
+ This software is licensed as described in the file LICENSE.txt,
+ which you should have received as part of this distribution.
+
+ ====================================================================
+
+    wb_git_blame.py
+
+    Read the output of git blame --incremental as git produces it.
+
+    Each group of lines starts with the commit id, original line,
+    final line and number of lines. The details of a commit follow
+    the first time it is seen and the group always ends with the
+    filename header.
+
+'''
+import git.exc
+
+class BlameGroup:
+    __slots__ = ('commit_id', 'final_line', 'num_lines', 'all_headers')
+
+    def __init__( self, commit_id, final_line, num_lines, all_headers ):
+        self.commit_id = commit_id
+        # final_line is the 1 based line number in the annotated file
+        self.final_line = final_line
+        self.num_lines = num_lines
+        # the commit headers the first time commit_id is seen otherwise None
+        self.all_headers = all_headers
+
+    def __repr__( self ):
+        return '<BlameGroup: %s lines %d-%d>' % (self.commit_id[:8], self.final_line, self.final_line + self.num_lines - 1)
+
+class BlameIncremental:
+    def __init__( self, repo, rev, path ):
+        self.proc = repo.git.blame( '--incremental', rev, '--', path, as_process=True )
+
+    def __iter__( self ):
+        all_seen_commits = set()
+
+        commit_id = None
+        final_line = None
+        num_lines = None
+        all_headers = {}
+
+        for line in self.proc.stdout:
+            line = line.decode( 'utf-8', 'replace' ).rstrip( '\n' )
+
+            if commit_id is None:
+                all_parts = line.split( ' ' )
+                if len(all_parts) != 4:
+                    continue
+
+                commit_id = all_parts[0]
+                final_line = int( all_parts[2] )
+                num_lines = int( all_parts[3] )
+                all_headers = {}
+                continue
+
+            key, _, value = line.partition( ' ' )
+            all_headers[ key ] = value
+
+            if key == 'filename':
+                if commit_id in all_seen_commits:
+                    yield BlameGroup( commit_id, final_line, num_lines, None )
+
+                else:
+                    all_seen_commits.add( commit_id )
+                    yield BlameGroup( commit_id, final_line, num_lines, all_headers )
+
+                commit_id = None
+
+        self.proc.wait()
+
+    def close( self ):
+        # stop git if the blame is abandoned
+        if self.proc.poll() is None:
+            self.proc.kill()
+
+        try:
+            self.proc.wait()
+
+        except git.exc.GitCommandError:
+            pass
@@ -0,0 +1,184 @@
+'''
+ ====================================================================
+ Copyright (c) 2018 Barry A Scott.  All rights reserved.
+
+ This software is licensed as described in the file LICENSE.txt,
+ which you should have received as part of this distribution.
+
+ ====================================================================
+
+    wb_git_cat_file.py
+
+    Read the contents of git objects from long running
+    git cat-file --batch-check and git cat-file --batch
+    processes instead of starting git for each read.
+
+    Each name is written to git and its answer read back before
+    the next name is written. Names, like <rev>:<path>,
+    are turned into object ids by --batch-check and only the
+    objects that are not in the cache of recently read objects
+    are read by --batch.
+
+'''
+import re
+import subprocess
+import threading
+import collections
+
+import git.exc
+
+# default limit on the size of the cached object contents
+default_max_cache_size = 16*1024*1024
+
+re_object_id = re.compile( r'^([0-9a-f]{40}|[0-9a-f]{64})$' )
+
+class WbGitCatFile:
+    def __init__( self, repo, max_cache_size=default_max_cache_size ):
+        self.repo = repo
+        self.max_cache_size = max_cache_size
+
+        # reads come from the foreground and background threads
+        # and are sent to git one read at a time
+        self.lock = threading.Lock()
+
+        self.all_procs = {}
+
+        # object id to contents in least recently used order
+        self.all_cached_contents = collections.OrderedDict()
+        self.cache_size = 0
+
+    def readObjects( self, all_names ):
+        '''
+        return the contents of each object in all_names as bytes.
+        A name is anything that git cat-file understands
+        like an object id or <rev>:<path>.
+        raises GitCommandError if an object does not exist
+        '''
+        with self.lock:
+            all_object_ids = self.__objectIds( all_names )
+
+            all_contents = {}
+            all_missing = []
+            for object_id in all_object_ids:
+                if object_id in all_contents:
+                    continue
+
+                contents = self.all_cached_contents.get( object_id )
+                if contents is None:
+                    all_missing.append( object_id )
+
+                else:
+                    self.all_cached_contents.move_to_end( object_id )
+
+                all_contents[ object_id ] = contents
+
+            for object_id, contents in zip( all_missing, self.__batch( '--batch', all_missing ) ):
+                all_contents[ object_id ] = contents
+                self.__addToCache( object_id, contents )
+
+            return [all_contents[ object_id ] for object_id in all_object_ids]
+
+    def objectIds( self, all_names ):
+        '''
+        return the object id of each object in all_names
+        without reading the contents of the objects.
+        raises GitCommandError if an object does not exist
+        '''
+        with self.lock:
+            return self.__objectIds( all_names )
+
+    def close( self ):
+        with self.lock:
+            for option in list( self.all_procs ):
+                self.__stop( option )
+
+    # ------------------------------------------------------------
+    def __objectIds( self, all_names ):
+        all_object_ids = list( all_names )
+
+        all_to_resolve = [index for index, name in enumerate( all_names ) if re_object_id.match( name ) is None]
+        all_headers = self.__batch( '--batch-check', [all_names[ index ] for index in all_to_resolve] )
+        for index, header in zip( all_to_resolve, all_headers ):
+            all_object_ids[ index ] = header
+
+        return all_object_ids
+
+    def __addToCache( self, object_id, contents ):
+        # do not let one large object empty the cache
+        if len(contents) > self.max_cache_size // 4:
+            return
+
+        self.all_cached_contents[ object_id ] = contents
+        self.cache_size += len(contents)
+
+        while self.cache_size > self.max_cache_size:
+            old_object_id, old_contents = self.all_cached_contents.popitem( last=False )
+            self.cache_size -= len(old_contents)
+
+    def __batch( self, option, all_names ):
+        # --batch-check answers with object ids and --batch with contents.
+        # git writes the answer to a name as soon as it reads the name so
+        # write one name at a time and read its answer before writing the
+        # next; otherwise git and this code can both block on full pipes
+        return [self.__request( option, name ) for name in all_names]
+
+    def __request( self, option, name ):
+        if '\n' in name:
+            raise git.exc.GitCommandError( ['git', 'cat-file', option], 1, stderr='cannot read %r' % (name,) )
+
+        proc = self.__start( option )
+        try:
+            proc.stdin.write( ('%s\n' % (name,)).encode( 'utf-8' ) )
+            proc.stdin.flush()
+
+            header = proc.stdout.readline()
+            if header == b'':
+                raise BrokenPipeError( 'git cat-file exited' )
+
+            # the name in "<name> missing" can have spaces in it
+            header = header.decode( 'utf-8', 'surrogateescape' ).rstrip( '\n' )
+            all_fields = header.rsplit( ' ', 2 )
+            if( header.endswith( (' missing', ' ambiguous') )
+            or len(all_fields) != 3
+            or re_object_id.match( all_fields[0] ) is None ):
+                answer = None
+
+            else:
+                object_id, object_type, size = all_fields
+                if option == '--batch-check':
+                    answer = object_id
+
+                else:
+                    answer = proc.stdout.read( int( size ) )
+                    if proc.stdout.read( 1 ) != b'\n':
+                        raise BrokenPipeError( 'git cat-file answer is truncated' )
+
+        except (OSError, ValueError) as e:
+            # restart git on the next read
+            self.__stop( option )
+            raise git.exc.GitCommandError( ['git', 'cat-file', option], 1, stderr=str(e) )
+
+        if answer is None:
+            raise git.exc.GitCommandError( ['git', 'cat-file', option], 128, stderr='%s does not exist' % (name,) )
+
+        return answer
+
+    def __start( self, option ):
+        proc = self.all_procs.get( option )
+        if proc is None or proc.poll() is not None:
+            proc = self.repo.git.cat_file( option, as_process=True, istream=subprocess.PIPE )
+            self.all_procs[ option ] = proc
+
+        return proc
+
+    def __stop( self, option ):
+        proc = self.all_procs.pop( option, None )
+        if proc is None:
+            return
+
+        try:
+            proc.stdin.close()
+            proc.wait()
+
+        except (OSError, git.exc.GitCommandError):
+            pass
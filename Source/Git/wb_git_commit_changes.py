@@ -0,0 +1,129 @@
+'''
+ ====================================================================
+ Copyright (c) 2018 Barry A Scott.  All rights reserved.
+
+ This software is licensed as described in the file LICENSE.txt,
+ which you should have received as part of this distribution.
+
+ ====================================================================
+
+    wb_git_commit_changes.py
+
+    Find the files added, deleted, renamed and modified by commits
+    using one git diff-tree process for any number of commits.
+
+'''
+import os
+import threading
+import subprocess
+import collections
+
+import wb_git_status_porcelain
+
+def iterCommitChanges( repo, all_commit_pairs ):
+    '''
+    all_commit_pairs is a list of (commit_id, parent_id)
+    parent_id is None for a root commit
+
+    yields (commit_id, all_added, all_deleted, all_renamed, all_modified)
+    in the same order as all_commit_pairs
+    '''
+    if len(all_commit_pairs) == 0:
+        return
+
+    # --always makes sure every commit is reported even if it changes nothing
+    proc = repo.git.diff_tree( '--stdin', '--always', '--root', '-r', '-M', '--name-status', '-z',
+                as_process=True, istream=subprocess.PIPE )
+
+    def writeCommits():
+        try:
+            for commit_id, parent_id in all_commit_pairs:
+                if parent_id is None:
+                    line = '%s\n' % (commit_id,)
+
+                else:
+                    # compare with the first parent only
+                    line = '%s %s\n' % (commit_id, parent_id)
+
+                proc.stdin.write( line.encode( 'ascii' ) )
+
+            proc.stdin.close()
+
+        except (OSError, ValueError):
+            # git has exited - the reader reports the error
+            pass
+
+    writer = threading.Thread( target=writeCommits, name='diff-tree writer' )
+    writer.daemon = True
+    writer.start()
+
+    commit_id = None
+    all_added = []
+    all_deleted = []
+    all_renamed = []
+    all_modified = []
+
+    all_fields = wb_git_status_porcelain.iterNulFields( proc.stdout )
+    for field in all_fields:
+        status = field.decode( 'ascii' )
+        code = status[0:1]
+
+        if code in ('A', 'C'):
+            name = os.fsdecode( next( all_fields ) )
+            if code == 'C':
+                name = os.fsdecode( next( all_fields ) )
+            all_added.append( name )
+
+        elif code == 'D':
+            all_deleted.append( os.fsdecode( next( all_fields ) ) )
+
+        elif code == 'R':
+            old_name = os.fsdecode( next( all_fields ) )
+            name = os.fsdecode( next( all_fields ) )
+            all_renamed.append( (name, old_name) )
+
+        elif code in ('M', 'T', 'U', 'X'):
+            all_modified.append( os.fsdecode( next( all_fields ) ) )
+
+        else:
+            # the id of the next commit
+            if commit_id is not None:
+                yield commit_id, all_added, all_deleted, all_renamed, all_modified
+
+            commit_id = status
+            all_added = []
+            all_deleted = []
+            all_renamed = []
+            all_modified = []
+
+    if commit_id is not None:
+        yield commit_id, all_added, all_deleted, all_renamed, all_modified
+
+    writer.join()
+
+    # raises GitCommandError if git failed
+    proc.wait()
+
+class CommitNodeChangesLru:
+    '''
+    limit the number of commit nodes that hold their file changes
+    the changes of the least recently used nodes are dropped
+    '''
+    def __init__( self, max_nodes ):
+        self.max_nodes = max_nodes
+        self.all_nodes = collections.OrderedDict()
+
+    def clear( self ):
+        self.all_nodes = collections.OrderedDict()
+
+    def touch( self, node ):
+        if node.commitId() in self.all_nodes:
+            self.all_nodes.move_to_end( node.commitId() )
+
+    def add( self, node ):
+        self.all_nodes[ node.commitId() ] = node
+        self.all_nodes.move_to_end( node.commitId() )
+
+        while len(self.all_nodes) > self.max_nodes:
+            commit_id, old_node = self.all_nodes.popitem( last=False )
+            old_node._clearFileChanges()
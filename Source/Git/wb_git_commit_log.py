@@ -0,0 +1,97 @@
+'''
+ ====================================================================
+ Copyright (c) 2018 Barry A Scott.  All rights reserved.
+
+ This software is licensed as described in the file LICENSE.txt,
+ which you should have received as part of this distribution.
+
+ ====================================================================
+
+    wb_git_commit_log.py
+
+    Read the details of commits needed by the log history
+    with one git log process instead of reading each commit
+    object through GitPython.
+
+'''
+import git.exc
+
+import wb_platform_specific
+import wb_git_status_porcelain
+
+# fields are separated by the ASCII unit separator, commits by NUL
+field_separator = '\x1f'
+log_format = field_separator.join( ('%H', '%P', '%an', '%ae', '%ct', '%ci', '%B') )
+num_fields = 7
+
+def iterCommitLog( repo, rev=None, paths='', limit=None, since=None, until=None ):
+    '''
+    yields (commit_id, parent_id, author_name, author_email, commit_time, commit_tz, message)
+    for each commit as it is read from git
+
+    parent_id is None for root commits
+    commit_time is seconds since the epoch and commit_tz is like +0100
+    '''
+    args = ['-z', '--format=%s' % (log_format,)]
+    if limit is not None:
+        args.append( '--max-count=%d' % (limit,) )
+    if since is not None:
+        args.append( '--since=%s' % (since,) )
+    if until is not None:
+        args.append( '--until=%s' % (until,) )
+    if rev is not None:
+        args.append( rev )
+
+    args.append( '--' )
+    if paths not in ('', None):
+        if isinstance( paths, (list, tuple) ):
+            args.extend( str(path) for path in paths )
+
+        else:
+            args.append( str(paths) )
+
+    yield from _iterLogProcess( repo.git.log( *args, as_process=True ) )
+
+def iterCommitLogForCommits( repo, all_commit_ids ):
+    '''
+    yields the same fields as iterCommitLog for each of the commits in all_commit_ids
+    using one git log for as many commits as fit on the command line
+    '''
+    for all_chunk_ids in wb_platform_specific.chunkCommandLinePaths( all_commit_ids ):
+        args = ['-z', '--no-walk=unsorted', '--format=%s' % (log_format,)]
+        args.extend( all_chunk_ids )
+        args.append( '--' )
+
+        yield from _iterLogProcess( repo.git.log( *args, as_process=True ) )
+
+def _iterLogProcess( proc ):
+    try:
+        for record in wb_git_status_porcelain.iterNulFields( proc.stdout ):
+            all_fields = record.decode( 'utf-8', 'replace' ).split( field_separator, num_fields-1 )
+            if len(all_fields) != num_fields:
+                continue
+
+            commit_id, all_parents, author_name, author_email, commit_time, commit_date, message = all_fields
+
+            # commit_date is like 2018-01-01 12:00:00 +0100
+            commit_tz = commit_date.split()[-1]
+
+            all_parents = all_parents.split()
+            parent_id = all_parents[0] if len(all_parents) > 0 else None
+
+            yield (commit_id, parent_id, author_name, author_email, int(commit_time), commit_tz, message)
+
+    except GeneratorExit:
+        # stop git if the log is abandoned before the last commit
+        if proc.poll() is None:
+            proc.kill()
+
+        try:
+            proc.wait()
+
+        except git.exc.GitCommandError:
+            pass
+
+        raise
+
+    proc.wait()
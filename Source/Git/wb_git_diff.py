@@ -0,0 +1,44 @@
+'''
+ ====================================================================
+ Copyright (c) 2018 Barry A Scott.  All rights reserved.
+
+ This software is licensed as described in the file LICENSE.txt,
+ which you should have received as part of this distribution.
+
+ ====================================================================
+
+    wb_git_diff.py
+
+    Read the output of git diff as git produces it so that
+    a large diff can be shown before git has finished.
+
+'''
+import git.exc
+
+read_size = 64*1024
+
+class DiffIncremental:
+    def __init__( self, repo, *all_args ):
+        self.proc = repo.git.diff( *all_args, as_process=True )
+
+    def __iter__( self ):
+        # the bytes of the output in the blocks that git writes
+        while True:
+            data = self.proc.stdout.read1( read_size )
+            if data == b'':
+                break
+
+            yield data
+
+        self.proc.wait()
+
+    def close( self ):
+        # stop git if the diff is abandoned
+        if self.proc.poll() is None:
+            self.proc.kill()
+
+        try:
+            self.proc.wait()
+
+        except git.exc.GitCommandError:
+            pass
@@ -11,10 +11,14 @@
 
 
 '''
+import itertools
+
 from PyQt5 import QtWidgets
 from PyQt5 import QtGui
 from PyQt5 import QtCore
 
+import wb_profile
+import wb_background_thread
 from wb_background_thread import thread_switcher
 
 import wb_tracked_qwidget
@@ -25,6 +29,8 @@ import wb_common_dialogs
 
 import wb_ui_components
 
+import wb_git_commit_changes
+
 def U_( s: str ) -> str:
     return s
 
@@ -47,7 +53,7 @@ class GitLogHistoryWindowComponents(wb_ui_components.WbMainWindowComponents):
 
         # ----------------------------------------
         t = addToolBar( T_('git info') )
-        addTool( t, T_('Diff'), act.tableActionGitDiffLogHistory, act.enablerTableGitDiffLogHistory, 'toolbar_images/diff.png' )
+        addTool( t, T_('Diff'), act.tableActionGitDiffLogHistory_Bg, act.enablerTableGitDiffLogHistory, 'toolbar_images/diff.png' )
         #addTool( t, T_('Annotate'), act.tableActionGitAnnotateLogHistory, act.enablerTableGitAnnotateLogHistory )
         t = addToolBar( T_('git actions') )
         addTool( t, T_('Tag'), self.view.tableActionGitTag, self.view.enablerTableGitTag )
@@ -58,7 +64,7 @@ class GitLogHistoryWindowComponents(wb_ui_components.WbMainWindowComponents):
         super().setupTableContextMenu( m, addMenu )
 
         m.addSection( T_('Diff') )
-        addMenu( m, T_('Diff'), act.tableActionGitDiffLogHistory, act.enablerTableGitDiffLogHistory, 'toolbar_images/diff.png' )
+        addMenu( m, T_('Diff'), act.tableActionGitDiffLogHistory_Bg, act.enablerTableGitDiffLogHistory, 'toolbar_images/diff.png' )
         addMenu( m, T_('Tag'), self.view.tableActionGitTag, self.view.enablerTableGitTag )
         m.addSection( T_('Rebase') )
         addMenu( m, T_('Reword commit message'), self.view.tableActionGitRebaseReword, self.view.enablerTableGitRebaseReword )
@@ -71,7 +77,7 @@ class GitLogHistoryWindowComponents(wb_ui_components.WbMainWindowComponents):
         act = self.ui_actions
 
         m.addSection( T_('Diff') )
-        addMenu( m, T_('Diff'), act.tableActionGitDiffLogHistory, act.enablerTableGitDiffLogHistory, 'toolbar_images/diff.png' )
+        addMenu( m, T_('Diff'), act.tableActionGitDiffLogHistory_Bg, act.enablerTableGitDiffLogHistory, 'toolbar_images/diff.png' )
 
     def getChangedFilesContextMenu( self ):
         return self.changed_files_context_menu
@@ -258,6 +264,13 @@ class WbGitLogHistoryView(wb_main_window.WbMainWindow, wb_tracked_qwidget.WbTrac
         self.ui_component.setTopWindow( self.app.top_window )
         self.ui_component.setMainWindow( self, None )
 
+        # prefetch the file changes of the commits around the visible rows
+        self.prefetch_running = False
+        self.timer_prefetch_file_changes = QtCore.QTimer()
+        self.timer_prefetch_file_changes.timeout.connect( self.prefetchFileChanges )
+        self.timer_prefetch_file_changes.setSingleShot( True )
+        self.log_table.verticalScrollBar().valueChanged.connect( self.schedulePrefetchFileChanges )
+
         # setup the chrome
         self.setupMenuBar( self.menuBar() )
         self.setupToolBar()
@@ -269,6 +282,18 @@ class WbGitLogHistoryView(wb_main_window.WbMainWindow, wb_tracked_qwidget.WbTrac
         # set focus
         self.log_table.setFocus()
 
+    def closeEvent( self, event ):
+        # do not leave git log running for commits that will not be shown
+        self.log_model.closeCommitLog()
+
+        super().closeEvent( event )
+
+    def threadSwitcherSerialKey( self ):
+        if self.git_project is None:
+            return None
+
+        return self.git_project.projectName()
+
     def setupMenuBar( self, mb ):
         self.ui_component.setupMenuBar( mb, self._addMenu )
 
@@ -372,6 +397,7 @@ class WbGitLogHistoryView(wb_main_window.WbMainWindow, wb_tracked_qwidget.WbTrac
         self.ui_component.progress.end()
         self.updateEnableStates()
         self.show()
+        self.schedulePrefetchFileChanges()
 
     def __revFromOptions( self, options ):
         tag = options.getTag()
@@ -530,6 +556,7 @@ class WbGitLogHistoryView(wb_main_window.WbMainWindow, wb_tracked_qwidget.WbTrac
         self.ui_component.progress.end()
         self.updateEnableStates()
         self.show()
+        self.schedulePrefetchFileChanges()
 
     @thread_switcher
     def showCommitLogForFile_Bg( self, git_project, filename, options ):
@@ -549,6 +576,7 @@ class WbGitLogHistoryView(wb_main_window.WbMainWindow, wb_tracked_qwidget.WbTrac
         self.ui_component.progress.end()
         self.updateEnableStates()
         self.show()
+        self.schedulePrefetchFileChanges()
 
     def selectionChangedCommit( self ):
         self.current_commit_selections = [index.row() for index in self.log_table.selectedIndexes() if index.column() == 0]
@@ -567,10 +595,79 @@ class WbGitLogHistoryView(wb_main_window.WbMainWindow, wb_tracked_qwidget.WbTrac
         self.commit_message.clear()
         self.commit_message.insertPlainText( node.commitMessage() )
 
-        self.changes_model.loadChanges( node.commitFileChanges() )
+        if node.hasFileChanges():
+            self.log_model.touchCommitNode( node )
+            self.changes_model.loadChanges( node.commitFileChanges() )
+
+        else:
+            # show the changes when they have been calculated
+            self.changes_model.loadChanges( [] )
+            self.app.wrapWithThreadSwitcher( self.loadFileChanges_Bg, 'selectionChangedCommit',
+                    wb_background_thread.PRIORITY_INTERACTIVE, self.threadSwitcherSerialKey )( [node] )
 
         self.updateEnableStates()
 
+    @thread_switcher
+    def loadFileChanges_Bg( self, all_nodes ):
+        git_project = self.git_project
+
+        yield self.app.switchToBackground
+
+        git_project.cmdCommitFileChanges( all_nodes )
+
+        yield self.app.switchToForeground
+
+        for node in all_nodes:
+            self.log_model.addCommitNodeWithChanges( node )
+
+        if len(self.current_commit_selections) > 0:
+            node = self.log_model.commitNode( self.current_commit_selections[0] )
+            if node in all_nodes:
+                self.changes_model.loadChanges( node.commitFileChanges() )
+                self.updateEnableStates()
+
+    # number of rows either side of the visible rows to prefetch
+    prefetch_margin_rows = 50
+
+    def schedulePrefetchFileChanges( self ):
+        self.timer_prefetch_file_changes.start( 200 )
+
+    def prefetchFileChanges( self ):
+        if self.git_project is None or self.log_model.rowCount( None ) == 0:
+            return
+
+        if self.prefetch_running:
+            self.schedulePrefetchFileChanges()
+            return
+
+        first_row = self.log_table.rowAt( 0 )
+        last_row = self.log_table.rowAt( self.log_table.viewport().height() - 1 )
+        if last_row < 0:
+            last_row = self.log_model.rowCount( None ) - 1
+
+        first_row = max( 0, first_row - self.prefetch_margin_rows )
+        last_row = min( self.log_model.rowCount( None ) - 1, last_row + self.prefetch_margin_rows )
+
+        all_nodes = [self.log_model.commitNode( row ) for row in range( first_row, last_row+1 )]
+        all_nodes = [node for node in all_nodes if not node.hasFileChanges()]
+        if len(all_nodes) == 0:
+            return
+
+        self.debugLog( 'prefetchFileChanges() rows %d to %d - %d nodes' % (first_row, last_row, len(all_nodes)) )
+        # a newer prefetch replaces one that has not finished
+        self.app.wrapWithThreadSwitcher( self.prefetchFileChanges_Bg, 'prefetchFileChanges',
+                wb_background_thread.PRIORITY_REFRESH, self.threadSwitcherSerialKey,
+                cancel_key=('prefetchFileChanges', id(self)) )( all_nodes )
+
+    @thread_switcher
+    def prefetchFileChanges_Bg( self, all_nodes ):
+        self.prefetch_running = True
+        try:
+            yield from self.loadFileChanges_Bg( all_nodes )
+
+        finally:
+            self.prefetch_running = False
+
     def selectionChangedFile( self ):
         self.current_file_selection = [index.row() for index in self.changes_table.selectedIndexes() if index.column() == 0]
         self.updateEnableStates()
@@ -607,6 +704,7 @@ class WbLogTableView(wb_table_view.WbTableView):
         self.main_window.ui_component.getTableContextMenu().exec_( global_pos )
 
 
+@wb_profile.profileModelResets
 class WbGitLogHistoryModel(QtCore.QAbstractTableModel):
     col_author = 0
     col_date = 1
@@ -616,6 +714,12 @@ class WbGitLogHistoryModel(QtCore.QAbstractTableModel):
 
     column_titles = (U_('Author'), U_('Date'), U_('Tag'), U_('Message'), U_('Commit ID'))
 
+    # the number of commits that hold on to their file changes
+    max_commits_with_changes = 1000
+
+    # the number of commits read from git each time more rows are needed
+    fetch_chunk_size = 200
+
     def __init__( self, app ):
         self.app = app
 
@@ -624,8 +728,15 @@ class WbGitLogHistoryModel(QtCore.QAbstractTableModel):
         super().__init__()
 
         self.all_commit_nodes  = []
+        # serialises the background work on the project
+        self.serial_key = None
+        # commits not read yet - None when all have been read
+        self.commit_log_iter = None
+        self.commit_log_generation = 0
+        self.fetch_in_progress = False
         self.all_tags_by_id = {}
         self.all_unpushed_commit_ids = set()
+        self.changes_lru = wb_git_commit_changes.CommitNodeChangesLru( self.max_commits_with_changes )
 
         if app.isDarkMode():
             self.__brush_is_tag = QtGui.QBrush( QtGui.QColor( 128, 128, 255 ) )
@@ -636,18 +747,84 @@ class WbGitLogHistoryModel(QtCore.QAbstractTableModel):
 
     def loadCommitLogForRepository( self, progress_callback, git_project, limit, since, until, rev=None, path='' ):
         self.beginResetModel()
-        self.all_commit_nodes = git_project.cmdCommitLogForRepository( progress_callback, limit, since, until, rev, path )
+        self.changes_lru.clear()
+        self.serial_key = git_project.projectName()
+        self.__startCommitLog( git_project.cmdCommitLogIterForRepository( limit, since, until, rev, path ) )
         self.all_tags_by_id = git_project.cmdTagsForRepository()
         self.all_unpushed_commit_ids = set( [commit.hexsha for commit in git_project.getUnpushedCommits()] )
         self.endResetModel()
 
     def loadCommitLogForFile( self, progress_callback, git_project, filename, limit, since, until, rev=None ):
         self.beginResetModel()
-        self.all_commit_nodes = git_project.cmdCommitLogForFile( progress_callback, filename, limit, since, until, rev=rev )
+        self.changes_lru.clear()
+        self.serial_key = git_project.projectName()
+        self.__startCommitLog( git_project.cmdCommitLogIterForFile( filename, limit, since, until, rev=rev ) )
         self.all_tags_by_id = git_project.cmdTagsForRepository()
         self.all_unpushed_commit_ids = set( git_project.getUnpushedCommits() )
         self.endResetModel()
 
+    def __startCommitLog( self, commit_log_iter ):
+        # only the first chunk is read, more is read as the view scrolls
+        self.closeCommitLog()
+        self.commit_log_iter = commit_log_iter
+
+        self.all_commit_nodes = list( itertools.islice( commit_log_iter, self.fetch_chunk_size ) )
+        if len(self.all_commit_nodes) < self.fetch_chunk_size:
+            self.commit_log_iter = None
+
+    def closeCommitLog( self ):
+        # stop the git log process of the commits not read yet.
+        # A running fetchMore_Bg closes the iterator it is reading
+        if self.commit_log_iter is not None and not self.fetch_in_progress:
+            self.commit_log_iter.close()
+
+        self.commit_log_generation += 1
+        self.commit_log_iter = None
+        self.fetch_in_progress = False
+
+    def canFetchMore( self, parent ):
+        return self.commit_log_iter is not None and not self.fetch_in_progress
+
+    def fetchMore( self, parent ):
+        self.fetch_in_progress = True
+        self.app.wrapWithThreadSwitcher( self.fetchMore_Bg, 'fetchMore',
+                wb_background_thread.PRIORITY_INTERACTIVE, self.serial_key )()
+
+    @thread_switcher
+    def fetchMore_Bg( self ):
+        generation = self.commit_log_generation
+        commit_log_iter = self.commit_log_iter
+
+        yield self.app.switchToBackground
+
+        all_new_nodes = list( itertools.islice( commit_log_iter, self.fetch_chunk_size ) )
+
+        yield self.app.switchToForeground
+
+        # ignore the commits if the log has been reloaded or closed
+        if generation != self.commit_log_generation:
+            commit_log_iter.close()
+            return
+
+        self.fetch_in_progress = False
+        if len(all_new_nodes) < self.fetch_chunk_size:
+            self.commit_log_iter = None
+
+        if len(all_new_nodes) == 0:
+            return
+
+        self.debugLog( 'fetchMore_Bg() %d more commits' % (len(all_new_nodes),) )
+        first_row = len(self.all_commit_nodes)
+        self.beginInsertRows( QtCore.QModelIndex(), first_row, first_row + len(all_new_nodes) - 1 )
+        self.all_commit_nodes.extend( all_new_nodes )
+        self.endInsertRows()
+
+    def addCommitNodeWithChanges( self, node ):
+        self.changes_lru.add( node )
+
+    def touchCommitNode( self, node ):
+        self.changes_lru.touch( node )
+
     def updateTags( self, git_project ):
         self.beginResetModel()
         self.all_tags_by_id = git_project.cmdTagsForRepository()
@@ -758,6 +935,7 @@ class WbChangesTableView(wb_table_view.WbTableView):
 
         self.main_window.ui_component.getChangedFilesContextMenu().exec_( global_pos )
 
+@wb_profile.profileModelResets
 class WbGitChangedFilesModel(QtCore.QAbstractTableModel):
     col_action = 0
     col_path = 1
@@ -21,15 +21,19 @@ from xml_preferences import SchemeNode, PreferencesNode
 
 import wb_pick_path_dialogs
 import wb_dialog_bases
+import wb_preferences
+
+Bool = wb_preferences.Bool
 
 class GitPreferences(PreferencesNode):
-    xml_attribute_info = (('program', pathlib.Path),)
+    xml_attribute_info = (('program', pathlib.Path), ('status_porcelain', Bool))
 
     def __init__( self, program=None ):
         super().__init__()
 
         assert program is None or isinstance( program, str )
         self.program = program
+        self.status_porcelain = False
 
 def setupPreferences( scheme_nodes ):
     (scheme_nodes
@@ -59,6 +63,10 @@ class GitPreferencesTab(wb_dialog_bases.WbTabBase):
 
         self.addRow( T_('Git Program'), self.git_program, self.browse_program )
 
+        self.status_porcelain = QtWidgets.QCheckBox( T_('Use git status --porcelain=v2 to find the status of files') )
+        self.status_porcelain.setChecked( self.prefs.status_porcelain )
+        self.addRow( T_('Status'), self.status_porcelain )
+
     def savePreferences( self ):
         path = self.git_program.text()
         if path == '':
@@ -67,6 +75,8 @@ class GitPreferencesTab(wb_dialog_bases.WbTabBase):
         else:
             self.prefs.program = pathlib.Path( self.git_program.text() )
 
+        self.prefs.status_porcelain = self.status_porcelain.isChecked()
+
     def __pickProgram( self ):
         program = wb_pick_path_dialogs.pickExecutable( self, pathlib.Path( self.git_program.text() ) )
         if program is not None:
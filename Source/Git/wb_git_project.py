@@ -13,10 +13,20 @@
 import sys
 import os
 import pathlib
+import datetime
 
+import wb_profile
+import wb_read_file
 import wb_annotate_node
 import wb_platform_specific
 import wb_git_callback_server
+import wb_git_status_engine
+import wb_git_status_porcelain
+import wb_git_commit_changes
+import wb_git_commit_log
+import wb_git_blame
+import wb_git_cat_file
+import wb_git_diff
 
 import git
 import git.exc
@@ -36,6 +46,14 @@ def gitInit( app, progress_handler, wc_path ):
             app.log.error( line )
         return False
 
+def textLinesFromBytes( data, errors='strict' ):
+    all_lines = data.decode( 'utf-8', errors ).split( '\n' )
+    if all_lines[-1] == '':
+        return all_lines[:-1]
+
+    else:
+        return all_lines
+
 __callback_server = None
 git_extra_environ = {}
 def initCallbackServer( app ):
@@ -82,6 +100,7 @@ def setCallbackRebaseEditorHandler( handler ):
 def setCallbackReply( code, value ):
     __callback_server.setReply( code, value )
 
+@wb_profile.profileMethods( 'cmd', 'updateState' )
 class GitProject:
     def __init__( self, app, prefs_project, ui_components ):
         self.app = app
@@ -93,13 +112,21 @@ class GitProject:
         self.prefs_project = prefs_project
         # repo will be setup on demand - this speeds up start up especically on macOS
         self.__repo = None
-        self.index = None
+        # git cat-file processes that read file contents, started on demand
+        self.__cat_file = None
 
         self.tree = GitProjectTreeNode( self, prefs_project.name, pathlib.Path( '.' ) )
         self.flat_tree = GitProjectTreeNode( self, prefs_project.name, pathlib.Path( '.' ) )
 
         self.all_file_state = {}
 
+        # remembers the state of the working tree between calls to updateState
+        if self.app.prefs.git.status_porcelain:
+            self.__status_engine = wb_git_status_porcelain.WbGitPorcelainStatus( self )
+
+        else:
+            self.__status_engine = wb_git_status_engine.WbGitIncrementalStatus( self )
+
         self.__stale_index = False
 
         self.__num_staged_files = 0
@@ -140,6 +167,12 @@ class GitProject:
 
         return self.__repo
 
+    def catFile( self ):
+        if self.__cat_file is None:
+            self.__cat_file = wb_git_cat_file.WbGitCatFile( self.repo() )
+
+        return self.__cat_file
+
     def scmType( self ):
         return 'git'
 
@@ -249,106 +282,125 @@ class GitProject:
             self.updateState( 'QQQ' )
             self.__stale_index = False
 
+    @property
+    def index( self ):
+        return self.__status_engine.index
+
+    def usesDirtyPaths( self ):
+        # the status engine only checks the paths that changed
+        return True
+
+    def noteDirtyPaths( self, all_dirty_paths ):
+        # None when the paths that changed are not known
+        self.__status_engine.noteDirtyPaths( all_dirty_paths )
+
+    def close( self ):
+        # stop the git cat-file processes kept for this project
+        if self.__cat_file is not None:
+            self.__cat_file.close()
+            self.__cat_file = None
+
     def updateState( self, tree_leaf ):
         self.debugLog( 'updateState( %r ) repo=%s' % (tree_leaf, self.projectPath()) )
 
-        # rebuild the tree
-        self.tree = GitProjectTreeNode( self, self.prefs_project.name, pathlib.Path( '.' ) )
-        self.flat_tree = GitProjectTreeNode( self, self.prefs_project.name, pathlib.Path( '.' ) )
-
         if not self.projectPath().exists():
             self.app.log.error( T_('Project %(name)s folder %(folder)s has been deleted') %
                             {'name': self.projectName()
                             ,'folder': self.projectPath()} )
 
+            self.__status_engine.reset()
             self.all_file_state = {}
 
+            # rebuild the tree
+            self.tree = GitProjectTreeNode( self, self.prefs_project.name, pathlib.Path( '.' ) )
+            self.flat_tree = GitProjectTreeNode( self, self.prefs_project.name, pathlib.Path( '.' ) )
+
         else:
             self.__calculateStatus()
 
-        for path in self.all_file_state:
-            self.__updateTree( path )
-
         self.dumpTree()
 
     def __calculateStatus( self ):
-        self.all_file_state = {}
+        # only the paths that the status engine reports as changed
+        # need new WbGitFileState objects and tree updates
+        full_rebuild, all_changed_paths = self.__status_engine.update()
 
-        repo_root = self.projectPath()
+        engine = self.__status_engine
+        self.__num_staged_files = engine.numStagedFiles()
+        self.__num_modified_files = engine.numModifiedFiles()
 
-        git_dir = repo_root / '.git'
+        all_old_file_state = self.all_file_state
 
-        all_folders = set( [repo_root] )
-        while len(all_folders) > 0:
-            folder = all_folders.pop()
+        if full_rebuild:
+            all_file_state = {}
+            for path in engine.allKnownPaths():
+                if( path in all_old_file_state
+                and path not in all_changed_paths
+                and not self.__fileStateDependsOnIndex( path ) ):
+                    # still correct - reuse it
+                    all_file_state[ path ] = all_old_file_state[ path ]
 
-            for filename in folder.iterdir():
-                abs_path = folder / filename
+                else:
+                    all_file_state[ path ] = self.__newFileState( path )
 
-                repo_relative = abs_path.relative_to( repo_root )
+            all_added = set( all_file_state ).difference( all_old_file_state )
+            all_removed = set( all_old_file_state ).difference( all_file_state )
 
-                if abs_path.is_dir():
-                    if abs_path != git_dir:
-                        all_folders.add( abs_path )
+        else:
+            all_file_state = dict( all_old_file_state )
+            all_added = set()
+            all_removed = set()
 
-                        self.all_file_state[ repo_relative ] = WbGitFileState( self, repo_relative )
-                        self.all_file_state[ repo_relative ].setIsDir()
+            for path in all_changed_paths:
+                if engine.hasPath( path ):
+                    if path not in all_file_state:
+                        all_added.add( path )
 
-                else:
-                    self.all_file_state[ repo_relative ] = WbGitFileState( self, repo_relative )
+                    all_file_state[ path ] = self.__newFileState( path )
 
-        # ----------------------------------------
-        # can only get info from the index if there is at least 1 commit
-        self.index = git.index.IndexFile( self.repo() )
+                elif path in all_file_state:
+                    del all_file_state[ path ]
+                    all_removed.add( path )
 
-        if self.hasCommits():
-            head_vs_index = self.index.diff( self.repo().head.commit )
-            index_vs_working = self.index.diff( None )
+        self.debugLog( '__calculateStatus full_rebuild %r changed %d added %d removed %d' %
+                        (full_rebuild, len(all_changed_paths), len(all_added), len(all_removed)) )
 
-        else:
-            head_vs_index = []
-            index_vs_working = []
+        self.all_file_state = all_file_state
 
-        # each ref to self.repo().untracked_files creates a new object
-        # cache the value once/update
-        untracked_files = self.repo().untracked_files
+        # patch the trees in place
+        for path in all_removed:
+            self.__removeFromTree( path )
 
-        for entry in self.index.entries.values():
-            filepath = pathlib.Path( entry.path )
-            if filepath not in self.all_file_state:
-                # filepath has been deleted
-                self.all_file_state[ filepath ] = WbGitFileState( self, filepath )
+        for path in all_added:
+            self.__updateTree( path )
 
-            self.all_file_state[ filepath ].setIndexEntry( entry )
+    def __fileStateDependsOnIndex( self, path ):
+        engine = self.__status_engine
+        return (path in engine.all_index_entries
+            or path in engine.all_staged_paths
+            or path in engine.all_unstaged_diffs)
 
-        self.__num_staged_files = 0
-        for diff in head_vs_index:
-            self.__num_staged_files += 1
-            filepath = pathlib.Path( diff.b_path )
+    def __newFileState( self, path ):
+        engine = self.__status_engine
 
-            if filepath not in self.all_file_state:
-                self.all_file_state[ filepath ] = WbGitFileState( self, filepath )
+        file_state = WbGitFileState( self, path )
+        if engine.all_paths.get( path, False ):
+            file_state.setIsDir()
 
-            if diff.renamed:
-                self.all_file_state[ pathlib.Path( diff.rename_from ) ]._addStaged( diff )
+        if path in engine.all_index_entries:
+            file_state.setIndexEntry( engine.all_index_entries[ path ] )
 
-            else:
-                self.all_file_state[ filepath ]._addStaged( diff )
+        diff = engine.all_staged_paths.get( path )
+        if diff is not None and (not diff.renamed or path == pathlib.Path( diff.rename_from )):
+            file_state._addStaged( diff )
 
-        self.__num_modified_files = 0
-        for diff in index_vs_working:
-            self.__num_modified_files += 1
-            filepath = pathlib.Path( diff.a_path )
-            if filepath not in self.all_file_state:
-                self.all_file_state[ filepath ] = WbGitFileState( self, filepath )
-            self.all_file_state[ filepath ]._addUnstaged( diff )
+        if path in engine.all_unstaged_diffs:
+            file_state._addUnstaged( engine.all_unstaged_diffs[ path ] )
 
-        for path in untracked_files:
-            filepath = pathlib.Path( path )
-            if filepath not in self.all_file_state:
-                self.all_file_state[ filepath ] = WbGitFileState( self, filepath )
+        if path in engine.all_untracked:
+            file_state._setUntracked()
 
-            self.all_file_state[ filepath ]._setUntracked()
+        return file_state
 
     def __updateTree( self, path ):
         assert isinstance( path, pathlib.Path ), 'path %r' % (path,)
@@ -369,6 +421,26 @@ class GitProject:
         node.addFileByName( path )
         self.flat_tree.addFileByPath( path )
 
+    def __removeFromTree( self, path ):
+        self.debugLogTree( '__removeFromTree path %r' % (path,) )
+
+        all_nodes = [self.tree]
+        for name in path.parts[0:-1]:
+            if not all_nodes[-1].hasFolder( name ):
+                break
+
+            all_nodes.append( all_nodes[-1].getFolder( name ) )
+
+        else:
+            all_nodes[-1].removeFileByName( path.name )
+
+        # remove the folders that no longer have anything in them
+        while len(all_nodes) > 1 and all_nodes[-1].isEmpty():
+            node = all_nodes.pop()
+            all_nodes[-1].removeFolder( node.name )
+
+        self.flat_tree.removeFileByPath( path )
+
     def dumpTree( self ):
         if self.debugLogTree.isEnabled():
             self.tree._dumpTree( 0 )
@@ -509,6 +581,86 @@ class GitProject:
         (self.prefs_project.path / filename).unlink()
         self.__stale_index = True
 
+    #
+    #   The cmd*Files functions act on many files with one git
+    #   command for as many paths as fit on the command line
+    #
+    def cmdStageFiles( self, all_filenames ):
+        self.debugLog( 'cmdStageFiles( %d files )' % (len(all_filenames),) )
+
+        for all_paths in wb_platform_specific.chunkCommandLinePaths( all_filenames ):
+            self.__runGitForPaths( self.repo().git.add, '--', *all_paths )
+
+        self.__stale_index = True
+
+    def cmdUnstageFiles( self, rev, all_filenames ):
+        self.debugLog( 'cmdUnstageFiles( %r, %d files )' % (rev, len(all_filenames)) )
+
+        for all_paths in wb_platform_specific.chunkCommandLinePaths( all_filenames ):
+            self.__runGitForPaths( self.repo().git.reset, rev, '--', *all_paths )
+
+        self.__stale_index = True
+
+    def cmdRevertFiles( self, rev, all_file_states ):
+        self.debugLog( 'cmdRevertFiles( %r, %d files )' % (rev, len(all_file_states)) )
+
+        all_reset_paths = []
+        all_checkout_paths = []
+
+        for file_state in all_file_states:
+            if rev == '--':
+                # revert the working file to the staged version
+                all_checkout_paths.append( file_state.relativePath() )
+
+            elif file_state.isStagedRenamed():
+                # renames need both names reverting in the right order
+                self.cmdRevert( rev, file_state )
+
+            elif( file_state.isStagedNew()
+            or file_state.isStagedModified() ):
+                all_reset_paths.append( file_state.relativePath() )
+
+            else:
+                all_checkout_paths.append( file_state.relativePath() )
+
+        for all_paths in wb_platform_specific.chunkCommandLinePaths( all_reset_paths ):
+            self.__runGitForPaths( self.repo().git.reset, rev, '--', *all_paths )
+
+        if rev == '--':
+            checkout_args = ('--',)
+
+        else:
+            checkout_args = (rev, '--')
+
+        for all_paths in wb_platform_specific.chunkCommandLinePaths( all_checkout_paths ):
+            self.__runGitForPaths( self.repo().git.checkout, *(checkout_args + tuple( all_paths )) )
+
+        self.__stale_index = True
+
+    def cmdDeleteFiles( self, all_filenames ):
+        self.debugLog( 'cmdDeleteFiles( %d files )' % (len(all_filenames),) )
+
+        for filename in all_filenames:
+            try:
+                (self.prefs_project.path / filename).unlink()
+
+            except OSError as e:
+                self.app.log.error( 'Error deleting %s' % (filename,) )
+                self.app.log.error( str(e) )
+
+        self.__stale_index = True
+
+    def __runGitForPaths( self, git_cmd, *args ):
+        try:
+            git_cmd( *args )
+
+        except GitCommandError as e:
+            if e.stderr is not None and "'" in e.stderr:
+                # stderr unfortuently is prefixed with "\n  stderr: '"
+                self.app.log.error( e.stderr.split( "'", 1 )[1][:-1] )
+            else:
+                self.app.log.error( str(e) )
+
     def cmdRename( self, filename, new_filename ):
         filestate = self.getFileState( filename )
         if filestate.isControlled():
@@ -610,6 +762,19 @@ class GitProject:
         else:
             return self.repo().git.diff( self.pathForGit( folder ), staged=False )
 
+    def cmdDiffFolderIncremental( self, folder, head, staged ):
+        # iterate over the output of the diff as git produces it
+        all_args = []
+        if staged:
+            all_args.append( '--staged' )
+
+        if head:
+            all_args.append( 'HEAD' )
+
+        all_args.append( self.pathForGit( folder ) )
+
+        return wb_git_diff.DiffIncremental( self.repo(), *all_args )
+
     def cmdDiffWorkingVsCommit( self, filename, commit ):
         return self.repo().git.diff( commit, self.pathForGit( filename ), staged=False )
 
@@ -619,20 +784,38 @@ class GitProject:
     def cmdDiffCommitVsCommit( self, filename, old_commit, new_commit ):
         return self.repo().git.diff( old_commit, new_commit, '--', self.pathForGit( filename ) )
 
+    # iterate over the lines of the diff as git finds them
+    def cmdDiffWorkingVsCommitIncremental( self, filename, commit ):
+        return wb_git_diff.DiffIncremental( self.repo(), commit, self.pathForGit( filename ) )
+
+    def cmdDiffCommitVsCommitIncremental( self, filename, old_commit, new_commit ):
+        return wb_git_diff.DiffIncremental( self.repo(), old_commit, new_commit, '--', self.pathForGit( filename ) )
+
     def cmdShow( self, what ):
         return self.repo().git.show( what )
 
     def getTextLinesForCommit( self, filepath, commit_id ):
+        return self.getTextLinesForCommits( filepath, [commit_id] )[0]
+
+    def getTextLinesForCommits( self, filepath, all_commit_ids ):
+        # read the file as it is in each commit with one request to git
         assert isinstance( filepath, pathlib.Path ), 'expecting pathlib.Path got %r' % (filepath,)
 
-        # git show wants a posix path, it does not work with '\' path seperators
+        # git wants a posix path, it does not work with '\' path seperators
         git_filepath = pathlib.PurePosixPath( filepath )
-        text = self.cmdShow( '%s:%s' % (commit_id, git_filepath) )
-        all_lines = text.split('\n')
-        if all_lines[-1] == '':
-            return all_lines[:-1]
-        else:
-            return all_lines
+        all_contents = self.catFile().readObjects( ['%s:%s' % (commit_id, git_filepath) for commit_id in all_commit_ids] )
+        return [textLinesFromBytes( contents, 'surrogateescape' ) for contents in all_contents]
+
+    def getBlobIdsForCommits( self, filepath, all_commit_ids ):
+        # the ids of the file in each commit without reading its contents
+        assert isinstance( filepath, pathlib.Path ), 'expecting pathlib.Path got %r' % (filepath,)
+
+        git_filepath = pathlib.PurePosixPath( filepath )
+        return self.catFile().objectIds( ['%s:%s' % (commit_id, git_filepath) for commit_id in all_commit_ids] )
+
+    def getTextLinesForBlobs( self, all_blobs ):
+        all_contents = self.catFile().readObjects( [blob.hexsha for blob in all_blobs] )
+        return [textLinesFromBytes( contents ) for contents in all_contents]
 
     def cmdCommit( self, message ):
         self.__stale_index = True
@@ -652,22 +835,24 @@ class GitProject:
 
         return all_commit_logs
 
-    def cmdCommitLogForRepository( self, progress_callback, limit=None, since=None, until=None, rev=None, paths='' ):
+    def cmdCommitLogIterForRepository( self, limit=None, since=None, until=None, rev=None, paths='' ):
+        # the commits are read from git as the caller iterates
         if not self.hasCommits():
-            return []
+            return iter( [] )
 
-        all_commit_logs = []
+        repo = self.repo()
+        return (GitCommitLogNode.fromLogFields( repo, *fields )
+                    for fields in wb_git_commit_log.iterCommitLog( repo, rev, paths, limit, since, until ))
 
-        kwds = {}
-        if limit is not None:
-            kwds['max_count'] = limit
-        if since is not None:
-            kwds['since'] = since
-        if since is not None:
-            kwds['until'] = until
+    def cmdCommitLogIterForFile( self, filename, limit=None, since=None, until=None, rev=None ):
+        return self.cmdCommitLogIterForRepository( paths=filename, limit=limit, since=since, until=until, rev=rev )
 
-        for commit in self.repo().iter_commits( rev, paths, **kwds ):
-            all_commit_logs.append( GitCommitLogNode( commit ) )
+    def cmdCommitLogForRepository( self, progress_callback, limit=None, since=None, until=None, rev=None, paths='', lazy_changes=False ):
+        all_commit_logs = list( self.cmdCommitLogIterForRepository( limit, since, until, rev, paths ) )
+
+        if lazy_changes:
+            # the caller uses cmdCommitFileChanges when the changes are needed
+            return all_commit_logs
 
         total = len(all_commit_logs)
         progress_callback( 0, total )
@@ -677,8 +862,13 @@ class GitProject:
 
         return all_commit_logs
 
-    def cmdCommitLogForFile( self, progress_callback, filename, limit=None, since=None, until=None, rev=None ):
-        return self.cmdCommitLogForRepository( progress_callback, paths=filename, limit=limit, since=since, until=until, rev=rev )
+    def cmdCommitLogForFile( self, progress_callback, filename, limit=None, since=None, until=None, rev=None, lazy_changes=False ):
+        return self.cmdCommitLogForRepository( progress_callback, paths=filename, limit=limit, since=since, until=until, rev=rev, lazy_changes=lazy_changes )
+
+    def cmdCommitFileChanges( self, all_commit_logs ):
+        # add the file changes to the nodes that do not have them yet
+        all_commit_logs = [node for node in all_commit_logs if not node.hasFileChanges()]
+        self.__addCommitChangeInformation( lambda count, total: None, all_commit_logs )
 
     def cmdTagsForRepository( self ):
         tag_name_by_id = {}
@@ -690,95 +880,95 @@ class GitProject:
     def doesTagExist( self, tag_name ):
         return tag_name in self.repo().tags
 
+    @wb_profile.profileFunction( 'project' )
     def __addCommitChangeInformation( self, progress_callback, all_commit_logs ):
         # now calculate what was added, deleted and modified in each commit
         total = len(all_commit_logs)
-        for offset in range( total ):
-            progress_callback( offset, total )
-            new_tree = all_commit_logs[ offset ].commitTree()
-            old_tree = all_commit_logs[ offset ].commitPreviousTree()
 
-            all_new = {}
-            self.__treeToDict( new_tree, all_new )
-            new_set = set(all_new)
+        # commits never change - use the changes from previous runs
+        cache = self.app.commit_changes_cache
+        all_cached_changes = cache.getMany( 'git', '', [node.commitId() for node in all_commit_logs] )
 
-            if old_tree is None:
-                all_commit_logs[ offset ]._addChanges( new_set, set(), [], set() )
+        all_uncached_logs = []
+        for node in all_commit_logs:
+            if node.commitId() in all_cached_changes:
+                node._setFileChanges( [tuple( change ) for change in all_cached_changes[ node.commitId() ]] )
 
             else:
-                all_old = {}
-                self.__treeToDict( old_tree, all_old )
+                all_uncached_logs.append( node )
 
-                old_set = set(all_old)
+        self.debugLog( '__addCommitChangeInformation %d commits %d cached' % (total, len(all_cached_changes)) )
 
-                all_added = new_set - old_set
-                all_deleted = old_set - new_set
+        all_commit_pairs = [(node.commitId(), node.commitParentId()) for node in all_uncached_logs]
+        all_changes = wb_git_commit_changes.iterCommitChanges( self.repo(), all_commit_pairs )
 
-                all_renamed = []
+        all_new_changes = {}
+        for offset, (commit_id, all_added, all_deleted, all_renamed, all_modified) in enumerate( all_changes ):
+            progress_callback( len(all_cached_changes) + offset, total )
 
-                # look for renames
-                if len(all_added) > 0 and len(all_deleted) > 0:
-                    all_old_id_to_name = {}
-                    for name in all_deleted:
-                        all_old_id_to_name[ all_old[ name ] ] = name
+            node = all_uncached_logs[ offset ]
+            assert commit_id == node.commitId(), 'diff-tree out of step %s vs. %s' % (commit_id, node.commitId())
+            node._addChanges( all_added, all_deleted, all_renamed, all_modified )
 
-                    for name in list(all_added):
-                        id_ = all_new[ name ]
+            all_new_changes[ commit_id ] = node.commitFileChanges()
 
-                        if id_ in all_old_id_to_name:
-                            old_name = all_old_id_to_name[ id_ ]
+        cache.putMany( 'git', '', all_new_changes )
 
-                            # converted svn repos can have trees that cannot
-                            # be used to figure out the rename
-                            # for example when the checkin deletes a folder
-                            # which cannot be expressed in git trees
-                            if( old_name in all_added
-                            and old_name in all_deleted ):
-                                all_added.remove( name )
-                                all_deleted.remove( old_name )
-                                all_renamed.append( (name, old_name) )
+    def annotateRevisionKey( self, filename, rev=None ):
+        # the annotation only changes when a commit changes the file
+        if rev is None:
+            rev = 'HEAD'
 
-                all_modified = set()
+        try:
+            commit_id = self.repo().git.log( '-1', '--format=%H', rev, '--', self.pathForGit( filename ) )
 
-                for key in all_new:
-                    if( key in all_old
-                    and all_new[ key ] != all_old[ key ] ):
-                        all_modified.add( key )
+        except GitCommandError:
+            return None
 
-                all_commit_logs[ offset ]._addChanges( all_added, all_deleted, all_renamed, all_modified )
+        if commit_id == '':
+            return None
 
-    def __treeToDict( self, tree, all_entries ):
-        for blob in tree:
-            if blob.type == 'blob':
-                all_entries[ blob.path ] = blob.hexsha
+        return commit_id
 
-        for child in tree.trees:
-            self.__treeToDict( child, all_entries )
+    def cmdAnnotationLinesForFile( self, filename, rev=None ):
+        # the lines of the file to annotate with no log_id yet
+        if rev is None:
+            rev = 'HEAD'
+
+        return [wb_annotate_node.AnnotateNode( line_num, line_text, None )
+                for line_num, line_text in enumerate( self.getTextLinesForCommit( filename, rev ), 1 )]
 
-    def cmdAnnotationForFile( self, filename, rev=None ):
+    def cmdAnnotationGroupsForFile( self, filename, rev=None ):
+        # iterate to get the BlameGroups as git finds them
         if rev is None:
             rev = 'HEAD'
 
-        all_annotate_nodes = []
+        return wb_git_blame.BlameIncremental( self.repo(), rev, self.pathForGit( filename ) )
 
-        line_num = 0
-        for commit, all_lines in self.repo().blame( rev, self.pathForGit( filename ) ):
-            commit_id = commit.hexsha
-            for line_text in all_lines:
-                line_num += 1
-                all_annotate_nodes.append(
-                    wb_annotate_node.AnnotateNode( line_num, line_text, commit_id ) )
+    def commitLogNodeForBlameGroup( self, group ):
+        # group must be the first group for its commit that has the headers
+        all_headers = group.all_headers
 
-        return all_annotate_nodes
+        all_previous = all_headers.get( 'previous', '' ).split( ' ' )
+        parent_id = all_previous[0] if all_previous[0] != '' else None
 
-    def cmdCommitLogForAnnotateFile( self, filename, all_commit_ids ):
-        all_commit_logs = {}
+        return GitCommitLogNode.fromLogFields(
+                    self.repo(),
+                    group.commit_id,
+                    parent_id,
+                    all_headers.get( 'author', '' ),
+                    all_headers.get( 'author-mail', '' ).strip( '<>' ),
+                    int( all_headers.get( 'committer-time', '0' ) ),
+                    all_headers.get( 'committer-tz', '+0000' ),
+                    all_headers.get( 'summary', '' ) )
 
-        for commit_id in all_commit_ids:
-            commit = self.repo().commit( commit_id )
-            all_commit_logs[ commit_id ] = GitCommitLogNode( commit )
+    def cmdUpdateCommitLogMessages( self, all_commit_log_nodes ):
+        # blame only reports the first line of the message
+        # read all the full messages with one git log
+        all_nodes_by_id = dict( (node.commitId(), node) for node in all_commit_log_nodes )
 
-        return all_commit_logs
+        for fields in wb_git_commit_log.iterCommitLogForCommits( self.repo(), list( all_nodes_by_id.keys() ) ):
+            all_nodes_by_id[ fields[0] ]._setMessage( fields[-1] )
 
     def cmdPull( self, progress_callback, info_callback ):
         tracking_branch = self.repo().head.ref.tracking_branch()
@@ -904,6 +1094,37 @@ class WbGitStashInfo:
 
 
 class WbGitFileState:
+    # there is one WbGitFileState for each file in the working copy
+    # so keep them small: the status is held as bits in __flags
+    __slots__ = ('__project', '__filepath', '__flags', '__staged_diff', '__unstaged_diff')
+
+    FLAG_IS_DIR =               0x0001
+    FLAG_UNTRACKED =            0x0002
+    FLAG_STATE_CALCULATED =     0x0004
+    FLAG_IN_INDEX =             0x0008
+
+    FLAG_STAGED_NEW =           0x0010
+    FLAG_STAGED_MODIFIED =      0x0020
+    FLAG_STAGED_DELETED =       0x0040
+    FLAG_STAGED_RENAMED =       0x0080
+
+    FLAG_UNSTAGED_NEW =         0x0100
+    FLAG_UNSTAGED_MODIFIED =    0x0200
+    FLAG_UNSTAGED_DELETED =     0x0400
+
+    FLAGS_STAGED =              0x00f0
+    FLAGS_UNSTAGED =            0x0700
+
+    all_abbrev_by_flag = (
+        (FLAG_STAGED_NEW,       'A'),
+        (FLAG_STAGED_MODIFIED,  'M'),
+        (FLAG_STAGED_DELETED,   'D'),
+        (FLAG_STAGED_RENAMED,   'R'),
+        (FLAG_UNSTAGED_NEW,     'A'),
+        (FLAG_UNSTAGED_MODIFIED,'M'),
+        (FLAG_UNSTAGED_DELETED, 'D'),
+        )
+
     def __init__( self, project, filepath ):
         assert isinstance( project, GitProject ),'expecting GitProject got %r' % (project,)
         assert isinstance( filepath, pathlib.Path ), 'expecting pathlib.Path got %r' % (filepath,)
@@ -911,28 +1132,25 @@ class WbGitFileState:
         self.__project = project
         self.__filepath = filepath
 
-        self.__is_dir = False
+        self.__flags = 0
 
-        self.__index_entry = None
         self.__unstaged_diff = None
         self.__staged_diff = None
-        self.__untracked = False
-
-        # from the above calculate the following
-        self.__state_calculated = False
 
-        self.__staged_is_modified = False
-        self.__unstaged_is_modified = False
+    def __repr__( self ):
+        return ('<WbGitFileState: calc %r, S=%r, U=%r' %
+                (self.__isFlagSet( self.FLAG_STATE_CALCULATED ),
+                 self.__abbrev( self.FLAGS_STAGED ), self.__abbrev( self.FLAGS_UNSTAGED )))
 
-        self.__staged_abbrev = None
-        self.__unstaged_abbrev = None
+    def __isFlagSet( self, flag ):
+        return (self.__flags & flag) != 0
 
-        self.__head_blob = None
-        self.__staged_blob = None
+    def __abbrev( self, mask ):
+        for flag, abbrev in self.all_abbrev_by_flag:
+            if self.__flags & mask & flag:
+                return abbrev
 
-    def __repr__( self ):
-        return ('<WbGitFileState: calc %r, S=%r, U=%r' %
-                (self.__state_calculated, self.__staged_abbrev, self.__unstaged_abbrev))
+        return ''
 
     def relativePath( self ):
         return self.__filepath
@@ -949,220 +1167,285 @@ class WbGitFileState:
         return pathlib.Path( self.__staged_diff.rename_to )
 
     def setIsDir( self ):
-        self.__is_dir = True
+        self.__flags |= self.FLAG_IS_DIR
 
     def isDir( self ):
-        return self.__is_dir
+        return self.__isFlagSet( self.FLAG_IS_DIR )
 
     def setIndexEntry( self, index_entry ):
-        self.__index_entry = index_entry
+        self.__flags |= self.FLAG_IN_INDEX
 
     def _addStaged( self, diff ):
-        self.__state_calculated = False
+        self.__flags &= ~(self.FLAG_STATE_CALCULATED|self.FLAGS_STAGED|self.FLAGS_UNSTAGED)
         self.__staged_diff = diff
 
     def _addUnstaged( self, diff ):
-        self.__state_calculated = False
+        self.__flags &= ~(self.FLAG_STATE_CALCULATED|self.FLAGS_STAGED|self.FLAGS_UNSTAGED)
         self.__unstaged_diff = diff
 
     def _setUntracked( self ):
-        self.__untracked = True
+        self.__flags |= self.FLAG_UNTRACKED
 
     # from the provided info work out
     # interesting properies
     def __calculateState( self ):
-        if self.__state_calculated:
+        if self.__flags & self.FLAG_STATE_CALCULATED:
             return
 
-        if self.__staged_diff is None:
-            self.__staged_abbrev = ''
+        flags = self.__flags
 
-        else:
+        if self.__staged_diff is not None:
             if self.__staged_diff.renamed:
-                self.__staged_abbrev = 'R'
+                flags |= self.FLAG_STAGED_RENAMED
 
             elif self.__staged_diff.deleted_file:
-                self.__staged_abbrev = 'A'
+                flags |= self.FLAG_STAGED_NEW
 
             elif self.__staged_diff.new_file:
-                self.__staged_abbrev = 'D'
+                flags |= self.FLAG_STAGED_DELETED
 
             else:
-                self.__staged_abbrev = 'M'
-                self.__staged_is_modified = True
-                self.__head_blob = self.__staged_diff.b_blob
-                self.__staged_blob = self.__staged_diff.a_blob
-
-        if  self.__unstaged_diff is None:
-            self.__unstaged_abbrev = ''
+                flags |= self.FLAG_STAGED_MODIFIED
 
-        else:
+        if self.__unstaged_diff is not None:
             if self.__unstaged_diff.deleted_file:
-                self.__unstaged_abbrev = 'D'
+                flags |= self.FLAG_UNSTAGED_DELETED
 
             elif self.__unstaged_diff.new_file:
-                self.__unstaged_abbrev = 'A'
+                flags |= self.FLAG_UNSTAGED_NEW
 
             else:
-                self.__unstaged_abbrev = 'M'
-                self.__unstaged_is_modified = True
-                if self.__head_blob is None:
-                    self.__head_blob = self.__unstaged_diff.a_blob
+                flags |= self.FLAG_UNSTAGED_MODIFIED
 
-        self.__state_calculated = True
+        self.__flags = flags | self.FLAG_STATE_CALCULATED
+
+    def __isStateSet( self, flag ):
+        self.__calculateState()
+        return (self.__flags & flag) != 0
 
     def getStagedAbbreviatedStatus( self ):
         self.__calculateState()
-        return self.__staged_abbrev
+        return self.__abbrev( self.FLAGS_STAGED )
 
     def getUnstagedAbbreviatedStatus( self ):
         self.__calculateState()
-        return self.__unstaged_abbrev
+        return self.__abbrev( self.FLAGS_UNSTAGED )
 
     #------------------------------------------------------------
     def isControlled( self ):
         if self.__staged_diff is not None:
             return True
 
-        return self.__index_entry is not None
+        return self.__isFlagSet( self.FLAG_IN_INDEX )
 
     def isUncontrolled( self ):
-        return self.__untracked
+        return self.__isFlagSet( self.FLAG_UNTRACKED )
 
     def isIgnored( self ):
         if self.__staged_diff is not None:
             return False
 
-        if self.__index_entry is not None:
+        if self.__isFlagSet( self.FLAG_IN_INDEX ):
             return False
 
         # untracked files have had ignored files striped out
-        if self.__untracked:
+        if self.__isFlagSet( self.FLAG_UNTRACKED ):
             return False
 
         return True
 
     # ------------------------------
     def isStagedNew( self ):
-        self.__calculateState()
-        return self.__staged_abbrev == 'A'
+        return self.__isStateSet( self.FLAG_STAGED_NEW )
 
     def isStagedModified( self ):
-        self.__calculateState()
-        return self.__staged_abbrev == 'M'
+        return self.__isStateSet( self.FLAG_STAGED_MODIFIED )
 
     def isStagedDeleted( self ):
-        self.__calculateState()
-        return self.__staged_abbrev == 'D'
+        return self.__isStateSet( self.FLAG_STAGED_DELETED )
 
     def isStagedRenamed( self ):
-        self.__calculateState()
-        return self.__staged_abbrev == 'R'
+        return self.__isStateSet( self.FLAG_STAGED_RENAMED )
 
     def isUnstagedModified( self ):
-        self.__calculateState()
-        return self.__unstaged_abbrev == 'M'
+        return self.__isStateSet( self.FLAG_UNSTAGED_MODIFIED )
 
     def isUnstagedDeleted( self ):
-        self.__calculateState()
-        return self.__unstaged_abbrev == 'D'
+        return self.__isStateSet( self.FLAG_UNSTAGED_DELETED )
 
     # ------------------------------------------------------------
     def canCommit( self ):
-        return self.__staged_abbrev != ''
+        return self.__isStateSet( self.FLAGS_STAGED )
 
     def canStage( self ):
-        return self.__unstaged_abbrev != '' or self.__untracked
+        return self.__isStateSet( self.FLAGS_UNSTAGED|self.FLAG_UNTRACKED )
 
     def canUnstage( self ):
-        return self.__staged_abbrev != ''
+        return self.__isStateSet( self.FLAGS_STAGED )
 
     def canRevert( self ):
-        return (self.isUnstagedDeleted()
-               or self.isUnstagedModified()
-               or self.isStagedNew()
-               or self.isStagedRenamed()
-               or self.isStagedDeleted()
-               or self.isStagedModified())
+        return self.__isStateSet( self.FLAGS_STAGED|self.FLAG_UNSTAGED_MODIFIED|self.FLAG_UNSTAGED_DELETED )
 
     # ------------------------------------------------------------
     def canDiffHeadVsStaged( self ):
-        self.__calculateState()
-        return self.__staged_is_modified
+        return self.__isStateSet( self.FLAG_STAGED_MODIFIED )
 
     def canDiffStagedVsWorking( self ):
         self.__calculateState()
-        return self.__unstaged_is_modified and self.__staged_is_modified
+        return (self.__isFlagSet( self.FLAG_UNSTAGED_MODIFIED )
+            and self.__isFlagSet( self.FLAG_STAGED_MODIFIED ))
 
     def canDiffHeadVsWorking( self ):
-        self.__calculateState()
-        return self.__unstaged_is_modified
+        return self.__isStateSet( self.FLAG_UNSTAGED_MODIFIED )
 
     def getTextLinesWorking( self ):
         path = self.absolutePath()
-        with path.open( encoding='utf-8' ) as f:
-            all_lines = f.read().split( '\n' )
-            if all_lines[-1] == '':
-                return all_lines[:-1]
-            else:
-                return all_lines
+        # like a file opened in text mode
+        all_lines = wb_read_file.readFileTextLines( path, universal_newlines=True )
+        if all_lines[-1] == '':
+            return all_lines[:-1]
+        else:
+            return all_lines
 
     def getTextLinesHead( self ):
-        return self.__getTextLinesFromBlob( self.getHeadBlob() )
+        return self.__project.getTextLinesForBlobs( [self.getHeadBlob()] )[0]
 
     def getTextLinesStaged( self ):
-        return self.__getTextLinesFromBlob( self.getStagedBlob() )
+        return self.__project.getTextLinesForBlobs( [self.getStagedBlob()] )[0]
 
-    def __getTextLinesFromBlob( self, blob ):
-        data = blob.data_stream.read()
-        text = data.decode( 'utf-8' )
-        all_lines = text.split('\n')
-        if all_lines[-1] == '':
-            return all_lines[:-1]
-        else:
-            return all_lines
+    def getTextLinesHeadAndStaged( self ):
+        # read both with one request to git
+        return self.__project.getTextLinesForBlobs( [self.getHeadBlob(), self.getStagedBlob()] )
 
     def getTextLinesForCommit( self, commit_id ):
-        git_filepath = pathlib.PurePosixPath( self.__filepath )
-        text = self.__project.cmdShow( '%s:%s' % (commit_id, git_filepath) )
-        all_lines = text.split('\n')
-        if all_lines[-1] == '':
-            return all_lines[:-1]
-        else:
-            return all_lines
+        return self.__project.getTextLinesForCommit( self.__filepath, commit_id )
+
+    def getTextLinesForCommits( self, all_commit_ids ):
+        return self.__project.getTextLinesForCommits( self.__filepath, all_commit_ids )
+
+    def getBlobIdsForCommits( self, all_commit_ids ):
+        return self.__project.getBlobIdsForCommits( self.__filepath, all_commit_ids )
+
+    def isWorkingSameAs( self, object_id ):
+        # hash the working file as git hash-object does, without any
+        # clean filters, and compare with the id git has for the blob
+        if object_id is None:
+            return False
+
+        digest_name = 'sha256' if len(object_id) == 64 else 'sha1'
+        try:
+            working_id = wb_read_file.fileDigest( self.absolutePath(), digest_name, lambda size: b'blob %d\0' % (size,) )
+
+        except OSError:
+            return False
+
+        return working_id == object_id
+
+    def isWorkingSameAsHead( self ):
+        head_blob = self.getHeadBlob()
+        return head_blob is not None and self.isWorkingSameAs( head_blob.hexsha )
+
+    def isWorkingSameAsStaged( self ):
+        staged_blob = self.getStagedBlob()
+        return staged_blob is not None and self.isWorkingSameAs( staged_blob.hexsha )
+
+    def isHeadSameAsStaged( self ):
+        head_blob = self.getHeadBlob()
+        staged_blob = self.getStagedBlob()
+        return (head_blob is not None and staged_blob is not None
+            and head_blob.hexsha == staged_blob.hexsha)
 
     def getHeadBlob( self ):
-        return self.__head_blob
+        if self.isStagedModified():
+            return self.__staged_diff.b_blob
+
+        if self.isUnstagedModified():
+            return self.__unstaged_diff.a_blob
+
+        return None
 
     def getStagedBlob( self ):
-        return self.__staged_blob
+        if self.isStagedModified():
+            return self.__staged_diff.a_blob
+
+        return None
 
 class GitCommitLogNode:
+    # the log history can hold many thousands of nodes
+    # keep only the columns it shows and create the
+    # GitPython commit object when it is needed
+    __slots__ = ('__repo', '__commit', '__commit_id', '__parent_id',
+                 '__author_name', '__author_email', '__commit_time', '__commit_tz',
+                 '__message', '__all_changes')
+
     def __init__( self, commit ):
+        self.__repo = commit.repo
         self.__commit = commit
-        self.__all_changes = []
+        self.__commit_id = commit.hexsha
+        self.__parent_id = commit.parents[0].hexsha if len(commit.parents) > 0 else None
+        self.__author_name = None
+        self.__author_email = None
+        self.__commit_time = None
+        self.__commit_tz = None
+        self.__message = None
+        # None until the changes are calculated
+        self.__all_changes = None
+
+    @classmethod
+    def fromLogFields( cls, repo, commit_id, parent_id, author_name, author_email, commit_time, commit_tz, message ):
+        # see wb_git_commit_log.iterCommitLog
+        node = cls.__new__( cls )
+        node.__repo = repo
+        node.__commit = None
+        node.__commit_id = commit_id
+        node.__parent_id = parent_id
+        node.__author_name = author_name
+        node.__author_email = author_email
+        node.__commit_time = commit_time
+        node.__commit_tz = commit_tz
+        node.__message = message
+        node.__all_changes = None
+        return node
+
+    def commit( self ):
+        if self.__commit is None:
+            self.__commit = self.__repo.commit( self.__commit_id )
+
+        return self.__commit
 
     def _addChanges( self, all_added, all_deleted, all_renamed, all_modified ):
+        all_changes = []
         for name in all_added:
-            self.__all_changes.append( ('A', name, '' ) )
+            all_changes.append( ('A', name, '' ) )
 
         for name in all_deleted:
-            self.__all_changes.append( ('D', name, '' ) )
+            all_changes.append( ('D', name, '' ) )
 
         for name, old_name in all_renamed:
-            self.__all_changes.append( ('R', name, old_name ) )
+            all_changes.append( ('R', name, old_name ) )
 
         for name in all_modified:
-            self.__all_changes.append( ('M', name, '' ) )
+            all_changes.append( ('M', name, '' ) )
+
+        self.__all_changes = all_changes
+
+    def _setFileChanges( self, all_changes ):
+        self.__all_changes = all_changes
+
+    def hasFileChanges( self ):
+        return self.__all_changes is not None
+
+    def _clearFileChanges( self ):
+        self.__all_changes = None
 
     def commitTree( self ):
-        return self.__commit.tree
+        return self.commit().tree
 
     def commitPreviousTree( self ):
-        if len(self.__commit.parents) == 0:
+        if self.__parent_id is None:
             return None
 
-        previous_commit = self.__commit.parents[0]
+        previous_commit = self.commit().parents[0]
         return previous_commit.tree
 
     def commitTreeDict( self ):
@@ -1180,25 +1463,46 @@ class GitCommitLogNode:
         return all_entries
 
     def commitId( self ):
-        return self.__commit.hexsha
+        return self.__commit_id
+
+    def commitParentId( self ):
+        return self.__parent_id
 
     def commitIdString( self ):
-        return self.__commit.hexsha
+        return self.__commit_id
 
     def commitAuthor( self ):
-        return self.__commit.author.name
+        if self.__author_name is None:
+            return self.__commit.author.name
+
+        return self.__author_name
 
     def commitAuthorEmail( self ):
-        return self.__commit.author.email
+        if self.__author_email is None:
+            return self.__commit.author.email
+
+        return self.__author_email
 
     def commitDate( self ):
-        return self.__commit.committed_datetime
+        if self.__commit_time is None:
+            return self.__commit.committed_datetime
+
+        # commit_tz is like +0100 or -0530
+        sign = -1 if self.__commit_tz.startswith( '-' ) else 1
+        offset = datetime.timedelta( hours=int( self.__commit_tz[1:3] ), minutes=int( self.__commit_tz[3:5] ) )
+        return datetime.datetime.fromtimestamp( self.__commit_time, datetime.timezone( sign*offset ) )
 
     def commitMessage( self ):
-        return self.__commit.message
+        if self.__message is None:
+            return self.__commit.message
+
+        return self.__message
+
+    def _setMessage( self, message ):
+        self.__message = message
 
     def commitMessageHeadline( self ):
-        return self.__commit.message.split('\n')[0]
+        return self.commitMessage().split('\n')[0]
 
     def commitFileChanges( self ):
         return self.__all_changes
@@ -1231,6 +1535,15 @@ class GitProjectTreeNode:
         path = path
         self.__all_files[ path ] = path
 
+    def removeFileByName( self, name ):
+        self.__all_files.pop( name, None )
+
+    def removeFileByPath( self, path ):
+        self.__all_files.pop( path, None )
+
+    def isEmpty( self ):
+        return len(self.__all_files) == 0 and len(self.__all_folders) == 0
+
     def getAllFileNames( self ):
         return self.__all_files.keys()
 
@@ -1243,6 +1556,10 @@ class GitProjectTreeNode:
         assert type(name) == str
         return self.__all_folders[ name ]
 
+    def removeFolder( self, name ):
+        assert type(name) == str
+        del self.__all_folders[ name ]
+
     def getAllFolderNodes( self ):
         return self.__all_folders.values()
 
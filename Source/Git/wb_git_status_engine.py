@@ -0,0 +1,488 @@
+'''
+ ====================================================================
+ Copyright (c) 2018 Barry A Scott.  All rights reserved.
+
+ This software is licensed as described in the file LICENSE.txt,
+ which you should have received as part of this distribution.
+
+ ====================================================================
+
+    wb_git_status_engine.py
+
+    Work out the git status of a working tree incrementally.
+
+    The first update does the full scan of the working tree
+    and asks git for the staged, unstaged and untracked state.
+
+    Later updates only rescan the folders whose mtime has changed,
+    only ask git to diff the files whose stat no longer matches
+    the index entry and only ask git about untracked files in
+    the folders that have changed.
+
+    When a file system watcher has noted the paths that changed
+    only those paths and the folders that hold them are checked.
+
+'''
+import os
+import sys
+import stat
+import pathlib
+import bisect
+
+import git
+import git.index
+
+# keep each git command line well below the OS argv limits
+max_paths_per_command = 500
+
+def chunked( all_items, size=max_paths_per_command ):
+    for offset in range( 0, len(all_items), size ):
+        yield all_items[ offset:offset+size ]
+
+def statKey( path ):
+    try:
+        st = os.stat( str(path) )
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    except OSError:
+        return None
+
+def globPathspecForFolder( folder ):
+    # match the files directly inside folder and nothing deeper
+    if folder == pathlib.Path( '.' ):
+        return ':(glob)*'
+
+    escaped = ''.join( '\\' + c if c in '*?[]\\' else c for c in pathlib.PurePosixPath( folder ).as_posix() )
+    return ':(glob)%s/*' % (escaped,)
+
+class WbGitIncrementalStatus:
+    def __init__( self, project ):
+        self.project = project
+        self.debugLog = project.debugLog
+
+        self.reset()
+
+    def reset( self ):
+        # working tree state
+        self.all_paths = {}                     # path -> is_dir
+        self.__all_folder_children = {}         # folder -> {name: is_dir}
+        self.__all_folder_mtimes = {}           # folder -> st_mtime_ns
+        self.__all_ignore_file_stats = {}       # .gitignore path -> statKey
+
+        # index and HEAD state
+        self.index = None
+        self.__index_stat = None
+        self.__head_id = None
+        self.all_index_entries = {}             # path -> IndexEntry
+        self.__all_sorted_index_names = []      # posix names of the index entries in sorted order
+
+        # status results
+        self.all_staged_diffs = []
+        self.all_staged_paths = {}              # path -> diff
+        self.all_unstaged_diffs = {}            # path -> diff
+        self.__all_unstaged_stats = {}          # path -> working file stat the diff was calculated for
+        self.all_untracked = set()
+
+        self.__resetDirtyPaths()
+
+    def __resetDirtyPaths( self ):
+        # None means that any path may have changed
+        self.__all_dirty_paths = None
+        self.__dirty_paths_noted = False
+
+    def noteDirtyPaths( self, all_dirty_paths ):
+        if not self.__dirty_paths_noted:
+            self.__dirty_paths_noted = True
+            self.__all_dirty_paths = None if all_dirty_paths is None else set( all_dirty_paths )
+
+        elif all_dirty_paths is None or self.__all_dirty_paths is None:
+            self.__all_dirty_paths = None
+
+        else:
+            self.__all_dirty_paths.update( all_dirty_paths )
+
+    def hasState( self ):
+        return self.index is not None
+
+    def update( self ):
+        '''
+        bring the status up to date
+
+        returns (full_rebuild, all_changed_paths)
+        if full_rebuild is True the caller must recheck every path
+        otherwise only the paths in all_changed_paths have changed state
+        '''
+        repo = self.project.repo()
+        repo_root = self.project.projectPath()
+        git_dir = pathlib.Path( repo.git_dir )
+
+        first_time = not self.hasState()
+
+        all_dirty_paths = self.__all_dirty_paths
+        self.__resetDirtyPaths()
+        if first_time or pathlib.Path( '.' ) in (all_dirty_paths or ()):
+            all_dirty_paths = None
+
+        all_changed_paths = set()
+        all_changed_folders = set()
+
+        # ----------------------------------------
+        # working tree folders
+        ignore_rules_changed = first_time
+        if first_time:
+            self.__scanFolders( repo_root, [pathlib.Path( '.' )], all_changed_paths, all_changed_folders )
+
+        else:
+            for path, stat_key in list( self.__all_ignore_file_stats.items() ):
+                new_stat_key = statKey( repo_root / path )
+                if new_stat_key != stat_key:
+                    self.__all_ignore_file_stats[ path ] = new_stat_key
+                    ignore_rules_changed = True
+
+            if all_dirty_paths is None:
+                all_folders_to_check = self.__all_folder_mtimes.keys()
+
+            else:
+                self.debugLog( 'WbGitIncrementalStatus.update() %d dirty paths' % (len(all_dirty_paths),) )
+                all_folders_to_check = set()
+                for path in all_dirty_paths:
+                    for folder in (path, path.parent):
+                        if folder in self.__all_folder_mtimes:
+                            all_folders_to_check.add( folder )
+
+            all_modified_folders = []
+            for folder in all_folders_to_check:
+                mtime = self.__all_folder_mtimes[ folder ]
+                try:
+                    if os.stat( str( repo_root / folder ) ).st_mtime_ns != mtime:
+                        all_modified_folders.append( folder )
+
+                except OSError:
+                    # removed - the rescan of the parent folder will clean up
+                    pass
+
+            if self.__scanFolders( repo_root, all_modified_folders, all_changed_paths, all_changed_folders ):
+                ignore_rules_changed = True
+
+        exclude_path = git_dir / 'info' / 'exclude'
+        exclude_stat = statKey( exclude_path )
+        if exclude_stat != self.__all_ignore_file_stats.get( exclude_path ):
+            self.__all_ignore_file_stats[ exclude_path ] = exclude_stat
+            ignore_rules_changed = True
+
+        # ----------------------------------------
+        # index and HEAD
+        index_stat = statKey( git_dir / 'index' )
+        head_id = self.__headId( repo )
+
+        index_changed = first_time or index_stat != self.__index_stat
+        head_changed = first_time or head_id != self.__head_id
+
+        self.__index_stat = index_stat
+        self.__head_id = head_id
+
+        if index_changed:
+            self.debugLog( 'WbGitIncrementalStatus.update() index changed' )
+            old_index_paths = set( self.all_index_entries )
+
+            self.index = git.index.IndexFile( repo )
+            self.all_index_entries = {}
+            for entry in self.index.entries.values():
+                self.all_index_entries[ pathlib.Path( entry.path ) ] = entry
+
+            self.__all_sorted_index_names = sorted( entry.path for entry in self.index.entries.values() )
+
+            # paths that enter or leave the index change their untracked state
+            for path in old_index_paths.symmetric_difference( self.all_index_entries ):
+                self.all_untracked.discard( path )
+                all_changed_folders.add( path.parent )
+                all_changed_paths.add( path )
+
+        if index_changed or head_changed:
+            self.debugLog( 'WbGitIncrementalStatus.update() staged changes' )
+            if head_id is not None:
+                self.all_staged_diffs = list( self.index.diff( repo.head.commit ) )
+
+            else:
+                self.all_staged_diffs = []
+
+            old_staged_paths = set( self.all_staged_paths )
+
+            self.all_staged_paths = {}
+            for diff in self.all_staged_diffs:
+                self.all_staged_paths[ pathlib.Path( diff.b_path ) ] = diff
+                if diff.renamed:
+                    self.all_staged_paths[ pathlib.Path( diff.rename_from ) ] = diff
+
+            all_changed_paths.update( old_staged_paths.symmetric_difference( self.all_staged_paths ) )
+
+        # ----------------------------------------
+        # working tree vs. index
+        if index_changed or all_dirty_paths is None:
+            all_index_paths_to_check = None
+
+        else:
+            all_index_paths_to_check = self.__indexPathsUnder( all_dirty_paths )
+
+        self.__updateUnstaged( repo, repo_root, index_stat, index_changed, all_index_paths_to_check, all_changed_paths )
+
+        # ----------------------------------------
+        # untracked files
+        if ignore_rules_changed:
+            self.debugLog( 'WbGitIncrementalStatus.update() all untracked' )
+            all_untracked = set( pathlib.Path( path ) for path in repo.untracked_files )
+
+        else:
+            self.debugLog( 'WbGitIncrementalStatus.update() untracked in %d folders' % (len(all_changed_folders),) )
+            all_untracked = set( path for path in self.all_untracked if path.parent not in all_changed_folders )
+            all_untracked.update( self.__untrackedInFolders( repo, all_changed_folders ) )
+
+        all_changed_paths.update( all_untracked.symmetric_difference( self.all_untracked ) )
+        self.all_untracked = all_untracked
+
+        full_rebuild = index_changed or head_changed
+        self.debugLog( 'WbGitIncrementalStatus.update() full_rebuild %r changed paths %d' % (full_rebuild, len(all_changed_paths)) )
+        return full_rebuild, all_changed_paths
+
+    def hasPath( self, path ):
+        return (path in self.all_paths
+            or path in self.all_index_entries
+            or path in self.all_staged_paths
+            or path in self.all_unstaged_diffs
+            or path in self.all_untracked)
+
+    def allKnownPaths( self ):
+        all_known_paths = set( self.all_paths )
+        all_known_paths.update( self.all_index_entries )
+        all_known_paths.update( self.all_staged_paths )
+        all_known_paths.update( self.all_unstaged_diffs )
+        all_known_paths.update( self.all_untracked )
+        return all_known_paths
+
+    def numStagedFiles( self ):
+        return len( self.all_staged_diffs )
+
+    def numModifiedFiles( self ):
+        return len( self.all_unstaged_diffs )
+
+    #------------------------------------------------------------
+    def __headId( self, repo ):
+        try:
+            return repo.head.commit.hexsha
+
+        except ValueError:
+            # no commits yet
+            return None
+
+    # returns True if a .gitignore file was added or removed
+    def __scanFolders( self, repo_root, all_folders, all_changed_paths, all_changed_folders ):
+        ignore_files_changed = False
+
+        all_folders = list( all_folders )
+        while len(all_folders) > 0:
+            folder = all_folders.pop()
+
+            # may have been removed by the scan of its parent
+            if folder != pathlib.Path( '.' ) and folder not in self.all_paths:
+                continue
+
+            all_changed_folders.add( folder )
+
+            abs_folder = repo_root / folder
+            try:
+                mtime = os.stat( str(abs_folder) ).st_mtime_ns
+                all_dirents = list( os.scandir( str(abs_folder) ) )
+
+            except OSError:
+                self.__removeFolder( folder, all_changed_paths )
+                continue
+
+            self.__all_folder_mtimes[ folder ] = mtime
+
+            all_old_children = self.__all_folder_children.get( folder, {} )
+            all_new_children = {}
+
+            for dirent in all_dirents:
+                try:
+                    is_dir = dirent.is_dir()
+
+                except OSError:
+                    is_dir = False
+
+                path = folder / dirent.name
+                if is_dir and path == pathlib.Path( '.git' ):
+                    continue
+
+                all_new_children[ dirent.name ] = is_dir
+
+                if dirent.name == '.gitignore' and path not in self.__all_ignore_file_stats:
+                    self.__all_ignore_file_stats[ path ] = statKey( abs_folder / dirent.name )
+                    ignore_files_changed = True
+
+                old_is_dir = all_old_children.get( dirent.name )
+                if old_is_dir == is_dir:
+                    continue
+
+                if old_is_dir:
+                    self.__removeFolder( path, all_changed_paths )
+
+                self.all_paths[ path ] = is_dir
+                all_changed_paths.add( path )
+
+                if is_dir:
+                    all_folders.append( path )
+
+            for name, is_dir in all_old_children.items():
+                if name not in all_new_children:
+                    path = folder / name
+                    if is_dir:
+                        self.__removeFolder( path, all_changed_paths )
+
+                    self.all_paths.pop( path, None )
+                    if self.__all_ignore_file_stats.pop( path, False ) is not False:
+                        ignore_files_changed = True
+                    all_changed_paths.add( path )
+
+            self.__all_folder_children[ folder ] = all_new_children
+
+        return ignore_files_changed
+
+    def __removeFolder( self, folder, all_changed_paths ):
+        all_children = self.__all_folder_children.pop( folder, {} )
+        self.__all_folder_mtimes.pop( folder, None )
+
+        for name, is_dir in all_children.items():
+            path = folder / name
+            if is_dir:
+                self.__removeFolder( path, all_changed_paths )
+
+            self.all_paths.pop( path, None )
+            self.__all_ignore_file_stats.pop( path, None )
+            all_changed_paths.add( path )
+
+        # the untracked files of the folder are gone with it
+        for path in [path for path in self.all_untracked if path.parent == folder]:
+            self.all_untracked.discard( path )
+            all_changed_paths.add( path )
+
+    def __indexPathsUnder( self, all_dirty_paths ):
+        # the index entries that are a dirty path or inside a dirty folder
+        all_paths = set()
+        for dirty_path in all_dirty_paths:
+            if dirty_path in self.all_index_entries:
+                all_paths.add( dirty_path )
+
+            prefix = pathlib.PurePosixPath( dirty_path ).as_posix() + '/'
+            offset = bisect.bisect_left( self.__all_sorted_index_names, prefix )
+            while( offset < len(self.__all_sorted_index_names)
+            and self.__all_sorted_index_names[ offset ].startswith( prefix ) ):
+                all_paths.add( pathlib.Path( self.__all_sorted_index_names[ offset ] ) )
+                offset += 1
+
+        return all_paths
+
+    def __updateUnstaged( self, repo, repo_root, index_stat, index_changed, all_index_paths_to_check, all_changed_paths ):
+        # files modified after the index was written cannot be trusted by stat alone
+        index_mtime_ns = index_stat[0] if index_stat is not None else 0
+
+        all_old_unstaged_diffs = self.all_unstaged_diffs
+        all_old_unstaged_stats = self.__all_unstaged_stats
+
+        if all_index_paths_to_check is None:
+            all_index_paths_to_check = self.all_index_entries.keys()
+            self.all_unstaged_diffs = {}
+            self.__all_unstaged_stats = {}
+
+        else:
+            # the paths not checked keep their state
+            self.all_unstaged_diffs = dict( all_old_unstaged_diffs )
+            self.__all_unstaged_stats = dict( all_old_unstaged_stats )
+            for path in all_index_paths_to_check:
+                self.all_unstaged_diffs.pop( path, None )
+                self.__all_unstaged_stats.pop( path, None )
+
+        all_candidates = []
+        for path in all_index_paths_to_check:
+            entry = self.all_index_entries[ path ]
+            try:
+                st = os.lstat( str( repo_root / path ) )
+                # chmod does not change the mtime
+                stat_key = (st.st_mtime_ns, st.st_size, st.st_mode)
+
+            except OSError:
+                st = None
+                stat_key = None
+
+            if( st is not None
+            and st.st_mtime_ns < index_mtime_ns
+            and statMatchesIndexEntry( st, entry ) ):
+                # clean
+                continue
+
+            if( not index_changed
+            and path in all_old_unstaged_stats
+            and all_old_unstaged_stats[ path ] == stat_key ):
+                # nothing has changed since the last diff of this file
+                self.__all_unstaged_stats[ path ] = stat_key
+                if path in all_old_unstaged_diffs:
+                    self.all_unstaged_diffs[ path ] = all_old_unstaged_diffs[ path ]
+                continue
+
+            self.__all_unstaged_stats[ path ] = stat_key
+            all_candidates.append( path )
+
+        self.debugLog( 'WbGitIncrementalStatus.__updateUnstaged() %d candidates' % (len(all_candidates),) )
+
+        for all_paths in chunked( all_candidates ):
+            for diff in self.index.diff( None, paths=[pathlib.PurePosixPath( path ).as_posix() for path in all_paths] ):
+                self.all_unstaged_diffs[ pathlib.Path( diff.a_path ) ] = diff
+
+        for path in set( all_old_unstaged_diffs ).union( self.all_unstaged_diffs ):
+            if all_old_unstaged_diffs.get( path ) is not self.all_unstaged_diffs.get( path ):
+                all_changed_paths.add( path )
+
+    def __untrackedInFolders( self, repo, all_folders ):
+        all_untracked = set()
+
+        all_pathspecs = [globPathspecForFolder( folder ) for folder in sorted( all_folders )]
+        for all_chunk_pathspecs in chunked( all_pathspecs ):
+            output = repo.git.ls_files( '--others', '--exclude-standard', '-z', '--', *all_chunk_pathspecs )
+            for name in output.split( '\0' ):
+                if name != '':
+                    all_untracked.add( pathlib.Path( name ) )
+
+        return all_untracked
+
+def statMatchesIndexEntry( st, entry ):
+    if not modeMatchesIndexEntry( st.st_mode, entry.mode ):
+        return False
+
+    # the index only holds the low 32 bits of the size
+    if (st.st_size & 0xffffffff) != entry.size:
+        return False
+
+    sec, nsec = divmod( st.st_mtime_ns, 1000000000 )
+    entry_sec, entry_nsec = entry.mtime
+    if sec != entry_sec:
+        return False
+
+    # git may be built without nanosecond support
+    return entry_nsec == 0 or nsec == entry_nsec
+
+def modeMatchesIndexEntry( st_mode, entry_mode ):
+    # git records the type of the file and for a regular file the exec bit
+    if stat.S_ISLNK( st_mode ):
+        return entry_mode == 0o120000
+
+    if stat.S_ISDIR( st_mode ):
+        # a submodule
+        return entry_mode == 0o160000
+
+    if sys.platform == 'win32':
+        # there is no exec bit to compare
+        return stat.S_ISREG( entry_mode )
+
+    if st_mode & stat.S_IXUSR:
+        return entry_mode == 0o100755
+
+    return entry_mode == 0o100644
@@ -0,0 +1,305 @@
+'''
+ ====================================================================
+ Copyright (c) 2018 Barry A Scott.  All rights reserved.
+
+ This software is licensed as described in the file LICENSE.txt,
+ which you should have received as part of this distribution.
+
+ ====================================================================
+
+    wb_git_status_porcelain.py
+
+    Work out the git status of a working tree from one run of
+
+        git status --porcelain=v2 -z --untracked-files=all --ignored
+
+    The output is parsed as it is read from git.
+
+    The results have the same shape as WbGitIncrementalStatus
+    so that GitProject can use either one.
+
+'''
+import os
+import pathlib
+import binascii
+
+import git
+import git.index
+
+null_hexsha = '0' * 40
+
+read_chunk_size = 64*1024
+
+def iterNulFields( stream ):
+    pending = b''
+    while True:
+        data = stream.read( read_chunk_size )
+        if not data:
+            break
+
+        all_fields = (pending + data).split( b'\0' )
+        pending = all_fields.pop()
+        yield from all_fields
+
+    if pending != b'':
+        yield pending
+
+class PorcelainIndexEntry:
+    __slots__ = ('path', 'mode', 'hexsha')
+
+    def __init__( self, path, mode=None, hexsha=None ):
+        self.path = path
+        self.mode = mode
+        self.hexsha = hexsha
+
+    def __repr__( self ):
+        return '<PorcelainIndexEntry: %s %s>' % (self.path, self.hexsha)
+
+class PorcelainDiff:
+    # the parts of a git.Diff that WbGitFileState uses
+    __slots__ = ('a_path', 'b_path', 'a_blob', 'b_blob'
+                ,'new_file', 'deleted_file', 'renamed', 'rename_from', 'rename_to')
+
+    def __init__( self, a_path, b_path, a_blob, b_blob ):
+        self.a_path = a_path
+        self.b_path = b_path
+        self.a_blob = a_blob
+        self.b_blob = b_blob
+
+        self.new_file = False
+        self.deleted_file = False
+        self.renamed = False
+        self.rename_from = None
+        self.rename_to = None
+
+    def __repr__( self ):
+        return '<PorcelainDiff: %s %s new %r deleted %r renamed %r>' % (self.a_path, self.b_path, self.new_file, self.deleted_file, self.renamed)
+
+class WbGitPorcelainStatus:
+    def __init__( self, project ):
+        self.project = project
+        self.debugLog = project.debugLog
+
+        self.reset()
+
+    def reset( self ):
+        self.all_paths = {}                     # path -> is_dir
+        self.__index = None
+        self.all_index_entries = {}             # path -> PorcelainIndexEntry
+
+        self.all_staged_diffs = []
+        self.all_staged_paths = {}              # path -> diff
+        self.all_unstaged_diffs = {}            # path -> diff
+        self.all_untracked = set()
+        self.all_ignored = set()
+
+        self.__has_state = False
+        self.__all_dirty_paths = None
+        self.__dirty_paths_noted = False
+
+    def hasState( self ):
+        return self.__has_state
+
+    @property
+    def index( self ):
+        # only needed to commit - read on demand
+        if self.__index is None:
+            self.__index = git.index.IndexFile( self.project.repo() )
+
+        return self.__index
+
+    def noteDirtyPaths( self, all_dirty_paths ):
+        if not self.__dirty_paths_noted:
+            self.__dirty_paths_noted = True
+            self.__all_dirty_paths = None if all_dirty_paths is None else set( all_dirty_paths )
+
+        elif all_dirty_paths is None or self.__all_dirty_paths is None:
+            self.__all_dirty_paths = None
+
+        else:
+            self.__all_dirty_paths.update( all_dirty_paths )
+
+    def update( self ):
+        '''
+        bring the status up to date
+
+        returns (full_rebuild, all_changed_paths) like WbGitIncrementalStatus.update
+        '''
+        all_dirty_paths = self.__all_dirty_paths
+        self.__all_dirty_paths = None
+        self.__dirty_paths_noted = False
+
+        if self.__has_state and all_dirty_paths is not None and len(all_dirty_paths) == 0:
+            self.debugLog( 'WbGitPorcelainStatus.update() nothing changed' )
+            return False, set()
+
+        repo = self.project.repo()
+
+        all_old_paths = self.all_paths
+        all_old_untracked = self.all_untracked
+
+        self.__index = None
+        self.all_paths = self.__scanFolders( self.project.projectPath() )
+        self.__parseStatus( repo )
+
+        # any file that git did not report on is tracked and unchanged
+        for path, is_dir in self.all_paths.items():
+            if( not is_dir
+            and path not in self.all_index_entries
+            and path not in self.all_untracked
+            and path not in self.all_ignored
+            and path not in self.all_staged_paths ):
+                self.all_index_entries[ path ] = PorcelainIndexEntry( path )
+
+        all_changed_paths = set( all_old_paths.items() ).symmetric_difference( self.all_paths.items() )
+        all_changed_paths = set( path for path, is_dir in all_changed_paths )
+        all_changed_paths.update( all_old_untracked.symmetric_difference( self.all_untracked ) )
+
+        self.__has_state = True
+
+        self.debugLog( 'WbGitPorcelainStatus.update() staged %d unstaged %d untracked %d' %
+                    (len(self.all_staged_diffs), len(self.all_unstaged_diffs), len(self.all_untracked)) )
+        return True, all_changed_paths
+
+    def hasPath( self, path ):
+        return (path in self.all_paths
+            or path in self.all_index_entries
+            or path in self.all_staged_paths
+            or path in self.all_unstaged_diffs
+            or path in self.all_untracked)
+
+    def allKnownPaths( self ):
+        all_known_paths = set( self.all_paths )
+        all_known_paths.update( self.all_index_entries )
+        all_known_paths.update( self.all_staged_paths )
+        all_known_paths.update( self.all_unstaged_diffs )
+        all_known_paths.update( self.all_untracked )
+        return all_known_paths
+
+    def numStagedFiles( self ):
+        return len( self.all_staged_diffs )
+
+    def numModifiedFiles( self ):
+        return len( self.all_unstaged_diffs )
+
+    #------------------------------------------------------------
+    def __scanFolders( self, repo_root ):
+        all_paths = {}
+
+        all_folders = [pathlib.Path( '.' )]
+        while len(all_folders) > 0:
+            folder = all_folders.pop()
+            try:
+                all_dirents = list( os.scandir( str( repo_root / folder ) ) )
+
+            except OSError:
+                continue
+
+            for dirent in all_dirents:
+                try:
+                    is_dir = dirent.is_dir()
+
+                except OSError:
+                    is_dir = False
+
+                path = folder / dirent.name
+                if is_dir and path == pathlib.Path( '.git' ):
+                    continue
+
+                all_paths[ path ] = is_dir
+                if is_dir:
+                    all_folders.append( path )
+
+        return all_paths
+
+    def __parseStatus( self, repo ):
+        self.all_index_entries = {}
+        self.all_staged_diffs = []
+        self.all_staged_paths = {}
+        self.all_unstaged_diffs = {}
+        self.all_untracked = set()
+        self.all_ignored = set()
+
+        proc = repo.git.status( '--porcelain=v2', '-z', '--untracked-files=all', '--ignored', as_process=True )
+
+        all_fields = iterNulFields( proc.stdout )
+        for field in all_fields:
+            record = os.fsdecode( field )
+            kind = record[0:1]
+
+            if kind == '1':
+                # 1 XY sub mH mI mW hH hI path
+                _, xy, sub, mode_head, mode_index, mode_work, sha_head, sha_index, name = record.split( ' ', 8 )
+                self.__addTracked( repo, xy, name, name, mode_head, mode_index, sha_head, sha_index )
+
+            elif kind == '2':
+                # 2 XY sub mH mI mW hH hI Xscore path NUL origPath
+                _, xy, sub, mode_head, mode_index, mode_work, sha_head, sha_index, score, name = record.split( ' ', 9 )
+                orig_name = os.fsdecode( next( all_fields ) )
+                self.__addTracked( repo, xy, name, orig_name, mode_head, mode_index, sha_head, sha_index )
+
+            elif kind == 'u':
+                # u XY sub m1 m2 m3 mW h1 h2 h3 path
+                _, xy, sub, mode_1, mode_2, mode_3, mode_work, sha_1, sha_2, sha_3, name = record.split( ' ', 10 )
+                path = pathlib.Path( name )
+                self.all_index_entries[ path ] = PorcelainIndexEntry( path, mode_2, sha_2 )
+
+                # show the conflict as a modified file with ours as the base
+                diff = PorcelainDiff( name, name, self.__blob( repo, sha_2, mode_2, name ), None )
+                self.all_unstaged_diffs[ path ] = diff
+
+            elif kind == '?':
+                self.all_untracked.add( pathlib.Path( record[2:] ) )
+
+            elif kind == '!':
+                self.all_ignored.add( pathlib.Path( record[2:] ) )
+
+        # raises GitCommandError if git failed
+        proc.wait()
+
+    def __addTracked( self, repo, xy, name, orig_name, mode_head, mode_index, sha_head, sha_index ):
+        staged, unstaged = xy[0], xy[1]
+
+        path = pathlib.Path( name )
+
+        if staged != 'D':
+            self.all_index_entries[ path ] = PorcelainIndexEntry( path, mode_index, sha_index )
+
+        # the staged diff is from the index to HEAD to match IndexFile.diff( head.commit )
+        if staged != '.':
+            diff = PorcelainDiff( name, orig_name,
+                        self.__blob( repo, sha_index, mode_index, name ),
+                        self.__blob( repo, sha_head, mode_head, orig_name ) )
+
+            if staged == 'R':
+                diff.renamed = True
+                diff.rename_from = name
+                diff.rename_to = orig_name
+                self.all_staged_paths[ pathlib.Path( orig_name ) ] = diff
+
+            elif staged in ('A', 'C'):
+                diff.deleted_file = True
+
+            elif staged == 'D':
+                diff.new_file = True
+
+            self.all_staged_paths[ path ] = diff
+            self.all_staged_diffs.append( diff )
+
+        # the unstaged diff is from the index to the working file
+        if unstaged != '.':
+            diff = PorcelainDiff( name, name, self.__blob( repo, sha_index, mode_index, name ), None )
+
+            if unstaged == 'D':
+                diff.deleted_file = True
+
+            elif unstaged == 'A':
+                diff.new_file = True
+
+            self.all_unstaged_diffs[ path ] = diff
+
+    def __blob( self, repo, hexsha, mode, name ):
+        if hexsha == null_hexsha:
+            return None
+
+        return git.Blob( repo, binascii.unhexlify( hexsha ), int( mode, 8 ), name )
@@ -11,11 +11,13 @@
 
 '''
 import sys
+import time
 import pathlib
 
 import wb_log_history_options_dialog
 import wb_ui_actions
 import wb_common_dialogs
+import wb_main_window
 
 import wb_git_project
 import wb_git_status_view
@@ -25,6 +27,12 @@ import wb_git_stash_dialogs
 
 from wb_background_thread import thread_switcher
 
+# the predicate of the smart diff for WbSelectionFacts
+def canDiffSmart( file_state ):
+    return (file_state.canDiffStagedVsWorking()
+            or file_state.canDiffHeadVsWorking()
+            or file_state.canDiffHeadVsStaged())
+
 #
 #   Start with the main window components interface
 #   and add actions used by the main window
@@ -68,19 +76,13 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
             return False
 
         elif focus == 'table':
-            all_file_states = self.tableSelectedAllFileStates()
-            if len(all_file_states) == 0:
-                return False
-
-            for obj in all_file_states:
-                if not predicate( obj ):
-                    return False
-
-            return True
+            facts = self.tableSelectionFacts()
+            return len(facts) > 0 and facts.all( predicate )
 
         else:
             return False
 
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerGitStashSave( self ):
         # enable if any files staged
         git_project = self.selectedGitProject()
@@ -95,6 +97,7 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
 
         return True
 
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerGitStashPop( self ):
         # enable if any files staged
         git_project = self.selectedGitProject()
@@ -129,47 +132,15 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
 
         elif focus == 'table':
             # make sure all the selected entries is modified
-            all_file_states = self.tableSelectedAllFileStates()
-            enable = True
-            for obj in all_file_states:
-                if not predicate( obj ):
-                    enable = False
-                    break
-
-            return enable
+            return self.tableSelectionFacts().all( predicate )
 
         else:
             return False
 
     def enablerGitDiffSmart( self ):
-        if not self.main_window.isScmTypeActive( 'git' ):
-            return False
-
-        focus = self.main_window.focusIsIn()
-
-        if focus == 'tree':
-            git_project = self.selectedGitProject()
-            if git_project is None:
-                return False
-
-            return git_project.hasCommits()
-
-        elif focus == 'table':
-            # make sure all the selected entries is modified
-            all_file_states = self.tableSelectedAllFileStates()
-            enable = True
-            for obj in all_file_states:
-                if not (obj.canDiffStagedVsWorking()
-                        or obj.canDiffHeadVsWorking()
-                        or obj.canDiffHeadVsStaged()):
-                    enable = False
-                    break
-
-            return enable
-
-        else:
-            return False
+        return self.__enablerDiff( canDiffSmart )
 
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerGitCommit( self ):
         # enable if any files staged
         git_project = self.selectedGitProject()
@@ -197,14 +168,17 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
         self.log.error( '    numStagedFiles -> %r' % (git_project.numStagedFiles(),) )
         self.log.error( '  numModifiedFiles -> %r' % (git_project.numModifiedFiles(),) )
 
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerGitPush( self ):
         git_project = self.selectedGitProject()
         return git_project is not None and git_project.canPush()
 
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerGitPull( self ):
         git_project = self.selectedGitProject()
         return git_project is not None and git_project.canPull()
 
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerGitLogHistory( self ):
         return True
 
@@ -252,27 +226,27 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
         if tree_node is None:
             return
 
-        diff_text = tree_node.project.cmdDiffFolder( tree_node.relativePath(), head=False, staged=False )
-        self.showDiffText( T_('Diff Staged vs. Working for %s') %
-                                        (tree_node.relativePath(),), diff_text.split('\n') )
+        diff_output = tree_node.project.cmdDiffFolderIncremental( tree_node.relativePath(), head=False, staged=False )
+        self.app.wrapWithThreadSwitcher( self.showDiffOutput_Bg, 'diff folder', serial_key=tree_node.project.projectName() )(
+                T_('Diff Staged vs. Working for %s') % (tree_node.relativePath(),), diff_output )
 
     def treeActionGitDiffHeadVsStaged( self ):
         tree_node = self.selectedGitProjectTreeNode()
         if tree_node is None:
             return
 
-        diff_text = tree_node.project.cmdDiffFolder( tree_node.relativePath(), head=True, staged=True )
-        self.showDiffText( T_('Diff Head vs. Staged for %s') %
-                                        (tree_node.relativePath(),), diff_text.split('\n') )
+        diff_output = tree_node.project.cmdDiffFolderIncremental( tree_node.relativePath(), head=True, staged=True )
+        self.app.wrapWithThreadSwitcher( self.showDiffOutput_Bg, 'diff folder', serial_key=tree_node.project.projectName() )(
+                T_('Diff Head vs. Staged for %s') % (tree_node.relativePath(),), diff_output )
 
     def treeActionGitDiffHeadVsWorking( self ):
         tree_node = self.selectedGitProjectTreeNode()
         if tree_node is None:
             return
 
-        diff_text = tree_node.project.cmdDiffFolder( tree_node.relativePath(), head=True, staged=False )
-        self.showDiffText( T_('Diff Head vs. Working for %s') %
-                                        (tree_node.relativePath(),), diff_text.split('\n') )
+        diff_output = tree_node.project.cmdDiffFolderIncremental( tree_node.relativePath(), head=True, staged=False )
+        self.app.wrapWithThreadSwitcher( self.showDiffOutput_Bg, 'diff folder', serial_key=tree_node.project.projectName() )(
+                T_('Diff Head vs. Working for %s') % (tree_node.relativePath(),), diff_output )
 
     def __logGitCommandError( self, e ):
         self.log.error( "'%s' returned with exit code %i" %
@@ -483,20 +457,20 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
     @thread_switcher
     def tableActionGitStage_Bg( self, checked=None ):
         self.debugLog( 'tableActionGitStage_Bg start' )
-        yield from self._tableActionChangeRepo_Bg( self._actionGitStage )
+        yield from self._tableActionChangeRepo_Bg( self._actionGitStageAll, all_at_once=True )
         self.debugLog( 'tableActionGitStage_Bg done' )
 
     @thread_switcher
     def tableActionGitUnstage_Bg( self, checked=None ):
-        yield from self._tableActionChangeRepo_Bg( self._actionGitUnstage )
+        yield from self._tableActionChangeRepo_Bg( self._actionGitUnstageAll, all_at_once=True )
 
     @thread_switcher
     def tableActionGitRevert_Bg( self, checked=None ):
-        yield from self._tableActionChangeRepo_Bg( self._actionGitRevert, self._areYouSureRevert )
+        yield from self._tableActionChangeRepo_Bg( self._actionGitRevertAll, self._areYouSureRevert, all_at_once=True )
 
     @thread_switcher
     def tableActionGitDelete_Bg( self, checked=None ):
-        yield from self._tableActionChangeRepo_Bg( self._actionGitDelete, self._areYouSureDelete )
+        yield from self._tableActionChangeRepo_Bg( self._actionGitDeleteAll, self._areYouSureDelete, all_at_once=True )
 
     @thread_switcher
     def tableActionGitRename_Bg( self, checked=None ):
@@ -534,38 +508,51 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
 
         yield from commit_log_view.showCommitLogForFile_Bg( git_project, filename, options )
 
-    def _actionGitStage( self, git_project, filename ):
-        self.debugLog( '_actionGitStage( %r, %s )' )
-        git_project.cmdStage( filename )
+    def _actionGitStageAll( self, git_project, all_filenames ):
+        self.debugLog( '_actionGitStageAll( %r, %d files )' % (git_project, len(all_filenames)) )
+        git_project.cmdStageFiles( all_filenames )
+
+    def _actionGitUnstageAll( self, git_project, all_filenames ):
+        self.debugLog( '_actionGitUnstageAll( %r, %d files )' % (git_project, len(all_filenames)) )
+        git_project.cmdUnstageFiles( 'HEAD', all_filenames )
+
+    def _actionGitRevertAll( self, git_project, all_filenames ):
+        all_to_staged = []
+        all_to_head = []
+        for filename in all_filenames:
+            file_state = git_project.getFileState( filename )
+            if( file_state.isStagedModified()
+            and (file_state.isUnstagedModified()
+                or file_state.isUnstagedDeleted()) ):
+                # revert to staged (--)
+                all_to_staged.append( file_state )
 
-    def _actionGitUnstage( self, git_project, filename ):
-        self.debugLog( '_actionGitUnstage( %r, %s )' )
-        git_project.cmdUnstage( 'HEAD', filename )
+            else:
+                # revert to HEAD
+                all_to_head.append( file_state )
 
-    def _actionGitRevert( self, git_project, filename ):
-        file_state = git_project.getFileState( filename )
-        if( file_state.isStagedModified()
-        and (file_state.isUnstagedModified()
-            or file_state.isUnstagedDeleted()) ):
-            # revert to staged (--)
-            git_project.cmdRevert( '--', filename )
+        if len(all_to_staged) > 0:
+            git_project.cmdRevertFiles( '--', all_to_staged )
 
-        else:
-            # revert to HEAD
-            git_project.cmdRevert( 'HEAD', file_state )
+        if len(all_to_head) > 0:
+            git_project.cmdRevertFiles( 'HEAD', all_to_head )
 
-    def _actionGitDelete( self, git_project, filename ):
-        file_state = git_project.getFileState( filename )
-        if file_state.isControlled():
-            git_project.cmdDelete( filename )
+    def _actionGitDeleteAll( self, git_project, all_filenames ):
+        all_controlled = []
+        for filename in all_filenames:
+            file_state = git_project.getFileState( filename )
+            if file_state.isControlled():
+                all_controlled.append( filename )
 
-        else:
-            try:
-                file_state.absolutePath().unlink()
+            else:
+                try:
+                    file_state.absolutePath().unlink()
 
-            except IOError as e:
-                self.log.error( 'Error deleting %s' % (filename,) )
-                self.log.error( str(e) )
+                except IOError as e:
+                    self.log.error( 'Error deleting %s' % (filename,) )
+                    self.log.error( str(e) )
+
+        git_project.cmdDeleteFiles( all_controlled )
 
 
     def _actionGitRename( self, git_project, filename ):
@@ -591,34 +578,61 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
     def _actionGitDiffHeadVsWorking( self, git_project, filename ):
         file_state = git_project.getFileState( filename )
 
+        title = T_('Diff HEAD vs. Work %s') % (filename,)
+        header_left = T_('HEAD %s') % (filename,)
+        header_right = T_('Work %s') % (filename,)
+
+        # the blob ids are compared before reading the text
+        if file_state.isWorkingSameAsHead():
+            self.showIdenticalFiles( title, file_state.getTextLinesWorking(), header_left, header_right )
+            return
+
         self.diffTwoFiles(
-                T_('Diff HEAD vs. Work %s') % (filename,),
+                title,
                 file_state.getTextLinesHead(),
                 file_state.getTextLinesWorking(),
-                T_('HEAD %s') % (filename,),
-                T_('Work %s') % (filename,)
+                header_left,
+                header_right
                 )
 
     def _actionGitDiffStagedVsWorking( self, git_project, filename ):
         file_state = git_project.getFileState( filename )
 
+        title = T_('Diff Staged vs. Work %s') % (filename,)
+        header_left = T_('Staged %s') % (filename,)
+        header_right = T_('Work %s') % (filename,)
+
+        if file_state.isWorkingSameAsStaged():
+            self.showIdenticalFiles( title, file_state.getTextLinesWorking(), header_left, header_right )
+            return
+
         self.diffTwoFiles(
-                T_('Diff Staged vs. Work %s') % (filename,),
+                title,
                 file_state.getTextLinesStaged(),
                 file_state.getTextLinesWorking(),
-                T_('Staged %s') % (filename,),
-                T_('Work %s') % (filename,)
+                header_left,
+                header_right
                 )
 
     def _actionGitDiffHeadVsStaged( self, git_project, filename ):
         file_state = git_project.getFileState( filename )
 
+        title = T_('Diff HEAD vs. Staged %s') % (filename,)
+        header_left = T_('HEAD %s') % (filename,)
+        header_right = T_('Staged %s') % (filename,)
+
+        if file_state.isHeadSameAsStaged():
+            self.showIdenticalFiles( title, file_state.getTextLinesStaged(), header_left, header_right )
+            return
+
+        text_head, text_staged = file_state.getTextLinesHeadAndStaged()
+
         self.diffTwoFiles(
-                T_('Diff HEAD vs. Staged %s') % (filename,),
-                file_state.getTextLinesHead(),
-                file_state.getTextLinesStaged(),
-                T_('HEAD %s') % (filename,),
-                T_('Staged %s') % (filename,)
+                title,
+                text_head,
+                text_staged,
+                header_left,
+                header_right
                 )
 
     #------------------------------------------------------------
@@ -629,10 +643,10 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
         return wb_common_dialogs.WbAreYouSureDelete( self.main_window, all_filenames )
 
     @thread_switcher
-    def _tableActionChangeRepo_Bg( self, execute_function, are_you_sure_function=None ):
+    def _tableActionChangeRepo_Bg( self, execute_function, are_you_sure_function=None, all_at_once=False ):
         self.debugLog( '_tableActionChangeRepo_Bg start' )
 
-        yield from self.table_view.tableActionViewRepo_Bg( execute_function, are_you_sure_function, self._tableActionChangeRepo_finalise_Bg )
+        yield from self.table_view.tableActionViewRepo_Bg( execute_function, are_you_sure_function, self._tableActionChangeRepo_finalise_Bg, all_at_once )
         self.debugLog( '_tableActionChangeRepo_Bg done' )
 
     @thread_switcher
@@ -684,38 +698,93 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
     @thread_switcher
     def __actionGitAnnotate_Bg( self, git_project, filename ):
         self.setStatusAction( T_('Annotate %s') % (filename,) )
-        self.progress.start( T_('Annotate %(count)d'), 0 )
 
         yield self.switchToBackground
 
-        # when we know that exception can be raised catch it...
-        all_annotation_nodes = git_project.cmdAnnotationForFile( filename )
+        repo_key = str( git_project.projectPath() )
+        rev_key = git_project.annotateRevisionKey( filename )
 
-        all_annotate_commit_ids = set()
-        for node in all_annotation_nodes:
-            all_annotate_commit_ids.add( node.log_id )
+        cached_annotation = self.app.annotate_cache.get( 'git', repo_key, filename, rev_key )
+        if cached_annotation is not None:
+            all_annotation_nodes, all_commit_logs = cached_annotation
 
-        yield self.switchToForeground
+            yield self.switchToForeground
 
-        self.progress.end()
-        self.progress.start( T_('Annotate Commit Logs %(count)d'), 0 )
+            self.setStatusAction()
 
-        yield self.switchToBackground
+            annotate_view = wb_git_annotate.WbGitAnnotateView(
+                                self.app,
+                                T_('Annotation of %s') % (filename,) )
+            annotate_view.showAnnotationForFile( all_annotation_nodes, all_commit_logs )
+            annotate_view.show()
+            return
 
         # when we know that exception can be raised catch it...
-        all_commit_logs = git_project.cmdCommitLogForAnnotateFile( filename, all_annotate_commit_ids )
+        all_annotation_nodes = git_project.cmdAnnotationLinesForFile( filename )
+        all_blame_groups = git_project.cmdAnnotationGroupsForFile( filename )
 
         yield self.switchToForeground
 
-        self.setStatusAction()
-        self.progress.end()
-
+        # show the text now and fill in the annotation as git blame finds it
         annotate_view = wb_git_annotate.WbGitAnnotateView(
                             self.app,
                             T_('Annotation of %s') % (filename,) )
-        annotate_view.showAnnotationForFile( all_annotation_nodes, all_commit_logs )
+        annotate_view.showAnnotationForFile( all_annotation_nodes, {} )
         annotate_view.show()
 
+        self.progress.start( T_('Annotate %(count)d of %(total)d lines'), len(all_annotation_nodes) )
+
+        all_commit_logs = []
+        blame_iter = iter( all_blame_groups )
+        blame_done = False
+        while not blame_done:
+            yield self.switchToBackground
+
+            all_row_ranges = []
+            all_new_commit_logs = {}
+
+            # update the view a few times a second
+            end_time = time.time() + 0.25
+            blame_done = True
+            for group in blame_iter:
+                if group.all_headers is not None:
+                    commit_log = git_project.commitLogNodeForBlameGroup( group )
+                    all_new_commit_logs[ group.commit_id ] = commit_log
+                    all_commit_logs.append( commit_log )
+
+                all_row_ranges.append( (group.final_line-1, group.num_lines, group.commit_id) )
+
+                if time.time() > end_time:
+                    blame_done = False
+                    break
+
+            yield self.switchToForeground
+
+            if not annotate_view.isVisible():
+                # the view was closed before blame finished
+                all_blame_groups.close()
+                self.setStatusAction()
+                self.progress.end()
+                return
+
+            annotate_view.updateAnnotationForFile( all_row_ranges, all_new_commit_logs )
+            self.progress.incEventCount( sum( num_lines for first_row, num_lines, log_id in all_row_ranges ) )
+
+        yield self.switchToBackground
+
+        # blame only has the first line of the commit messages
+        git_project.cmdUpdateCommitLogMessages( all_commit_logs )
+
+        self.app.annotate_cache.put( 'git', repo_key, filename, rev_key, all_annotation_nodes,
+                                    dict( (commit_log.commitId(), commit_log) for commit_log in all_commit_logs ) )
+
+        yield self.switchToForeground
+
+        self.setStatusAction()
+        self.progress.end()
+
+        annotate_view.completeAnnotationForFile()
+
     commit_key = 'git-commit-dialog'
     def treeActionGitCommit( self ):
         if self.app.hasSingleton( self.commit_key ):
@@ -726,7 +795,7 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
         git_project = self.selectedGitProject()
 
         commit_dialog = wb_git_commit_dialog.WbGitCommitDialog( self.app, git_project )
-        commit_dialog.commitAccepted.connect( self.app.wrapWithThreadSwitcher( self.__commitAccepted_Bg ) )
+        commit_dialog.commitAccepted.connect( self.app.wrapWithThreadSwitcher( self.__commitAccepted_Bg, 'commit', serial_key=git_project.projectName() ) )
         commit_dialog.commitClosed.connect( self.__commitClosed )
 
         # show to the user
@@ -771,29 +840,30 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
     #============================================================
     @thread_switcher
     def tableActionGitStageAndInclude_Bg( self, checked=None ):
-        yield from self._tableActionChangeRepo_Bg( self._actionGitStageAndInclude )
+        yield from self._tableActionChangeRepo_Bg( self._actionGitStageAndIncludeAll, all_at_once=True )
 
-    def _actionGitStageAndInclude( self, git_project, filename ):
-        self._actionGitStage( git_project, filename )
-        self.main_window.all_included_files.add( filename )
+    def _actionGitStageAndIncludeAll( self, git_project, all_filenames ):
+        self._actionGitStageAll( git_project, all_filenames )
+        self.main_window.all_included_files.update( all_filenames )
 
     @thread_switcher
     def tableActionGitUnstageAndExclude_Bg( self, checked=None ):
-        yield from self._tableActionChangeRepo_Bg( self._actionGitUnstageAndExclude )
+        yield from self._tableActionChangeRepo_Bg( self._actionGitUnstageAndExcludeAll, all_at_once=True )
 
-    def _actionGitUnstageAndExclude( self, git_project, filename ):
-        self._actionGitUnstage( git_project, filename )
-        self.main_window.all_included_files.discard( filename )
+    def _actionGitUnstageAndExcludeAll( self, git_project, all_filenames ):
+        self._actionGitUnstageAll( git_project, all_filenames )
+        self.main_window.all_included_files.difference_update( all_filenames )
 
     @thread_switcher
     def tableActionGitRevertAndExclude_Bg( self, checked=None ):
-        yield from self._tableActionChangeRepo_Bg( self._actionGitRevertAndExclude, self._areYouSureRevert )
+        yield from self._tableActionChangeRepo_Bg( self._actionGitRevertAndExcludeAll, self._areYouSureRevert, all_at_once=True )
 
-    def _actionGitRevertAndExclude( self, git_project, filename ):
-        self._actionGitRevert( git_project, filename )
+    def _actionGitRevertAndExcludeAll( self, git_project, all_filenames ):
+        self._actionGitRevertAll( git_project, all_filenames )
 
-        if not git_project.getFileState( filename ).canCommit():
-            self.main_window.all_included_files.discard( filename )
+        for filename in all_filenames:
+            if not git_project.getFileState( filename ).canCommit():
+                self.main_window.all_included_files.discard( filename )
 
     @thread_switcher
     def tableActionCommitInclude_Bg( self, checked ):
@@ -848,13 +918,14 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
         else:
             assert False, 'focus not as expected: %r' % (focus,)
 
-    def tableActionGitDiffLogHistory( self ):
+    @thread_switcher
+    def tableActionGitDiffLogHistory_Bg( self, checked=None ):
         focus = self.main_window.focusIsIn()
         if focus == 'commits':
-            self.diffLogHistory()
+            yield from self.diffLogHistory_Bg()
 
         elif focus == 'changes':
-            self.diffFileChanges()
+            yield from self.diffFileChanges_Bg()
 
         else:
             assert False, 'focus not as expected: %r' % (focus,)
@@ -867,7 +938,8 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
         else:
             return False
 
-    def diffLogHistory( self ):
+    @thread_switcher
+    def diffLogHistory_Bg( self ):
         mw = self.main_window
 
         #
@@ -918,12 +990,30 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
 
         heading_old = T_('commit %(commit_old)s date %(date_old)s') % title_vars
 
+        self.setStatusAction( title )
+
         #
         #   figure out the text to diff
         #
         if mw.filename is not None:
             filestate = mw.git_project.getFileState( mw.filename )
 
+            yield self.switchToBackground
+
+            # compare the blob ids before reading any text
+            if commit_new is None:
+                blob_id_old, = filestate.getBlobIdsForCommits( [commit_old] )
+                if filestate.isStagedModified():
+                    is_identical = filestate.getStagedBlob().hexsha == blob_id_old
+
+                else:
+                    is_identical = filestate.isWorkingSameAs( blob_id_old )
+
+            else:
+                blob_id_old, blob_id_new = filestate.getBlobIdsForCommits( [commit_old, commit_new] )
+                is_identical = blob_id_old == blob_id_new
+
+            # only one side is read when they are the same
             if commit_new is None:
                 if filestate.isStagedModified():
                     text_new = filestate.getTextLinesStaged()
@@ -932,29 +1022,47 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
                     # either we want HEAD or the modified working
                     text_new = filestate.getTextLinesWorking()
 
-            else:
+                if not is_identical:
+                    text_old = filestate.getTextLinesForCommit( commit_old )
+
+            elif is_identical:
                 text_new = filestate.getTextLinesForCommit( commit_new )
 
-            text_old = filestate.getTextLinesForCommit( commit_old )
+            else:
+                text_old, text_new = filestate.getTextLinesForCommits( [commit_old, commit_new] )
 
-            self.diffTwoFiles(
-                    title,
-                    text_old,
-                    text_new,
-                    heading_old,
-                    heading_new
-                    )
+            yield self.switchToForeground
+
+            if is_identical:
+                self.showIdenticalFiles( title, text_new, heading_old, heading_new )
+
+            else:
+                yield from self.diffTwoFiles_Bg(
+                        title,
+                        text_old,
+                        text_new,
+                        heading_old,
+                        heading_new
+                        )
 
         else: # folder
+            yield self.switchToBackground
+
             if commit_new is None:
-                text = mw.git_project.cmdDiffWorkingVsCommit( pathlib.Path('.'), commit_old )
-                self.showDiffText( title, text.split('\n') )
+                all_diff_output = mw.git_project.cmdDiffWorkingVsCommitIncremental( pathlib.Path('.'), commit_old )
 
             else:
-                text = mw.git_project.cmdDiffCommitVsCommit( pathlib.Path('.'), commit_old, commit_new )
-                self.showDiffText( title, text.split('\n') )
+                all_diff_output = mw.git_project.cmdDiffCommitVsCommitIncremental( pathlib.Path('.'), commit_old, commit_new )
+
+            yield self.switchToForeground
+
+            # show the diff as git produces it
+            yield from self.showDiffOutput_Bg( title, all_diff_output )
 
-    def diffFileChanges( self ):
+        self.setStatusAction()
+
+    @thread_switcher
+    def diffFileChanges_Bg( self ):
         mw = self.main_window
 
         #QQQ:return an object - pylint does not do this
@@ -975,16 +1083,34 @@ class GitMainWindowActions(wb_ui_actions.WbMainWindowActions):
 
         filepath = pathlib.Path( filename )
 
-        text_new = mw.git_project.getTextLinesForCommit( filepath, commit_new )
-        text_old = mw.git_project.getTextLinesForCommit( filepath, commit_old )
+        self.setStatusAction( title )
 
-        self.diffTwoFiles(
-                title,
-                text_old,
-                text_new,
-                heading_old,
-                heading_new
-                )
+        yield self.switchToBackground
+
+        # a change of mode only has the same blob on both sides
+        blob_id_old, blob_id_new = mw.git_project.getBlobIdsForCommits( filepath, [commit_old, commit_new] )
+        is_identical = blob_id_old == blob_id_new
+        if is_identical:
+            text_new = mw.git_project.getTextLinesForCommit( filepath, commit_new )
+
+        else:
+            text_old, text_new = mw.git_project.getTextLinesForCommits( filepath, [commit_old, commit_new] )
+
+        yield self.switchToForeground
+
+        if is_identical:
+            self.showIdenticalFiles( title, text_new, heading_old, heading_new )
+
+        else:
+            yield from self.diffTwoFiles_Bg(
+                    title,
+                    text_old,
+                    text_new,
+                    heading_old,
+                    heading_new
+                    )
+
+        self.setStatusAction()
 
     def annotateLogHistory( self ):
         self.log.error( 'annotateLogHistory TBD' )
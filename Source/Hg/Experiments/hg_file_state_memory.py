@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+#
+#   hg_file_state_memory.py
+#
+#   Compare the memory used and the time taken by a full garbage
+#   collection for the file states of a very large working copy:
+#
+#       legacy  - dict backed objects with the attributes WbHgFileState had
+#       current - WbHgFileState with __slots__
+#
+#   usage: hg_file_state_memory.py [<num-files>]
+#
+import sys
+
+sys.path.insert( 0, '..' )
+sys.path.insert( 0, '../../Common' )
+sys.path.insert( 0, '../../Common/Experiments' )
+
+import file_state_memory
+
+import wb_hg_project
+
+class FakeProject:
+    pass
+
+class LegacyFileState:
+    def __init__( self, project, filepath ):
+        self.project = project
+        self.filepath = filepath
+        self.is_dir = False
+        self.state = ''
+        self.nodeid = None
+        self.permission = None
+        self.executable = None
+        self.symlink = None
+
+    def setManifest( self, nodeid, permission, executable, symlink ):
+        self.nodeid = nodeid.decode('utf-8')
+        self.permission = permission
+        self.executable = executable
+        self.symlink = symlink
+
+    def setState( self, state ):
+        self.state = state
+
+def makeFileStates( file_state_class, project, all_paths ):
+    all_file_state = {}
+    for index, path in enumerate( all_paths ):
+        file_state = file_state_class( project, path )
+        file_state.setManifest( b'%040x' % (index,), 0o644, False, False )
+        # one in ten files is modified
+        file_state.setState( 'M' if index % 10 == 0 else 'C' )
+        all_file_state[ path ] = file_state
+
+    return all_file_state
+
+if __name__ == '__main__':
+    sys.exit( file_state_memory.main( sys.argv, 'hg', makeFileStates,
+                FakeProject(), LegacyFileState, wb_hg_project.WbHgFileState ) )
@@ -15,6 +15,7 @@ from PyQt5 import QtWidgets
 from PyQt5 import QtGui
 from PyQt5 import QtCore
 
+import wb_profile
 import wb_tracked_qwidget
 import wb_main_window
 import wb_ui_components
@@ -276,6 +277,7 @@ class WbLogTableView(wb_table_view.WbTableView):
 
         self.main_window.setFocusIsIn( 'commits' )
 
+@wb_profile.profileModelResets
 class WbHgLogHistoryModel(QtCore.QAbstractTableModel):
     col_author = 0
     col_date = 1
@@ -403,6 +405,7 @@ class WbChangesTableView(wb_table_view.WbTableView):
 
         self.main_window.setFocusIsIn( 'changes' )
 
+@wb_profile.profileModelResets
 class WbHgChangedFilesModel(QtCore.QAbstractTableModel):
     col_action = 0
     col_path = 1
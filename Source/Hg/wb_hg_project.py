@@ -15,8 +15,11 @@ import pathlib
 import sys
 import pytz
 
+import wb_profile
+import wb_read_file
 import wb_background_thread
 import wb_annotate_node
+import wb_platform_specific
 
 import hglib
 import hglib.util
@@ -42,6 +45,7 @@ def HgVersion():
     # assume first line is has the critical version info
     return out.decode( 'utf-8' ).split('\n')[0]
 
+@wb_profile.profileMethods( 'cmd', 'updateState' )
 class HgProject:
     def __init__( self, app, prefs_project, ui_components ):
         self.app = app
@@ -129,6 +133,19 @@ class HgProject:
     def numModifiedFiles( self ):
         return self.__num_modified_files
 
+    def usesDirtyPaths( self ):
+        return False
+
+    def noteDirtyPaths( self, all_dirty_paths ):
+        # hg status always checks the whole working copy
+        pass
+
+    def close( self ):
+        # stop the hg command server
+        if self.__repo is not None:
+            self.__repo.close()
+            self.__repo = None
+
     def updateState( self, tree_leaf ):
         # rebuild the tree
         self.tree = HgProjectTreeNode( self, self.prefs_project.name, pathlib.Path( '.' ) )
@@ -311,10 +328,22 @@ class HgProject:
     def cmdDelete( self, filename ):
         self.repo().delete( self.pathForHg( filename ) )
 
+    def cmdAddFiles( self, all_filenames ):
+        for all_paths in wb_platform_specific.chunkCommandLinePaths( [self.pathForHg( filename ) for filename in all_filenames] ):
+            self.repo().add( all_paths )
+
+    def cmdRevertFiles( self, all_filenames ):
+        for all_paths in wb_platform_specific.chunkCommandLinePaths( [self.pathForHg( filename ) for filename in all_filenames] ):
+            self.repo().revert( all_paths )
+
     def cmdDiffFolder( self, folder ):
         text = self.repo().diff( [self.pathForHg( folder )] )
         return text.decode( 'utf-8' )
 
+    def cmdDiffFolderOutput( self, folder ):
+        # the bytes of the diff output for the unified diff view to decode as it shows lines
+        return self.repo().diff( [self.pathForHg( folder )] )
+
     def cmdDiffWorkingVsCommit( self, filename, commit ):
         text = self.repo().diff( [self.pathForHg( filename )], revs='%d' % (commit,) )
         return text.decode( 'utf-8' )
@@ -340,6 +369,14 @@ class HgProject:
 
         return all_annotate_nodes
 
+    def annotateRevisionKey( self, filename ):
+        # annotate is of the parent of the working directory
+        all_parents = self.repo().parents()
+        if all_parents is None:
+            return None
+
+        return all_parents[0].node.decode( 'utf-8' )
+
     def cmdCommitLogForAnnotateFile( self, filename, all_revs ):
         all_commit_logs = {}
 
@@ -362,9 +399,7 @@ class HgProject:
         else:
             date = None
 
-        all_logs = [WbHgLogFull( data, self.repo() ) for data in self.repo().log( limit=limit, date=date )]
-
-        return all_logs
+        return self.__commitLogsWithChanges( self.repo().log( limit=limit, date=date ) )
 
     def cmdCommitLogForFile( self, filename, limit=None, since=None, until=None ):
         if since is not None and until is not None:
@@ -379,8 +414,28 @@ class HgProject:
         else:
             date = None
 
-        all_logs = [WbHgLogFull( data, self.repo() )
-                    for data in self.repo().log( files=[self.pathForHg( filename )], limit=limit, date=date )]
+        return self.__commitLogsWithChanges( self.repo().log( files=[self.pathForHg( filename )], limit=limit, date=date ) )
+
+    def __commitLogsWithChanges( self, all_log_data ):
+        # the changes depend on the local revision numbers so are cached per repo
+        cache = self.app.commit_changes_cache
+        repo_key = str( self.projectPath() )
+
+        all_cached_changes = cache.getMany( 'hg', repo_key, [data.node.decode( 'utf-8' ) for data in all_log_data] )
+
+        all_logs = []
+        all_new_changes = {}
+        for data in all_log_data:
+            node = data.node.decode( 'utf-8' )
+            if node in all_cached_changes:
+                all_logs.append( WbHgLogFull( data, self.repo(), [tuple( change ) for change in all_cached_changes[ node ]] ) )
+
+            else:
+                log = WbHgLogFull( data, self.repo() )
+                all_new_changes[ node ] = log.all_changed_files
+                all_logs.append( log )
+
+        cache.putMany( 'hg', repo_key, all_new_changes )
 
         return all_logs
 
@@ -587,9 +642,13 @@ class WbHgLogBasic:
         return '%d:%s' % (self.rev, self.node)
 
 class WbHgLogFull(WbHgLogBasic):
-    def __init__( self, data, repo ):
+    def __init__( self, data, repo, all_changed_files=None ):
         super().__init__( data, repo )
 
+        if all_changed_files is not None:
+            self.all_changed_files = all_changed_files
+            return
+
         if self.rev == 0:
             rev= '0'
         else:
@@ -598,6 +657,9 @@ class WbHgLogFull(WbHgLogBasic):
         self.all_changed_files = [(state.decode('utf-8'), path.decode('utf-8')) for state, path in repo.status( rev=rev )]
 
 class WbHgFileState:
+    # there is one WbHgFileState for each file in the working copy so keep them small
+    __slots__ = ('__project', '__filepath', '__is_dir', '__state', '__nodeid', '__permission', '__executable', '__symlink')
+
     def __init__( self, project : HgProject, filepath : 'pathlib.Path' ) -> None:
         self.__project = project
         self.__filepath = filepath
@@ -683,12 +745,12 @@ class WbHgFileState:
 
     def getTextLinesWorking( self ) -> List[str]:
         path = pathlib.Path( self.__project.projectPath() ) / self.__filepath
-        with path.open( encoding='utf-8' ) as f:
-            all_lines = f.read().split( '\n' )
-            if all_lines[-1] == '':
-                return all_lines[:-1]
-            else:
-                return all_lines
+        # like a file opened in text mode
+        all_lines = wb_read_file.readFileTextLines( path, universal_newlines=True )
+        if all_lines[-1] == '':
+            return all_lines[:-1]
+        else:
+            return all_lines
 
     def getTextLinesHead( self ) -> List[str]:
         return self.getTextLinesForRevision( 'tip' )
@@ -16,6 +16,7 @@ import pathlib
 import wb_log_history_options_dialog
 import wb_ui_actions
 import wb_common_dialogs
+import wb_main_window
 
 import wb_hg_commit_dialog
 import wb_hg_project
@@ -63,15 +64,8 @@ class HgMainWindowActions(wb_ui_actions.WbMainWindowActions):
             return True
 
         elif focus == 'table':
-            all_file_states = self.tableSelectedAllFileStates()
-            if len(all_file_states) == 0:
-                return False
-
-            for obj in all_file_states:
-                if not predicate( obj ):
-                    return False
-
-            return True
+            facts = self.tableSelectionFacts()
+            return len(facts) > 0 and facts.all( predicate )
 
         else:
             return False
@@ -89,41 +83,15 @@ class HgMainWindowActions(wb_ui_actions.WbMainWindowActions):
 
         elif focus == 'table':
             # make sure all the selected entries is modified
-            all_file_states = self.tableSelectedAllFileStates()
-            enable = True
-            for obj in all_file_states:
-                if not predicate( obj ):
-                    enable = False
-                    break
-
-            return enable
+            return self.tableSelectionFacts().all( predicate )
 
         else:
             return False
 
     def enablerHgDiffSmart( self ):
-        if not self.main_window.isScmTypeActive( 'hg' ):
-            return False
-
-        focus = self.main_window.focusIsIn()
-
-        if focus == 'tree':
-            return True
-
-        elif focus == 'table':
-            # make sure all the selected entries is modified
-            all_file_states = self.tableSelectedAllFileStates()
-            enable = True
-            for obj in all_file_states:
-                if not obj.canDiffHeadVsWorking():
-                    enable = False
-                    break
-
-            return enable
-
-        else:
-            return False
+        return self.__enablerDiff( wb_hg_project.WbHgFileState.canDiffHeadVsWorking )
 
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerHgCommit( self ):
         # enable if any files modified
         hg_project = self.selectedHgProject()
@@ -149,10 +117,12 @@ class HgMainWindowActions(wb_ui_actions.WbMainWindowActions):
         self.log.error( '     commit_dialog -> %r' % (self.app.hasSingleton( self.commit_key ),) )
         self.log.error( '  numModifiedFiles -> %r' % (hg_project.numModifiedFiles(),) )
 
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerHgPush( self ):
         hg_project = self.selectedHgProject()
         return hg_project is not None and hg_project.canPush()
 
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerHgLogHistory( self ):
         return True
 
@@ -210,9 +180,9 @@ class HgMainWindowActions(wb_ui_actions.WbMainWindowActions):
         if tree_node is None:
             return
 
-        diff_text = tree_node.project.cmdDiffFolder( tree_node.relativePath() )
-        self.showDiffText( T_('Diff Head vs. Working for %s') %
-                                        (tree_node.relativePath(),), diff_text.split('\n') )
+        diff_output = tree_node.project.cmdDiffFolderOutput( tree_node.relativePath() )
+        self.app.wrapWithThreadSwitcher( self.showDiffOutput_Bg, 'diff folder', serial_key=tree_node.project.projectName() )(
+                T_('Diff Head vs. Working for %s') % (tree_node.relativePath(),), [diff_output] )
 
     def __logHgCommandError( self, e ):
         if e.out:
@@ -352,11 +322,11 @@ class HgMainWindowActions(wb_ui_actions.WbMainWindowActions):
     # ------------------------------------------------------------
     @thread_switcher
     def tableActionHgAdd_Bg( self, checked=None ):
-        yield from self.__tableActionChangeRepo_Bg( self.__actionHgAdd )
+        yield from self.__tableActionChangeRepo_Bg( self.__actionHgAddAll, all_at_once=True )
 
     @thread_switcher
     def tableActionHgRevert_Bg( self, checked=None ):
-        yield from self.__tableActionChangeRepo_Bg( self.__actionHgRevert, self.__areYouSureRevert )
+        yield from self.__tableActionChangeRepo_Bg( self.__actionHgRevertAll, self.__areYouSureRevert, all_at_once=True )
 
     @thread_switcher
     def tableActionHgDelete_Bg( self, checked=None ):
@@ -370,11 +340,11 @@ class HgMainWindowActions(wb_ui_actions.WbMainWindowActions):
         self.debugLog( 'tableActionHgDiffHeadVsWorking()' )
         self.table_view.tableActionViewRepo( self.__actionHgDiffHeadVsWorking )
 
-    def __actionHgAdd( self, hg_project, filename ):
-        hg_project.cmdAdd( filename )
+    def __actionHgAddAll( self, hg_project, all_filenames ):
+        hg_project.cmdAddFiles( all_filenames )
 
-    def __actionHgRevert( self, hg_project, filename ):
-        hg_project.cmdRevert( filename )
+    def __actionHgRevertAll( self, hg_project, all_filenames ):
+        hg_project.cmdRevertFiles( all_filenames )
 
     def __actionHgDelete( self, hg_project, filename ):
         file_state = hg_project.getFileState( filename )
@@ -414,13 +384,13 @@ class HgMainWindowActions(wb_ui_actions.WbMainWindowActions):
         return wb_common_dialogs.WbAreYouSureDelete( self.main_window, all_filenames )
 
     @thread_switcher
-    def __tableActionChangeRepo_Bg( self, execute_function, are_you_sure_function=None ):
+    def __tableActionChangeRepo_Bg( self, execute_function, are_you_sure_function=None, all_at_once=False ):
         @thread_switcher
         def finalise( hg_project ):
             # take account of the change
             yield from self.top_window.updateTableView_Bg()
 
-        yield from self.table_view.tableActionViewRepo_Bg( execute_function, are_you_sure_function, finalise )
+        yield from self.table_view.tableActionViewRepo_Bg( execute_function, are_you_sure_function, finalise, all_at_once )
 
     # ------------------------------------------------------------
     def selectedHgProjectTreeNode( self ):
@@ -464,22 +434,32 @@ class HgMainWindowActions(wb_ui_actions.WbMainWindowActions):
 
         yield self.switchToBackground
 
-        # when we know that exception can be raised catch it...
-        all_annotation_nodes = hg_project.cmdAnnotationForFile( filename )
+        repo_key = str( hg_project.projectPath() )
+        rev_key = hg_project.annotateRevisionKey( filename )
 
-        all_annotate_revs = set()
-        for node in all_annotation_nodes:
-            all_annotate_revs.add( node.log_id )
+        cached_annotation = self.app.annotate_cache.get( 'hg', repo_key, filename, rev_key )
+        if cached_annotation is not None:
+            all_annotation_nodes, all_commit_logs = cached_annotation
 
-        yield self.switchToForeground
+        else:
+            # when we know that exception can be raised catch it...
+            all_annotation_nodes = hg_project.cmdAnnotationForFile( filename )
 
-        self.progress.end()
-        self.progress.start( T_('Annotate Commit Logs %(count)d'), 0 )
+            all_annotate_revs = set()
+            for node in all_annotation_nodes:
+                all_annotate_revs.add( node.log_id )
 
-        yield self.switchToBackground
+            yield self.switchToForeground
+
+            self.progress.end()
+            self.progress.start( T_('Annotate Commit Logs %(count)d'), 0 )
+
+            yield self.switchToBackground
+
+            # when we know that exception can be raised catch it...
+            all_commit_logs = hg_project.cmdCommitLogForAnnotateFile( filename, all_annotate_revs )
 
-        # when we know that exception can be raised catch it...
-        all_commit_logs = hg_project.cmdCommitLogForAnnotateFile( filename, all_annotate_revs )
+            self.app.annotate_cache.put( 'hg', repo_key, filename, rev_key, all_annotation_nodes, all_commit_logs )
 
         yield self.switchToForeground
 
@@ -502,7 +482,7 @@ class HgMainWindowActions(wb_ui_actions.WbMainWindowActions):
         hg_project = self.selectedHgProject()
 
         commit_dialog = wb_hg_commit_dialog.WbHgCommitDialog( self.app, hg_project )
-        commit_dialog.commitAccepted.connect( self.app.wrapWithThreadSwitcher( self.__commitAccepted_Bg ) )
+        commit_dialog.commitAccepted.connect( self.app.wrapWithThreadSwitcher( self.__commitAccepted_Bg, 'commit', serial_key=hg_project.projectName() ) )
         commit_dialog.commitClosed.connect( self.__commitClosed )
 
         # show to the user
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+#
+#   p4_file_state_memory.py
+#
+#   Compare the memory used and the time taken by a full garbage
+#   collection for the file states of a very large workspace:
+#
+#       legacy  - dict backed objects with the attributes WbP4FileState had
+#                 including the whole fstat of each file
+#       current - WbP4FileState with __slots__ that keeps only the depot file
+#
+#   usage: p4_file_state_memory.py [<num-files>]
+#
+import sys
+
+sys.path.insert( 0, '..' )
+sys.path.insert( 0, '../../Common' )
+sys.path.insert( 0, '../../Common/Experiments' )
+
+import file_state_memory
+
+import wb_p4_project
+
+class FakeRepo:
+    def is_ignored( self, path ):
+        return False
+
+class FakeProject:
+    def __init__( self ):
+        self.__repo = FakeRepo()
+
+    def debugLog( self, msg ):
+        pass
+
+    def repo( self ):
+        return self.__repo
+
+    def pathForP4( self, path ):
+        return str(path)
+
+class LegacyFileState:
+    def __init__( self, project, filepath ):
+        self.project = project
+        self.filepath = filepath
+        self.fstat = {}
+        self.is_dir = False
+        self.is_ignored = project.repo().is_ignored( project.pathForP4( filepath ) )
+        self.state = 'I' if self.is_ignored else ''
+
+    def setFStat( self, fstat ):
+        self.fstat = fstat
+        self.is_ignored = False
+        self.state = wb_p4_project.WbP4FileState.map_p4_action_to_state.get( self.fstat.get( 'action', '' ), '?' )
+
+def makeFStat( index, path ):
+    # the fields p4 fstat returns for a file
+    fstat = {'depotFile': '//depot/%s' % (path.as_posix(),)
+            ,'clientFile': '/workspace/%s' % (path.as_posix(),)
+            ,'isMapped': ''
+            ,'headAction': 'edit'
+            ,'headType': 'text'
+            ,'headTime': '%d' % (1500000000 + index,)
+            ,'headRev': '%d' % (1 + index % 7,)
+            ,'headChange': '%d' % (1000 + index // 10,)
+            ,'headModTime': '%d' % (1500000000 + index,)
+            ,'haveRev': '%d' % (1 + index % 7,)}
+    # one in ten files is opened
+    if index % 10 == 0:
+        fstat['action'] = 'edit'
+
+    return fstat
+
+def makeFileStates( file_state_class, project, all_paths ):
+    all_file_state = {}
+    for index, path in enumerate( all_paths ):
+        file_state = file_state_class( project, path )
+        file_state.setFStat( makeFStat( index, path ) )
+        all_file_state[ path ] = file_state
+
+    return all_file_state
+
+if __name__ == '__main__':
+    sys.exit( file_state_memory.main( sys.argv, 'p4', makeFileStates,
+                FakeProject(), LegacyFileState, wb_p4_project.WbP4FileState ) )
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+#
+#   p4_fstat_benchmark.py
+#
+#   Compare the number of server round trips and the time taken by:
+#
+#       opened  - cmdOpenedFiles, p4 opened then fstat of the opened files
+#       status  - updateState, fstat of each folder from the root to a leaf
+#
+#   before and after batching the fstat calls.
+#
+#   A stand-in for p4d answers opened and fstat from a workspace made in
+#   a temporary folder and sleeps for <latency-ms> on every round trip,
+#   which is the cost that batching saves on a real server.
+#
+#   usage: p4_fstat_benchmark.py [<num-opened>] [<depth>] [<latency-ms>]
+#
+import sys
+import time
+import pathlib
+import tempfile
+import builtins
+
+sys.path.insert( 0, '..' )
+sys.path.insert( 0, '../../Common' )
+
+builtins.T_ = lambda s: s
+
+import wb_p4_project
+
+files_per_folder = 50
+
+class FakeDebugOption:
+    def __call__( self, msg ):
+        pass
+
+    def isEnabled( self ):
+        return False
+
+class FakeDebug:
+    def __getattr__( self, name ):
+        return FakeDebugOption()
+
+class FakeLog:
+    def __getattr__( self, name ):
+        return print
+
+class FakeApp:
+    def __init__( self ):
+        self.debug_options = FakeDebug()
+        self.log = FakeLog()
+
+    def isForegroundThread( self ):
+        return False
+
+class FakePrefsProject:
+    def __init__( self, path ):
+        self.name = 'BenchmarkWorkspace'
+        self.path = path
+
+class StandInServer:
+    '''
+    answers the p4 commands used for status like p4d would
+    '''
+    def __init__( self, workspace, all_opened_files, latency ):
+        self.workspace = workspace
+        self.all_opened_files = set( all_opened_files )
+        self.latency = latency
+        self.round_trips = 0
+
+    def connected( self ):
+        return True
+
+    def connect( self ):
+        pass
+
+    def is_ignored( self, path ):
+        # P4Python checks P4IGNORE locally without a round trip
+        return False
+
+    def depotFile( self, path ):
+        return '//depot/%s' % (path.relative_to( self.workspace ).as_posix(),)
+
+    def clientFile( self, depot_file ):
+        return str( self.workspace / depot_file[len('//depot/'):] )
+
+    def fstat( self, path ):
+        fstat = {'depotFile': self.depotFile( path )
+                ,'clientFile': str( path )
+                ,'headAction': 'add'
+                ,'headRev': '1'}
+        if path in self.all_opened_files:
+            fstat['action'] = 'edit'
+
+        return fstat
+
+    def run( self, fn_name, *args, handler=None ):
+        self.round_trips += 1
+        time.sleep( self.latency )
+
+        if fn_name == 'opened':
+            return [{'depotFile': self.depotFile( path ), 'action': 'edit', 'rev': '1'}
+                    for path in sorted( self.all_opened_files )]
+
+        if fn_name == 'fstat':
+            all_fstat = []
+            for file_spec in args:
+                if file_spec.startswith( '-' ):
+                    continue
+
+                if file_spec.startswith( '//' ):
+                    all_fstat.append( self.fstat( pathlib.Path( self.clientFile( file_spec ) ) ) )
+
+                elif file_spec.endswith( '/*' ):
+                    folder = pathlib.Path( file_spec[:-2] )
+                    all_fstat.extend( self.fstat( path ) for path in sorted( folder.iterdir() ) if path.is_file() )
+
+            return all_fstat
+
+        raise ValueError( 'stand-in does not support %s' % (fn_name,) )
+
+def makeWorkspace( workspace, depth ):
+    all_files = []
+    folder = workspace
+    for level in range( depth ):
+        folder = folder / ('level-%02d' % (level,))
+        folder.mkdir()
+        for index in range( files_per_folder ):
+            path = folder / ('file-%04d.txt' % (index,))
+            path.write_text( 'file %d at level %d\n' % (index, level) )
+            all_files.append( path )
+
+    return folder, all_files
+
+def legacyOpenedFiles( server ):
+    # p4 opened then one fstat per opened file
+    all_opened_files = server.run( 'opened' )
+    for ofile in all_opened_files:
+        fstat = server.run( 'fstat', ofile[ 'depotFile' ] )[0]
+        ofile[ 'clientFile' ] = fstat[ 'clientFile' ]
+
+    return all_opened_files
+
+def legacyStatus( server, workspace, leaf ):
+    # one fstat per folder from the root to the leaf
+    all_folders = set( [workspace] )
+    folder = leaf
+    while folder != workspace:
+        all_folders.add( folder )
+        folder = folder.parent
+
+    all_fstat = []
+    for folder in all_folders:
+        all_fstat.extend( server.run( 'fstat', '-Rc', '%s/*' % (folder,) ) )
+
+    return all_fstat
+
+def timeIt( label, server, fn ):
+    server.round_trips = 0
+    start = time.time()
+    result = fn()
+    print( '    %-10s %8.3fs %6d round trips' % (label, time.time() - start, server.round_trips) )
+    return result
+
+def main( argv ):
+    num_opened = int( argv[1] ) if len(argv) > 1 else 500
+    depth = int( argv[2] ) if len(argv) > 2 else 10
+    latency = (float( argv[3] ) if len(argv) > 3 else 2.0) / 1000.0
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workspace = pathlib.Path( tmp_dir )
+        leaf, all_files = makeWorkspace( workspace, depth )
+        num_opened = min( num_opened, len(all_files) )
+        step = max( 1, len(all_files) // num_opened )
+
+        server = StandInServer( workspace, all_files[::step][:num_opened], latency )
+
+        project = wb_p4_project.P4Project( FakeApp(), FakePrefsProject( workspace ), None )
+        # talk to the stand-in instead of a p4d
+        project._P4Project__repo = server
+
+        print( 'opened: %d opened files' % (len(server.all_opened_files),) )
+        legacy = timeIt( 'legacy', server, lambda: legacyOpenedFiles( server ) )
+        batched = timeIt( 'batched', server, lambda: project.cmdOpenedFiles() )
+        assert [ofile['clientFile'] for ofile in legacy] == [ofile['clientFile'] for ofile in batched]
+
+        print( 'status: %d folders of %d files' % (depth+1, files_per_folder) )
+        timeIt( 'legacy', server, lambda: legacyStatus( server, workspace, leaf ) )
+        timeIt( 'batched', server, lambda: project.updateState( leaf.relative_to( workspace ) ) )
+        print( '    %d files, %d opened' % (len(project.all_file_state),
+                    sum( 1 for file_state in project.all_file_state.values() if file_state.isOpened() )) )
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit( main( sys.argv ) )
@@ -276,10 +276,10 @@ class WbP4ChangeDialog(wb_main_window.WbMainWindow, wb_tracked_qwidget.WbTracked
     def isScmTypeActive( self, scm_type ):
         return scm_type == 'p4'
 
-    def updateActionEnabledStates( self ):
+    def updateActionEnabledStates( self, all_changed=None ):
         # can be called during __init__ on macOS version
         if self.table_view is None or self.table_view.table_model is None:
             return
 
-        self.updateEnableStates()
+        self.updateEnableStates( all_changed=all_changed )
         self.enableOkButton()
@@ -15,6 +15,7 @@ from PyQt5 import QtWidgets
 from PyQt5 import QtGui
 from PyQt5 import QtCore
 
+import wb_profile
 import wb_tracked_qwidget
 import wb_main_window
 import wb_ui_components
@@ -297,6 +298,7 @@ class WbLogTableView(wb_table_view.WbTableView):
         self.main_window.ui_component.getTableContextMenu().exec_( global_pos )
 
 
+@wb_profile.profileModelResets
 class WbP4LogHistoryModel(QtCore.QAbstractTableModel):
     col_author = 0
     col_date = 1
@@ -432,6 +434,7 @@ class WbChangesTableView(wb_table_view.WbTableView):
 
         self.main_window.ui_component.getChangedFilesContextMenu().exec_( global_pos )
 
+@wb_profile.profileModelResets
 class WbP4ChangedFilesModel(QtCore.QAbstractTableModel):
     col_action = 0
     col_path = 1
@@ -17,8 +17,11 @@ import os
 import pytz
 import datetime
 
+import wb_profile
+import wb_read_file
 import wb_background_thread
 import wb_annotate_node
+import wb_platform_specific
 
 import P4
 
@@ -58,6 +61,7 @@ class SkipEmptyWarnings(ReportErrors):
 
         return super().outputMessage( e )
 
+@wb_profile.profileMethods( 'cmd', 'updateState' )
 class P4Project:
     def __init__( self, app, prefs_project, ui_components ):
         self.app = app
@@ -183,6 +187,16 @@ class P4Project:
     def numModifiedFiles( self ):
         return self.__num_modified_files
 
+    def usesDirtyPaths( self ):
+        return False
+
+    def noteDirtyPaths( self, all_dirty_paths ):
+        # the opened files are known to the server not the file system
+        pass
+
+    def close( self ):
+        pass
+
     def updateState( self, tree_leaf ):
         self.debugLog( '-'*80 )
         self.debugLog( 'updateState( %r ) repo=%s' % (tree_leaf, self.projectPath()) )
@@ -211,7 +225,7 @@ class P4Project:
         # incrementally update the file state
         self.debugLogTree( 'updateTreeNodeState( %r )' % (tree_node,) )
 
-        self.__calculateFolderStatus( tree_node.absolutePath() )
+        self.__calculateFoldersStatus( [tree_node.absolutePath()] )
 
         for path, file_state in self.all_file_state.items():
             self.__updateTree( path, file_state )
@@ -231,56 +245,86 @@ class P4Project:
 
         self.debugLogTree( '__calculateStatus() all_folders %r' % (all_folders,) )
 
-        while len(all_folders) > 0:
-            folder = all_folders.pop()
-            self.debugLogTree( '__calculateStatus() folder %s' % (folder,) )
+        self.__calculateFoldersStatus( sorted( all_folders ) )
 
-            self.__calculateFolderStatus( folder )
-
-    def __calculateFolderStatus( self, folder ):
-        self.debugLogTree( '__calculateFolderStatus( %s )' % (folder,) )
+    def __calculateFoldersStatus( self, all_folders ):
+        self.debugLogTree( '__calculateFoldersStatus( %r )' % (all_folders,) )
         repo_root = self.projectPath()
 
-        # files all the files in the folder
-        for filename in folder.iterdir():
-            abs_path = folder / filename
-            self.debugLogTree( '__calculateFolderStatus() abs_path %s' % (abs_path,) )
-
-            repo_relative = abs_path.relative_to( repo_root )
-
-            if abs_path.is_dir():
-                self.all_file_state[ repo_relative ] = WbP4FileState( self, repo_relative )
-                self.all_file_state[ repo_relative ].setIsDir()
+        for folder in all_folders:
+            # files all the files in the folder
+            for filename in folder.iterdir():
+                abs_path = folder / filename
+                self.debugLogTree( '__calculateFoldersStatus() abs_path %s' % (abs_path,) )
 
+                repo_relative = abs_path.relative_to( repo_root )
 
-            else:
-                if repo_relative not in self.all_file_state:
+                if abs_path.is_dir():
                     self.all_file_state[ repo_relative ] = WbP4FileState( self, repo_relative )
+                    self.all_file_state[ repo_relative ].setIsDir()
 
-        # get the p4 file status for all the files in this folder
-        try:
-            all_fstat = self._run( 'fstat', '-Rc', '%s/*' % (self.pathForP4( folder ),), handler=SkipEmptyWarnings( self.app.log ) )
-            # sometimes fstat returns False (??!)
-            if type(all_fstat) == bool:
-                all_fstat = []
+                else:
+                    if repo_relative not in self.all_file_state:
+                        self.all_file_state[ repo_relative ] = WbP4FileState( self, repo_relative )
 
-            for fstat in all_fstat:
-                # not interested in delete files
-                if fstat.get( 'headAction', '' ) in ('delete', 'move/delete'):
+        # get the p4 file status for all the files in all the folders
+        # with one fstat for as many folders as fit on the command line
+        all_file_specs = ['%s/*' % (self.pathForP4( folder ),) for folder in all_folders]
+        for all_chunk_specs in wb_platform_specific.chunkCommandLinePaths( all_file_specs ):
+            try:
+                self.__mergeFStat( self.__runFStat( '-Rc', *all_chunk_specs ) )
+
+            except P4.P4Exception as e:
+                if len(all_chunk_specs) == 1:
+                    self.app.log.error( 'P4 fstat error: %s' % (e,) )
+                    self.debugLogTree( '__calculateFoldersStatus() fstat error %r' % (e,) )
                     continue
 
-                abs_path = self.pathForWb( fstat['clientFile'] )
+                # find the folders that fstat can report on one at a time
+                self.debugLogTree( '__calculateFoldersStatus() batched fstat error %r' % (e,) )
+                for file_spec in all_chunk_specs:
+                    try:
+                        self.__mergeFStat( self.__runFStat( '-Rc', file_spec ) )
+
+                    except P4.P4Exception as e:
+                        self.app.log.error( 'P4 fstat error: %s' % (e,) )
+                        self.debugLogTree( '__calculateFoldersStatus() fstat error %r' % (e,) )
+
+    def __runFStat( self, *args ):
+        all_fstat = self._run( 'fstat', *args, handler=SkipEmptyWarnings( self.app.log ) )
+        # sometimes fstat returns False (??!)
+        if type(all_fstat) == bool:
+            all_fstat = []
+
+        return all_fstat
+
+    def __mergeFStat( self, all_fstat, add_new_files=True ):
+        repo_root = self.projectPath()
+
+        for fstat in all_fstat:
+            # not interested in delete files
+            if fstat.get( 'headAction', '' ) in ('delete', 'move/delete'):
+                continue
+
+            if 'clientFile' not in fstat:
+                continue
+
+            abs_path = self.pathForWb( fstat['clientFile'] )
+            try:
                 repo_relative = abs_path.relative_to( repo_root )
 
-                if repo_relative not in self.all_file_state:
-                    # filepath has been deleted
-                    self.all_file_state[ repo_relative ] = WbP4FileState( self, repo_relative )
+            except ValueError:
+                # opened in another part of the client workspace
+                continue
 
-                self.all_file_state[ repo_relative ].setFStat( fstat )
+            if repo_relative not in self.all_file_state:
+                if not add_new_files:
+                    continue
 
-        except P4.P4Exception as e:
-            self.app.log.error( 'P4 fstat error: %s' % (e,) )
-            self.debugLogTree( '__calculateFolderStatus() fstat error %r' % (e,) )
+                # filepath has been deleted
+                self.all_file_state[ repo_relative ] = WbP4FileState( self, repo_relative )
+
+            self.all_file_state[ repo_relative ].setFStat( fstat )
 
     def __updateTree( self, path, file_state ):
         self.debugLogTree( '__updateTree( %r, %r )' % (path, file_state) )
@@ -379,6 +423,24 @@ class P4Project:
         else:
             return all_lines
 
+    def getDigestForRevision( self, filepath, rev ):
+        # the MD5 of the file at rev that the server keeps
+        # returns None if the server does not report a digest
+        if type( rev ) == int:
+            rev = '@%d' % (rev,)
+
+        try:
+            all_fstat = self._run( 'fstat', '-Ol', '-T', 'digest', self.pathForP4( filepath ) + rev, handler=SkipEmptyWarnings( self.app.log ) )
+
+        except P4.P4Exception:
+            return None
+
+        # sometimes fstat returns False (??!)
+        if type(all_fstat) == bool or len(all_fstat) == 0:
+            return None
+
+        return all_fstat[0].get( 'digest' )
+
     def cmdFetchChange( self ):
         self.debugLog( 'cmdFetchChange()' )
         changespec = self.__repo.fetch_change()
@@ -448,7 +510,7 @@ class P4Project:
         self._run( 'edit', self.pathForP4( filename ) )
 
     def cmdAdd( self, filename ):
-        self_run( 'add', self.pathForP4( filename ) )
+        self._run( 'add', self.pathForP4( filename ) )
 
     def cmdRevert( self, filename ):
         self._run( 'revert', self.pathForP4( filename ) )
@@ -456,6 +518,19 @@ class P4Project:
     def cmdDelete( self, filename ):
         self._run( 'delete', self.pathForP4( filename ) )
 
+    def cmdEditFiles( self, all_filenames ):
+        self.__runForFiles( 'edit', all_filenames )
+
+    def cmdAddFiles( self, all_filenames ):
+        self.__runForFiles( 'add', all_filenames )
+
+    def cmdRevertFiles( self, all_filenames ):
+        self.__runForFiles( 'revert', all_filenames )
+
+    def __runForFiles( self, fn_name, all_filenames ):
+        for all_paths in wb_platform_specific.chunkCommandLinePaths( [self.pathForP4( filename ) for filename in all_filenames] ):
+            self._run( fn_name, *all_paths )
+
     def cmdDiffFolder( self, folder ):
         self.debugLog( 'cmdDiffFolder( %r )' % (folder,) )
         text = self._run( 'diff', '-du',
@@ -515,6 +590,20 @@ class P4Project:
 
         return all_annotate_nodes
 
+    def annotateRevisionKey( self, filename ):
+        # annotate is of #head which only changes when a change is submitted
+        try:
+            all_fstat = self._run( 'fstat', '-T', 'headChange', self.pathForP4( filename ), handler=SkipEmptyWarnings( self.app.log ) )
+
+        except P4.P4Exception:
+            return None
+
+        # sometimes fstat returns False (??!)
+        if type(all_fstat) == bool or len(all_fstat) == 0:
+            return None
+
+        return all_fstat[0].get( 'headChange' )
+
     def cmdChangeLogForAnnotateFile( self, filename, all_revs ):
         all_change_logs = {}
 
@@ -536,9 +625,7 @@ class P4Project:
             cmd = ['%s/...' % (folder,)]
 
         try:
-            all_logs = [WbP4LogFull( data, self.repo() )
-                            for data in self._run( 'changes', cmd )]
-            return all_logs
+            return self.__changeLogsWithChanges( self._run( 'changes', cmd ) )
 
         except P4.P4Exception as e:
             self.app.log.error( 'p4 changes for %s failed: %r' % (folder, e) )
@@ -557,15 +644,36 @@ class P4Project:
             cmd = [self.pathForP4( filename )]
 
         try:
-            all_logs = [WbP4LogFull( data, self.repo() )
-                            for data in self._run( 'changes', cmd )]
-
-            return all_logs
+            return self.__changeLogsWithChanges( self._run( 'changes', cmd ) )
 
         except P4.P4Exception as e:
             self.app.log.error( 'p4 changes for %s failed: %r' % (filename, e) )
             return []
 
+    def __changeLogsWithChanges( self, all_change_data ):
+        # change numbers are only unique for a server
+        cache = self.app.commit_changes_cache
+        repo_key = self.repo().port
+
+        all_cached_describes = cache.getMany( 'p4', repo_key, [data['change'] for data in all_change_data] )
+
+        all_logs = []
+        all_new_describes = {}
+        for data in all_change_data:
+            if data['change'] in all_cached_describes:
+                all_logs.append( WbP4LogFull( data, self.repo(), all_cached_describes[ data['change'] ] ) )
+
+            else:
+                log = WbP4LogFull( data, self.repo() )
+                # pending changes can still be altered
+                if data.get( 'status' ) == 'submitted':
+                    all_new_describes[ data['change'] ] = {'desc': log.message, 'files': log.all_changed_files}
+                all_logs.append( log )
+
+        cache.putMany( 'p4', repo_key, all_new_describes )
+
+        return all_logs
+
     def cmdTagsForRepository( self ):
         return {}
 
@@ -620,11 +728,31 @@ class P4Project:
         return False
 
     def cmdOpenedFiles( self ):
+        all_opened_files, all_fstat = self.cmdOpenedFilesAndFStat()
+        return all_opened_files
+
+    def cmdOpenedFilesAndFStat( self ):
         all_opened_files = self._run( 'opened' )
+
+        # one fstat for as many of the opened files as fit on the command line
+        all_depot_fstat = {}
+        all_depot_files = [ofile[ 'depotFile' ] for ofile in all_opened_files]
+        for all_chunk_files in wb_platform_specific.chunkCommandLinePaths( all_depot_files ):
+            for fstat in self.__runFStat( *all_chunk_files ):
+                all_depot_fstat[ fstat[ 'depotFile' ] ] = fstat
+
         for ofile in all_opened_files:
-            fstat = self._run( 'fstat', ofile[ 'depotFile' ] )[0]
+            fstat = all_depot_fstat.get( ofile[ 'depotFile' ] )
+            if fstat is None or 'clientFile' not in fstat:
+                raise P4.P4Exception( 'fstat did not report the client file of %s' % (ofile[ 'depotFile' ],) )
+
             ofile[ 'clientFile' ] = fstat[ 'clientFile' ]
-        return all_opened_files
+
+        return all_opened_files, list( all_depot_fstat.values() )
+
+    def updateOpenedFileStates( self, all_fstat ):
+        # keep the state of files already in the tree up to date
+        self.__mergeFStat( all_fstat, add_new_files=False )
 
     def cmdChangesPending( self ):
         cmd = ['-u', os.getlogin(), '-s', 'pending', '-c', self.getClientName()]
@@ -660,15 +788,23 @@ class WbP4LogBasic:
         return '%d' % (self.change,)
 
 class WbP4LogFull(WbP4LogBasic):
-    def __init__( self, data, repo ):
+    def __init__( self, data, repo, cached_describe=None ):
         super().__init__( data, repo )
 
+        if cached_describe is not None:
+            self.message = cached_describe['desc']
+            self.all_changed_files = [tuple( change ) for change in cached_describe['files']]
+            return
+
         data = repo.run_describe( '-s', self.change )[0]
         self.message = data['desc']
         # could add in 'type', 'rev' and 'fileSize'
         self.all_changed_files = list( zip( data['action'], data['depotFile'] ) )
 
 class WbP4FileState:
+    # there is one WbP4FileState for each file in the working copy so keep them small
+    __slots__ = ('__project', '__filepath', '__depot_file', '__is_dir', '__is_ignored', '__state')
+
     map_p4_action_to_state = {
         'edit': 'O',
         'add': 'A',
@@ -680,7 +816,8 @@ class WbP4FileState:
         project.debugLog('WbP4FileState.__init__( %r )' % (filepath,) )
         self.__project = project
         self.__filepath = filepath
-        self.__fstat = {}
+        # only the depot file of the fstat is needed
+        self.__depot_file = None
 
         self.__is_dir = False
         self.__is_ignored = project.repo().is_ignored( project.pathForP4( self.__filepath ) )
@@ -693,7 +830,7 @@ class WbP4FileState:
 
     def __repr__( self ) -> str:
         return ('<WbP4FileState: P: %r S: %r P4: %r>' %
-                (self.__filepath, self.__state, len(self.__fstat)))
+                (self.__filepath, self.__state, self.__depot_file))
 
     def setIsDir( self ) -> None:
         self.__is_dir = True
@@ -703,9 +840,9 @@ class WbP4FileState:
 
     def setFStat( self, fstat ) -> None:
         self.__project.debugLog('WbP4FileState.setFStat() %r: fstat: %r' % (self.__filepath, fstat) )
-        self.__fstat = fstat
+        self.__depot_file = fstat.get( 'depotFile' )
         self.__is_ignored = False
-        self.__state = self.map_p4_action_to_state.get( self.__fstat.get( 'action', '' ), '?' )
+        self.__state = self.map_p4_action_to_state.get( fstat.get( 'action', '' ), '?' )
         self.__project.debugLog('WbP4FileState.setFStat() isControlled %r state %r' % (self.isControlled(), self.__state) )
 
     def setState( self, state : str ):
@@ -730,10 +867,10 @@ class WbP4FileState:
 
     # ------------------------------------------------------------
     def isControlled( self ) -> bool:
-        return 'depotFile' in self.__fstat
+        return self.__depot_file is not None
 
     def isUncontrolled( self ) -> bool:
-        return 'depotFile' not in self.__fstat
+        return self.__depot_file is None
         return self.__state == '?'
 
     def isIgnored( self ) -> bool:
@@ -768,16 +905,29 @@ class WbP4FileState:
 
     def getTextLinesWorking( self ) -> List[str]:
         path = pathlib.Path( self.__project.projectPath() ) / self.__filepath
-        with path.open( encoding='utf-8' ) as f:
-            all_lines = f.read().split( '\n' )
-            if all_lines[-1] == '':
-                return all_lines[:-1]
-            else:
-                return all_lines
+        # like a file opened in text mode
+        all_lines = wb_read_file.readFileTextLines( path, universal_newlines=True )
+        if all_lines[-1] == '':
+            return all_lines[:-1]
+        else:
+            return all_lines
 
     def getTextLinesHead( self ) -> List[str]:
         return self.getTextLinesForRevision( '#head' )
 
+    def isWorkingSameAsRevision( self, rev ) -> bool:
+        # compare the MD5 of the working file with the digest
+        # from the server so that the text of rev is not fetched
+        digest = self.__project.getDigestForRevision( self.__filepath, rev )
+        if digest is None:
+            return False
+
+        try:
+            return wb_read_file.fileDigest( self.absolutePath(), 'md5' ) == digest.lower()
+
+        except OSError:
+            return False
+
     def getTextLinesForRevision( self, rev ) -> List[str]:
         if type( rev ) == int:
             rev = '@%d' % (rev,)
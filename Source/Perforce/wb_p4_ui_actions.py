@@ -17,6 +17,7 @@ import pathlib
 import wb_log_history_options_dialog
 import wb_ui_actions
 import wb_common_dialogs
+import wb_main_window
 
 import wb_p4_change_dialog
 import wb_p4_project
@@ -70,15 +71,8 @@ class P4MainWindowActions(wb_ui_actions.WbMainWindowActions):
             return True
 
         elif focus == 'table':
-            all_file_states = self.tableSelectedAllFileStates()
-            if len(all_file_states) == 0:
-                return False
-
-            for obj in all_file_states:
-                if not predicate( obj ):
-                    return False
-
-            return True
+            facts = self.tableSelectionFacts()
+            return len(facts) > 0 and facts.all( predicate )
 
         else:
             return False
@@ -96,41 +90,15 @@ class P4MainWindowActions(wb_ui_actions.WbMainWindowActions):
 
         elif focus == 'table':
             # make sure all the selected entries is modified
-            all_file_states = self.tableSelectedAllFileStates()
-            enable = True
-            for obj in all_file_states:
-                if not predicate( obj ):
-                    enable = False
-                    break
-
-            return enable
+            return self.tableSelectionFacts().all( predicate )
 
         else:
             return False
 
     def enablerP4DiffSmart( self ):
-        if not self.main_window.isScmTypeActive( 'p4' ):
-            return False
-
-        focus = self.main_window.focusIsIn()
-
-        if focus == 'tree':
-            return True
-
-        elif focus == 'table':
-            # make sure all the selected entries is modified
-            all_file_states = self.tableSelectedAllFileStates()
-            enable = True
-            for obj in all_file_states:
-                if not obj.canDiffHeadVsWorking():
-                    enable = False
-                    break
-
-            return enable
-
-        else:
-            return False
+        return self.__enablerDiff( wb_p4_project.WbP4FileState.canDiffHeadVsWorking )
 
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerP4LogHistory( self ):
         return True
 
@@ -319,7 +287,8 @@ class P4MainWindowActions(wb_ui_actions.WbMainWindowActions):
 
         yield self.app.switchToBackground
 
-        all_opened_files = p4_project.cmdOpenedFiles()
+        all_opened_files, all_opened_fstat = p4_project.cmdOpenedFilesAndFStat()
+        p4_project.updateOpenedFileStates( all_opened_fstat )
         all_changes_pending = p4_project.cmdChangesPending()
         all_changes_shelved = p4_project.cmdChangesShelved()
 
@@ -339,17 +308,17 @@ class P4MainWindowActions(wb_ui_actions.WbMainWindowActions):
     @thread_switcher
     def tableActionP4Edit_Bg( self, checked=None ):
         # p4 edit filename ...
-        yield from self.__tableActionChangeRepo_Bg( self.__actionP4Edit )
+        yield from self.__tableActionChangeRepo_Bg( self.__actionP4EditAll, all_at_once=True )
 
         self.table_view.tableActionEdit()
 
     @thread_switcher
     def tableActionP4Add_Bg( self, checked=None ):
-        yield from self.__tableActionChangeRepo_Bg( self.__actionP4Add )
+        yield from self.__tableActionChangeRepo_Bg( self.__actionP4AddAll, all_at_once=True )
 
     @thread_switcher
     def tableActionP4Revert_Bg( self, checked=None ):
-        yield from self.__tableActionChangeRepo_Bg( self.__actionP4Revert, self.__areYouSureRevert )
+        yield from self.__tableActionChangeRepo_Bg( self.__actionP4RevertAll, self.__areYouSureRevert, all_at_once=True )
 
     @thread_switcher
     def tableActionP4Delete_Bg( self, checked=None ):
@@ -363,14 +332,14 @@ class P4MainWindowActions(wb_ui_actions.WbMainWindowActions):
         self.debugLog( 'tableActionP4DiffHeadVsWorking()' )
         self.table_view.tableActionViewRepo( self.__actionP4DiffHeadVsWorking )
 
-    def __actionP4Edit( self, p4_project, filename ):
-        p4_project.cmdEdit( filename )
+    def __actionP4EditAll( self, p4_project, all_filenames ):
+        p4_project.cmdEditFiles( all_filenames )
 
-    def __actionP4Add( self, p4_project, filename ):
-        p4_project.cmdAdd( filename )
+    def __actionP4AddAll( self, p4_project, all_filenames ):
+        p4_project.cmdAddFiles( all_filenames )
 
-    def __actionP4Revert( self, p4_project, filename ):
-        p4_project.cmdRevert( filename )
+    def __actionP4RevertAll( self, p4_project, all_filenames ):
+        p4_project.cmdRevertFiles( all_filenames )
 
     def __actionP4Delete( self, p4_project, filename ):
         file_state = p4_project.getFileState( filename )
@@ -394,12 +363,21 @@ class P4MainWindowActions(wb_ui_actions.WbMainWindowActions):
     def __actionP4DiffHeadVsWorking( self, p4_project, filename ):
         file_state = p4_project.getFileState( filename )
 
+        title = T_('Diff HEAD vs. Work %s') % (filename,)
+        header_left = T_('HEAD %s') % (filename,)
+        header_right = T_('Work %s') % (filename,)
+
+        # the digest of #head is compared before printing its text
+        if file_state.isWorkingSameAsRevision( '#head' ):
+            self.showIdenticalFiles( title, file_state.getTextLinesWorking(), header_left, header_right )
+            return
+
         self.diffTwoFiles(
-                T_('Diff HEAD vs. Work %s') % (filename,),
+                title,
                 file_state.getTextLinesHead(),
                 file_state.getTextLinesWorking(),
-                T_('HEAD %s') % (filename,),
-                T_('Work %s') % (filename,)
+                header_left,
+                header_right
                 )
 
     #------------------------------------------------------------
@@ -410,13 +388,13 @@ class P4MainWindowActions(wb_ui_actions.WbMainWindowActions):
         return wb_common_dialogs.WbAreYouSureDelete( self.main_window, all_filenames )
 
     @thread_switcher
-    def __tableActionChangeRepo_Bg( self, execute_function, are_you_sure_function=None ):
+    def __tableActionChangeRepo_Bg( self, execute_function, are_you_sure_function=None, all_at_once=False ):
         @thread_switcher
         def finalise( p4_project ):
             # take account of the change
             yield from self.top_window.updateTableView_Bg()
 
-        yield from self.table_view.tableActionViewRepo_Bg( execute_function, are_you_sure_function, finalise )
+        yield from self.table_view.tableActionViewRepo_Bg( execute_function, are_you_sure_function, finalise, all_at_once )
 
     # ------------------------------------------------------------
     def selectedP4ProjectTreeNode( self ):
@@ -464,22 +442,32 @@ class P4MainWindowActions(wb_ui_actions.WbMainWindowActions):
 
         yield self.switchToBackground
 
-        # when we know that exception can be raised catch it...
-        all_annotation_nodes = p4_project.cmdAnnotationForFile( filename )
+        repo_key = str( p4_project.projectPath() )
+        rev_key = p4_project.annotateRevisionKey( filename )
 
-        all_annotate_revs = set()
-        for node in all_annotation_nodes:
-            all_annotate_revs.add( node.log_id )
+        cached_annotation = self.app.annotate_cache.get( 'p4', repo_key, filename, rev_key )
+        if cached_annotation is not None:
+            all_annotation_nodes, all_change_logs = cached_annotation
 
-        yield self.switchToForeground
+        else:
+            # when we know that exception can be raised catch it...
+            all_annotation_nodes = p4_project.cmdAnnotationForFile( filename )
 
-        self.progress.end()
-        self.progress.start( T_('Annotate Change Logs %(count)d'), 0 )
+            all_annotate_revs = set()
+            for node in all_annotation_nodes:
+                all_annotate_revs.add( node.log_id )
 
-        yield self.switchToBackground
+            yield self.switchToForeground
+
+            self.progress.end()
+            self.progress.start( T_('Annotate Change Logs %(count)d'), 0 )
+
+            yield self.switchToBackground
+
+            # when we know that exception can be raised catch it...
+            all_change_logs = p4_project.cmdChangeLogForAnnotateFile( filename, all_annotate_revs )
 
-        # when we know that exception can be raised catch it...
-        all_change_logs = p4_project.cmdChangeLogForAnnotateFile( filename, all_annotate_revs )
+            self.app.annotate_cache.put( 'p4', repo_key, filename, rev_key, all_annotation_nodes, all_change_logs )
 
         yield self.switchToForeground
 
@@ -502,7 +490,7 @@ class P4MainWindowActions(wb_ui_actions.WbMainWindowActions):
         p4_project = self.selectedP4Project()
 
         change_dialog = wb_p4_change_dialog.WbP4ChangeDialog( self.app, p4_project )
-        change_dialog.changeAccepted.connect( self.app.wrapWithThreadSwitcher( self.__changeAccepted_Bg ) )
+        change_dialog.changeAccepted.connect( self.app.wrapWithThreadSwitcher( self.__changeAccepted_Bg, 'commit', serial_key=p4_project.projectName() ) )
         change_dialog.changeClosed.connect( self.__changeClosed )
 
         # show to the user
@@ -659,10 +647,19 @@ class P4MainWindowActions(wb_ui_actions.WbMainWindowActions):
             filestate = mw.p4_project.getFileState( mw.filename )
 
             if change_new is None:
+                if filestate.isWorkingSameAsRevision( change_old ):
+                    self.showIdenticalFiles( title, filestate.getTextLinesWorking(), heading_old, heading_new )
+                    return
+
                 # either we want HEAD or the modified working
                 text_new = filestate.getTextLinesWorking()
 
             else:
+                digest_new = mw.p4_project.getDigestForRevision( filestate.relativePath(), change_new )
+                if digest_new is not None and digest_new == mw.p4_project.getDigestForRevision( filestate.relativePath(), change_old ):
+                    self.showIdenticalFiles( title, filestate.getTextLinesForRevision( change_new ), heading_old, heading_new )
+                    return
+
                 text_new = filestate.getTextLinesForRevision( change_new )
 
             text_old = filestate.getTextLinesForRevision( change_old )
@@ -705,6 +702,11 @@ class P4MainWindowActions(wb_ui_actions.WbMainWindowActions):
 
         filepath = pathlib.Path( filename )
 
+        digest_new = mw.p4_project.getDigestForRevision( filepath, rev_new )
+        if digest_new is not None and digest_new == mw.p4_project.getDigestForRevision( filepath, rev_old ):
+            self.showIdenticalFiles( title, mw.p4_project.getTextLinesForRevision( filepath, rev_new ), heading_old, heading_new )
+            return
+
         text_new = mw.p4_project.getTextLinesForRevision( filepath, rev_new )
         text_old = mw.p4_project.getTextLinesForRevision( filepath, rev_old )
 
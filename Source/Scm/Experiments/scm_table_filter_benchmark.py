@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+#
+#   scm_table_filter_benchmark.py
+#
+#   Time the table of a flat view of a very large working copy:
+#
+#       load    - refreshTable then sort by the status column
+#       typing  - the filter text changed one key at a time
+#       show    - the show changed and show uncontrolled toggles
+#
+#   for the legacy QSortFilterProxyModel, that asks about each row and
+#   compares rows a pair at a time using the entries of the model, and
+#   the current WbScmTableSortFilter that filters and sorts all the rows
+#   in one go using the row flags and names of the model.
+#
+#   usage: scm_table_filter_benchmark.py [<num-files>]
+#
+import sys
+import time
+import pathlib
+import builtins
+
+sys.path.insert( 0, '..' )
+sys.path.insert( 0, '../../Common' )
+
+builtins.T_ = lambda s: s
+
+from PyQt5 import QtCore
+
+import wb_scm_table_model
+
+class FakeDebugOption:
+    def __call__( self, msg ):
+        pass
+
+    def __bool__( self ):
+        return False
+
+    def isEnabled( self ):
+        return False
+
+class FakeDebug:
+    def __getattr__( self, name ):
+        return FakeDebugOption()
+
+class FakeApp:
+    def __init__( self ):
+        self.debug_options = FakeDebug()
+
+    def isDarkMode( self ):
+        return False
+
+class FakeStatus:
+    def __init__( self, staged, unstaged, controlled ):
+        self.staged = staged
+        self.unstaged = unstaged
+        self.controlled = controlled
+
+    def getStagedAbbreviatedStatus( self ):
+        return self.staged
+
+    def getUnstagedAbbreviatedStatus( self ):
+        return self.unstaged
+
+    def isControlled( self ):
+        return self.controlled
+
+    def isUncontrolled( self ):
+        return not self.controlled
+
+    def isIgnored( self ):
+        return False
+
+    def canCommit( self ):
+        return self.staged != '' or self.unstaged != ''
+
+class FakeTreeNode:
+    # a flat_tree node of a working copy that is not on disk
+    def __init__( self, num_files ):
+        self.all_status = {}
+        for index in range( num_files ):
+            name = pathlib.Path( 'folder-%03d/file-%06d.txt' % (index // 1000, index) )
+            if index % 10 == 0:
+                self.all_status[ name ] = FakeStatus( '', 'M', True )
+
+            elif index % 97 == 0:
+                self.all_status[ name ] = FakeStatus( '', '', False )
+
+            else:
+                self.all_status[ name ] = FakeStatus( '', '', True )
+
+    def absolutePath( self ):
+        return pathlib.Path( '/not-a-working-copy' )
+
+    def isByPath( self ):
+        return True
+
+    def isNotEqual( self, other ):
+        return self is not other
+
+    def getAllFileNames( self ):
+        return self.all_status.keys()
+
+    def getStatusEntry( self, name ):
+        return self.all_status[ name ]
+
+class LegacyTableSortFilter(QtCore.QSortFilterProxyModel):
+    def __init__( self, app, parent=None ):
+        self.app = app
+        super().__init__( parent )
+
+        self.filter_text = ''
+
+        self.show_controlled_and_changed = True
+        self.show_controlled_and_not_changed = True
+        self.show_uncontrolled = True
+        self.show_ignored = False
+
+        self.setDynamicSortFilter( True )
+
+    def setFilterText( self, text ):
+        self.filter_text = text
+        self.invalidateFilter()
+
+    def setShowControlledAndNotChangedFiles( self, state ):
+        self.show_controlled_and_not_changed = state
+        self.invalidateFilter()
+
+    def setShowUncontrolledFiles( self, state ):
+        self.show_uncontrolled = state
+        self.invalidateFilter()
+
+    def filterAcceptsRow( self, source_row, source_parent ):
+        model = self.sourceModel()
+        index = model.createIndex( source_row, model.col_name )
+
+        entry = model.data( index, QtCore.Qt.UserRole )
+
+        changed = entry.stagedAsString() != '' or entry.statusAsString() != ''
+        not_changed = entry.stagedAsString() == '' and entry.statusAsString() == ''
+
+        if entry.is_dir():
+            return False
+
+        if entry.isControlled() and changed and not self.show_controlled_and_changed:
+            return False
+
+        if entry.isControlled() and not_changed and not self.show_controlled_and_not_changed:
+            return False
+
+        if entry.isUncontrolled() and not self.show_uncontrolled:
+            return False
+
+        if entry.isIgnore() and not self.show_ignored:
+            return False
+
+        if self.filter_text != '':
+            return self.filter_text.lower() in str(entry.name).lower()
+
+        return True
+
+    def lessThan( self, source_left, source_right ):
+        model = self.sourceModel()
+        left_ent = model.entry( source_left )
+        right_ent = model.entry( source_right )
+
+        for left, right in ((left_ent.stagedAsString(), right_ent.stagedAsString()),
+                            (left_ent.statusAsString(), right_ent.statusAsString()),
+                            (left_ent.isControlled(), right_ent.isControlled())):
+            if left != right:
+                return left > right
+
+        return str(left_ent.name) < str(right_ent.name)
+
+def timeIt( label, fn ):
+    start = time.time()
+    fn()
+    return '%s %7.3fs' % (label, time.time() - start)
+
+def measure( label, sort_filter_class, tree_node ):
+    model = wb_scm_table_model.WbScmTableModel( FakeApp() )
+    sort_filter = sort_filter_class( model.app )
+    sort_filter.setSourceModel( model )
+
+    def load():
+        model.setScmProjectTreeNode( tree_node )
+        sort_filter.sort( model.col_status )
+
+    def typing():
+        for length in range( 1, len('file-01234') + 1 ):
+            sort_filter.setFilterText( 'file-01234'[:length] )
+
+        while length > 0:
+            length -= 1
+            sort_filter.setFilterText( 'file-01234'[:length] )
+
+    def show():
+        for state in (False, True):
+            sort_filter.setShowControlledAndNotChangedFiles( state )
+            sort_filter.setShowUncontrolledFiles( state )
+
+    all_times = [timeIt( 'load', load ), timeIt( 'typing', typing ), timeIt( 'show', show )]
+    print( '    %-8s %s  %d entries made' % (label, '  '.join( all_times ), len(model.rows.all_entries)) )
+
+def main( argv ):
+    num_files = int( argv[1] ) if len(argv) > 1 else 100000
+
+    app = QtCore.QCoreApplication( argv )
+
+    tree_node = FakeTreeNode( num_files )
+
+    print( 'flat view: %d files' % (num_files,) )
+    measure( 'legacy', LegacyTableSortFilter, tree_node )
+    measure( 'current', wb_scm_table_model.WbScmTableSortFilter, tree_node )
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit( main( sys.argv ) )
@@ -0,0 +1,305 @@
+'''
+ ====================================================================
+ Copyright (c) 2018 Barry A Scott.  All rights reserved.
+
+ This software is licensed as described in the file LICENSE.txt,
+ which you should have received as part of this distribution.
+
+ ====================================================================
+
+    wb_scm_annotate_cache.py
+
+    Keep the annotation of files so that annotating the same
+    revision of a file again does not need the SCM to work it out.
+
+    Annotations are keyed by SCM type, repository, path and a
+    revision key that the SCM resolves to the revision that last
+    changed the file.
+
+    Each annotation is held as the line text, an array of commit
+    index for each line and a table of the commits. The most
+    recently used annotations are kept in memory and all are
+    saved in an SQLite database that is trimmed back to max_size
+    bytes by removing the least recently used.
+
+'''
+import sqlite3
+import threading
+import collections
+import array
+import json
+import zlib
+import time
+
+import wb_date
+import wb_annotate_node
+
+schema_version = 1
+
+# default limits of the memory and database caches
+default_max_memory_lines = 500000
+default_max_size = 32*1024*1024
+
+class AnnotateCommitLog:
+    # the parts of a commit log that the annotate view shows
+    __slots__ = ('id_string', 'author', 'timestamp', 'message')
+
+    def __init__( self, id_string, author, timestamp, message ):
+        self.id_string = id_string
+        self.author = author
+        self.timestamp = timestamp
+        self.message = message
+
+    @classmethod
+    def fromLogNode( cls, log_node ):
+        return cls( log_node.commitIdString(), log_node.commitAuthor(), log_node.commitDate().timestamp(), log_node.commitMessage() )
+
+    def commitIdString( self ):
+        return self.id_string
+
+    def commitAuthor( self ):
+        return self.author
+
+    def commitDate( self ):
+        return wb_date.utcDatetime( self.timestamp )
+
+    def commitMessage( self ):
+        return self.message
+
+class AnnotateCacheEntry:
+    __slots__ = ('all_line_text', 'all_commit_index', 'all_commits')
+
+    def __init__( self, all_line_text, all_commit_index, all_commits ):
+        self.all_line_text = all_line_text
+        self.all_commit_index = all_commit_index
+        self.all_commits = all_commits
+
+    @classmethod
+    def fromAnnotation( cls, all_annotation_nodes, all_commit_logs ):
+        all_commit_index = array.array( 'L' )
+        all_commits = []
+        all_index_by_log_id = {}
+
+        for node in all_annotation_nodes:
+            if node.log_id not in all_index_by_log_id:
+                log_node = all_commit_logs.get( node.log_id )
+                if log_node is None:
+                    # not a complete annotation
+                    return None
+
+                all_index_by_log_id[ node.log_id ] = len(all_commits)
+                all_commits.append( AnnotateCommitLog.fromLogNode( log_node ) )
+
+            all_commit_index.append( all_index_by_log_id[ node.log_id ] )
+
+        return cls( [node.line_text for node in all_annotation_nodes], all_commit_index, all_commits )
+
+    @classmethod
+    def fromBytes( cls, data ):
+        all_fields = json.loads( zlib.decompress( data ).decode( 'utf-8' ) )
+        return cls( all_fields['lines'],
+                    array.array( 'L', all_fields['index'] ),
+                    [AnnotateCommitLog( *commit ) for commit in all_fields['commits']] )
+
+    def toBytes( self ):
+        all_fields = {
+            'lines':    self.all_line_text,
+            'index':    self.all_commit_index.tolist(),
+            'commits':  [(commit.id_string, commit.author, commit.timestamp, commit.message) for commit in self.all_commits],
+            }
+        return zlib.compress( json.dumps( all_fields ).encode( 'utf-8' ) )
+
+    def numLines( self ):
+        return len(self.all_line_text)
+
+    def annotation( self ):
+        # the log_id of each node is the index of its commit
+        all_annotation_nodes = [wb_annotate_node.AnnotateNode( line_num, line_text, commit_index )
+                                for line_num, (line_text, commit_index)
+                                in enumerate( zip( self.all_line_text, self.all_commit_index ), 1 )]
+        return all_annotation_nodes, dict( enumerate( self.all_commits ) )
+
+class WbAnnotateCache:
+    def __init__( self, log, filename=None, max_memory_lines=default_max_memory_lines, max_size=default_max_size ):
+        self.log = log
+        self.filename = filename
+        self.max_memory_lines = max_memory_lines
+        self.max_size = max_size
+
+        # used from the foreground and background threads
+        self.lock = threading.Lock()
+
+        # key to AnnotateCacheEntry in least recently used order
+        self.all_memory_entries = collections.OrderedDict()
+        self.memory_lines = 0
+
+        self.db = None
+        if self.filename is not None:
+            self.__open()
+
+    def __open( self ):
+        for attempt in (1, 2):
+            try:
+                self.db = sqlite3.connect( str(self.filename), check_same_thread=False )
+                self.db.execute( 'PRAGMA journal_mode=WAL' )
+                self.db.execute( 'CREATE TABLE IF NOT EXISTS version (version INTEGER)' )
+
+                row = self.db.execute( 'SELECT version FROM version' ).fetchone()
+                if row is not None and row[0] != schema_version:
+                    self.db.execute( 'DROP TABLE IF EXISTS annotations' )
+                    self.db.execute( 'DELETE FROM version' )
+                    row = None
+
+                if row is None:
+                    self.db.execute( 'INSERT INTO version (version) VALUES (?)', (schema_version,) )
+
+                self.db.execute( 'CREATE TABLE IF NOT EXISTS annotations '
+                                 '(scm_type TEXT, repo_key TEXT, path TEXT, rev_key TEXT, annotation BLOB, size INTEGER, last_used REAL, '
+                                 'PRIMARY KEY (scm_type, repo_key, path, rev_key))' )
+                self.db.execute( 'CREATE INDEX IF NOT EXISTS annotations_last_used ON annotations (last_used)' )
+                self.db.commit()
+
+                # check that the database is usable
+                self.db.execute( 'SELECT COUNT(*) FROM annotations' ).fetchone()
+                return
+
+            except sqlite3.DatabaseError as e:
+                self.log.error( 'Annotate cache %s is damaged - %s' % (self.filename, e) )
+                self.__close()
+                self.__remove()
+
+        self.log.error( 'Annotate cache database is disabled' )
+        self.__close()
+
+    def __close( self ):
+        if self.db is not None:
+            try:
+                self.db.close()
+
+            except sqlite3.DatabaseError:
+                pass
+
+            self.db = None
+
+    def __remove( self ):
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            path = self.filename.parent / (self.filename.name + suffix)
+            try:
+                if path.exists():
+                    path.unlink()
+
+            except OSError as e:
+                self.log.error( 'Cannot remove %s - %s' % (path, e) )
+
+    def __databaseError( self, e ):
+        # start again with an empty database
+        self.log.error( 'Annotate cache error - %s' % (e,) )
+        self.__close()
+        self.__remove()
+        self.__open()
+
+    def get( self, scm_type, repo_key, path, rev_key ):
+        '''
+        return (all_annotation_nodes, all_commit_logs) or None if not cached
+        '''
+        if rev_key is None:
+            return None
+
+        key = (scm_type, repo_key, str(path), rev_key)
+
+        with self.lock:
+            entry = self.all_memory_entries.get( key )
+            if entry is not None:
+                self.all_memory_entries.move_to_end( key )
+                return entry.annotation()
+
+            entry = self.__getFromDatabase( key )
+            if entry is None:
+                return None
+
+            self.__addToMemory( key, entry )
+            return entry.annotation()
+
+    def put( self, scm_type, repo_key, path, rev_key, all_annotation_nodes, all_commit_logs ):
+        if rev_key is None:
+            return
+
+        entry = AnnotateCacheEntry.fromAnnotation( all_annotation_nodes, all_commit_logs )
+        if entry is None:
+            return
+
+        key = (scm_type, repo_key, str(path), rev_key)
+
+        with self.lock:
+            self.__addToMemory( key, entry )
+            self.__putInDatabase( key, entry )
+
+    def __addToMemory( self, key, entry ):
+        old_entry = self.all_memory_entries.pop( key, None )
+        if old_entry is not None:
+            self.memory_lines -= old_entry.numLines()
+
+        self.all_memory_entries[ key ] = entry
+        self.memory_lines += entry.numLines()
+
+        # always keep the newest entry even if it is over the limit
+        while self.memory_lines > self.max_memory_lines and len(self.all_memory_entries) > 1:
+            old_key, old_entry = self.all_memory_entries.popitem( last=False )
+            self.memory_lines -= old_entry.numLines()
+
+    def __getFromDatabase( self, key ):
+        if self.db is None:
+            return None
+
+        try:
+            row = self.db.execute( 'SELECT annotation FROM annotations WHERE scm_type=? AND repo_key=? AND path=? AND rev_key=?', key ).fetchone()
+            if row is None:
+                return None
+
+            try:
+                entry = AnnotateCacheEntry.fromBytes( row[0] )
+
+            except (ValueError, KeyError, TypeError, zlib.error):
+                self.db.execute( 'DELETE FROM annotations WHERE scm_type=? AND repo_key=? AND path=? AND rev_key=?', key )
+                self.db.commit()
+                return None
+
+            self.db.execute( 'UPDATE annotations SET last_used=? WHERE scm_type=? AND repo_key=? AND path=? AND rev_key=?', (time.time(),) + key )
+            self.db.commit()
+            return entry
+
+        except sqlite3.DatabaseError as e:
+            self.__databaseError( e )
+            return None
+
+    def __putInDatabase( self, key, entry ):
+        if self.db is None:
+            return
+
+        data = entry.toBytes()
+        try:
+            self.db.execute( 'INSERT OR REPLACE INTO annotations (scm_type, repo_key, path, rev_key, annotation, size, last_used) '
+                             'VALUES (?, ?, ?, ?, ?, ?, ?)', key + (data, len(data), time.time()) )
+            self.db.commit()
+
+            self.__trim()
+
+        except sqlite3.DatabaseError as e:
+            self.__databaseError( e )
+
+    def __trim( self ):
+        total_size = self.db.execute( 'SELECT SUM(size) FROM annotations' ).fetchone()[0] or 0
+        if total_size <= self.max_size:
+            return
+
+        # remove the least recently used down to 3/4 of the max size
+        excess = total_size - (self.max_size * 3 // 4)
+        all_rowids = []
+        for rowid, size in self.db.execute( 'SELECT rowid, size FROM annotations ORDER BY last_used' ):
+            all_rowids.append( (rowid,) )
+            excess -= size
+            if excess <= 0:
+                break
+
+        self.db.executemany( 'DELETE FROM annotations WHERE rowid=?', all_rowids )
+        self.db.commit()
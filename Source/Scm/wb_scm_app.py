@@ -21,6 +21,8 @@ import wb_scm_main_window
 import wb_scm_preferences
 import wb_scm_debug
 import wb_scm_images
+import wb_scm_commit_changes_cache
+import wb_scm_annotate_cache
 
 import wb_scm_factories
 
@@ -48,6 +50,14 @@ class WbScmApp(wb_app.WbApp):
         for msg in all_messages:
             self.log.info( msg )
 
+        # the file changes of commits are kept between runs
+        self.commit_changes_cache = wb_scm_commit_changes_cache.WbCommitChangesCache(
+                                        self.log, wb_platform_specific.getCommitChangesCacheFilename() )
+
+        # annotations are shared by all the annotate views and kept between runs
+        self.annotate_cache = wb_scm_annotate_cache.WbAnnotateCache(
+                                        self.log, wb_platform_specific.getAnnotateCacheFilename() )
+
     def formatDatetime( self, datetime_or_timestamp:Union[float, 'datetime.datetime'] ) -> str:
         dt = wb_date.localDatetime( datetime_or_timestamp )
 
@@ -0,0 +1,187 @@
+'''
+ ====================================================================
+ Copyright (c) 2018 Barry A Scott.  All rights reserved.
+
+ This software is licensed as described in the file LICENSE.txt,
+ which you should have received as part of this distribution.
+
+ ====================================================================
+
+    wb_scm_commit_changes_cache.py
+
+    Keep the files changed by each commit between runs.
+
+    Commits never change once made so the changes calculated for
+    the log history can be reused. They are kept in an SQLite
+    database keyed by SCM type, repository and commit id.
+
+    The database is trimmed back to max_size bytes by removing
+    the least recently used commits. A damaged database is deleted
+    and started again.
+
+'''
+import sqlite3
+import threading
+import json
+import time
+
+schema_version = 1
+
+# default size limit of the database
+default_max_size = 64*1024*1024
+
+class WbCommitChangesCache:
+    def __init__( self, log, filename, max_size=default_max_size ):
+        self.log = log
+        self.filename = filename
+        self.max_size = max_size
+
+        # used from the foreground and background threads
+        self.lock = threading.Lock()
+        self.db = None
+
+        self.__open()
+
+    def __open( self ):
+        for attempt in (1, 2):
+            try:
+                self.db = sqlite3.connect( str(self.filename), check_same_thread=False )
+                self.db.execute( 'PRAGMA journal_mode=WAL' )
+                self.db.execute( 'CREATE TABLE IF NOT EXISTS version (version INTEGER)' )
+
+                row = self.db.execute( 'SELECT version FROM version' ).fetchone()
+                if row is not None and row[0] != schema_version:
+                    self.db.execute( 'DROP TABLE IF EXISTS changes' )
+                    self.db.execute( 'DELETE FROM version' )
+                    row = None
+
+                if row is None:
+                    self.db.execute( 'INSERT INTO version (version) VALUES (?)', (schema_version,) )
+
+                self.db.execute( 'CREATE TABLE IF NOT EXISTS changes '
+                                 '(scm_type TEXT, repo_key TEXT, commit_id TEXT, changes TEXT, size INTEGER, last_used REAL, '
+                                 'PRIMARY KEY (scm_type, repo_key, commit_id))' )
+                self.db.execute( 'CREATE INDEX IF NOT EXISTS changes_last_used ON changes (last_used)' )
+                self.db.commit()
+
+                # check that the database is usable
+                self.db.execute( 'SELECT COUNT(*) FROM changes' ).fetchone()
+                return
+
+            except sqlite3.DatabaseError as e:
+                self.log.error( 'Commit changes cache %s is damaged - %s' % (self.filename, e) )
+                self.__close()
+                self.__remove()
+
+        self.log.error( 'Commit changes cache is disabled' )
+        self.__close()
+
+    def __close( self ):
+        if self.db is not None:
+            try:
+                self.db.close()
+
+            except sqlite3.DatabaseError:
+                pass
+
+            self.db = None
+
+    def __remove( self ):
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            path = self.filename.parent / (self.filename.name + suffix)
+            try:
+                if path.exists():
+                    path.unlink()
+
+            except OSError as e:
+                self.log.error( 'Cannot remove %s - %s' % (path, e) )
+
+    def __databaseError( self, e ):
+        # start again with an empty cache
+        self.log.error( 'Commit changes cache error - %s' % (e,) )
+        self.__close()
+        self.__remove()
+        self.__open()
+
+    def getMany( self, scm_type, repo_key, all_commit_ids ):
+        '''
+        return a dict of commit_id to the changes for all the commit ids found
+        '''
+        all_changes = {}
+        if len(all_commit_ids) == 0:
+            return all_changes
+
+        with self.lock:
+            if self.db is None:
+                return all_changes
+
+            try:
+                all_bad_ids = []
+                for commit_id in all_commit_ids:
+                    row = self.db.execute( 'SELECT changes FROM changes WHERE scm_type=? AND repo_key=? AND commit_id=?',
+                                            (scm_type, repo_key, commit_id) ).fetchone()
+                    if row is None:
+                        continue
+
+                    try:
+                        all_changes[ commit_id ] = json.loads( row[0] )
+
+                    except ValueError:
+                        all_bad_ids.append( commit_id )
+
+                now = time.time()
+                self.db.executemany( 'UPDATE changes SET last_used=? WHERE scm_type=? AND repo_key=? AND commit_id=?',
+                                    [(now, scm_type, repo_key, commit_id) for commit_id in all_changes] )
+                self.db.executemany( 'DELETE FROM changes WHERE scm_type=? AND repo_key=? AND commit_id=?',
+                                    [(scm_type, repo_key, commit_id) for commit_id in all_bad_ids] )
+                self.db.commit()
+
+            except sqlite3.DatabaseError as e:
+                self.__databaseError( e )
+                return {}
+
+        return all_changes
+
+    def putMany( self, scm_type, repo_key, all_changes ):
+        '''
+        add a dict of commit_id to changes, the changes must be JSON serialisable
+        '''
+        if len(all_changes) == 0:
+            return
+
+        now = time.time()
+        all_rows = []
+        for commit_id, changes in all_changes.items():
+            text = json.dumps( changes )
+            all_rows.append( (scm_type, repo_key, commit_id, text, len(text), now) )
+
+        with self.lock:
+            if self.db is None:
+                return
+
+            try:
+                self.db.executemany( 'INSERT OR REPLACE INTO changes (scm_type, repo_key, commit_id, changes, size, last_used) '
+                                     'VALUES (?, ?, ?, ?, ?, ?)', all_rows )
+                self.db.commit()
+
+                self.__trim()
+
+            except sqlite3.DatabaseError as e:
+                self.__databaseError( e )
+
+    def __trim( self ):
+        total_size = self.db.execute( 'SELECT SUM(size) FROM changes' ).fetchone()[0] or 0
+        if total_size <= self.max_size:
+            return
+
+        # remove the least recently used down to 3/4 of the max size
+        excess = total_size - (self.max_size * 3 // 4)
+        all_rowids = []
+        for rowid, size in self.db.execute( 'SELECT rowid, size FROM changes ORDER BY last_used' ):
+            all_rowids.append( (rowid,) )
+            excess -= size
+            if excess <= 0:
+                break
+
+        self.db.executemany( 'DELETE FROM changes WHERE rowid=?', all_rowids )
+        self.db.commit()
@@ -174,6 +174,12 @@ class WbScmMainWindow(wb_main_window.WbMainWindow):
         self.timer_update_enable_states.timeout.connect( self.updateActionEnabledStates )
         self.timer_update_enable_states.setSingleShot( True )
 
+        # timer used to wait for a burst of file system changes to finish
+        self.timer_file_system_changes = QtCore.QTimer()
+        self.timer_file_system_changes.timeout.connect( self.__fileSystemChangesSettled )
+        self.timer_file_system_changes.setSingleShot( True )
+        self.file_system_changes_first_time = None
+
         # all variables exist
         self.__init_state = self.INIT_STATE_CONSISTENT
 
@@ -368,15 +374,45 @@ class WbScmMainWindow(wb_main_window.WbMainWindow):
             self.app.log.infoheader( 'Switching to branch %s' % (branch_name,) )
             scm_project.switchToBranch( branch_name )
 
-    singleton_update_table_running = False
+    # the serial keys of the projects with an update running
+    all_update_table_running_keys = set()
+    # requests made while an update of the same project is running
+    # become one more update - serial key -> folder
+    all_update_table_pending_folders = {}
 
     @thread_switcher
     def updateTableView_Bg( self, folder=None ):
-        if WbScmMainWindow.singleton_update_table_running:
+        # only requests for the same project are coalesced as they
+        # run under the same serial key as the running update
+        key = self.threadSwitcherSerialKey()
+
+        if key in WbScmMainWindow.all_update_table_running_keys:
+            self.debugLog( 'updateTableView_Bg coalesced for %r' % (key,) )
+            all_pending_folders = WbScmMainWindow.all_update_table_pending_folders
+            if key in all_pending_folders:
+                # different folders were asked for - update the selected folder
+                if all_pending_folders[ key ] != folder:
+                    all_pending_folders[ key ] = None
+
+            else:
+                all_pending_folders[ key ] = folder
             return
 
-        WbScmMainWindow.singleton_update_table_running = True
+        WbScmMainWindow.all_update_table_running_keys.add( key )
+        try:
+            while True:
+                yield from self.__updateTableView_Bg( folder )
+
+                if key not in WbScmMainWindow.all_update_table_pending_folders:
+                    break
 
+                folder = WbScmMainWindow.all_update_table_pending_folders.pop( key )
+
+        finally:
+            WbScmMainWindow.all_update_table_running_keys.discard( key )
+            WbScmMainWindow.all_update_table_pending_folders.pop( key, None )
+
+    def __updateTableView_Bg( self, folder ):
         self.__updateBranches()
 
         # need to turn sort on and off to have the view sorted on an update
@@ -387,6 +423,8 @@ class WbScmMainWindow(wb_main_window.WbMainWindow):
 
         # sort filter is now invalid
         self.table_view.table_sortfilter.refreshFilter()
+        # and the file states of the selection may have changed
+        self.table_view.invalidateSelectionFacts()
 
         # tall all the singletons to update
         for singleton in self.app.getAllSingletons():
@@ -397,14 +435,12 @@ class WbScmMainWindow(wb_main_window.WbMainWindow):
         # enabled states will have changed
         self.timer_update_enable_states.start( 0 )
 
-        WbScmMainWindow.singleton_update_table_running = False
-
-    def updateActionEnabledStates( self ):
+    def updateActionEnabledStates( self, all_changed=None ):
         # can be called during __init__ on macOS version
         if self.table_view is None or self.table_view.table_model is None:
             return
 
-        self.updateEnableStates()
+        self.updateEnableStates( all_changed=all_changed )
 
     def setupMenuBar( self, mb ):
         # --- setup common menus
@@ -586,7 +622,8 @@ class WbScmMainWindow(wb_main_window.WbMainWindow):
             else:
                 action = submenu.addAction( '-place holder-' )
                 action.setMenuRole( QtWidgets.QAction.NoRole )
-                handler = self.app.wrapWithThreadSwitcher( self.gotoFavoriteHandler_bg, 'favorite: %s' % (menu_name,) )
+                handler = self.app.wrapWithThreadSwitcher( self.gotoFavoriteHandler_bg, 'favorite: %s' % (menu_name,),
+                                        wb_background_thread.PRIORITY_INTERACTIVE, project.name )
                 action.triggered.connect( handler )
                 # QAction.NoRole prevents the TextHeuristicRole putting user's favorites in system menus 
                 action.setMenuRole( QtWidgets.QAction.NoRole )
@@ -612,11 +649,20 @@ class WbScmMainWindow(wb_main_window.WbMainWindow):
 
         return self.tree_model.selectedScmProjectTreeNode()
 
+    def threadSwitcherSerialKey( self ):
+        # the actions work on the selected project
+        scm_project_tree_node = self.selectedScmProjectTreeNode()
+        if scm_project_tree_node is None:
+            return None
+
+        return scm_project_tree_node.project.projectName()
+
     #------------------------------------------------------------
     #
     #   Enabler handlers
     #
     #------------------------------------------------------------
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerFolderExists( self ):
         scm_project_tree_node = self.selectedScmProjectTreeNode()
         if scm_project_tree_node is None:
@@ -624,6 +670,7 @@ class WbScmMainWindow(wb_main_window.WbMainWindow):
 
         return scm_project_tree_node.absolutePath() is not None
 
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerIsProject( self ):
         scm_project_tree_node = self.selectedScmProjectTreeNode()
         if scm_project_tree_node is None:
@@ -631,6 +678,7 @@ class WbScmMainWindow(wb_main_window.WbMainWindow):
 
         return scm_project_tree_node.relativePath() == pathlib.Path( '.' )
 
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerAddFavorite( self ):
         scm_project_tree_node = self.selectedScmProjectTreeNode()
         if scm_project_tree_node is None:
@@ -640,6 +688,7 @@ class WbScmMainWindow(wb_main_window.WbMainWindow):
                 scm_project_tree_node.project.projectPath(),
                 scm_project_tree_node.relativePath() )
 
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerEditOrRemoveFavorite( self ):
         scm_project_tree_node = self.selectedScmProjectTreeNode()
         if scm_project_tree_node is None:
@@ -661,7 +710,50 @@ class WbScmMainWindow(wb_main_window.WbMainWindow):
         if self.__init_state != self.INIT_STATE_COMPLETE:
             return
 
-        self.app.wrapWithThreadSwitcher( self.updateTableView_Bg, 'appActiveHandler' )()
+        scm_project_tree_node = self.selectedScmProjectTreeNode()
+        if( scm_project_tree_node is not None
+        and not self.tree_model.projectMayHaveChanged( scm_project_tree_node.project ) ):
+            self.debugLog( 'appActiveHandler() no file system changes' )
+            return
+
+        self.app.wrapWithThreadSwitcher( self.updateTableView_Bg, 'appActiveHandler',
+                wb_background_thread.PRIORITY_REFRESH, self.threadSwitcherSerialKey )()
+
+    # wait this long after the last change before refreshing
+    file_system_changes_settle_time = 0.5
+    # but do not wait longer then this for a constantly changing tree
+    file_system_changes_max_delay = 5.0
+
+    def fileSystemChanged( self, project_name ):
+        if self.__init_state != self.INIT_STATE_COMPLETE:
+            return
+
+        # only the selected project is shown
+        scm_project_tree_node = self.selectedScmProjectTreeNode()
+        if scm_project_tree_node is None or scm_project_tree_node.project.projectName() != project_name:
+            return
+
+        now = time.time()
+        if self.file_system_changes_first_time is None:
+            self.file_system_changes_first_time = now
+
+        if now - self.file_system_changes_first_time < self.file_system_changes_max_delay:
+            self.timer_file_system_changes.start( int( self.file_system_changes_settle_time * 1000 ) )
+
+        elif not self.timer_file_system_changes.isActive():
+            self.timer_file_system_changes.start( 0 )
+
+    def __fileSystemChangesSettled( self ):
+        self.file_system_changes_first_time = None
+
+        scm_project_tree_node = self.selectedScmProjectTreeNode()
+        if scm_project_tree_node is None:
+            return
+
+        if self.tree_model.fs_watcher.isDirty( scm_project_tree_node.project.projectName() ):
+            self.debugLog( '__fileSystemChangesSettled() refresh %s' % (scm_project_tree_node.project.projectName(),) )
+            self.app.wrapWithThreadSwitcher( self.updateTableView_Bg, 'fileSystemChanged',
+                    wb_background_thread.PRIORITY_REFRESH, self.threadSwitcherSerialKey )()
 
     #------------------------------------------------------------
     #
@@ -832,6 +924,8 @@ class WbScmMainWindow(wb_main_window.WbMainWindow):
         # close all open modeless windows
         wb_tracked_qwidget.closeAllWindows()
 
+        self.tree_model.closeAllProjects()
+
         if close:
             self.close()
 
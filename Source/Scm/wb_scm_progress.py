@@ -38,8 +38,8 @@ class WbScmProgress:
 
         self.status_widget.setText( self.progress_format % progress_values )
 
-    def incEventCount( self ):
-        self.__event_count += 1
+    def incEventCount( self, count=1 ):
+        self.__event_count += count
         self.__updateStatusCtrl()
 
     def getEventCount( self ):
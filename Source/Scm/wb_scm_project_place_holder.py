@@ -40,6 +40,15 @@ class ScmProjectPlaceholder:
     def projectPath( self ):
         return pathlib.Path( self.prefs_project.path )
 
+    def usesDirtyPaths( self ):
+        return False
+
+    def noteDirtyPaths( self, all_dirty_paths ):
+        pass
+
+    def close( self ):
+        pass
+
     def updateState( self, tree_leaf ):
         pass
 
@@ -11,139 +11,288 @@
 
 '''
 import os
+import array
 
 from PyQt5 import QtGui
 from PyQt5 import QtCore
 
+import wb_profile
+
 def U_( s: str ) -> str:
     return s
 
-class WbScmTableSortFilter(QtCore.QSortFilterProxyModel):
+# flags of each row of the table used to filter and sort
+ROW_IS_DIR                  = 0x01
+ROW_CONTROLLED_CHANGED      = 0x02
+ROW_CONTROLLED_NOT_CHANGED  = 0x04
+ROW_UNCONTROLLED            = 0x08
+ROW_IGNORED                 = 0x10
+ROW_CAN_COMMIT              = 0x20
+
+ROW_CONTROLLED = ROW_CONTROLLED_CHANGED|ROW_CONTROLLED_NOT_CHANGED
+
+class WbScmTableSortFilter(QtCore.QAbstractProxyModel):
+    '''
+    Filter and sort the rows of a WbScmTableModel.
+
+    All the rows are filtered on their ROW_* flags and names and sorted
+    in one go when anything changes. This is much quicker than being
+    asked about each row and comparing rows one pair at a time.
+    '''
     def __init__( self, app, parent=None ):
         self.app = app
         super().__init__( parent )
 
         self.filter_text = ''
+        self.filter_text_lower = ''
 
         self.show_controlled_and_changed = True
         self.show_controlled_and_not_changed = True
         self.show_uncontrolled = True
         self.show_ignored = False
 
+        # rows with any of these ROW_* flags are not shown
+        self.hide_flags = 0
+        self.__updateHideFlags()
+
+        self.sort_column = -1
+        self.sort_order = QtCore.Qt.AscendingOrder
+
+        # proxy row to source row
+        self.all_proxy_rows = []
+        # source row to proxy row or -1 if the row is filtered out
+        self.all_source_rows = array.array( 'l' )
+
+        # the unsorted rows accepted by the last filter
+        # used to filter only those rows when the filter text is extended
+        self.last_filter = None
+
+        # persistent indices saved while the layout changes
+        self.all_layout_indices = None
+        self.all_layout_keys = None
+
+    def __updateHideFlags( self ):
+        hide_flags = ROW_IS_DIR
+
+        if not self.show_controlled_and_changed:
+            hide_flags |= ROW_CONTROLLED_CHANGED
+
+        if not self.show_controlled_and_not_changed:
+            hide_flags |= ROW_CONTROLLED_NOT_CHANGED
+
+        if not self.show_uncontrolled:
+            hide_flags |= ROW_UNCONTROLLED
+
+        if not self.show_ignored:
+            hide_flags |= ROW_IGNORED
+
+        self.hide_flags = hide_flags
+
+    def setSourceModel( self, model ):
+        super().setSourceModel( model )
+
+        model.modelAboutToBeReset.connect( self.beginResetModel )
+        model.modelReset.connect( self.__sourceModelReset )
+        model.layoutAboutToBeChanged.connect( self.__sourceLayoutAboutToBeChanged )
+        model.layoutChanged.connect( self.__sourceLayoutChanged )
+        model.dataChanged.connect( self.__sourceDataChanged )
+
+        self.beginResetModel()
+        self.__updateRows()
+        self.endResetModel()
+
     # ------------------------------------------------------------
     def refreshFilter( self ):
         # call when there is a reason to recalculate the filter
         self.invalidateFilter()
 
+    def invalidateFilter( self ):
+        self.__aboutToChangeLayout( by_name=False )
+        self.__updateRows()
+        self.__layoutChanged()
+
     def setFilterText( self, text ):
         self.filter_text = text
-        # invalidateFilter is documented to update the view when the
-        # filter conditions are changed but it does not work
-        # when filter puts more items into the result
+        self.filter_text_lower = text.lower()
         self.invalidateFilter()
 
     def setShowControlledAndChangedFiles( self, state ):
         self.show_controlled_and_changed = state
+        self.__updateHideFlags()
         self.invalidateFilter()
 
     def setShowControlledAndNotChangedFiles( self, state ):
         self.show_controlled_and_not_changed = state
+        self.__updateHideFlags()
         self.invalidateFilter()
 
     def setShowUncontrolledFiles( self, state ):
         self.show_uncontrolled = state
+        self.__updateHideFlags()
         self.invalidateFilter()
 
     def setShowIgnoredFiles( self, state ):
         self.show_ignored = state
+        self.__updateHideFlags()
+        self.invalidateFilter()
+
+    def sort( self, column, order=QtCore.Qt.AscendingOrder ):
+        self.sort_column = column
+        self.sort_order = order
         self.invalidateFilter()
 
+    def sortColumn( self ):
+        return self.sort_column
+
+    def sortOrder( self ):
+        return self.sort_order
+
     # ------------------------------------------------------------
-    def filterAcceptsRow( self, source_row, source_parent ):
+    def __updateRows( self ):
         model = self.sourceModel()
-        index = model.createIndex( source_row, WbScmTableModel.col_name )
+        rows = model.rows
 
-        entry = model.data( index, QtCore.Qt.UserRole )
+        key = (rows, self.hide_flags)
+        text = self.filter_text_lower
+        if( self.last_filter is not None
+        and self.last_filter[0] == key
+        and self.last_filter[1] in text ):
+            # only the rows that matched the shorter text can match
+            all_accepted = self.last_filter[2]
 
-        changed = entry.stagedAsString() != '' or entry.statusAsString() != ''
-        not_changed = entry.stagedAsString() == '' and entry.statusAsString() == ''
+        else:
+            hide_flags = self.hide_flags
+            all_accepted = [row for row, flags in enumerate( rows.all_flags ) if not flags & hide_flags]
 
-        if entry.is_dir():
-            return False
+        if text != '':
+            all_names_lower = rows.all_names_lower
+            all_accepted = [row for row in all_accepted if text in all_names_lower[ row ]]
 
-        if entry.isControlled() and changed and not self.show_controlled_and_changed:
-            return False
+        self.last_filter = (key, text, all_accepted)
 
-        if entry.isControlled() and not_changed and not self.show_controlled_and_not_changed:
-            return False
+        # the rows are in name order
+        column = self.sort_column
+        if column in (model.col_staged, model.col_status):
+            all_proxy_rows = sorted( all_accepted, key=rows.statusRank().__getitem__ )
 
-        if entry.isUncontrolled() and not self.show_uncontrolled:
-            return False
+        elif column == model.col_date:
+            all_proxy_rows = sorted( all_accepted, key=lambda row: (rows.mtime( row ), row) )
 
-        if entry.isIgnore() and not self.show_ignored:
-            return False
+        elif column == model.col_type:
+            all_proxy_rows = sorted( all_accepted, key=lambda row: (rows.isDir( row ), row) )
 
-        if self.filter_text != '':
-            return self.filter_text.lower() in str(entry.name).lower()
+        else:
+            all_proxy_rows = list( all_accepted )
 
-        return True
+        if self.sort_order == QtCore.Qt.DescendingOrder:
+            all_proxy_rows.reverse()
 
-    def lessThan( self, source_left, source_right ):
-        model = self.sourceModel()
-        left_ent = model.entry( source_left )
-        right_ent = model.entry( source_right )
-        column = source_left.column()
+        self.all_proxy_rows = all_proxy_rows
+        self.all_source_rows = array.array( 'l', [-1] ) * len(rows)
+        for proxy_row, source_row in enumerate( all_proxy_rows ):
+            self.all_source_rows[ source_row ] = proxy_row
 
-        if column == model.col_name:
-            return left_ent.name < right_ent.name
+    def __aboutToChangeLayout( self, by_name ):
+        self.layoutAboutToBeChanged.emit()
 
-        if column in (model.col_staged, model.col_status):
-            # cached first
-            left = left_ent.stagedAsString()
-            right = right_ent.stagedAsString()
-            if left != right:
-                return left > right
+        # the selection and current index are persistent indices
+        self.all_layout_indices = self.persistentIndexList()
+        all_source_rows = [self.all_proxy_rows[ index.row() ] for index in self.all_layout_indices]
+        if by_name:
+            # the rows of the source are about to be replaced
+            all_names = self.sourceModel().rows.all_names
+            self.all_layout_keys = [str(all_names[ row ]) for row in all_source_rows]
+
+        else:
+            self.all_layout_keys = all_source_rows
 
-            # then working changes
-            left = left_ent.statusAsString()
-            right = right_ent.statusAsString()
-            if left != right:
-                return left > right
+    def __layoutChanged( self, by_name=False ):
+        if len(self.all_layout_indices) > 0:
+            if by_name:
+                all_row_by_name = {str(name): row for row, name in enumerate( self.sourceModel().rows.all_names )}
+                all_source_rows = [all_row_by_name.get( name, -1 ) for name in self.all_layout_keys]
+
+            else:
+                all_source_rows = self.all_layout_keys
 
-            left = left_ent.isControlled()
-            right = right_ent.isControlled()
-            if left != right:
-                return left > right
+            all_new_indices = []
+            for index, source_row in zip( self.all_layout_indices, all_source_rows ):
+                proxy_row = self.all_source_rows[ source_row ] if source_row >= 0 else -1
+                if proxy_row >= 0:
+                    all_new_indices.append( self.createIndex( proxy_row, index.column() ) )
 
-            left = left_ent.isIgnore()
-            right = right_ent.isIgnore()
-            if left != right:
-                return left < right
+                else:
+                    all_new_indices.append( QtCore.QModelIndex() )
+
+            self.changePersistentIndexList( self.all_layout_indices, all_new_indices )
+
+        self.all_layout_indices = None
+        self.all_layout_keys = None
+
+        self.layoutChanged.emit()
+
+    def __sourceModelReset( self ):
+        self.__updateRows()
+        self.endResetModel()
+
+    def __sourceLayoutAboutToBeChanged( self ):
+        self.__aboutToChangeLayout( by_name=True )
+
+    def __sourceLayoutChanged( self ):
+        self.__updateRows()
+        self.__layoutChanged( by_name=True )
+
+    def __sourceDataChanged( self, top_left, bottom_right, all_roles=() ):
+        all_proxy_rows = [self.all_source_rows[ row ] for row in range( top_left.row(), bottom_right.row()+1 )
+                            if self.all_source_rows[ row ] >= 0]
+        if len(all_proxy_rows) > 0:
+            self.dataChanged.emit(
+                self.createIndex( min( all_proxy_rows ), top_left.column() ),
+                self.createIndex( max( all_proxy_rows ), bottom_right.column() ),
+                all_roles )
+
+    # ------------------------------------------------------------
+    def mapToSource( self, proxy_index ):
+        if not proxy_index.isValid():
+            return QtCore.QModelIndex()
 
-            # finally in name order
-            # name can be pathlib.Path or str.
-            return str(left_ent.name) < str(right_ent.name)
+        return self.sourceModel().createIndex( self.all_proxy_rows[ proxy_index.row() ], proxy_index.column() )
 
-        if column == model.col_status:
-            if left == right:
-                return left_ent.name < right_ent.name
+    def mapFromSource( self, source_index ):
+        if not source_index.isValid():
+            return QtCore.QModelIndex()
 
-            return left > right
+        proxy_row = self.all_source_rows[ source_index.row() ]
+        if proxy_row < 0:
+            return QtCore.QModelIndex()
 
-        if column == model.col_date:
-            left = (left_ent.stat().st_mtime, left_ent.name)
-            right = (right_ent.stat().st_mtime, right_ent.name)
+        return self.createIndex( proxy_row, source_index.column() )
 
-            return left < right
+    def index( self, row, column, parent=QtCore.QModelIndex() ):
+        if parent.isValid() or row < 0 or row >= len(self.all_proxy_rows):
+            return QtCore.QModelIndex()
 
-        if column == model.col_type:
-            left = (left_ent.is_dir(), left_ent.name)
-            right = (right_ent.is_dir(), right_ent.name)
+        return self.createIndex( row, column )
 
-            return left < right
+    def parent( self, index ):
+        return QtCore.QModelIndex()
 
-        assert False, 'Unknown column %r' % (source_left,)
+    def rowCount( self, parent=QtCore.QModelIndex() ):
+        if parent.isValid():
+            return 0
 
+        return len(self.all_proxy_rows)
+
+    def columnCount( self, parent=QtCore.QModelIndex() ):
+        if parent.isValid():
+            return 0
+
+        return self.sourceModel().col_num_columns
+
+    def headerData( self, section, orientation, role ):
+        return self.sourceModel().headerData( section, orientation, role )
+
+@wb_profile.profileModelResets
 class WbScmTableModel(QtCore.QAbstractTableModel):
     col_include = 0
     col_staged = 1
@@ -164,7 +313,7 @@ class WbScmTableModel(QtCore.QAbstractTableModel):
 
         self.scm_project_tree_node = None
 
-        self.all_files = []
+        self.rows = WbScmTableRows( self.app, {}, {} )
         self.all_included_files = None
 
         if app.isDarkMode():
@@ -180,7 +329,7 @@ class WbScmTableModel(QtCore.QAbstractTableModel):
         return self.scm_project_tree_node is not None and self.scm_project_tree_node.isByPath()
 
     def rowCount( self, parent ):
-        return len( self.all_files )
+        return len( self.rows.all_names )
 
     def columnCount( self, parent ):
         return len( self.column_titles )
@@ -199,7 +348,7 @@ class WbScmTableModel(QtCore.QAbstractTableModel):
         return None
 
     def entry( self, index ):
-        return self.all_files[ index.row() ]
+        return self.rows.entry( index.row() )
 
     role_to_name = {
         QtCore.Qt.UserRole: 'UserRole',
@@ -208,34 +357,37 @@ class WbScmTableModel(QtCore.QAbstractTableModel):
         }
     def data( self, index, role ):
         result = self.data_( index, role )
-        if role in self.role_to_name:
+        if self.debugLog and role in self.role_to_name:
             if isinstance( result, QtGui.QBrush ):
                 colour = result.color()
                 result_p = 'Colour(%d, %d, %d)' % (colour.red(), colour.green(), colour.blue())
             else:
                 result_p = result
-            self.debugLog( 'WbScmTableModel.data( %r, %r ) -> %r' % (self.all_files[ index.row() ], self.role_to_name[ role ], result_p) )
+            self.debugLog( 'WbScmTableModel.data( %r, %r ) -> %r' % (self.rows.entry( index.row() ), self.role_to_name[ role ], result_p) )
         return result
 
     def data_( self, index, role ):
+        # only the rows the view shows need a WbScmTableEntry
         if role == QtCore.Qt.UserRole:
-            return self.all_files[ index.row() ]
+            return self.rows.entry( index.row() )
 
         if role == QtCore.Qt.DisplayRole:
-            entry = self.all_files[ index.row() ]
+            row = index.row()
 
             col = index.column()
 
             if col == self.col_include:
-                return 'X' if entry.name in self.all_included_files else ''
+                return 'X' if self.rows.all_names[ row ] in self.all_included_files else ''
 
             elif col == self.col_staged:
-                return entry.stagedAsString()
+                return self.rows.all_staged[ row ]
 
             elif col == self.col_status:
-                return entry.statusAsString()
+                return self.rows.all_unstaged[ row ]
 
             elif col == self.col_name:
+                entry = self.rows.entry( row )
+
                 # entry.name maybe a pathlib.Path object
                 name = str(entry.name)
 
@@ -250,17 +402,17 @@ class WbScmTableModel(QtCore.QAbstractTableModel):
                     return name
 
             elif col == self.col_date:
-                return entry.fileDate()
+                return self.rows.entry( row ).fileDate()
 
             elif col == self.col_type:
-                return entry.is_dir() and 'Dir' or 'File'
+                return self.rows.isDir( row ) and 'Dir' or 'File'
 
             assert False
 
         elif role == QtCore.Qt.ForegroundRole:
-            entry = self.all_files[ index.row() ]
-            cached = entry.stagedAsString()
-            working = entry.statusAsString()
+            row = index.row()
+            cached = self.rows.all_staged[ row ]
+            working = self.rows.all_unstaged[ row ]
 
             if cached != '':
                 return self.__brush_is_cached
@@ -268,8 +420,9 @@ class WbScmTableModel(QtCore.QAbstractTableModel):
             if working != '':
                 return self.__brush_is_changed
 
-            self.debugLog( 'WbScmTableModel.data_() isControlled %r entry %r' % (entry.isControlled(), entry) )
-            if not entry.isControlled():
+            controlled = self.rows.isControlled( row )
+            self.debugLog( 'WbScmTableModel.data_() isControlled %r name %r' % (controlled, self.rows.all_names[ row ]) )
+            if not controlled:
                 return self.__brush_is_uncontrolled
 
         #if role == QtCore.Qt.BackgroundRole:
@@ -290,111 +443,60 @@ class WbScmTableModel(QtCore.QAbstractTableModel):
             scm_project_tree_node = self.scm_project_tree_node
 
         # find all the files know to the SCM and the folder
-        all_files = {}
+        all_dirents = {}
         if scm_project_tree_node.absolutePath().exists():
             if not scm_project_tree_node.isByPath():
                 # skip scanning the file system for now
                 folder = scm_project_tree_node.absolutePath()
                 for dirent in os_scandir( str( folder ) ):
-                    entry = WbScmTableEntry( self.app, dirent.name )
-                    entry.updateFromDirEnt( dirent )
-
-                    all_files[ entry.name ] = entry
+                    all_dirents[ dirent.name ] = dirent
 
+        all_status = {}
         for name in scm_project_tree_node.getAllFileNames():
-            if name not in all_files:
-                entry = WbScmTableEntry( self.app, name )
-
-            else:
-                entry = all_files[ name ]
+            all_status[ name ] = scm_project_tree_node.getStatusEntry( name )
 
-            entry.updateFromScm( scm_project_tree_node.getStatusEntry( name ) )
-
-            all_files[ entry.name ] = entry
+        new_rows = WbScmTableRows( self.app, all_dirents, all_status )
 
         if( self.scm_project_tree_node is None
         or self.scm_project_tree_node.isNotEqual( scm_project_tree_node ) ):
             self.debugLog( 'WbScmTableModel.refreshTable() resetModel' )
             self.beginResetModel()
-            self.all_files = sorted( all_files.values() )
+            self.rows = new_rows
             self.endResetModel()
 
             # see if self.all_included_files needs setting up
             if self.all_included_files is not None:
-                for entry in self.all_files:
-                    if entry.canCommit():
-                        self.all_included_files.add( entry.name )
+                self.all_included_files.update( self.rows.namesWithFlags( ROW_CAN_COMMIT ) )
 
             else:
                 self.all_included_files = set()
 
         else:
-            parent = QtCore.QModelIndex()
-            self.debugLog( 'WbScmTableModel.refreshTable() insert/remove' )
-
-            all_new_files = sorted( all_files.values() )
-
-            all_old_names = [entry.name for entry in self.all_files]
-            all_new_names = [entry.name for entry in all_new_files]
-
-            all_debug_lines = []
-            for offset, name in enumerate( self.all_files ):
-                all_debug_lines.append( 'old %2d %s' % (offset, name) )
-
-            for offset, name in enumerate( all_new_files ):
-                all_debug_lines.append( 'new %2d %s' % (offset, name) )
-
-            if self.debugLog:
-                for line in all_debug_lines:
-                    self.debugLog( line )
-
-            offset = 0
-            while offset < len(all_new_files) and offset < len(self.all_files):
-                self.debugLog( 'WbScmTableModel.refreshTable() while offset %d %r old %r' %
-                        (offset, all_new_files[ offset ].name, self.all_files[ offset ].name) )
-
-                # all_new_files and self.all_files are a mix of str and Path objects
-                # coerce to str to do the compares
-                if str(all_new_files[ offset ].name) == str(self.all_files[ offset ].name):
-                    if all_new_files[ offset ].isNotEqual( self.all_files[ offset ] ):
-                        self.debugLog( 'WbScmTableModel.refreshTable() emit dataChanged row=%d' % (offset,) )
-                        self.dataChanged.emit(
-                            self.createIndex( offset, self.col_staged ),
-                            self.createIndex( offset, self.col_type ) )
-                    offset += 1
-
-                elif str(all_new_files[ offset ].name) < str(self.all_files[ offset ].name):
-                    self.debugLog( 'WbScmTableModel.refreshTable() insertRows row=%d %r' % (offset, all_new_names[offset]) )
-                    self.beginInsertRows( parent, offset, offset )
-                    self.all_files.insert( offset, all_new_files[ offset ] )
-                    all_old_names.insert( offset, all_new_files[ offset ].name )
-                    self.endInsertRows()
-                    offset += 1
+            self.debugLog( 'WbScmTableModel.refreshTable() layout changed %d to %d rows' % (len(self.rows), len(new_rows)) )
 
-                else:
-                    self.debugLog( 'WbScmTableModel.refreshTable() deleteRows row=%d' % (offset,) )
-                    # delete the old
-                    self.beginRemoveRows( parent, offset, offset )
-                    del self.all_files[ offset ]
-                    del all_old_names[ offset ]
-                    self.endRemoveRows()
+            # a single layout change for all the added, removed and changed rows
+            # that keeps the persistent indices, like the selection, of rows
+            # that are in the old and new rows
+            self.layoutAboutToBeChanged.emit()
 
-            if offset < len(self.all_files):
-                self.debugLog( 'WbScmTableModel.refreshTable() removeRows at end of old row=%d %r' % (offset, all_old_names[ offset: ]) )
+            all_old_indices = self.persistentIndexList()
+            all_names = [str(self.rows.all_names[ index.row() ]) for index in all_old_indices]
 
-                self.beginRemoveRows( parent, offset, len(self.all_files)-1 )
-                del self.all_files[ offset: ]
-                self.endRemoveRows()
+            self.rows = new_rows
 
-            if offset < len(all_new_files):
-                self.debugLog( 'WbScmTableModel.refreshTable() insertRows at end of new row=%d %r, old row %s' % (offset, all_new_names[offset:], offset) )
+            if len(all_old_indices) > 0:
+                all_row_by_name = {str(name): row for row, name in enumerate( self.rows.all_names )}
+                all_new_indices = []
+                for index, name in zip( all_old_indices, all_names ):
+                    if name in all_row_by_name:
+                        all_new_indices.append( self.createIndex( all_row_by_name[ name ], index.column() ) )
 
-                to_insert = len(all_new_files) - offset - 1
-                self.beginInsertRows( parent, offset, offset + to_insert )
-                self.all_files.extend( all_new_files[offset:] )
-                self.endInsertRows()
+                    else:
+                        all_new_indices.append( QtCore.QModelIndex() )
 
-            self.all_files = sorted( all_files.values() )
+                self.changePersistentIndexList( all_old_indices, all_new_indices )
+
+            self.layoutChanged.emit()
 
         self.scm_project_tree_node = scm_project_tree_node
         self.debugLog( 'WbScmTableModel.refreshTable() done self.scm_project_tree_node %r' % (self.scm_project_tree_node,) )
@@ -419,15 +521,125 @@ class WbScmTableModel(QtCore.QAbstractTableModel):
             return []
 
         all_indices = []
-        for row in range( self.rowCount( QtCore.QModelIndex() ) ):
-            index = self.createIndex( row, 0 )
-            entry = self.data( index, QtCore.Qt.UserRole )
-            if entry.name in all_names:
-                all_indices.append( index )
+        for row, name in enumerate( self.rows.all_names ):
+            if name in all_names:
+                all_indices.append( self.createIndex( row, 0 ) )
 
         return all_indices
 
+class WbScmTableRows:
+    '''
+    The rows of the table held as columns in name order with the
+    ROW_* flags and abbreviated status of each row worked out once
+    so that filtering and sorting do not need a WbScmTableEntry.
+
+    Entries are made only for the rows that the view asks for.
+    '''
+    __slots__ = ('app', 'all_names', 'all_names_lower', 'all_dirents', 'all_status'
+                ,'all_staged', 'all_unstaged', 'all_flags', 'all_status_rank', 'all_entries')
+
+    def __init__( self, app, all_dirents, all_status ):
+        self.app = app
+
+        # name can be pathlib.Path or str
+        self.all_names = sorted( set( all_dirents ) | set( all_status ), key=str )
+        self.all_names_lower = [str(name).lower() for name in self.all_names]
+        self.all_dirents = [all_dirents.get( name ) for name in self.all_names]
+        self.all_status = [all_status.get( name ) for name in self.all_names]
+
+        self.all_staged = []
+        self.all_unstaged = []
+        self.all_flags = array.array( 'L' )
+
+        for dirent, status in zip( self.all_dirents, self.all_status ):
+            flags = 0
+            if dirent is not None and dirent.is_dir():
+                flags |= ROW_IS_DIR
+
+            staged = ''
+            unstaged = ''
+            if status is not None:
+                staged = status.getStagedAbbreviatedStatus()
+                unstaged = status.getUnstagedAbbreviatedStatus()
+
+                if status.isControlled():
+                    if staged != '' or unstaged != '':
+                        flags |= ROW_CONTROLLED_CHANGED
+
+                    else:
+                        flags |= ROW_CONTROLLED_NOT_CHANGED
+
+                if status.isUncontrolled():
+                    flags |= ROW_UNCONTROLLED
+
+                if status.isIgnored():
+                    flags |= ROW_IGNORED
+
+                if status.canCommit():
+                    flags |= ROW_CAN_COMMIT
+
+            self.all_staged.append( staged )
+            self.all_unstaged.append( unstaged )
+            self.all_flags.append( flags )
+
+        # the position of each row sorted by status made when first needed
+        self.all_status_rank = None
+
+        # row to WbScmTableEntry
+        self.all_entries = {}
+
+    def __len__( self ):
+        return len(self.all_names)
+
+    def entry( self, row ):
+        entry = self.all_entries.get( row )
+        if entry is None:
+            entry = WbScmTableEntry( self.app, self.all_names[ row ] )
+            entry.updateFromDirEnt( self.all_dirents[ row ] )
+            entry.updateFromScm( self.all_status[ row ] )
+            self.all_entries[ row ] = entry
+
+        return entry
+
+    def namesWithFlags( self, flags ):
+        return [name for name, row_flags in zip( self.all_names, self.all_flags ) if row_flags & flags]
+
+    def isDir( self, row ):
+        return (self.all_flags[ row ] & ROW_IS_DIR) != 0
+
+    def isControlled( self, row ):
+        return (self.all_flags[ row ] & ROW_CONTROLLED) != 0
+
+    def isIgnore( self, row ):
+        return (self.all_flags[ row ] & ROW_IGNORED) != 0
+
+    def mtime( self, row ):
+        dirent = self.all_dirents[ row ]
+        if dirent is None:
+            return 0
+
+        return dirent.stat().st_mtime
+
+    def statusRank( self ):
+        if self.all_status_rank is None:
+            # staged then working status, controlled before uncontrolled,
+            # ignored last then name order. Sort on each key from the last
+            # to the first as sort is stable and the rows are in name order.
+            all_rows = list( range( len(self.all_names) ) )
+            all_rows.sort( key=self.isIgnore )
+            all_rows.sort( key=self.isControlled, reverse=True )
+            all_rows.sort( key=self.all_unstaged.__getitem__, reverse=True )
+            all_rows.sort( key=self.all_staged.__getitem__, reverse=True )
+
+            self.all_status_rank = array.array( 'L', all_rows )
+            for rank, row in enumerate( all_rows ):
+                self.all_status_rank[ row ] = rank
+
+        return self.all_status_rank
+
 class WbScmTableEntry:
+    __slots__ = ('app', 'name', 'dirent', 'status')
+
     def __init__( self, app, name ):
         self.app = app
         self.name = name
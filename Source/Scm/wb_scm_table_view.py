@@ -15,6 +15,7 @@ from PyQt5 import QtCore
 import wb_scm_table_model
 import wb_shell_commands
 import wb_table_view
+import wb_main_window
 
 import wb_background_thread
 
@@ -31,6 +32,9 @@ class WbScmTableView(wb_table_view.WbTableView):
 
         self.all_visible_columns = None
 
+        # WbSelectionFacts of the current selection, made when first needed
+        self.__selection_facts = None
+
         # short cut keys in the table view
         self.table_keys_edit = ('\r', 'e', 'E')
         self.table_keys_open = ('o', 'O')
@@ -43,8 +47,13 @@ class WbScmTableView(wb_table_view.WbTableView):
 
         self.table_sortfilter = wb_scm_table_model.WbScmTableSortFilter( self.app )
         self.table_sortfilter.setSourceModel( self.table_model )
-        # does this hurt performance?
-        self.table_sortfilter.setDynamicSortFilter( True )
+
+        # the selected file states change with the rows of the model
+        self.table_model.modelReset.connect( self.__tableModelChanged )
+        self.table_model.layoutChanged.connect( self.__tableModelChanged )
+        self.table_model.dataChanged.connect( self.__tableModelChanged )
+        self.table_model.rowsInserted.connect( self.__tableModelChanged )
+        self.table_model.rowsRemoved.connect( self.__tableModelChanged )
 
         self.table_sort_column = self.table_model.col_status
         self.table_sort_order = QtCore.Qt.AscendingOrder
@@ -52,6 +61,9 @@ class WbScmTableView(wb_table_view.WbTableView):
         # setModel triggers a selectionChanged event
         self.setModel( self.table_sortfilter )
 
+        # filtering and sorting is a layout change that can take rows out of the selection
+        self.table_sortfilter.layoutChanged.connect( self.__tableLayoutChanged )
+
         # allow Tab/Shift-Tab to move between tree/filter/table and log widgets
         self.setTabKeyNavigation( False )
 
@@ -142,6 +154,7 @@ class WbScmTableView(wb_table_view.WbTableView):
         self.table_model.setIncludedFilesSet( all_included_files )
 
     def setScmProjectTreeNode( self, tree_node ):
+        self.invalidateSelectionFacts()
         self.table_model.setScmProjectTreeNode( tree_node )
 
     def selectedScmProject( self ):
@@ -181,6 +194,23 @@ class WbScmTableView(wb_table_view.WbTableView):
                 for name in all_names
                 if scm_project.hasFileState( relative_folder / name )]
 
+    def selectionFacts( self ):
+        if self.__selection_facts is None:
+            self.__selection_facts = wb_main_window.WbSelectionFacts( self.selectedAllFileStates() )
+
+        return self.__selection_facts
+
+    # call when the selection or the file states of the selection change
+    def invalidateSelectionFacts( self ):
+        self.__selection_facts = None
+
+    def __tableModelChanged( self, *args ):
+        self.invalidateSelectionFacts()
+
+    def __tableLayoutChanged( self, *args ):
+        self.invalidateSelectionFacts()
+        self.main_window.updateActionEnabledStates( all_changed=(wb_main_window.ENABLER_TABLE_SELECTION,) )
+
     def tableActionViewRepo( self, execute_function, are_you_sure_function=None, finalise_function=None ):
         all_filenames = self.__tableActionViewRepoPrep( are_you_sure_function )
         if len(all_filenames) > 0:
@@ -192,23 +222,31 @@ class WbScmTableView(wb_table_view.WbTableView):
             if finalise_function is not None:
                 finalise_function( scm_project )
 
-    # like tableActionViewRepo but uses yield for use with a thread switcher
+    # like tableActionViewRepo but uses yield for use with a thread switcher.
+    # execute_function is called for each filename or, with all_at_once,
+    # called once with the list of all the filenames
     @thread_switcher
-    def tableActionViewRepo_Bg( self, execute_function, are_you_sure_function=None, finalise_function=None ):
+    def tableActionViewRepo_Bg( self, execute_function, are_you_sure_function=None, finalise_function=None, all_at_once=False ):
         self.debugLog( 'tableActionViewRepo_Bg start' )
         all_filenames = self.__tableActionViewRepoPrep( are_you_sure_function )
 
         if len(all_filenames) > 0:
             scm_project = self.selectedScmProject()
 
-            for filename in all_filenames:
+            if all_at_once:
+                all_execute_args = [all_filenames]
+
+            else:
+                all_execute_args = all_filenames
+
+            for execute_arg in all_execute_args:
                 if wb_background_thread.requiresThreadSwitcher( execute_function ):
                     self.debugLog( 'tableActionViewRepo_Bg exec yield from  %r' % (execute_function,) )
-                    yield from execute_function( scm_project, filename )
+                    yield from execute_function( scm_project, execute_arg )
 
                 else:
-                    self.debugLog( 'tableActionViewRepo_Bg exec call %r( %r, %r )' % (execute_function, scm_project, filename) )
-                    execute_function( scm_project, filename )
+                    self.debugLog( 'tableActionViewRepo_Bg exec call %r( %r, %r )' % (execute_function, scm_project, execute_arg) )
+                    execute_function( scm_project, execute_arg )
 
             if finalise_function is not None:
                 if wb_background_thread.requiresThreadSwitcher( finalise_function ):
@@ -293,7 +331,8 @@ class WbScmTableView(wb_table_view.WbTableView):
     def selectionChanged( self, selected, deselected ):
         self.debugLog( 'WbTableView.selectionChanged()' )
 
-        self.main_window.updateActionEnabledStates()
+        self.invalidateSelectionFacts()
+        self.main_window.updateActionEnabledStates( all_changed=(wb_main_window.ENABLER_TABLE_SELECTION,) )
 
         # allow the table to redraw the selected row highlights
         super().selectionChanged( selected, deselected )
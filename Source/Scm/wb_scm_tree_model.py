@@ -14,6 +14,8 @@ from PyQt5 import QtGui
 from PyQt5 import QtCore
 
 import wb_scm_project_place_holder
+import wb_fs_watcher
+import wb_background_thread
 
 from wb_background_thread import thread_switcher
 
@@ -36,8 +38,10 @@ class WbScmTreeSortFilter(QtCore.QSortFilterProxyModel):
         return left_ent.text().lower() > right_ent.text().lower()
 
     def selectionChanged( self, selected, deselected ):
-        self.app.wrapWithThreadSwitcher( self.main_window.treeSelectionChanged_Bg, 'sort filter SelectionChanged' )(
-                self.mapSelectionToSource( selected ),
+        source_selected = self.mapSelectionToSource( selected )
+        self.app.wrapWithThreadSwitcher( self.main_window.treeSelectionChanged_Bg, 'sort filter SelectionChanged',
+                wb_background_thread.PRIORITY_INTERACTIVE, self.sourceModel().serialKeyForSelection( source_selected ) )(
+                source_selected,
                 self.mapSelectionToSource( deselected ) )
 
 class WbScmTreeModel(QtGui.QStandardItemModel):
@@ -53,6 +57,15 @@ class WbScmTreeModel(QtGui.QStandardItemModel):
 
         self.all_scm_projects = {}
 
+        # names of the projects being refreshed and the folder of
+        # the one refresh to do after the running one finishes
+        self.all_refreshing_projects = set()
+        self.all_pending_refresh_folders = {}
+
+        # records the paths changed in each project in all_scm_projects
+        self.fs_watcher = wb_fs_watcher.WbFileSystemWatcher( self.app,
+                                self.app.deferRunInForeground( self.__fileSystemChanged ) )
+
         self.debugLog( 'WbScmTreeModel.__init__ self.selected_node = None' )
         self.selected_node = None
 
@@ -65,6 +78,10 @@ class WbScmTreeModel(QtGui.QStandardItemModel):
         self.all_scm_projects[ scm_project.tree.name ] = (scm_project, tree_node)
         self.appendRow( tree_node )
 
+        # only watch the projects that use the changed paths
+        if scm_project.usesDirtyPaths() and scm_project.projectPath().exists():
+            self.fs_watcher.addTree( scm_project.tree.name, scm_project.projectPath() )
+
     def delProject( self, project_name ):
         item = self.invisibleRootItem()
 
@@ -83,6 +100,20 @@ class WbScmTreeModel(QtGui.QStandardItemModel):
 
         self.removeRow( row, QtCore.QModelIndex() )
 
+        self.fs_watcher.removeTree( project_name )
+
+        if project_name in self.all_scm_projects:
+            scm_project, tree_node = self.all_scm_projects.pop( project_name )
+            scm_project.close()
+
+    def closeAllProjects( self ):
+        # stop the processes the projects keep running
+        for scm_project, tree_node in self.all_scm_projects.values():
+            scm_project.close()
+
+        # and the threads watching their working trees
+        self.fs_watcher.shutdown()
+
     @thread_switcher
     def refreshTree_Bg( self, folder=None ):
         self.debugLog( 'refreshTree_Bg( %r ) selected_node %r' % (folder, self.selected_node) )
@@ -90,13 +121,53 @@ class WbScmTreeModel(QtGui.QStandardItemModel):
             return
 
         scm_project = self.selected_node.scm_project_tree_node.project
+        project_name = scm_project.projectName()
+
+        if project_name in self.all_refreshing_projects:
+            # the running refresh will update the project once more
+            # when it finishes - any number of requests become one
+            self.debugLog( 'refreshTree_Bg() coalesced for %s' % (project_name,) )
+            if project_name in self.all_pending_refresh_folders:
+                # different folders were asked for - refresh the selected folder
+                if self.all_pending_refresh_folders[ project_name ] != folder:
+                    self.all_pending_refresh_folders[ project_name ] = None
+
+            else:
+                self.all_pending_refresh_folders[ project_name ] = folder
+            return
+
+        self.all_refreshing_projects.add( project_name )
+        try:
+            while True:
+                yield from self.__refreshProject_Bg( scm_project, folder )
+
+                if project_name not in self.all_pending_refresh_folders:
+                    break
+
+                folder = self.all_pending_refresh_folders.pop( project_name )
+
+                # drop the pending refresh if another project is now selected
+                if( self.selected_node is None
+                or self.selected_node.scm_project_tree_node.project is not scm_project ):
+                    self.debugLog( 'refreshTree_Bg() dropped stale refresh of %s' % (project_name,) )
+                    break
+
+                self.debugLog( 'refreshTree_Bg() pending refresh of %s' % (project_name,) )
+
+        finally:
+            self.all_refreshing_projects.discard( project_name )
+            self.all_pending_refresh_folders.pop( project_name, None )
+
+    def __refreshProject_Bg( self, scm_project, folder ):
         self.app.top_window.setStatusAction( T_('Update status of %s') % (scm_project.projectName(),) )
-        yield self.app.switchToBackground
 
-        # update the project data
         if folder is None:
             folder = self.selected_node.scm_project_tree_node.relativePath()
 
+        yield self.app.switchToBackground
+
+        # update the project data
+        scm_project.noteDirtyPaths( self.fs_watcher.takeDirtyPaths( scm_project.projectName() ) )
         scm_project.updateState( folder )
 
         yield self.app.switchToForeground
@@ -114,6 +185,14 @@ class WbScmTreeModel(QtGui.QStandardItemModel):
             self.table_model.setScmProjectTreeNode( self.selected_node.scm_project_tree_node )
         self.debugLog( 'refreshTree_Bg() Done' )
 
+    def __fileSystemChanged( self, project_name ):
+        self.app.top_window.fileSystemChanged( project_name )
+
+    def projectMayHaveChanged( self, scm_project ):
+        # without a precise watcher any file may have changed
+        project_name = scm_project.projectName()
+        return not self.fs_watcher.isPrecise( project_name ) or self.fs_watcher.isDirty( project_name )
+
     def getFirstProjectIndex( self ):
         if self.invisibleRootItem().rowCount() == 0:
             return None
@@ -189,7 +268,20 @@ class WbScmTreeModel(QtGui.QStandardItemModel):
         self.debugLog( 'selectionChanged: deselected %r' % ([(index.row(), index.column()) for index in deselected.indexes()],) )
         super().selectionChanged( selected, deselected )
         self.debugLog( 'selectionChanged calling selectionChanged_Bg' )
-        self.app.wrapWithThreadSwitcher( self.selectionChanged_Bg, 'treeModel selectionChanged' )( selected, deselected )
+        self.app.wrapWithThreadSwitcher( self.selectionChanged_Bg, 'treeModel selectionChanged',
+                wb_background_thread.PRIORITY_INTERACTIVE, self.serialKeyForSelection( selected ) )( selected, deselected )
+
+    def serialKeyForSelection( self, selected ):
+        # serialise the background work of a selection with the rest of its project's work
+        all_selected = selected.indexes()
+        if len( all_selected ) == 0:
+            return None
+
+        node = self.itemFromIndex( all_selected[0] )
+        if node is None:
+            return None
+
+        return node.scm_project_tree_node.project.projectName()
 
     @thread_switcher
     def selectionChanged_Bg( self, selected, deselected ):
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+#
+#   svn_file_state_memory.py
+#
+#   Compare the memory used and the time taken by a full garbage
+#   collection for the file states of a very large working copy:
+#
+#       legacy  - dict backed objects with the attributes WbSvnFileState had
+#       current - WbSvnFileState with __slots__
+#
+#   The pysvn status of each file is not included as both keep it.
+#
+#   usage: svn_file_state_memory.py [<num-files>]
+#
+import sys
+
+sys.path.insert( 0, '..' )
+sys.path.insert( 0, '../../Common' )
+sys.path.insert( 0, '../../Common/Experiments' )
+
+import file_state_memory
+
+import wb_svn_project
+
+class FakeProject:
+    pass
+
+class FakeStatus:
+    is_versioned = True
+
+class LegacyFileState:
+    def __init__( self, project, filepath ):
+        self.project = project
+        self.filepath = filepath
+        self.is_dir = False
+        self.state = None
+
+    def setState( self, state ):
+        self.state = state
+
+def makeFileStates( file_state_class, project, all_paths ):
+    status = FakeStatus()
+
+    all_file_state = {}
+    for path in all_paths:
+        file_state = file_state_class( project, path )
+        file_state.setState( status )
+        all_file_state[ path ] = file_state
+
+    return all_file_state
+
+if __name__ == '__main__':
+    sys.exit( file_state_memory.main( sys.argv, 'svn', makeFileStates,
+                FakeProject(), LegacyFileState, wb_svn_project.WbSvnFileState ) )
@@ -14,6 +14,7 @@ from PyQt5 import QtWidgets
 from PyQt5 import QtGui
 from PyQt5 import QtCore
 
+import wb_profile
 import wb_tracked_qwidget
 import wb_main_window
 import wb_ui_components
@@ -225,6 +226,7 @@ class WbLogHistoryTableView(wb_table_view.WbTableView):
 
         self.main_window.setFocusIsIn( 'commits' )
 
+@wb_profile.profileModelResets
 class WbSvnLogHistoryModel(QtCore.QAbstractTableModel):
     col_author = 0
     col_date = 1
@@ -347,6 +349,7 @@ class WbChangesTableView(wb_table_view.WbTableView):
 
         self.main_window.setFocusIsIn( 'changes' )
 
+@wb_profile.profileModelResets
 class WbSvnChangedFilesModel(QtCore.QAbstractTableModel):
     col_action = 0
     col_path = 1
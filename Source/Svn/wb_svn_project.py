@@ -14,14 +14,17 @@ import pathlib
 import tempfile
 import pysvn
 
+import wb_profile
 import wb_date
 import wb_read_file
 import wb_annotate_node
 import wb_background_thread
+import wb_platform_specific
 import wb_svn_utils
 
 ClientError = pysvn.ClientError
 
+@wb_profile.profileMethods( 'cmd', 'updateState' )
 class SvnProject:
     svn_depth_empty = pysvn.depth.empty
     svn_depth_infinity = pysvn.depth.infinity
@@ -123,6 +126,16 @@ class SvnProject:
 
             self.flat_tree.addFileByPath( filepath )
 
+    def usesDirtyPaths( self ):
+        return False
+
+    def noteDirtyPaths( self, all_dirty_paths ):
+        # svn status always checks the whole working copy
+        pass
+
+    def close( self ):
+        pass
+
     def updateState( self, tree_leaf ):
         self.debugLog( 'updateState( %r ) repo=%s' % (tree_leaf, self.projectPath()) )
 
@@ -290,6 +303,22 @@ class SvnProject:
         self.client().revert( self.pathForSvn( filename ), depth=depth )
         self.__stale_status = True
 
+    def cmdAddFiles( self, all_filenames ):
+        self.debugLog( 'cmdAddFiles( %d files )' % (len(all_filenames),) )
+
+        for all_paths in wb_platform_specific.chunkCommandLinePaths( [self.pathForSvn( filename ) for filename in all_filenames] ):
+            self.client().add( all_paths )
+
+        self.__stale_status = True
+
+    def cmdRevertFiles( self, all_filenames ):
+        self.debugLog( 'cmdRevertFiles( %d files )' % (len(all_filenames),) )
+
+        for all_paths in wb_platform_specific.chunkCommandLinePaths( [self.pathForSvn( filename ) for filename in all_filenames] ):
+            self.client().revert( all_paths )
+
+        self.__stale_status = True
+
     def cmdResolved( self, filename ):
         self.debugLog( 'cmdResolved( %r )' % (filename,) )
 
@@ -512,6 +541,12 @@ class SvnProject:
 
         return all_annotation_nodes
 
+    def annotateRevisionKey( self, filename ):
+        # annotate is from r0 to HEAD which only changes when the file is committed
+        info = self.client().info2( self.pathForSvn( filename ), revision=self.svn_rev_head, depth=self.svn_depth_empty )
+        # info is list of (path, entry)
+        return '%d' % (info[0][1]['last_changed_rev'].number,)
+
     def cmdCommitLogForAnnotateFile( self, filename, rev_start_num, rev_end_num ):
         rev_start = pysvn.Revision( pysvn.opt_revision_kind.number, rev_start_num )
         rev_end = pysvn.Revision( pysvn.opt_revision_kind.number, rev_end_num )
@@ -591,6 +626,9 @@ class SvnProject:
         return self.__notification_of_files_in_conflict
 
 class WbSvnFileState:
+    # there is one WbSvnFileState for each file in the working copy so keep them small
+    __slots__ = ('__project', '__filepath', '__is_dir', '__state')
+
     def __init__( self, project, filepath ):
         self.__project = project
         self.__filepath = filepath
@@ -662,12 +700,12 @@ class WbSvnFileState:
 
     def getTextLinesWorking( self ):
         path = pathlib.Path( self.__project.projectPath() ) / self.__filepath
-        with path.open( encoding='utf-8' ) as f:
-            all_lines = f.read().split( '\n' )
-            if all_lines[-1] == '':
-                return all_lines[:-1]
-            else:
-                return all_lines
+        # like a file opened in text mode
+        all_lines = wb_read_file.readFileTextLines( path, universal_newlines=True )
+        if all_lines[-1] == '':
+            return all_lines[:-1]
+        else:
+            return all_lines
 
     def getTextLinesBase( self ):
         path = pathlib.Path( self.__project.projectPath() ) / self.__filepath
@@ -679,6 +717,29 @@ class WbSvnFileState:
 
         return all_content_lines
 
+    def isWorkingSameAsBase( self ):
+        # compare the working file with the checksum of the
+        # base that svn keeps so that the base text is not read
+        try:
+            wc_info = self.__project.cmdInfo( self.__filepath )['wc_info']
+
+        except pysvn.ClientError:
+            return False
+
+        if wc_info is None or not wc_info['checksum']:
+            return False
+
+        # svn 1.7 and later keep a SHA1 and older working copies an MD5
+        checksum = wc_info['checksum']
+        digest_name = 'sha1' if len(checksum) == 40 else 'md5'
+
+        path = pathlib.Path( self.__project.projectPath() ) / self.__filepath
+        try:
+            return wb_read_file.fileDigest( path, digest_name ) == checksum
+
+        except OSError:
+            return False
+
     def getTextLinesHead( self ):
         path = pathlib.Path( self.__project.projectPath() ) / self.__filepath
         all_content_lines = self.__project.client().cat(
@@ -18,6 +18,7 @@ from PyQt5 import QtWidgets
 import wb_log_history_options_dialog
 import wb_ui_actions
 import wb_common_dialogs
+import wb_main_window
 
 import wb_svn_project
 import wb_svn_info_dialog
@@ -466,15 +467,8 @@ class SvnMainWindowActions(wb_ui_actions.WbMainWindowActions):
         if not self.main_window.isScmTypeActive( 'svn' ):
             return False
 
-        all_file_state = self.tableSelectedAllFileStates()
-        if len(all_file_state) == 0:
-            return False
-
-        for file_state in all_file_state:
-            if not file_state.isModified():
-                return False
-
-        return True
+        facts = self.tableSelectionFacts()
+        return len(facts) > 0 and facts.all( wb_svn_project.WbSvnFileState.isModified )
 
     def enablerTableSvnDiffHeadVsWorking( self ):
         if not self.main_window.isScmTypeActive( 'svn' ):
@@ -500,27 +494,14 @@ class SvnMainWindowActions(wb_ui_actions.WbMainWindowActions):
         return self._enablerTableSvnIsControlled()
 
     def __enablerTableSvnIsUncontrolled( self ):
-        all_file_state = self.tableSelectedAllFileStates()
-        if len(all_file_state) == 0:
-            return False
-
-        for file_state in all_file_state:
-            if not file_state.isUncontrolled():
-                return False
-
-        return True
+        facts = self.tableSelectionFacts()
+        return len(facts) > 0 and facts.all( wb_svn_project.WbSvnFileState.isUncontrolled )
 
     def _enablerTableSvnIsControlled( self ):
-        all_file_state = self.tableSelectedAllFileStates()
-        if len(all_file_state) == 0:
-            return False
-
-        for file_state in all_file_state:
-            if not file_state.isControlled():
-                return False
-
-        return True
+        facts = self.tableSelectionFacts()
+        return len(facts) > 0 and facts.all( wb_svn_project.WbSvnFileState.isControlled )
 
+    @wb_main_window.enabler_depends_on( wb_main_window.ENABLER_PROJECT )
     def enablerSvnCheckin( self ):
         tree_node = self.selectedSvnProjectTreeNode()
         if tree_node is None:
@@ -531,24 +512,36 @@ class SvnMainWindowActions(wb_ui_actions.WbMainWindowActions):
     # ------------------------------------------------------------
     def tableActionSvnDiffBaseVsWorking( self ):
         for file_state in self.tableSelectedAllFileStates():
-            self.diffTwoFiles(
+            self.__diffBaseVsWorking(
+                    file_state,
                     T_('Diff Base vs. Working %s') % (file_state.relativePath(),),
-                    file_state.getTextLinesBase(),
-                    file_state.getTextLinesWorking(),
                     T_('Base %s') % (file_state.relativePath(),),
                     T_('Working %s') % (file_state.relativePath(),)
                     )
 
     def tableActionSvnDiffHeadVsWorking( self ):
         for file_state in self.tableSelectedAllFileStates():
-            self.diffTwoFiles(
+            self.__diffBaseVsWorking(
+                    file_state,
                     T_('Diff HEAD vs. Working %s') % (file_state.relativePath(),),
-                    file_state.getTextLinesBase(),
-                    file_state.getTextLinesWorking(),
                     T_('HEAD %s') % (file_state.relativePath(),),
                     T_('Working %s') % (file_state.relativePath(),)
                     )
 
+    def __diffBaseVsWorking( self, file_state, title, header_left, header_right ):
+        # the checksum of the base is compared before reading its text
+        if file_state.isWorkingSameAsBase():
+            self.showIdenticalFiles( title, file_state.getTextLinesWorking(), header_left, header_right )
+            return
+
+        self.diffTwoFiles(
+                title,
+                file_state.getTextLinesBase(),
+                file_state.getTextLinesWorking(),
+                header_left,
+                header_right
+                )
+
     @thread_switcher
     def tableActionSvnInfo_Bg( self, checked=None ):
         def execute_function( svn_project, filename ):
@@ -593,20 +586,20 @@ class SvnMainWindowActions(wb_ui_actions.WbMainWindowActions):
 
     @thread_switcher
     def tableActionSvnAdd_Bg( self, checked=None ):
-        def execute_function( svn_project, filename ):
+        def execute_all_function( svn_project, all_filenames ):
             try:
-                svn_project.cmdAdd( filename )
+                svn_project.cmdAddFiles( all_filenames )
 
             except wb_svn_project.ClientError as e:
                 svn_project.logClientError( e )
 
-        yield from self._tableActionSvnCmd_Bg( execute_function )
+        yield from self._tableActionSvnCmd_Bg( execute_all_function, all_at_once=True )
 
     @thread_switcher
     def tableActionSvnRevert_Bg( self, checked=None ):
-        def execute_function( svn_project, filename ):
+        def execute_all_function( svn_project, all_filenames ):
             try:
-                svn_project.cmdRevert( filename )
+                svn_project.cmdRevertFiles( all_filenames )
 
             except wb_svn_project.ClientError as e:
                 svn_project.logClientError( e )
@@ -615,7 +608,7 @@ class SvnMainWindowActions(wb_ui_actions.WbMainWindowActions):
         def are_you_sure( all_filenames ):
             return wb_common_dialogs.WbAreYouSureRevert( self.main_window, all_filenames )
 
-        yield from self._tableActionSvnCmd_Bg( execute_function, are_you_sure )
+        yield from self._tableActionSvnCmd_Bg( execute_all_function, are_you_sure, all_at_once=True )
 
     @thread_switcher
     def tableActionSvnResolveConflict_Bg( self, checked=None ):
@@ -710,12 +703,12 @@ class SvnMainWindowActions(wb_ui_actions.WbMainWindowActions):
         yield from self._tableActionSvnCmd_Bg( execute_function )
 
     @thread_switcher
-    def _tableActionSvnCmd_Bg( self, execute_function, are_you_sure_function=None ):
+    def _tableActionSvnCmd_Bg( self, execute_function, are_you_sure_function=None, all_at_once=False ):
         svn_project = self.selectedSvnProject()
         if svn_project is None:
             return
 
-        yield from self.table_view.tableActionViewRepo_Bg( execute_function, are_you_sure_function )
+        yield from self.table_view.tableActionViewRepo_Bg( execute_function, are_you_sure_function, None, all_at_once )
         yield from self.top_window.updateTableView_Bg()
 
     # ------------------------------------------------------------
@@ -745,6 +738,30 @@ class SvnMainWindowActions(wb_ui_actions.WbMainWindowActions):
 
         yield self.switchToBackground
 
+        repo_key = str( svn_project.projectPath() )
+        try:
+            rev_key = svn_project.annotateRevisionKey( filename )
+
+        except wb_svn_project.ClientError:
+            # annotate without the cache
+            rev_key = None
+
+        cached_annotation = self.app.annotate_cache.get( 'svn', repo_key, filename, rev_key )
+        if cached_annotation is not None:
+            all_annotation_nodes, all_commit_logs = cached_annotation
+
+            yield self.switchToForeground
+
+            self.setStatusAction()
+            self.progress.end()
+
+            annotate_view = wb_svn_annotate.WbSvnAnnotateView(
+                                self.app,
+                                T_('Annotation of %s') % (filename,) )
+            annotate_view.showAnnotationForFile( all_annotation_nodes, all_commit_logs )
+            annotate_view.show()
+            return
+
         try:
             all_annotation_nodes = svn_project.cmdAnnotationForFile( filename )
             all_annotate_revs = set()
@@ -770,9 +787,11 @@ class SvnMainWindowActions(wb_ui_actions.WbMainWindowActions):
         try:
             all_commit_logs = svn_project.cmdCommitLogForAnnotateFile( filename, rev_max, rev_min )
 
+            self.app.annotate_cache.put( 'svn', repo_key, filename, rev_key, all_annotation_nodes, all_commit_logs )
+
         except wb_svn_project.ClientError as e:
             svn_project.logClientError( e, 'Cannot get commit logs for %s:%s' % (svn_project.projectPath(), filename) )
-            all_commit_logs = []
+            all_commit_logs = {}
 
         yield self.switchToForeground
 
@@ -803,7 +822,7 @@ class SvnMainWindowActions(wb_ui_actions.WbMainWindowActions):
 
         # QQQ need to finish the work to setup all_paths_to_checkin
         commit_dialog = wb_svn_commit_dialog.WbSvnCommitDialog( self.app, svn_project, [] )
-        commit_dialog.commitAccepted.connect( self.app.wrapWithThreadSwitcher( self.__commitAccepted_Bg ) )
+        commit_dialog.commitAccepted.connect( self.app.wrapWithThreadSwitcher( self.__commitAccepted_Bg, 'commit', serial_key=svn_project.projectName() ) )
         commit_dialog.commitClosed.connect( self.__commitClosed )
 
         # show to the user
@@ -864,22 +883,24 @@ class SvnMainWindowActions(wb_ui_actions.WbMainWindowActions):
     #============================================================
     @thread_switcher
     def tableActionSvnAddAndInclude_Bg( self, checked=None ):
-        def execute_function( svn_project, filename ):
+        def execute_all_function( svn_project, all_filenames ):
             try:
-                svn_project.cmdAdd( filename )
-                self.main_window.addCommitIncludedFile( filename )
+                svn_project.cmdAddFiles( all_filenames )
+                for filename in all_filenames:
+                    self.main_window.addCommitIncludedFile( filename )
 
             except wb_svn_project.ClientError as e:
                 svn_project.logClientError( e )
 
-        yield from self._tableActionSvnCmd_Bg( execute_function )
+        yield from self._tableActionSvnCmd_Bg( execute_all_function, all_at_once=True )
 
     @thread_switcher
     def tableActionSvnRevertAndExclude_Bg( self, checked=None ):
-        def execute_function( svn_project, filename ):
+        def execute_all_function( svn_project, all_filenames ):
             try:
-                svn_project.cmdRevert( filename )
-                self.main_window.removeCommitIncludedFile( filename )
+                svn_project.cmdRevertFiles( all_filenames )
+                for filename in all_filenames:
+                    self.main_window.removeCommitIncludedFile( filename )
 
             except wb_svn_project.ClientError as e:
                 svn_project.logClientError( e )
@@ -888,7 +909,7 @@ class SvnMainWindowActions(wb_ui_actions.WbMainWindowActions):
         def are_you_sure( all_filenames ):
             return wb_common_dialogs.WbAreYouSureRevert( self.main_window, all_filenames )
 
-        yield from self._tableActionSvnCmd_Bg( execute_function, are_you_sure )
+        yield from self._tableActionSvnCmd_Bg( execute_all_function, are_you_sure, all_at_once=True )
 
     @thread_switcher
     def tableActionCommitInclude_Bg( self, checked=None ):